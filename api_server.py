@@ -1,22 +1,36 @@
 # api_server.py (SUDAH DITAMBAHKAN ENDPOINT GAMBAR)
 
-from flask import Flask, request, jsonify, send_from_directory  # <--- TAMBAHKAN send_from_directory
+from flask import Flask, request, jsonify, send_file, abort, Response, stream_with_context
 from flask_cors import CORS
-from chatbot_service import ChatbotService
+from chatbot_service import (ChatbotService, BASE_OUTPUT_DIR, PRELOAD_ONLY,
+                             BATCH_JOB_CONCURRENCY, BATCH_JOB_MAX_ATTEMPTS, BATCH_JOB_MAX_REQUESTS)
+from core.batch_runner import BatchRunner, parse_batch_request
+from core.metrics import metrics
+from core.image_serving import SourceImageResolver, IMAGE_MAX_AGE_SECONDS
+from core.chat_request import CORS_ORIGINS, parse_chat_request, format_sse, llm_error_response
+from core.vector_store import VectorStoreError
+from core.llm_client import LLMError
 import os
+import json
 
 # --- INISIALISASI UTAMA ---
 print("Starting server and initializing ChatbotService...")
 try:
-    chatbot_service = ChatbotService()
+    # Di bawah gunicorn (gunicorn.conf.py) master hanya memuat model; tiap worker memanggil
+    # connect() dan warmup() setelah fork. Tanpa gunicorn semuanya dilakukan di sini.
+    chatbot_service = ChatbotService(preload_only=PRELOAD_ONLY)
+    if not PRELOAD_ONLY:
+        chatbot_service.warmup()
     print("ChatbotService is ready.")
 except Exception as e:
     print(f"Failed to initialize ChatbotService: {e}")
     chatbot_service = None
 
+source_images = SourceImageResolver(BASE_OUTPUT_DIR)
+
 # Buat aplikasi Flask
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": ["http://milvus_web.localhost", "http://localhost:5000", "http://127.0.0.1:5000", "http://192.168.100.66:5000"]}})
+CORS(app, resources={r"/*": {"origins": CORS_ORIGINS}})
 
 # --- ENDPOINT API ---
 
@@ -28,42 +42,153 @@ def index():
         "status": "healthy" if chatbot_service else "unhealthy"
     })
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness: 200 hanya setelah koneksi worker dibuka dan inferensi pemanasan selesai."""
+    if not chatbot_service or not chatbot_service.ready:
+        return jsonify({"status": "not ready"}), 503
+    return jsonify({"status": "ready", "pid": os.getpid()})
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Endpoint utama untuk menerima pertanyaan dari pengguna."""
     if not chatbot_service:
         return jsonify({"error": "Service is not initialized. Check server logs."}), 503
 
-    data = request.get_json()
-    if not data:
-        return jsonify({"error": "Invalid request. JSON body is missing."}), 400
-
-    query = data.get('query')
-    if not query or not isinstance(query, str):
-        return jsonify({"error": "Missing 'query' field in request or it's not a string."}), 400
-
-    history = data.get('history', [])
-    if not isinstance(history, list):
-        return jsonify({"error": "'history' field must be a list."}), 400
+    # Validasi body (termasuk mode 'session_id' dan 'defer_suggestions') ada di core/chat_request.py
+    params, error = parse_chat_request(request.get_json(silent=True))
+    if error:
+        return jsonify({"error": error}), 400
+    query = params["query"]
 
     print(f"Received query: {query}")
 
     try:
-        response = chatbot_service.get_response(query, history)
+        if params["session_mode"]:
+            response = chatbot_service.get_session_response(query, params["session_id"], params["defer_suggestions"],
+                                                            params["filters"])
+        else:
+            response = chatbot_service.get_response(query, params["history"], params["defer_suggestions"],
+                                                    params["filters"])
         return jsonify(response)
-    
+
+    except VectorStoreError as e:
+        # Zilliz tidak menjawab dalam deadline-nya (setelah retry): klien boleh mencoba lagi
+        print(f"Vector search unavailable: {e}")
+        return jsonify({"error": "Document search is temporarily unavailable.", "details": str(e)}), 503
+    except LLMError as e:
+        # Groq gagal setelah retry/deadline: tidak ada jawaban error yang dikirim sebagai jawaban
+        print(f"LLM unavailable: {e}")
+        status, body, headers = llm_error_response(e)
+        return jsonify(body), status, headers
     except Exception as e:
         print(f"Error processing query: {e}")
         return jsonify({"error": "An internal error occurred.", "details": str(e)}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Versi streaming dari /chat (text/event-stream). Urutan event:
+    'sources' -> 'token' (berulang) -> 'suggestions' -> 'done'.
+    Body sama dengan /chat, termasuk mode 'session_id'.
+    """
+    if not chatbot_service:
+        return jsonify({"error": "Service is not initialized. Check server logs."}), 503
+
+    params, error = parse_chat_request(request.get_json(silent=True), allow_defer=False)
+    if error:
+        return jsonify({"error": error}), 400
+    query = params["query"]
+
+    print(f"Received streaming query: {query}")
+
+    def generate():
+        try:
+            for event, payload in chatbot_service.stream_response(
+                    query, params["history"], params["session_id"], params["session_mode"], params["filters"]):
+                yield format_sse(event, payload)
+        except LLMError as e:
+            print(f"LLM unavailable during streaming query: {e}")
+            yield format_sse("error", llm_error_response(e)[1])
+        except Exception as e:
+            print(f"Error processing streaming query: {e}")
+            yield format_sse("error", {"error": "An internal error occurred.", "details": str(e)})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Banyak pertanyaan dalam satu request: {"requests": [{"id", "query", "history", "filters"}, ...]}.
+    Hasil dialirkan sebagai NDJSON (satu baris per pertanyaan, urutan selesai), diakhiri
+    baris {"done": true, ...}. Saran tidak dibuat untuk job batch.
+    """
+    if not chatbot_service:
+        return jsonify({"error": "Service is not initialized. Check server logs."}), 503
+
+    params, error = parse_batch_request(request.get_json(silent=True), BATCH_JOB_MAX_REQUESTS, BATCH_JOB_CONCURRENCY)
+    if error:
+        return jsonify({"error": error}), 400
+
+    print(f"Received batch of {len(params['jobs'])} queries")
+    runner = BatchRunner(chatbot_service, params["concurrency"], BATCH_JOB_MAX_ATTEMPTS)
+
+    def generate():
+        for result in runner.run(params["jobs"]):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True, **runner.scheduler.counts}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/suggestions/<request_id>', methods=['GET'])
+def suggestions(request_id):
+    """Saran pertanyaan lanjutan untuk request /chat yang memakai defer_suggestions."""
+    if not chatbot_service:
+        return jsonify({"error": "Service is not initialized."}), 503
+
+    result = chatbot_service.get_suggestions(request_id)
+    if result is None:
+        return jsonify({"error": "Unknown or already fetched request_id."}), 404
+    return jsonify({"request_id": request_id, "suggestions": result})
+
+@app.route('/cache/invalidate', methods=['POST'])
+def invalidate_cache():
+    """Membuang cache jawaban semantik; body opsional {"collection": "..."} untuk satu koleksi saja."""
+    if not chatbot_service:
+        return jsonify({"error": "Service is not initialized."}), 503
+
+    data = request.get_json(silent=True) or {}
+    removed = chatbot_service.invalidate_answer_cache(data.get('collection'))
+    # Di bawah gunicorn hanya cache worker ini yang dibersihkan (lihat gunicorn.conf.py)
+    return jsonify({"status": "Answer cache invalidated.", "removed": removed, "pid": os.getpid()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics_summary():
+    """Counter dan latensi p50/p95 (mis. answer_seconds, suggestions_saved_seconds) milik worker ini."""
+    return jsonify(dict(metrics.summary(), pid=os.getpid()))
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Statistik micro-batching model, hit/miss cache dan anggaran rate limit LLM."""
+    if not chatbot_service:
+        return jsonify({"error": "Service is not initialized."}), 503
+    return jsonify({"batching": chatbot_service.batching_stats(), "caches": chatbot_service.cache_stats(),
+                    "llm": chatbot_service.llm_stats(),
+                    "thumbnails": source_images.thumbnails.stats()})
+
 @app.route('/clear_history', methods=['POST'])
 def clear_history():
-    """Endpoint untuk membersihkan riwayat percakapan di sisi server."""
+    """
+    Endpoint untuk membersihkan riwayat percakapan.
+    Dengan body {"session_id": "..."} riwayat session di server dihapus; tanpa
+    session_id riwayat memang hanya ada di klien.
+    """
     if not chatbot_service:
         return jsonify({"error": "Service is not initialized."}), 503
     
-    chatbot_service.clear_history()
-    return jsonify({"status": "Conversation history cleared on the server."})
+    data = request.get_json(silent=True) or {}
+    return jsonify(chatbot_service.clear_history(data.get('session_id')))
 
 
 # <--- TAMBAHKAN ENDPOINT BARU INI --->
@@ -72,12 +197,20 @@ def serve_source_image(filename):
     """
     Endpoint untuk melayani file gambar dari folder 'output'.
     Contoh URL: /source_image/Manual_Akuntansi/images/p13_full.png
+    Thumbnail: tambahkan ?w=320 (dibulatkan ke 160/320/640) atau ?thumb=1.
+    Respons membawa ETag kuat, Last-Modified dan Cache-Control; If-None-Match /
+    If-Modified-Since dijawab 304 dan header Range didukung (206).
     """
-    # 'output' adalah nama folder di mana gambar disimpan
-    # 'filename' adalah path relatif di dalam folder tersebut
-    return send_from_directory('output', filename)
+    # 'filename' adalah path relatif di dalam folder output; path di luar folder ditolak
+    width = SourceImageResolver.requested_width(request.args.get('w'), request.args.get('thumb'))
+    resolved = source_images.resolve(filename, width)
+    if resolved is None:
+        abort(404)
+    path, etag, last_modified = resolved
+    return send_file(path, etag=etag, last_modified=last_modified, max_age=IMAGE_MAX_AGE_SECONDS, conditional=True)
 
 
 # --- MENJALANKAN SERVER ---
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # threaded=True: request lain tetap jalan selama satu request menunggu Zilliz/Groq
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
\ No newline at end of file
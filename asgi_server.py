@@ -0,0 +1,255 @@
+# asgi_server.py
+"""
+Entry point ASGI dengan route yang sama seperti api_server.py, di atas AsyncChatbotService.
+Request yang sedang menunggu Zilliz / Groq tidak memegang thread, sehingga satu proses
+bisa melayani ratusan percakapan bersamaan.
+
+Jalankan:
+    uvicorn asgi_server:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from async_chatbot_service import AsyncChatbotService
+from chatbot_service import BASE_OUTPUT_DIR, BATCH_JOB_CONCURRENCY, BATCH_JOB_MAX_ATTEMPTS, BATCH_JOB_MAX_REQUESTS
+from core.batch_runner import AsyncBatchRunner, parse_batch_request
+from core.chat_request import CORS_ORIGINS, parse_chat_request, format_sse, llm_error_response
+from core.image_serving import SourceImageResolver, IMAGE_MAX_AGE_SECONDS, is_not_modified, http_date
+from core.metrics import metrics
+from core.vector_store import VectorStoreError
+from core.llm_client import LLMError
+
+# --- INISIALISASI UTAMA ---
+print("Starting ASGI server and initializing AsyncChatbotService...")
+try:
+    chatbot_service = AsyncChatbotService()
+    print("AsyncChatbotService is ready.")
+except Exception as e:
+    print(f"Failed to initialize AsyncChatbotService: {e}")
+    chatbot_service = None
+
+source_images = SourceImageResolver(BASE_OUTPUT_DIR)
+
+SERVICE_UNAVAILABLE = {"error": "Service is not initialized. Check server logs."}
+
+
+async def _json_body(request: Request):
+    try:
+        return await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+
+# --- ENDPOINT API ---
+async def index(request: Request):
+    """Endpoint untuk mengecek apakah server berjalan."""
+    return JSONResponse({
+        "message": "RAG Chatbot API is running!",
+        "status": "healthy" if chatbot_service else "unhealthy"
+    })
+
+
+async def ready(request: Request):
+    """Readiness: 200 hanya setelah inferensi pemanasan selesai ('/' hanya liveness)."""
+    if not chatbot_service or not chatbot_service.ready:
+        return JSONResponse({"status": "not ready"}, status_code=503)
+    return JSONResponse({"status": "ready", "pid": os.getpid()})
+
+
+async def chat(request: Request):
+    """Endpoint utama untuk menerima pertanyaan dari pengguna (sama dengan /chat di api_server.py)."""
+    if not chatbot_service:
+        return JSONResponse(SERVICE_UNAVAILABLE, status_code=503)
+
+    params, error = parse_chat_request(await _json_body(request))
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    query = params["query"]
+
+    print(f"Received query: {query}")
+
+    try:
+        if params["session_mode"]:
+            response = await chatbot_service.get_session_response(query, params["session_id"], params["defer_suggestions"],
+                                                                  params["filters"])
+        else:
+            response = await chatbot_service.get_response(query, params["history"], params["defer_suggestions"],
+                                                          params["filters"])
+        return JSONResponse(response)
+    except VectorStoreError as e:
+        print(f"Vector search unavailable: {e}")
+        return JSONResponse({"error": "Document search is temporarily unavailable.", "details": str(e)},
+                            status_code=503)
+    except LLMError as e:
+        print(f"LLM unavailable: {e}")
+        status, body, headers = llm_error_response(e)
+        return JSONResponse(body, status_code=status, headers=headers)
+    except Exception as e:
+        print(f"Error processing query: {e}")
+        return JSONResponse({"error": "An internal error occurred.", "details": str(e)}, status_code=500)
+
+
+async def chat_stream(request: Request):
+    """Versi streaming dari /chat (text/event-stream): 'sources' -> 'token' -> 'suggestions' -> 'done'."""
+    if not chatbot_service:
+        return JSONResponse(SERVICE_UNAVAILABLE, status_code=503)
+
+    params, error = parse_chat_request(await _json_body(request), allow_defer=False)
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    query = params["query"]
+
+    print(f"Received streaming query: {query}")
+
+    async def generate():
+        try:
+            async for event, payload in chatbot_service.stream_response(
+                    query, params["history"], params["session_id"], params["session_mode"], params["filters"]):
+                yield format_sse(event, payload)
+        except LLMError as e:
+            print(f"LLM unavailable during streaming query: {e}")
+            yield format_sse("error", llm_error_response(e)[1])
+        except Exception as e:
+            print(f"Error processing streaming query: {e}")
+            yield format_sse("error", {"error": "An internal error occurred.", "details": str(e)})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(generate(), media_type='text/event-stream', headers=headers)
+
+
+async def chat_batch(request: Request):
+    """
+    Banyak pertanyaan dalam satu request: {"requests": [{"id", "query", "history", "filters"}, ...]}.
+    Hasil dialirkan sebagai NDJSON (satu baris per pertanyaan, urutan selesai), diakhiri
+    baris {"done": true, ...}. Saran tidak dibuat untuk job batch.
+    """
+    if not chatbot_service:
+        return JSONResponse(SERVICE_UNAVAILABLE, status_code=503)
+
+    params, error = parse_batch_request(await _json_body(request), BATCH_JOB_MAX_REQUESTS, BATCH_JOB_CONCURRENCY)
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+
+    print(f"Received batch of {len(params['jobs'])} queries")
+    runner = AsyncBatchRunner(chatbot_service, params["concurrency"], BATCH_JOB_MAX_ATTEMPTS)
+
+    async def generate():
+        async for result in runner.run(params["jobs"]):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True, **runner.scheduler.counts}) + "\n"
+
+    return StreamingResponse(generate(), media_type='application/x-ndjson')
+
+
+async def suggestions(request: Request):
+    """Saran pertanyaan lanjutan untuk request /chat yang memakai defer_suggestions."""
+    if not chatbot_service:
+        return JSONResponse({"error": "Service is not initialized."}, status_code=503)
+
+    request_id = request.path_params["request_id"]
+    result = await chatbot_service.get_suggestions(request_id)
+    if result is None:
+        return JSONResponse({"error": "Unknown or already fetched request_id."}, status_code=404)
+    return JSONResponse({"request_id": request_id, "suggestions": result})
+
+
+async def invalidate_cache(request: Request):
+    """Membuang cache jawaban semantik; body opsional {"collection": "..."} untuk satu koleksi saja."""
+    if not chatbot_service:
+        return JSONResponse({"error": "Service is not initialized."}, status_code=503)
+
+    data = await _json_body(request) or {}
+    removed = chatbot_service.invalidate_answer_cache(data.get('collection'))
+    return JSONResponse({"status": "Answer cache invalidated.", "removed": removed})
+
+
+async def metrics_summary(request: Request):
+    """Counter dan latensi p50/p95 (mis. answer_seconds, suggestions_saved_seconds)."""
+    return JSONResponse(metrics.summary())
+
+
+async def stats(request: Request):
+    """Statistik micro-batching model, hit/miss cache dan anggaran rate limit LLM."""
+    if not chatbot_service:
+        return JSONResponse({"error": "Service is not initialized."}, status_code=503)
+    return JSONResponse({"batching": chatbot_service.batching_stats(), "caches": chatbot_service.cache_stats(),
+                         "llm": chatbot_service.llm_stats(),
+                         "thumbnails": source_images.thumbnails.stats()})
+
+
+async def clear_history(request: Request):
+    """Membersihkan riwayat session di server (body {"session_id": "..."})."""
+    if not chatbot_service:
+        return JSONResponse({"error": "Service is not initialized."}, status_code=503)
+
+    data = await _json_body(request) or {}
+    return JSONResponse(await chatbot_service.clear_history(data.get('session_id')))
+
+
+async def serve_source_image(request: Request):
+    """
+    Gambar halaman dari folder 'output' (lihat api_server.serve_source_image):
+    ETag kuat, Last-Modified, Cache-Control, 304 kondisional, Range, dan ?w= / ?thumb=1.
+    """
+    width = SourceImageResolver.requested_width(request.query_params.get('w'), request.query_params.get('thumb'))
+    # Hash ETag dan pembuatan thumbnail adalah I/O + CPU; jangan jalankan di event loop
+    resolved = await asyncio.to_thread(source_images.resolve, request.path_params["filename"], width)
+    if resolved is None:
+        return JSONResponse({"error": "Not found."}, status_code=404)
+    path, etag, last_modified = resolved
+
+    headers = {
+        "ETag": f'"{etag}"',
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": f"public, max-age={IMAGE_MAX_AGE_SECONDS}",
+    }
+    if is_not_modified(request.headers.get("if-none-match"), request.headers.get("if-modified-since"),
+                       etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers)
+
+
+routes = [
+    Route('/', index, methods=['GET']),
+    Route('/ready', ready, methods=['GET']),
+    Route('/chat', chat, methods=['POST']),
+    Route('/chat/stream', chat_stream, methods=['POST']),
+    Route('/chat/batch', chat_batch, methods=['POST']),
+    Route('/suggestions/{request_id}', suggestions, methods=['GET']),
+    Route('/cache/invalidate', invalidate_cache, methods=['POST']),
+    Route('/metrics', metrics_summary, methods=['GET']),
+    Route('/stats', stats, methods=['GET']),
+    Route('/clear_history', clear_history, methods=['POST']),
+    Route('/source_image/{filename:path}', serve_source_image, methods=['GET', 'HEAD']),
+]
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Pemanasan di event loop yang akan melayani request (klien async dibuat di loop ini)
+    if chatbot_service:
+        await chatbot_service.warmup()
+    yield
+    # Koneksi pool Zilliz async ditutup di loop yang sama tempat dibuat
+    if chatbot_service and chatbot_service.milvus:
+        await chatbot_service.milvus.close()
+
+
+app = Starlette(routes=routes, lifespan=lifespan,
+                middleware=[Middleware(CORSMiddleware, allow_origins=CORS_ORIGINS,
+                                       allow_methods=["*"], allow_headers=["*"])])
+
+
+# --- MENJALANKAN SERVER ---
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=5000)
@@ -0,0 +1,320 @@
+# async_chatbot_service.py
+"""
+Varian async dari ChatbotService untuk server ASGI (asgi_server.py).
+Zilliz (AsyncMilvusClient) dan Groq (AsyncGroq) ditunggu di event loop tanpa memegang
+thread; inferensi CPU (encode, rerank, BM25, penyusunan prompt) dijalankan di executor
+berukuran tetap. Logika retrieval, prompt, cache dan format sumber dipakai ulang dari
+ChatbotService, sehingga jawaban kedua varian identik.
+"""
+import asyncio
+import functools
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from chatbot_service import (
+    ChatbotService, WARMUP_QUERY,
+    SUGGESTION_MODE, SUGGESTION_TIMEOUT_SECONDS, SUGGESTION_POLL_SECONDS,
+    ENUMERATION_MIN_NEW_RATIO,
+)
+from core.enumeration import collect_unique_hits_async
+from core.llm_answer import AsyncLLMAnswerGenerator
+from core.llm_client import PRIORITY_SUGGESTION
+from core.metrics import metrics
+from core.request_context import RequestContext
+from core.vector_store import AsyncZillizVectorStore, AsyncLocalVectorStore, SearchProfile
+
+# Batas thread untuk pekerjaan CPU; request lain tetap menunggu I/O di event loop
+ASYNC_CPU_WORKERS = int(os.environ.get("ASYNC_CPU_WORKERS", 16))
+
+
+class AsyncChatbotService(ChatbotService):
+    def __init__(self, milvus=None, llm_generator=None, embedding_model=None, reranker_model=None,
+                 keyword_index=None, image_index=None, cpu_workers=ASYNC_CPU_WORKERS, preload_only=False):
+        """
+        Sama seperti ChatbotService, tetapi `milvus` adalah store vektor async (AsyncZillizVectorStore) dan
+        `llm_generator` adalah AsyncLLMAnswerGenerator (atau objek dengan antarmuka yang sama).
+        """
+        self.cpu_executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="cpu")
+        super().__init__(milvus=milvus, llm_generator=llm_generator, embedding_model=embedding_model,
+                         reranker_model=reranker_model, keyword_index=keyword_index, image_index=image_index,
+                         preload_only=preload_only)
+
+    def _create_executors(self):
+        # Saran dan tahap "map" enumerasi berjalan sebagai task di event loop: tanpa thread pool
+        return None, None
+
+    def _connect_handlers(self, config):
+        """Handler async untuk Zilliz dan Groq (model dan pembungkusnya sama dengan versi sinkron)."""
+        self.milvus = self._create_vector_store(config, AsyncZillizVectorStore, AsyncLocalVectorStore)
+        self.llm_generator = AsyncLLMAnswerGenerator(policy=self._llm_policy())
+
+    async def warmup(self) -> bool:
+        """Versi async dari ChatbotService.warmup (dipanggil dari lifespan asgi_server)."""
+        start = time.perf_counter()
+        embedding_model, reranker_model = self._base_models or (self.embedding_model, self.reranker_model)
+        try:
+            query_vector = await self._run_cpu(embedding_model.encode, WARMUP_QUERY)
+            await self._run_cpu(reranker_model.predict, [(WARMUP_QUERY, WARMUP_QUERY)])
+            profile = self.search_profiles["WARMUP"]
+            await self.milvus.search_by_vector(query_vector, top_k=profile.top_k, profile=profile)
+        except Exception as e:
+            print(f"[WARMUP] Gagal: {e}")
+            return False
+        duration = time.perf_counter() - start
+        metrics.record("warmup_seconds", duration)
+        print(f"[WARMUP] Selesai dalam {duration:.2f} detik (pid {os.getpid()}).")
+        self.ready = True
+        return True
+
+    async def _run_cpu(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_executor, functools.partial(fn, *args))
+
+    # --- METODE UTAMA UNTUK DIPANGGIL OLEH API ---
+    async def get_response(self, query: str, history: list, defer_suggestions: bool = None, filters: dict = None,
+                           suggestions: bool = True):
+        if defer_suggestions is None:
+            defer_suggestions = SUGGESTION_MODE == "deferred"
+        ctx = self.new_context(history, filters)
+
+        if not self.milvus:
+            return {"error": "Service is not fully initialized yet."}
+
+        if self._is_conversational_query(query):
+            return self._conversational_response(ctx, query)
+
+        cache_vector, cached = await self._run_cpu(self._lookup_answer_cache, query, ctx)
+        if cached is not None:
+            return self._cached_response(ctx, query, cached)
+
+        plan = await self._prepare_query_async(query, ctx)
+        suggestion_job = self._start_suggestions_async(query, plan.get("sources", [])) if suggestions else None
+        try:
+            with metrics.timer("answer_seconds"):
+                result = await self._generate_from_plan_async(plan)
+        except BaseException:
+            # Termasuk pembatalan (klien putus): task saran tidak dibiarkan berjalan tanpa pemilik
+            self._cancel_suggestions(suggestion_job)
+            raise
+
+        response = self._build_response(ctx, query, result)
+        if suggestion_job is None:
+            return response
+        if defer_suggestions:
+            self._defer_suggestions(ctx.request_id, suggestion_job)
+            response["suggestions_pending"] = True
+        else:
+            response["suggestions"], complete = await self._await_suggestions_async(suggestion_job)
+            if complete:
+                self._store_answer_cache(cache_vector, ctx, query, response)
+        return response
+
+    async def stream_response(self, query: str, history: list = None, session_id: str = None, session_mode: bool = False,
+                              filters: dict = None):
+        """Versi async dari ChatbotService.stream_response (urutan event yang sama)."""
+        if session_mode:
+            session_id = session_id or uuid.uuid4().hex
+            history = await asyncio.to_thread(self.session_store.get, session_id)
+        ctx = self.new_context(history, filters)
+        base_length = len(ctx.history)
+
+        if not self.milvus:
+            yield "error", {"error": "Service is not fully initialized yet."}
+            return
+
+        is_conversational = self._is_conversational_query(query)
+        cache_vector, cached = (None, None) if is_conversational else \
+            await self._run_cpu(self._lookup_answer_cache, query, ctx)
+        prompt_tokens = 0  # jawaban percakapan/cache tidak memanggil LLM
+        if is_conversational:
+            answer = self._generate_conversational_response(query)
+            yield "sources", []
+            yield "token", answer
+            suggestions = []
+        elif cached is not None:
+            response, _similarity = cached
+            answer = response["answer"]
+            yield "sources", response["sources"]
+            yield "token", answer
+            suggestions = response["suggestions"]
+        else:
+            plan = await self._prepare_query_async(query, ctx)
+            prompt_tokens = plan.get("prompt_tokens", 0)
+            sources = plan.get("sources", [])
+            suggestion_job = self._start_suggestions_async(query, sources)
+            formatted_sources = self._format_sources_for_api(sources)
+            yield "sources", formatted_sources
+
+            if "answer" in plan:
+                answer = plan["answer"]
+                yield "token", answer
+            else:
+                parts = []
+                try:
+                    async for chunk in self.llm_generator.generate_answer_stream(plan["llm_query"], plan["prompt"]):
+                        parts.append(chunk)
+                        yield "token", chunk
+                except BaseException:
+                    self._cancel_suggestions(suggestion_job)
+                    raise
+                answer = "".join(parts).strip()
+
+            suggestions, complete = await self._await_suggestions_async(suggestion_job)
+            if complete:
+                self._store_answer_cache(cache_vector, ctx, query,
+                                         {"answer": answer, "sources": formatted_sources, "suggestions": suggestions})
+
+        self._add_to_history(ctx, "user", query)
+        self._add_to_history(ctx, "bot", answer or "Maaf, saya tidak bisa menjawab.")
+        yield "suggestions", suggestions
+
+        done = {"request_id": ctx.request_id, "cache_hit": cached is not None, "prompt_tokens": prompt_tokens}
+        if session_mode:
+            new_turns = ctx.history[base_length:]
+            await asyncio.to_thread(self.session_store.append, session_id, new_turns)
+            done.update({"session_id": session_id, "new_turns": new_turns})
+        else:
+            done["updated_history"] = ctx.history
+        yield "done", done
+
+    async def get_session_response(self, query: str, session_id: str = None, defer_suggestions: bool = None,
+                                   filters: dict = None):
+        session_id = session_id or uuid.uuid4().hex
+        # Session store (SQLite) bisa memblokir; jalankan di thread
+        history = await asyncio.to_thread(self.session_store.get, session_id)
+        response = await self.get_response(query, history, defer_suggestions, filters)
+        new_turns = response.pop("updated_history", [])[len(history):]
+        await asyncio.to_thread(self.session_store.append, session_id, new_turns)
+        response["session_id"] = session_id
+        response["new_turns"] = new_turns
+        return response
+
+    async def get_suggestions(self, request_id: str):
+        with self._pending_lock:
+            job = self.pending_suggestions.pop(request_id, None)
+        if job is None:
+            return await self._shared_suggestions_async(request_id)
+        if self.session_store.shared and not await asyncio.to_thread(self.session_store.discard_suggestions,
+                                                                      request_id):
+            job[0].cancel()
+            return None  # sudah diambil lewat worker lain
+        return (await self._await_suggestions_async(job))[0]
+
+    async def _shared_suggestions_async(self, request_id: str):
+        """Versi async dari _shared_suggestions (polling tanpa memblokir event loop)."""
+        if not self.session_store.shared:
+            return None
+        while True:
+            entry = await asyncio.to_thread(self.session_store.pop_suggestions, request_id)
+            if entry is None:
+                return None
+            suggestions, deadline = entry
+            if suggestions is not None:
+                return suggestions
+            if time.time() >= deadline:
+                metrics.increment("suggestions_timeout")
+                return self._generate_fallback_suggestions("")
+            await asyncio.sleep(SUGGESTION_POLL_SECONDS)
+
+    async def clear_history(self, session_id: str = None):
+        if session_id:
+            await asyncio.to_thread(self.session_store.delete, session_id)
+        return {"status": "Conversation history cleared."}
+
+    # --- SARAN ---
+    def _start_suggestions_async(self, query: str, sources: list):
+        """Menjadwalkan pembuatan saran sebagai task; mengembalikan (task, deadline)."""
+        context = "\n\n".join([hit.get('text') or '' for hit in sources])
+
+        async def task():
+            start = time.perf_counter()
+            suggestions_text = await self.llm_generator.generate_answer(
+                query, self._build_suggestion_prompt(query, context),
+                priority=PRIORITY_SUGGESTION, timeout=SUGGESTION_TIMEOUT_SECONDS)
+            suggestions = self._parse_suggestions(suggestions_text)
+            duration = time.perf_counter() - start
+            metrics.record("suggestions_seconds", duration)
+            return suggestions, duration
+
+        return asyncio.create_task(task()), time.monotonic() + SUGGESTION_TIMEOUT_SECONDS
+
+    def _publish_suggestions(self, request_id: str, task):
+        # Callback task berjalan di event loop; penulisan SQLite dipindah ke executor
+        asyncio.get_running_loop().run_in_executor(
+            self.cpu_executor, functools.partial(super()._publish_suggestions, request_id, task))
+
+    async def _await_suggestions_async(self, job) -> tuple:
+        """Seperti _await_suggestions (mengembalikan (saran, lengkap)); task yang lewat batas waktu dibatalkan."""
+        task, deadline = job
+        wait_start = time.perf_counter()
+        try:
+            suggestions, duration = await asyncio.wait_for(task, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            metrics.increment("suggestions_timeout")
+            return self._generate_fallback_suggestions(""), False
+        except Exception as e:
+            metrics.increment("suggestions_failed")
+            print(f"[ERROR] Gagal menghasilkan saran: {e}")
+            return self._generate_fallback_suggestions(""), False
+        finally:
+            waited = time.perf_counter() - wait_start
+            metrics.record("suggestions_wait_seconds", waited)
+        metrics.record("suggestions_saved_seconds", max(0.0, duration - waited))
+        return suggestions, True
+
+    # --- PEMROSESAN QUERY ---
+    async def _prepare_query_async(self, query: str, ctx: RequestContext) -> dict:
+        if self._is_comparison_query(query):
+            return await self._prepare_comparison_query_async(query, ctx)
+        if self._classify_query_type(query) == "ENUMERATION":
+            return await self._prepare_enumeration_query_async(query, ctx)
+        return await self._prepare_standard_query_async(query, ctx)
+
+    async def _generate_from_plan_async(self, plan: dict) -> dict:
+        if "answer" in plan:
+            return {"answer": plan["answer"], "sources": plan.get("sources", [])}
+        answer = await self.llm_generator.generate_answer(plan["llm_query"], plan["prompt"])
+        return {"answer": answer, "sources": plan["sources"], "prompt_tokens": plan.get("prompt_tokens", 0)}
+
+    async def _prepare_standard_query_async(self, query: str, ctx: RequestContext) -> dict:
+        print(f"Searching for: {query}")
+        query_vector = await self._run_cpu(self.embedding_model.encode, query)
+        search_profile = self.search_profiles["FACT"]
+        filters = self._search_filters(query, ctx)
+        vector_hits = await self.milvus.search_by_vector(query_vector, top_k=search_profile.top_k,
+                                                         profile=search_profile, filters=filters)
+        return await self._run_cpu(self._standard_plan, query, ctx, vector_hits, filters)
+
+    async def _prepare_enumeration_query_async(self, query: str, ctx: RequestContext) -> dict:
+        print(f"Processing ENUMERATION query: {query}")
+        query_vector = await self._run_cpu(self.embedding_model.encode, query)
+        search_profile = self.search_profiles["ENUMERATION"]
+        filters = self._search_filters(query, ctx)
+        all_hits, pages = await collect_unique_hits_async(
+            lambda offset, limit: self.milvus.search_by_vector(query_vector, top_k=limit, offset=offset,
+                                                               profile=search_profile, filters=filters),
+            search_profile.top_k, self.rerank_profiles["ENUMERATION"].retrieval_depth, ENUMERATION_MIN_NEW_RATIO)
+        print(f"[ENUMERATION] {len(all_hits)} halaman unik dari {pages} halaman hasil pencarian.")
+        stage = await self._run_cpu(self._enumeration_stage, query, ctx, all_hits, filters)
+        if "answer" in stage or len(stage["prompts"]) == 1:
+            return self._enumeration_plan(query, stage)
+        partial_lists = await asyncio.gather(
+            *(self.llm_generator.generate_answer(query, prompt) for prompt in stage["prompts"]))
+        return self._enumeration_plan(query, stage, list(partial_lists))
+
+    async def _prepare_comparison_query_async(self, query: str, ctx: RequestContext) -> dict:
+        entities = self._extract_entities_for_comparison(query)
+        if len(entities) < 2:
+            return {"answer": "Maaf, saya tidak yakin apa yang ingin Anda bandingkan. Tolong sebutkan dua dokumen atau topik.", "sources": []}
+
+        print(f"Searching for context of: {entities}")
+        filters = self._search_filters(query, ctx)
+        hit_lists = await self._search_many(entities, self.search_profiles["COMPARISON"], filters)
+        return await self._run_cpu(self._comparison_plan, query, ctx, entities, hit_lists, filters)
+
+    async def _search_many(self, queries: list, profile: SearchProfile, filters: dict = None) -> list:
+        """Satu encode (di executor CPU service) dan satu pencarian multi-vektor untuk semua query."""
+        vectors = await self._run_cpu(self.embedding_model.encode, list(queries))
+        return await self.milvus.search_by_vectors(vectors, top_k=profile.top_k, profile=profile, filters=filters)
@@ -0,0 +1,79 @@
+# batch_job.py
+"""
+Menjawab banyak pertanyaan dari file JSONL secara offline, tanpa HTTP: model, koneksi
+Zilliz dan Groq dimuat sekali, lalu pertanyaan dijalankan oleh core/batch_runner.py
+(encode per jendela, micro-batch rerank bersama, konkurensi LLM terbatas yang menyesuaikan
+diri dengan rate limit Groq). Satu baris hasil ditulis ke file output begitu pertanyaannya
+selesai.
+
+Setiap baris input adalah objek JSON dengan id, query, dan opsional history / filters:
+    {"id": "Q-001", "query": "Apa ketentuan cuti tahunan?", "filters": {"jenis_dokumen": "SOP"}}
+
+Jalankan:
+    python batch_job.py pertanyaan.jsonl hasil.jsonl --concurrency 8
+    python batch_job.py requests.jsonl hasil.jsonl --id-field request_id --query-field body
+
+Run yang terputus (Ctrl+C, crash, deploy) dilanjutkan dengan perintah yang sama: pertanyaan
+yang sudah berstatus "ok" di file hasil dilewati. --restart memulai dari awal.
+"""
+import argparse
+import sys
+import time
+
+from chatbot_service import ChatbotService, BATCH_JOB_CONCURRENCY, BATCH_JOB_MAX_ATTEMPTS
+from core.batch_runner import BatchRunner, JsonlResultWriter, read_batch_file
+
+PROGRESS_EVERY = 10
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="File JSONL berisi pertanyaan")
+    parser.add_argument("output", help="File JSONL hasil (dilanjutkan jika sudah ada)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_JOB_CONCURRENCY)
+    parser.add_argument("--max-attempts", type=int, default=BATCH_JOB_MAX_ATTEMPTS)
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--query-field", default="query")
+    parser.add_argument("--restart", action="store_true", help="Abaikan hasil yang sudah ada dan mulai dari awal")
+    args = parser.parse_args()
+
+    jobs, invalid = read_batch_file(args.input, args.id_field, args.query_field)
+    writer = JsonlResultWriter(args.output, resume=not args.restart)
+    for result in invalid:
+        if not writer.is_done(result["id"]):
+            writer.write(result)
+    todo = [job for job in jobs if not writer.is_done(job.id)]
+    print(f"[BATCH] {len(jobs)} pertanyaan valid, {len(invalid)} tidak valid, "
+          f"{len(jobs) - len(todo)} sudah selesai sebelumnya, {len(todo)} akan dijalankan.")
+    if not todo:
+        writer.close()
+        return 0
+
+    service = ChatbotService()
+    service.warmup()
+    runner = BatchRunner(service, args.concurrency, args.max_attempts)
+
+    start = time.perf_counter()
+    finished = 0
+    try:
+        for result in runner.run(todo):
+            writer.write(result)
+            finished += 1
+            if finished % PROGRESS_EVERY == 0 or finished == len(todo):
+                elapsed = time.perf_counter() - start
+                print(f"[BATCH] {finished}/{len(todo)} selesai ({finished / elapsed:.2f}/detik, "
+                      f"konkurensi {runner.scheduler.limiter.limit}).")
+    except KeyboardInterrupt:
+        print(f"\n[BATCH] Dihentikan setelah {finished} pertanyaan; jalankan perintah yang sama untuk melanjutkan.")
+        return 130
+    finally:
+        writer.close()
+
+    counts = runner.scheduler.counts
+    print(f"[BATCH] Selesai dalam {time.perf_counter() - start:.1f} detik: {counts['ok']} ok, "
+          f"{counts['error']} gagal, {counts['retried']} percobaan ulang.")
+    return 0 if counts["error"] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# benchmarks/bench_async.py
+"""
+Ratusan percakapan bersamaan dalam satu proses: ChatbotService sinkron dengan
+sejumlah thread worker tetap (seperti Flask/gunicorn) vs AsyncChatbotService di satu
+event loop. Encode/rerank memakai micro-batching di kedua varian.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_async --chats 200 --sync-workers 8 32
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.batching import BatchedEmbeddingModel, BatchedCrossEncoder
+from benchmarks.support import (FakeEmbeddingModel, FakeCrossEncoder, build_fake_service,
+                                build_fake_async_service, summarize_ms)
+
+QUERIES = [
+    "Apa ketentuan kebijakan cuti tahunan?",
+    "Bagaimana prosedur pengadaan barang?",
+    "Jelaskan manajemen risiko operasional",
+    "Apa isi kode etik pegawai?",
+]
+
+
+def batched_models(args):
+    reranker = FakeCrossEncoder(cost_per_pair=args.pair_cost_ms / 1000)
+    return (BatchedEmbeddingModel(FakeEmbeddingModel(), args.max_batch_size, args.max_wait_ms),
+            BatchedCrossEncoder(reranker, args.max_batch_size * 8, args.max_wait_ms))
+
+
+def report(samples, elapsed, total):
+    stats = summarize_ms(samples)
+    stats["wall_seconds"] = round(elapsed, 2)
+    stats["throughput_rps"] = round(total / elapsed, 2)
+    return stats
+
+
+def run_sync(workers, args):
+    embedding_model, reranker_model = batched_models(args)
+    service = build_fake_service(num_chunks=args.chunks, zilliz_latency=args.zilliz_latency,
+                                 llm_latency=args.llm_latency,
+                                 embedding_model=embedding_model, reranker_model=reranker_model)
+
+    def one(i):
+        start = time.perf_counter()
+        service.get_response(QUERIES[i % len(QUERIES)] + f" #{i}", [])
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        samples = list(pool.map(one, range(args.chats)))
+    return report(samples, time.perf_counter() - start, args.chats)
+
+
+def run_async(args):
+    embedding_model, reranker_model = batched_models(args)
+    service = build_fake_async_service(num_chunks=args.chunks, zilliz_latency=args.zilliz_latency,
+                                       llm_latency=args.llm_latency,
+                                       embedding_model=embedding_model, reranker_model=reranker_model)
+
+    async def one(i):
+        start = time.perf_counter()
+        await service.get_response(QUERIES[i % len(QUERIES)] + f" #{i}", [])
+        return time.perf_counter() - start
+
+    async def main():
+        start = time.perf_counter()
+        samples = await asyncio.gather(*(one(i) for i in range(args.chats)))
+        return report(list(samples), time.perf_counter() - start, args.chats)
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--sync-workers", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--zilliz-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=1.5)
+    # Biaya CPU per pasangan rerank; kecil = beban didominasi I/O (Zilliz/Groq)
+    parser.add_argument("--pair-cost-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    result = {f"sync_{workers}_threads": run_sync(workers, args) for workers in args.sync_workers}
+    result["async_event_loop"] = run_async(args)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
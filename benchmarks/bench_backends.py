@@ -0,0 +1,150 @@
+# benchmarks/bench_backends.py
+"""
+Akurasi vs latensi backend inferensi (torch / onnx / int8) untuk model embedding dan
+reranker asli, di atas set query tetap. Backend "torch" menjadi acuan:
+- embedding: kemiripan kosinus vektor tiap backend terhadap vektor torch;
+- rerank: kesamaan urutan kandidat (top-1 sama, irisan top-5, Kendall tau) terhadap urutan torch.
+Kandidat per query diambil dari korpus BM25 di `output/` jika ada, selain itu dari
+kumpulan passage sintetis di bawah.
+
+Jalankan dari root repo (ekspor pertama memerlukan torch + onnx + onnxruntime):
+    python -m benchmarks.bench_backends --backends torch onnx int8 --iterations 5
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from chatbot_service import EMBEDDING_MODEL_NAME, RERANKER_MODEL_NAME, BASE_OUTPUT_DIR, MODEL_EXPORT_DIR, ONNX_THREADS
+from core.inference_backend import load_embedding_model, load_reranker_model
+from core.json_loader import JSONCorpusLoader
+from benchmarks.support import TOPICS, summarize_ms
+
+QUERIES = [
+    "Apa ketentuan kebijakan cuti tahunan bagi pegawai?",
+    "Bagaimana prosedur pengadaan barang di atas nilai tertentu?",
+    "Siapa yang berwenang menyetujui perjalanan dinas luar negeri?",
+    "Jelaskan kerangka manajemen risiko operasional",
+    "Apa sanksi pelanggaran kode etik pegawai?",
+    "Kapan laporan keuangan konsolidasi harus disampaikan?",
+    "Bagaimana pengendalian gratifikasi diterapkan?",
+    "Apa tugas satuan audit internal?",
+    "Bagaimana pencatatan dan penyusutan aset tetap?",
+    "Siapa yang menetapkan remunerasi direksi?",
+    "Apa saja prinsip tata kelola teknologi informasi?",
+    "Standar akuntansi apa yang dipakai untuk laporan keuangan?",
+]
+
+PASSAGE_TEMPLATES = [
+    "Ketentuan mengenai {topic} ditetapkan oleh Direksi dan berlaku bagi seluruh unit kerja.",
+    "Prosedur {topic} dimulai dengan pengajuan permohonan tertulis kepada atasan langsung.",
+    "Pelanggaran terhadap {topic} dikenakan sanksi administratif sesuai tingkat pelanggarannya.",
+    "Laporan pelaksanaan {topic} disampaikan paling lambat tanggal 10 bulan berikutnya.",
+    "Kewenangan persetujuan {topic} berada pada pejabat setingkat kepala divisi.",
+]
+
+
+def synthetic_candidates(top_k):
+    passages = [template.format(topic=topic) for topic in TOPICS for template in PASSAGE_TEMPLATES]
+    # Urutan kandidat tetap per query (berputar di atas kumpulan passage)
+    return [[passages[(i * 7 + j) % len(passages)] for j in range(top_k)] for i in range(len(QUERIES))]
+
+
+def corpus_candidates(top_k):
+    if not os.path.isdir(BASE_OUTPUT_DIR):
+        return None
+    index = JSONCorpusLoader(BASE_OUTPUT_DIR).index
+    if not len(index):
+        return None
+    return [[index.get_text(doc_id) for doc_id, _score in index.search(query, top_k)] for query in QUERIES]
+
+
+def kendall_tau(reference, other):
+    """Kendall tau-a antara dua vektor skor untuk kandidat yang sama."""
+    n = len(reference)
+    concordant = discordant = 0
+    for i in range(n):
+        for j in range(i + 1, n):
+            sign = np.sign(reference[i] - reference[j]) * np.sign(other[i] - other[j])
+            concordant += sign > 0
+            discordant += sign < 0
+    pairs = n * (n - 1) / 2
+    return float((concordant - discordant) / pairs) if pairs else 1.0
+
+
+def run_backend(backend, candidates, args):
+    start = time.perf_counter()
+    embedding_model, embedding_backend = load_embedding_model(EMBEDDING_MODEL_NAME, backend, args.export_dir,
+                                                              ONNX_THREADS)
+    reranker_model, reranker_backend = load_reranker_model(RERANKER_MODEL_NAME, backend, args.export_dir,
+                                                           ONNX_THREADS)
+    pair_lists = [[(query, passage) for passage in passages] for query, passages in zip(QUERIES, candidates)]
+    # Sesi ONNX Runtime dibuat saat panggilan pertama; masukkan ke waktu muat
+    embedding_model.encode(QUERIES[0])
+    reranker_model.predict(pair_lists[0])
+    load_seconds = time.perf_counter() - start
+
+    encode_samples, rerank_samples = [], []
+    for _ in range(args.iterations):
+        vectors, scores = [], []
+        for query, pairs in zip(QUERIES, pair_lists):
+            start = time.perf_counter()
+            vectors.append(np.asarray(embedding_model.encode(query), dtype=np.float32))
+            encode_samples.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            scores.append(np.asarray(reranker_model.predict(pairs), dtype=np.float32))
+            rerank_samples.append(time.perf_counter() - start)
+
+    report = {"embedding_backend": embedding_backend, "reranker_backend": reranker_backend,
+              "load_seconds": round(load_seconds, 2), "encode_query": summarize_ms(encode_samples),
+              f"rerank_{len(pair_lists[0])}_pairs": summarize_ms(rerank_samples)}
+    return report, vectors, scores
+
+
+def compare(reference_vectors, reference_scores, vectors, scores):
+    cosines = [float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+               for a, b in zip(reference_vectors, vectors)]
+    top1, top5, taus, max_diff = [], [], [], 0.0
+    for reference, other in zip(reference_scores, scores):
+        reference_order, other_order = np.argsort(-reference), np.argsort(-other)
+        top1.append(reference_order[0] == other_order[0])
+        top5.append(len(set(reference_order[:5]) & set(other_order[:5])) / 5)
+        taus.append(kendall_tau(reference, other))
+        max_diff = max(max_diff, float(np.abs(reference - other).max()))
+    return {
+        "embedding_cosine_mean": round(float(np.mean(cosines)), 5),
+        "embedding_cosine_min": round(float(np.min(cosines)), 5),
+        "rerank_top1_agreement": round(float(np.mean(top1)), 3),
+        "rerank_top5_overlap": round(float(np.mean(top5)), 3),
+        "rerank_kendall_tau_mean": round(float(np.mean(taus)), 4),
+        "rerank_max_abs_score_diff": round(max_diff, 5),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "int8"])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=30)
+    parser.add_argument("--export-dir", default=MODEL_EXPORT_DIR)
+    args = parser.parse_args()
+
+    candidates = corpus_candidates(args.candidates) or synthetic_candidates(args.candidates)
+    backends = ["torch"] + [backend for backend in args.backends if backend != "torch"]
+
+    result = {}
+    reference = None
+    for backend in backends:
+        report, vectors, scores = run_backend(backend, candidates, args)
+        if reference is None:
+            reference = (vectors, scores)
+        else:
+            report["vs_torch"] = compare(*reference, vectors, scores)
+        result[backend] = report
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/bench_batch.py
+"""
+Ratusan pertanyaan audit sekaligus: satu /chat per pertanyaan berurutan (dengan saran),
+thread pool polos di atas get_response, dan BatchRunner (prefetch embedding, tanpa saran,
+konkurensi adaptif + cooldown 429, retry). LLM palsu membatasi laju seperti Groq
+(token bucket permintaan per detik; melebihi -> 429 dengan retry-after).
+
+Diukur: waktu total, throughput, jawaban gagal (LLMError setelah retry), panggilan LLM dan 429.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_batch --questions 200
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from core.batch_runner import BatchRunner, BatchJob
+from core.llm_answer import LLMAnswerGenerator
+from core.llm_client import LLMError
+from benchmarks.support import FakeGroqClient, build_fake_service, TOPICS
+
+
+class RateLimitError(Exception):
+    """Meniru groq.RateLimitError: status_code 429 dan header retry-after."""
+    def __init__(self, retry_after):
+        super().__init__("Error code: 429 - rate limit reached")
+        self.status_code = 429
+        self.response = SimpleNamespace(headers={"retry-after": f"{retry_after:.2f}"})
+
+
+class RateLimitedGroqClient(FakeGroqClient):
+    """FakeGroqClient dengan token bucket `rps` permintaan/detik (kapasitas `burst`)."""
+    def __init__(self, rps, burst, **kwargs):
+        super().__init__(**kwargs)
+        self.rps = rps
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _create(self, *args, **kwargs):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rps)
+            self.updated = now
+            if self.tokens < 1:
+                self.rejected += 1
+                raise RateLimitError((1 - self.tokens) / self.rps)
+            self.tokens -= 1
+        return super()._create(*args, **kwargs)
+
+
+def questions(n):
+    return [{"id": f"Q-{i:04d}", "query": f"Apa ketentuan {TOPICS[i % len(TOPICS)]} nomor {i}?"} for i in range(n)]
+
+
+def build(args):
+    client = RateLimitedGroqClient(args.llm_rps, args.llm_burst, latency=args.llm_latency, token_delay=0.0)
+    service = build_fake_service(num_chunks=args.chunks, zilliz_latency=args.zilliz_latency,
+                                 llm_generator=LLMAnswerGenerator(client=client))
+    service.answer_cache = None
+    return service, client
+
+
+def report(samples_ok, failed, elapsed, client):
+    return {"seconds": round(elapsed, 2), "throughput_qps": round(samples_ok / elapsed, 2),
+            "failed_answers": failed, "llm_calls": client.calls, "llm_429": client.rejected}
+
+
+def answered(service, query) -> bool:
+    try:
+        service.get_response(query, [])
+        return True
+    except LLMError:
+        return False
+
+
+def run_sequential(args, items):
+    service, client = build(args)
+    start = time.perf_counter()
+    failed = sum(not answered(service, item["query"]) for item in items)
+    return report(len(items) - failed, failed, time.perf_counter() - start, client)
+
+
+def run_thread_pool(args, items):
+    service, client = build(args)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        failed = sum(not ok for ok in pool.map(lambda item: answered(service, item["query"]), items))
+    return report(len(items) - failed, failed, time.perf_counter() - start, client)
+
+
+def run_batch_runner(args, items):
+    service, client = build(args)
+    runner = BatchRunner(service, args.concurrency, max_attempts=5)
+    start = time.perf_counter()
+    results = list(runner.run([BatchJob(item["id"], item["query"]) for item in items]))
+    failed = sum(result["status"] != "ok" for result in results)
+    stats = report(len(items) - failed, failed, time.perf_counter() - start, client)
+    stats["retries"] = runner.scheduler.counts["retried"]
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--sequential-questions", type=int, default=40,
+                        help="Subset untuk mode berurutan (diekstrapolasi lewat throughput)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--zilliz-latency", type=float, default=0.03)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-rps", type=float, default=20.0)
+    parser.add_argument("--llm-burst", type=int, default=10)
+    args = parser.parse_args()
+
+    items = questions(args.questions)
+    result = {
+        "sequential_chat": run_sequential(args, items[:args.sequential_questions]),
+        "thread_pool_get_response": run_thread_pool(args, items),
+        "batch_runner": run_batch_runner(args, items),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
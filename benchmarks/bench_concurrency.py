@@ -0,0 +1,72 @@
+# benchmarks/bench_concurrency.py
+"""
+Throughput /chat (ChatbotService.get_response) terhadap jumlah request bersamaan,
+dengan dan tanpa micro-batching encode/predict.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_concurrency --requests 48 --concurrency 1 4 16
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.batching import BatchedEmbeddingModel, BatchedCrossEncoder
+from benchmarks.support import FakeEmbeddingModel, FakeCrossEncoder, build_fake_service, summarize_ms
+
+QUERIES = [
+    "Apa ketentuan kebijakan cuti tahunan?",
+    "Bagaimana prosedur pengadaan barang?",
+    "Jelaskan manajemen risiko operasional",
+    "Apa isi kode etik pegawai?",
+]
+
+
+def run(concurrency, total, batched, args):
+    embedding_model, reranker_model = FakeEmbeddingModel(), FakeCrossEncoder()
+    if batched:
+        embedding_model = BatchedEmbeddingModel(embedding_model, args.max_batch_size, args.max_wait_ms)
+        reranker_model = BatchedCrossEncoder(reranker_model, args.max_batch_size * 8, args.max_wait_ms)
+    service = build_fake_service(num_chunks=args.chunks, zilliz_latency=args.zilliz_latency,
+                                 llm_latency=args.llm_latency,
+                                 embedding_model=embedding_model, reranker_model=reranker_model)
+
+    def one(i):
+        start = time.perf_counter()
+        service.get_response(QUERIES[i % len(QUERIES)], [])
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+
+    stats = summarize_ms(samples)
+    stats["throughput_rps"] = round(total / elapsed, 2)
+    if batched:
+        stats["batching"] = service.batching_stats()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=48)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--zilliz-latency", type=float, default=0.03)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    result = {}
+    for concurrency in args.concurrency:
+        result[f"concurrency_{concurrency}"] = {
+            "serial_models": run(concurrency, args.requests, False, args),
+            "micro_batched": run(concurrency, args.requests, True, args),
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
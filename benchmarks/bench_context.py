@@ -0,0 +1,103 @@
+# benchmarks/bench_context.py
+"""
+Konteks prompt tanpa batas (semua hit terpilih digabung apa adanya, seperti sebelumnya) vs
+konteks yang dipaket dalam anggaran token per jenis query dengan pembuangan chunk yang
+hampir sama: token prompt per request, jumlah panggilan LLM (tahap map enumerasi) dan
+irisan sumber dengan varian tanpa batas.
+
+Korpus sintetis memakai chunk sepanjang chunk OCR asli dan sebagian chunk punya salinan
+tumpang tindih di halaman berikutnya (seperti chunking dengan overlap).
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_context --iterations 10
+"""
+import argparse
+import json
+import random
+
+import numpy as np
+
+from chatbot_service import CONTEXT_TOKEN_BUDGETS
+from benchmarks.support import FakeCollection, build_fake_service, TOPICS
+
+QUERIES = {
+    "fact": [f"Apa ketentuan {topic} yang berlaku?" for topic in TOPICS],
+    "comparison": [f"bandingkan {a} dan {b}" for a, b in zip(TOPICS, TOPICS[1:])],
+    "enumeration": [f"sebutkan semua dokumen tentang {topic}" for topic in TOPICS],
+}
+
+FILLER = ("Pelaksanaan {topic} wajib didokumentasikan, dilaporkan kepada atasan langsung dan "
+          "dievaluasi secara berkala oleh unit kepatuhan sesuai pedoman yang berlaku pada perusahaan. ")
+
+
+class OverlappingCollection(FakeCollection):
+    """FakeCollection dengan chunk panjang; `duplicate_ratio` chunk punya salinan tumpang tindih."""
+    def __init__(self, num_chunks, duplicate_ratio, chunk_sentences, latency, seed=11):
+        super().__init__(num_chunks=num_chunks, latency=latency)
+        rng = random.Random(seed)
+        copies, vectors = [], []
+        for i, row in enumerate(self.rows):
+            topic = row["judul_bab"].lower()
+            row["text"] += " " + FILLER.format(topic=topic) * chunk_sentences
+            if rng.random() < duplicate_ratio:
+                copy = dict(row, chunk_id=f"{row['chunk_id']}-overlap", halaman_awal=row["halaman_awal"] + 1,
+                            text="Lanjutan dari halaman sebelumnya. " + row["text"])
+                copies.append(copy)
+                vectors.append(self.matrix[i])  # vektor sama: salinan terambil bersama aslinya
+        self.rows.extend(copies)
+        if vectors:
+            self.matrix = np.vstack([self.matrix, np.stack(vectors)])
+
+
+def run(args, packed):
+    collection = OverlappingCollection(args.chunks, args.duplicate_ratio, args.chunk_sentences,
+                                       latency=args.zilliz_latency)
+    service = build_fake_service(collection=collection, llm_latency=args.llm_latency, hybrid=True)
+    service.answer_cache = None
+    if not packed:
+        # Tanpa anggaran dan tanpa dedup: hanya batas jumlah chunk per jenis query yang berlaku
+        service.context_budgets = {key: 10 ** 9 for key in CONTEXT_TOKEN_BUDGETS}
+        service.context_packer.dedup_threshold = 0
+    llm_client = service.llm_generator.client
+    report, sources = {}, {}
+    for query_type, queries in QUERIES.items():
+        tokens, calls_before = [], llm_client.calls
+        for i in range(args.iterations):
+            query = queries[i % len(queries)]
+            response = service.get_response(query, [])
+            tokens.append(response["prompt_tokens"])
+            sources[(query_type, query)] = {(s.get("source_file"), s.get("page")) for s in response["sources"]}
+        report[query_type] = {
+            "prompt_tokens_mean": round(float(np.mean(tokens)), 1),
+            "prompt_tokens_max": int(np.max(tokens)),
+            # Saran juga memanggil LLM: satu per request
+            "llm_calls_per_query": round((llm_client.calls - calls_before) / args.iterations - 1, 2),
+        }
+    report["token_counter"] = service.context_packer.counter.name
+    return report, sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.3)
+    parser.add_argument("--chunk-sentences", type=int, default=8)
+    parser.add_argument("--zilliz-latency", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    unbounded_report, unbounded_sources = run(args, packed=False)
+    packed_report, packed_sources = run(args, packed=True)
+    overlap = [len(unbounded_sources[key] & packed_sources[key]) / max(1, len(unbounded_sources[key]))
+               for key in unbounded_sources]
+    result = {
+        "unbounded_context": unbounded_report,
+        "packed_context": packed_report,
+        "sources_overlap_ratio": round(float(np.mean(overlap)), 3),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/bench_image_index.py
+"""
+Resolusi URL gambar sumber di _format_sources_for_api pada pohon output sintetis
+berisi ribuan dokumen: probing os.path.exists per halaman (perilaku lama) vs
+lookup SourceImageIndex. --stat-latency-ms mensimulasikan volume jaringan
+(setiap stat pada probing lama ditunda sebesar itu).
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_image_index --documents 5000 --iterations 500
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import chatbot_service
+from core.image_index import SourceImageIndex
+from benchmarks.support import build_fake_service, summarize_ms
+
+# Campuran konvensi nama yang ditebak oleh kode lama
+NAMINGS = ["p{page}_full.png", "page_{page}.png", "{page}.png", "p{page}_img_0.png"]
+
+
+def make_tree(root, documents, pages_per_doc, seed=0):
+    rng = random.Random(seed)
+    for doc in range(documents):
+        images_dir = os.path.join(root, f"Dokumen_{doc}", "images")
+        os.makedirs(images_dir)
+        naming = NAMINGS[doc % len(NAMINGS)]
+        for page in range(1, pages_per_doc + 1):
+            if rng.random() < 0.1:
+                continue  # sebagian halaman tanpa gambar
+            open(os.path.join(images_dir, naming.format(page=page)), 'wb').close()
+
+
+class LegacyFormatter:
+    """Meniru perilaku lama: hingga empat os.path.exists per halaman sumber."""
+    def __init__(self, base_dir, stat_latency):
+        self.base_dir = base_dir
+        self.stat_latency = stat_latency
+        self.stat_calls = 0
+
+    def _exists(self, path):
+        self.stat_calls += 1
+        if self.stat_latency:
+            time.sleep(self.stat_latency)
+        return os.path.exists(path)
+
+    def image_url(self, source_file, page_num):
+        folder_name = os.path.splitext(source_file)[0]
+        images_dir = os.path.join(self.base_dir, folder_name, "images")
+        guesses = [f"p{page_num}_full.png", f"page_{page_num}.png", f"{page_num}.png", f"p{page_num}_img_0.png"]
+        for guess in guesses:
+            if self._exists(os.path.join(images_dir, guess)):
+                return f"{chatbot_service.BASE_API_URL}/source_image/{folder_name}/images/{guess}"
+        return None
+
+
+def random_sources(rng, documents, pages_per_doc, count):
+    return [{"metadata": {"source_file": f"Dokumen_{rng.randrange(documents)}.pdf",
+                          "page": rng.randint(1, pages_per_doc)}, "text": "..."} for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--pages-per-doc", type=int, default=20)
+    parser.add_argument("--sources-per-response", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--stat-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_images_")
+    try:
+        start = time.perf_counter()
+        make_tree(root, args.documents, args.pages_per_doc)
+        print(f"Pohon sintetis: {args.documents} dokumen dalam {time.perf_counter() - start:.1f} s ({root})")
+
+        start = time.perf_counter()
+        index = SourceImageIndex(root, refresh_seconds=0)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        index.rebuild()
+        rescan_unchanged_seconds = time.perf_counter() - start
+
+        service = build_fake_service(num_chunks=50, llm_latency=0.0, image_index=index)
+        legacy = LegacyFormatter(root, args.stat_latency_ms / 1000)
+        rng = random.Random(1)
+        batches = [random_sources(rng, args.documents, args.pages_per_doc, args.sources_per_response)
+                   for _ in range(args.iterations)]
+
+        before, after = [], []
+        mismatches = 0
+        for sources in batches:
+            start = time.perf_counter()
+            legacy_urls = [legacy.image_url(s["metadata"]["source_file"], s["metadata"]["page"]) for s in sources]
+            before.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            formatted = service._format_sources_for_api(sources)
+            after.append(time.perf_counter() - start)
+
+            # Sumber duplikat dilewati oleh formatter, jadi bandingkan per halaman unik
+            expected = dict(zip(((s["metadata"]["source_file"], s["metadata"]["page"]) for s in sources), legacy_urls))
+            mismatches += sum(1 for item in formatted if item["image_url"] != expected[(item["source_file"], item["page"])])
+
+        result = {
+            "documents": args.documents,
+            "index": dict(index.stats(), build_ms=round(build_seconds * 1000, 1),
+                          rescan_unchanged_ms=round(rescan_unchanged_seconds * 1000, 1)),
+            "before_probing": dict(summarize_ms(before),
+                                   stat_calls_per_response=round(legacy.stat_calls / args.iterations, 1)),
+            "after_index": dict(summarize_ms(after), stat_calls_per_response=0),
+            "url_mismatches": mismatches,
+        }
+        print(json.dumps(result, indent=2))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
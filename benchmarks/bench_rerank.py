@@ -0,0 +1,82 @@
+# benchmarks/bench_rerank.py
+"""
+Latensi p50/p95 per jenis query: rerank ganda (perilaku lama, ZillizVectorStore.search
+ikut me-rerank) vs rerank sekali per request. Cache jawaban dan cache skor rerank
+dimatikan agar setiap iterasi benar-benar me-rerank.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_rerank --iterations 20
+"""
+import argparse
+import json
+import time
+
+from core.vector_store import ZillizVectorStore
+from benchmarks.support import build_fake_service, summarize_ms
+
+QUERIES = {
+    "standard": [
+        "Apa ketentuan kebijakan cuti tahunan?",
+        "Bagaimana prosedur pengadaan barang?",
+        "Jelaskan manajemen risiko operasional",
+    ],
+    "comparison": [
+        "bandingkan kebijakan cuti tahunan dan peraturan perjalanan dinas",
+        "perbedaan audit internal dengan manajemen risiko operasional",
+    ],
+}
+
+
+class DoubleRerankVectorStore(ZillizVectorStore):
+    """
+    Meniru perilaku sebelum perubahan: setiap pencarian berteks ikut me-rerank. search() untuk
+    query standar, search_many() untuk entitas perbandingan (fan-out satu round trip); tiap
+    daftar hit di-rerank dengan query-nya sendiri, lalu service me-rerank sekali lagi.
+    """
+    def search(self, query, top_k=10, rerank=False, profile=None, filters=None):
+        return super().search(query, top_k=top_k, rerank=True, profile=profile, filters=filters)
+
+    def search_many(self, queries, top_k=10, offset=0, profile=None, filters=None):
+        queries = list(queries)
+        hit_lists = super().search_many(queries, top_k, offset, profile, filters)
+        return [self.rerank(query, hits) for query, hits in zip(queries, hit_lists)]
+
+
+def run(handler_cls, iterations, args):
+    service = build_fake_service(num_chunks=args.chunks, handler_cls=handler_cls,
+                                 zilliz_latency=args.zilliz_latency, llm_latency=args.llm_latency)
+    # Query yang diulang tidak boleh dijawab dari cache jawaban / skor: yang diukur adalah rerank
+    service.answer_cache = None
+    service.score_cache = None
+    report = {}
+    for query_type, queries in QUERIES.items():
+        samples = []
+        pairs_before = service.reranker_model.pairs
+        for i in range(iterations):
+            query = queries[i % len(queries)]
+            start = time.perf_counter()
+            service.get_response(query, [])
+            samples.append(time.perf_counter() - start)
+        stats = summarize_ms(samples)
+        stats["rerank_pairs_per_query"] = round((service.reranker_model.pairs - pairs_before) / iterations, 1)
+        report[query_type] = stats
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--zilliz-latency", type=float, default=0.03)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    result = {
+        "before_double_rerank": run(DoubleRerankVectorStore, args.iterations, args),
+        "after_single_rerank": run(ZillizVectorStore, args.iterations, args),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/bench_rerank_depth.py
+"""
+Rerank penuh (semua kandidat dalam satu batch) vs rerank bertingkat dengan early cutoff:
+pasangan CrossEncoder per query, latensi tahap rerank dan end-to-end, dan seberapa sering
+sumber akhir yang dikirim ke LLM sama persis dengan hasil rerank penuh.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_rerank_depth --iterations 30
+"""
+import argparse
+import json
+import time
+
+from chatbot_service import RERANK_PROFILES
+from core.metrics import metrics
+from core.reranker import RerankProfile
+from benchmarks.support import build_fake_service, summarize_ms, TOPICS
+
+QUERIES = {
+    "fact": [f"Apa ketentuan {topic} yang berlaku?" for topic in TOPICS],
+    "comparison": [f"bandingkan {a} dan {b}" for a, b in zip(TOPICS, TOPICS[1:])],
+}
+
+
+def full_profiles():
+    """Profil yang sama tanpa cutoff: semua kandidat hingga rerank_depth dalam satu tahap."""
+    return {key: RerankProfile(p.name, p.retrieval_depth, p.rerank_depth, p.keep, p.threshold, batch_size=0)
+            for key, p in RERANK_PROFILES.items()}
+
+
+def cascade_profiles(margin):
+    """Profil bertingkat dengan margin skala FakeCrossEncoder (skor -0.2..0.8, bukan logit)."""
+    return {key: RerankProfile(p.name, p.retrieval_depth, p.rerank_depth, p.keep, p.threshold,
+                               batch_size=p.batch_size, margin=margin)
+            for key, p in RERANK_PROFILES.items()}
+
+
+def source_ids(response):
+    return [(s.get("source_file"), s.get("page")) for s in response.get("sources", [])]
+
+
+def run(profiles, args):
+    service = build_fake_service(num_chunks=args.chunks, zilliz_latency=args.zilliz_latency,
+                                 llm_latency=args.llm_latency, hybrid=True)
+    service.score_cache = None  # setiap iterasi harus benar-benar menilai pasangan
+    service.answer_cache = None
+    service.rerank_profiles = profiles
+    metrics.reset()
+    report, sources = {}, {}
+    for query_type, queries in QUERIES.items():
+        samples = []
+        pairs_before = service.reranker_model.pairs
+        for i in range(args.iterations):
+            query = queries[i % len(queries)]
+            start = time.perf_counter()
+            response = service.get_response(query, [])
+            samples.append(time.perf_counter() - start)
+            sources[(query_type, query)] = source_ids(response)
+        stats = {"end_to_end": summarize_ms(samples),
+                 "rerank_stage": metrics.summary()["latency"].get(f"rerank_seconds_{query_type}"),
+                 "rerank_pairs_per_query": round((service.reranker_model.pairs - pairs_before) / args.iterations, 1)}
+        report[query_type] = stats
+    return report, sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--zilliz-latency", type=float, default=0.01)
+    parser.add_argument("--llm-latency", type=float, default=0.01)
+    parser.add_argument("--margin", type=float, default=0.1)
+    args = parser.parse_args()
+
+    full_report, full_sources = run(full_profiles(), args)
+    cascade_report, cascade_sources = run(cascade_profiles(args.margin), args)
+    same = sum(full_sources[key] == cascade_sources.get(key) for key in full_sources)
+    result = {
+        "full_rerank": full_report,
+        "cascade_rerank": cascade_report,
+        "identical_sources_ratio": round(same / len(full_sources), 3),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
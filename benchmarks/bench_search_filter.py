@@ -0,0 +1,63 @@
+# benchmarks/bench_search_filter.py
+"""
+Query yang menyebut satu dokumen: retrieval lebar lalu membuang hit dari dokumen lain
+(perilaku lama) vs filter metadata yang didorong ke pencarian (`filter=` Milvus). Diukur:
+hit yang masih terpakai dari top_k, dan ukuran payload hasil pencarian dengan semua
+field (OUTPUT_FIELDS lama) vs field minimal profil pencarian (CONTEXT_FIELDS).
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_search_filter --iterations 50
+"""
+import argparse
+import json
+
+import numpy as np
+
+from core.vector_store import ZillizVectorStore, SearchProfile, OUTPUT_FIELDS, CONTEXT_FIELDS
+from benchmarks.support import FakeCollection, FakeMilvusClient, FakeEmbeddingModel, FakeCrossEncoder, TOPICS
+
+
+def payload_bytes(hits):
+    return len(json.dumps([[{"id": h["id"], "distance": h["distance"], "entity": h["entity"]} for h in row]
+                           for row in hits], ensure_ascii=False).encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=30)
+    args = parser.parse_args()
+
+    collection = FakeCollection(num_chunks=args.chunks, latency=0.0)
+    config = {"collection_name": "benchmark", "uri": "local://fake", "token": ""}
+    store = ZillizVectorStore(config, FakeEmbeddingModel(), FakeCrossEncoder(),
+                              client_factory=lambda: FakeMilvusClient(collection))
+    documents = sorted({row["source_file"] for row in collection.rows})
+    profile = SearchProfile("fact", top_k=args.top_k, output_fields=CONTEXT_FIELDS)
+
+    kept_broad, kept_pushdown = [], []
+    for i in range(args.iterations):
+        document = documents[i % len(documents)]
+        query = f"Apa ketentuan {TOPICS[i % len(TOPICS)]} di {document}?"
+        broad = store.search(query, top_k=args.top_k, profile=profile)
+        kept_broad.append(sum(hit["metadata"]["source_file"] == document for hit in broad))
+        pushed = store.search(query, top_k=args.top_k, profile=profile, filters={"source_file": (document,)})
+        kept_pushdown.append(len(pushed))
+
+    vectors = store.embedding_model.encode(TOPICS)
+    full = collection.search_results(vectors, None, args.top_k, OUTPUT_FIELDS, "")
+    minimal = collection.search_results(vectors, None, args.top_k, CONTEXT_FIELDS, "")
+    result = {
+        "broad_then_discard": {"hits_kept_mean": round(float(np.mean(kept_broad)), 2), "top_k": args.top_k},
+        "filter_pushdown": {"hits_kept_mean": round(float(np.mean(kept_pushdown)), 2), "top_k": args.top_k},
+        "payload_bytes_per_query": {
+            "all_fields": payload_bytes(full) // len(TOPICS),
+            "profile_fields": payload_bytes(minimal) // len(TOPICS),
+        },
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_search_many.py
+"""
+Retrieval untuk beberapa query sekaligus (entitas perbandingan, varian query): satu
+pencarian per query di thread pool bersama (perilaku lama) vs search_many (satu encode,
+satu pencarian multi-vektor). Diukur di bawah beban beberapa request bersamaan:
+latensi per request, round trip ke Zilliz dan panggilan encode per request.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_search_many --requests 200 --concurrency 16 --queries 3
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.vector_store import ZillizVectorStore
+from benchmarks.support import (FakeCollection, FakeMilvusClient, FakeEmbeddingModel, FakeCrossEncoder,
+                                TOPICS, summarize_ms)
+
+
+def build_store(args):
+    collection = FakeCollection(num_chunks=args.chunks, latency=args.zilliz_latency)
+    config = {"collection_name": "benchmark", "uri": "local://fake", "token": ""}
+    store = ZillizVectorStore(config, FakeEmbeddingModel(), FakeCrossEncoder(),
+                              client_factory=lambda: FakeMilvusClient(collection))
+    return store, collection
+
+
+def request_queries(i, n):
+    return [TOPICS[(i + j) % len(TOPICS)] for j in range(n)]
+
+
+def run(mode, args):
+    store, collection = build_store(args)
+    # Perilaku lama: executor bersama untuk fan-out pencarian (RETRIEVAL_WORKERS = 8)
+    retrieval_executor = ThreadPoolExecutor(max_workers=args.retrieval_workers)
+
+    def one(i):
+        queries = request_queries(i, args.queries)
+        start = time.perf_counter()
+        if mode == "per_query":
+            vectors = store.embedding_model.encode(queries)
+            list(retrieval_executor.map(lambda vector: store.search_by_vector(vector, top_k=args.top_k), vectors))
+        else:
+            store.search_many(queries, top_k=args.top_k)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        samples = list(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    retrieval_executor.shutdown()
+    stats = summarize_ms(samples)
+    stats["throughput_rps"] = round(args.requests / elapsed, 2)
+    stats["round_trips_per_request"] = round(collection.searches / args.requests, 2)
+    stats["encode_calls_per_request"] = round(store.embedding_model.calls / args.requests, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=15)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--zilliz-latency", type=float, default=0.05)
+    parser.add_argument("--retrieval-workers", type=int, default=8)
+    args = parser.parse_args()
+
+    result = {"per_query_searches": run("per_query", args), "search_many": run("search_many", args)}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
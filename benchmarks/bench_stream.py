@@ -0,0 +1,61 @@
+# benchmarks/bench_stream.py
+"""
+Waktu sampai byte pertama: get_response (blocking) vs stream_response (SSE),
+dengan LLM palsu lokal yang melakukan streaming token.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_stream --iterations 10
+"""
+import argparse
+import json
+import time
+
+from core.llm_answer import LLMAnswerGenerator
+from benchmarks.support import FakeGroqClient, build_fake_service, summarize_ms
+
+QUERIES = {
+    "standard": "Apa ketentuan kebijakan cuti tahunan?",
+    "enumeration": "sebutkan semua ketentuan audit internal",
+    "comparison": "bandingkan kebijakan cuti tahunan dan peraturan perjalanan dinas",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    args = parser.parse_args()
+
+    client = FakeGroqClient(latency=args.llm_latency, token_delay=args.token_delay, answer_tokens=args.answer_tokens)
+    service = build_fake_service(num_chunks=1000, llm_generator=LLMAnswerGenerator(client=client))
+
+    report = {}
+    for query_type, query in QUERIES.items():
+        blocking, first_sources, first_token, stream_total = [], [], [], []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            service.get_response(query, [])
+            blocking.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            seen_token = False
+            for event, _payload in service.stream_response(query, []):
+                if event == "sources":
+                    first_sources.append(time.perf_counter() - start)
+                elif event == "token" and not seen_token:
+                    first_token.append(time.perf_counter() - start)
+                    seen_token = True
+            stream_total.append(time.perf_counter() - start)
+        report[query_type] = {
+            "blocking_total": summarize_ms(blocking),
+            "stream_first_sources": summarize_ms(first_sources),
+            "stream_first_token": summarize_ms(first_token),
+            "stream_total": summarize_ms(stream_total),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_suggestions.py
+"""
+Latensi end-to-end get_response: saran dibuat serial setelah jawaban (perilaku lama)
+vs bersamaan dengan jawaban vs deferred (diambil terpisah).
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_suggestions --iterations 10
+"""
+import argparse
+import json
+import time
+from concurrent.futures import Future
+
+from core.llm_answer import LLMAnswerGenerator
+from core.metrics import metrics
+from benchmarks.support import FakeGroqClient, build_fake_service, summarize_ms
+
+QUERIES = [
+    "Apa ketentuan kebijakan cuti tahunan?",
+    "bandingkan kebijakan cuti tahunan dan peraturan perjalanan dinas",
+]
+
+
+def _serial_start_suggestions(service):
+    """Meniru perilaku lama: saran dihitung sampai selesai di jalur kritis."""
+    def start(query, sources):
+        future = Future()
+        context = "\n\n".join([hit.get('text') or '' for hit in sources])
+        with metrics.timer("suggestions_seconds"):
+            suggestions = service._generate_proactive_suggestions(query, context)
+        # Durasi 0: tidak ada waktu yang tumpang tindih dengan jawaban, jadi tidak ada yang "dihemat"
+        future.set_result((suggestions, 0.0))
+        return future, time.monotonic() + 3600
+    return start
+
+
+def run(mode, args):
+    client = FakeGroqClient(latency=args.llm_latency, token_delay=0.0, suggestion_latency=args.suggestion_latency)
+    service = build_fake_service(num_chunks=1000, llm_generator=LLMAnswerGenerator(client=client))
+    if mode == "serial":
+        service._start_suggestions = _serial_start_suggestions(service)
+    metrics.reset()
+
+    samples = []
+    for i in range(args.iterations):
+        start = time.perf_counter()
+        response = service.get_response(QUERIES[i % len(QUERIES)], [], defer_suggestions=(mode == "deferred"))
+        samples.append(time.perf_counter() - start)
+        if mode == "deferred":
+            service.get_suggestions(response["request_id"])
+    return {"end_to_end": summarize_ms(samples), "metrics": metrics.summary()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--suggestion-latency", type=float, default=0.6)
+    args = parser.parse_args()
+
+    print(json.dumps({mode: run(mode, args) for mode in ("serial", "concurrent", "deferred")}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
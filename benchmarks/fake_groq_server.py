@@ -0,0 +1,213 @@
+# benchmarks/fake_groq_server.py
+"""
+Server HTTP lokal yang meniru endpoint chat completions Groq (/openai/v1/chat/completions):
+jawaban biasa dan stream=True (SSE), latensi sampai token pertama dan jeda antar token,
+header x-ratelimit-* dengan anggaran permintaan/token per jendela waktu, 429 + retry-after
+saat anggaran habis, dan 5xx acak. Dipakai oleh benchmark lewat FakeGroqServer, atau sebagai
+pengganti Groq untuk seluruh server (SDK Groq membaca GROQ_BASE_URL):
+
+    python -m benchmarks.fake_groq_server --port 8800 --requests 30 --tokens 20000 --window 60
+    GROQ_BASE_URL=http://127.0.0.1:8800 GROQ_API_KEY=fake python api_server.py
+
+Statistik (permintaan, 429, 5xx) tersedia di GET /stats.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUGGESTION_ANSWER = "['Apa dasar hukumnya?', 'Siapa yang berwenang?', 'Kapan mulai berlaku?']"
+
+
+def _format_duration(seconds: float) -> str:
+    """Format durasi header reset Groq: "7.66s", "2m59.56s"."""
+    minutes, seconds = divmod(max(0.0, seconds), 60)
+    return f"{int(minutes)}m{seconds:.2f}s" if minutes else f"{seconds:.2f}s"
+
+
+class FakeGroqServer:
+    """
+    Groq palsu di thread latar. Anggaran `requests` permintaan dan `tokens` token (prompt +
+    jawaban, perkiraan 4 karakter per token) per `window` detik, dihitung dari permintaan
+    pertama tiap jendela; `error_rate` = peluang 503 per permintaan yang lolos anggaran.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.4, token_delay: float = 0.01,
+                 answer_tokens: int = 40, requests: int = 30, tokens: int = 20000, window: float = 60.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.answer_tokens = answer_tokens
+        self.limits = {"requests": requests, "tokens": tokens}
+        self.window = window
+        self.error_rate = error_rate
+        self.stats = {"requests": 0, "completed": 0, "rate_limited": 0, "server_errors": 0, "streams": 0}
+        self._random = random.Random(seed)
+        self._used = {"requests": 0, "tokens": 0}
+        self._window_start = None
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-groq", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Melayani di thread pemanggil (CLI) sampai diinterupsi."""
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def admit(self, tokens: int):
+        """(status, header rate limit, jenis anggaran yang habis | None) untuk satu permintaan."""
+        with self._lock:
+            now = time.monotonic()
+            self.stats["requests"] += 1
+            if self._window_start is None or now - self._window_start >= self.window:
+                self._window_start, self._used = now, {"requests": 0, "tokens": 0}
+            reset = self._window_start + self.window - now
+            exhausted = None
+            if self._used["requests"] + 1 > self.limits["requests"]:
+                exhausted = "requests"
+            elif self._used["tokens"] + tokens > self.limits["tokens"]:
+                exhausted = "tokens"
+            elif self._random.random() < self.error_rate:
+                self.stats["server_errors"] += 1
+                return 503, {}, None
+            else:
+                self._used["requests"] += 1
+                self._used["tokens"] += tokens
+            if exhausted:
+                self.stats["rate_limited"] += 1
+            headers = {}
+            for kind in ("requests", "tokens"):
+                headers[f"x-ratelimit-limit-{kind}"] = str(self.limits[kind])
+                headers[f"x-ratelimit-remaining-{kind}"] = str(max(0, self.limits[kind] - self._used[kind]))
+                headers[f"x-ratelimit-reset-{kind}"] = _format_duration(reset)
+            if exhausted:
+                headers["retry-after"] = str(math.ceil(reset))
+                return 429, headers, exhausted
+            return 200, headers, None
+
+    def completion_tokens(self, prompt: str) -> list:
+        if "Saran Pertanyaan" in prompt:
+            return [SUGGESTION_ANSWER]
+        return ["- Jawaban"] + [f" simulasi{i}" for i in range(self.answer_tokens - 1)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):  # tanpa log akses per permintaan
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.server.fake.stats)
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        fake = self.server.fake
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        messages = request.get("messages") or []
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        tokens = fake.completion_tokens(messages[-1].get("content", "") if messages else "")
+
+        status, headers, exhausted = fake.admit(prompt_tokens + len(tokens))
+        if status == 429:
+            self._send_json(429, {"error": {
+                "message": f"Rate limit reached ({exhausted}). Please try again in {headers['retry-after']}s.",
+                "type": exhausted, "code": "rate_limit_exceeded"}}, headers)
+            return
+        if status != 200:
+            self._send_json(status, {"error": {"message": "Service Unavailable", "type": "internal_server_error"}})
+            return
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        base = {"id": completion_id, "created": int(time.time()), "model": request.get("model", "fake")}
+        if not request.get("stream"):
+            time.sleep(fake.latency + fake.token_delay * len(tokens))
+            fake.count("completed")
+            self._send_json(200, dict(base, object="chat.completion", choices=[{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "".join(tokens)}}],
+                usage={"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                       "total_tokens": prompt_tokens + len(tokens)}), headers)
+            return
+
+        fake.count("streams")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        time.sleep(fake.latency)
+        for i, token in enumerate(tokens + [None]):
+            if i:
+                time.sleep(fake.token_delay)
+            delta, finish = ({"content": token}, None) if token is not None else ({}, "stop")
+            chunk = dict(base, object="chat.completion.chunk",
+                         choices=[{"index": 0, "delta": delta, "finish_reason": finish}])
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        fake.count("completed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=0.4, help="Detik sampai token pertama")
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=30, help="Permintaan per jendela")
+    parser.add_argument("--tokens", type=int, default=20000, help="Token per jendela")
+    parser.add_argument("--window", type=float, default=60.0, help="Panjang jendela anggaran (detik)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Peluang 503 per permintaan")
+    args = parser.parse_args()
+
+    server = FakeGroqServer(args.host, args.port, args.latency, args.token_delay, args.answer_tokens,
+                            args.requests, args.tokens, args.window, args.error_rate)
+    print(f"Fake Groq di {server.url} (GROQ_BASE_URL={server.url}); Ctrl+C untuk berhenti.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+# benchmarks/support.py
+"""
+Komponen palsu (fake) dan utilitas untuk benchmark offline.
+Model, collection Zilliz dan LLM disimulasikan dengan biaya waktu yang bisa diatur,
+sehingga pipeline ChatbotService yang asli bisa diukur tanpa GPU/jaringan.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from types import SimpleNamespace
+
+import numpy as np
+
+from async_chatbot_service import AsyncChatbotService
+from chatbot_service import ChatbotService
+from core.keyword_index import BM25Index
+from core.search_filter import matches_filters
+from core.llm_answer import LLMAnswerGenerator, AsyncLLMAnswerGenerator
+from core.vector_store import ZillizVectorStore, AsyncZillizVectorStore
+
+EMBEDDING_DIM = 384
+
+TOPICS = [
+    "kebijakan cuti tahunan", "prosedur pengadaan barang", "standar akuntansi keuangan",
+    "peraturan perjalanan dinas", "manajemen risiko operasional", "audit internal",
+    "kode etik pegawai", "pengelolaan aset tetap", "laporan keuangan konsolidasi",
+    "remunerasi direksi", "tata kelola teknologi informasi", "pengendalian gratifikasi",
+]
+DOC_TYPES = ["Peraturan", "Manual", "SOP", "Surat Edaran"]
+
+# Satu "CPU" bersama: model palsu tidak bisa berjalan paralel, seperti model asli yang
+# sudah memakai semua core. Biaya per panggilan inilah yang diamortisasi oleh batching.
+CPU_LOCK = threading.Lock()
+
+
+def percentile(values, pct):
+    """Persentil sederhana (nearest-rank) dari daftar nilai."""
+    if not values: return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize_ms(samples):
+    """Ringkasan p50/p95/mean dalam milidetik dari sampel dalam detik."""
+    ms = [s * 1000.0 for s in samples]
+    return {
+        "n": len(ms),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else 0.0,
+    }
+
+
+def _text_vector(text: str) -> np.ndarray:
+    seed = int.from_bytes(hashlib.md5(text.encode('utf-8')).digest()[:4], 'little')
+    return np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+
+
+class FakeEmbeddingModel:
+    """Meniru SentenceTransformer.encode dengan vektor deterministik dan biaya CPU simulasi."""
+    def __init__(self, cost_per_call=0.004, cost_per_text=0.002):
+        self.cost_per_call = cost_per_call
+        self.cost_per_text = cost_per_text
+        self.calls = 0
+        self.texts = 0
+
+    def encode(self, sentences, **kwargs):
+        single = isinstance(sentences, str)
+        batch = [sentences] if single else list(sentences)
+        with CPU_LOCK:
+            self.calls += 1
+            self.texts += len(batch)
+            time.sleep(self.cost_per_call + self.cost_per_text * len(batch))
+        vectors = np.stack([_text_vector(t) for t in batch]) if batch else np.zeros((0, EMBEDDING_DIM), np.float32)
+        return vectors[0] if single else vectors
+
+
+class FakeCrossEncoder:
+    """Meniru CrossEncoder.predict; skor = tumpang tindih kata, biaya per pasangan."""
+    def __init__(self, cost_per_call=0.005, cost_per_pair=0.003):
+        self.cost_per_call = cost_per_call
+        self.cost_per_pair = cost_per_pair
+        self.calls = 0
+        self.pairs = 0
+
+    def predict(self, pairs, **kwargs):
+        pairs = list(pairs)
+        with CPU_LOCK:
+            self.calls += 1
+            self.pairs += len(pairs)
+            time.sleep(self.cost_per_call + self.cost_per_pair * len(pairs))
+        scores = []
+        for query, passage in pairs:
+            q_words = set(query.lower().split())
+            p_words = set(passage.lower().split())
+            scores.append(len(q_words & p_words) / (len(q_words) or 1) - 0.2)
+        return np.array(scores, dtype=np.float32)
+
+
+class _FakeHit:
+    def __init__(self, hit_id, distance, entity):
+        self.id = hit_id
+        self.distance = distance
+        self.entity = entity
+
+
+class FakeCollection:
+    """Korpus sintetis koleksi Zilliz palsu: baris entity, matriks vektor dan brute-force L2."""
+    def __init__(self, num_chunks=2000, latency=0.03, seed=7):
+        rng = random.Random(seed)
+        self.latency = latency
+        self.rows = []
+        for i in range(num_chunks):
+            topic = rng.choice(TOPICS)
+            doc_no = rng.randint(1, max(1, num_chunks // 20))
+            text = (f"Bagian {i} membahas {topic} sesuai dokumen nomor {doc_no}. "
+                    f"Ketentuan {topic} berlaku untuk seluruh unit kerja dan ditinjau setiap tahun.")
+            self.rows.append({
+                "chunk_id": f"chunk-{i}",
+                "text": text,
+                "source_file": f"Dokumen_{doc_no}.pdf",
+                "halaman_awal": rng.randint(1, 60),
+                "halaman_akhir": None,
+                "judul_bab": topic.title(),
+                "bab": str(rng.randint(1, 12)),
+                "jenis_dokumen": rng.choice(DOC_TYPES),
+                "document_source": f"Dokumen_{doc_no}.pdf",
+            })
+        self.matrix = np.stack([_text_vector(row["text"]) for row in self.rows])
+        self.searches = 0
+
+    def pages(self):
+        """((source_file, page), text) per halaman, untuk membangun BM25Index dari korpus yang sama."""
+        pages = {}
+        for row in self.rows:
+            key = (row["source_file"], row["halaman_awal"])
+            pages[key] = pages.get(key, "") + row["text"] + "\n"
+        return pages.items()
+
+    def brute_force(self, data, limit, offset=0, filters=None):
+        """[(indeks_baris, jarak L2)] per vektor query; `filters` menyaring baris sebelum top-k."""
+        allowed = None
+        if filters:
+            allowed = np.array([matches_filters(filters, row) for row in self.rows], dtype=bool)
+        results = []
+        for vector in data:
+            diff = self.matrix - np.asarray(vector, dtype=np.float32)
+            distances = np.einsum('ij,ij->i', diff, diff)
+            if allowed is not None:
+                distances = np.where(allowed, distances, np.inf)
+            order = np.argsort(distances)[offset:offset + limit]
+            results.append([(int(i), float(distances[i])) for i in order if np.isfinite(distances[i])])
+        return results
+
+    def search_results(self, data, search_params, limit, output_fields, filter_expr):
+        """Hasil dalam bentuk MilvusClient.search: hanya `output_fields` yang dikirim balik."""
+        self.searches += 1
+        offset = (search_params or {}).get("offset", 0)
+        fields = output_fields or (list(self.rows[0]) if self.rows else [])
+        return [[{"id": i, "distance": distance, "entity": {field: self.rows[i].get(field) for field in fields}}
+                 for i, distance in ranked]
+                for ranked in self.brute_force(data, limit, offset, parse_filter_expression(filter_expr))]
+
+
+_FILTER_TERM_RE = re.compile(r'(\w+) in (\[.*?\])(?: and |$)')
+
+
+def parse_filter_expression(expression: str) -> dict:
+    """Kebalikan dari core.search_filter.filter_expression (cukup untuk ekspresi yang dibuatnya)."""
+    return {field: tuple(json.loads(values)) for field, values in _FILTER_TERM_RE.findall(expression or "")}
+
+
+class FakeMilvusClient:
+    """Meniru MilvusClient.search di atas FakeCollection (hasil: list per vektor query berisi dict hit)."""
+    def __init__(self, collection: FakeCollection):
+        self.collection = collection
+
+    def search(self, collection_name=None, data=None, filter="", limit=10, output_fields=None,
+               search_params=None, anns_field=None, **kwargs):
+        time.sleep(self.collection.latency)
+        return self.collection.search_results(data, search_params, limit, output_fields, filter)
+
+    def close(self):
+        pass
+
+
+class FakeAsyncMilvusClient:
+    """Meniru AsyncMilvusClient.search di atas FakeCollection; latensi ditunggu tanpa memegang thread."""
+    def __init__(self, collection: FakeCollection):
+        self.collection = collection
+
+    async def search(self, collection_name=None, data=None, filter="", limit=10, output_fields=None,
+                     search_params=None, anns_field=None, **kwargs):
+        await asyncio.sleep(self.collection.latency)
+        return self.collection.search_results(data, search_params, limit, output_fields, filter)
+
+    async def close(self):
+        pass
+
+
+def _completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _stream_chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class FakeGroqClient:
+    """
+    LLM palsu lokal dengan antarmuka `chat.completions.create` seperti klien Groq,
+    termasuk stream=True. Dipakai lewat LLMAnswerGenerator(client=FakeGroqClient()).
+    `latency` = waktu sampai token pertama, `token_delay` = jeda antar token.
+    """
+    def __init__(self, latency=0.4, token_delay=0.01, suggestion_latency=None, answer_tokens=40):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.suggestion_latency = latency if suggestion_latency is None else suggestion_latency
+        self.answer_tokens = answer_tokens
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model=None, messages=None, temperature=None, stream=False, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]["content"] if messages else ""
+        if "Saran Pertanyaan" in prompt:
+            time.sleep(self.suggestion_latency)
+            return _completion("['Apa dasar hukumnya?', 'Siapa yang berwenang?', 'Kapan mulai berlaku?']")
+
+        tokens = ["- Jawaban"] + [f" simulasi{i}" for i in range(self.answer_tokens - 1)]
+        if not stream:
+            time.sleep(self.latency + self.token_delay * len(tokens))
+            return _completion("".join(tokens))
+        return self._stream(tokens)
+
+    def _stream(self, tokens):
+        time.sleep(self.latency)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_delay)
+            yield _stream_chunk(token)
+
+
+class FakeAsyncGroqClient(FakeGroqClient):
+    """Versi async dari FakeGroqClient (antarmuka AsyncGroq: create() di-await, stream = async iterator)."""
+    async def _create(self, model=None, messages=None, temperature=None, stream=False, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]["content"] if messages else ""
+        if "Saran Pertanyaan" in prompt:
+            await asyncio.sleep(self.suggestion_latency)
+            return _completion("['Apa dasar hukumnya?', 'Siapa yang berwenang?', 'Kapan mulai berlaku?']")
+
+        tokens = ["- Jawaban"] + [f" simulasi{i}" for i in range(self.answer_tokens - 1)]
+        if not stream:
+            await asyncio.sleep(self.latency + self.token_delay * len(tokens))
+            return _completion("".join(tokens))
+        return self._stream(tokens)
+
+    async def _stream(self, tokens):
+        await asyncio.sleep(self.latency)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield _stream_chunk(token)
+
+
+async def _as_coroutine(value):
+    return value
+
+
+def build_fake_async_service(num_chunks=2000, zilliz_latency=0.03, llm_latency=0.4,
+                             embedding_model=None, reranker_model=None, llm_generator=None, hybrid=False,
+                             collection=None):
+    """Membangun AsyncChatbotService asli di atas komponen palsu async."""
+    embedding_model = embedding_model or FakeEmbeddingModel()
+    reranker_model = reranker_model or FakeCrossEncoder()
+    collection = collection or FakeCollection(num_chunks=num_chunks, latency=zilliz_latency)
+    config = {"collection_name": "benchmark", "uri": "local://fake", "token": ""}
+    milvus = AsyncZillizVectorStore(config, embedding_model, reranker_model,
+                                    client_factory=lambda: _as_coroutine(FakeAsyncMilvusClient(collection)))
+    llm_generator = llm_generator or AsyncLLMAnswerGenerator(client=FakeAsyncGroqClient(latency=llm_latency))
+    keyword_index = BM25Index.from_pages(collection.pages()) if hybrid else None
+    return AsyncChatbotService(milvus=milvus, llm_generator=llm_generator,
+                               embedding_model=embedding_model, reranker_model=reranker_model,
+                               keyword_index=keyword_index)
+
+
+def build_fake_service(num_chunks=2000, handler_cls=ZillizVectorStore, zilliz_latency=0.03, llm_latency=0.4,
+                       embedding_model=None, reranker_model=None, llm_generator=None, hybrid=False,
+                       image_index=None, collection=None):
+    """Membangun ChatbotService asli di atas komponen palsu."""
+    embedding_model = embedding_model or FakeEmbeddingModel()
+    reranker_model = reranker_model or FakeCrossEncoder()
+    collection = collection or FakeCollection(num_chunks=num_chunks, latency=zilliz_latency)
+    config = {"collection_name": "benchmark", "uri": "local://fake", "token": ""}
+    milvus = handler_cls(config, embedding_model, reranker_model, client_factory=lambda: FakeMilvusClient(collection))
+    llm_generator = llm_generator or LLMAnswerGenerator(client=FakeGroqClient(latency=llm_latency))
+    keyword_index = BM25Index.from_pages(collection.pages()) if hybrid else None
+    return ChatbotService(milvus=milvus, llm_generator=llm_generator,
+                          embedding_model=embedding_model, reranker_model=reranker_model,
+                          keyword_index=keyword_index, image_index=image_index)
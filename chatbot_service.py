@@ -6,15 +6,33 @@ import re
 import uuid
 import json
 import ast
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 
 # --- IMPORTS YANG SUDAH DISESUAIKAN ---
 try:
     # Import handler baru untuk Zilliz Cloud
-    from core.zilliz_handler import ZillizHandler
+    from core.vector_store import ZillizVectorStore, LocalVectorStore, RetryPolicy, SearchProfile, CONTEXT_FIELDS
+    from core.search_filter import DocumentMatcher, filter_expression
     from core.llm_answer import LLMAnswerGenerator
+    from core.llm_client import LLMPolicy, PRIORITY_SUGGESTION
+    from core.reranker import cascade_rerank_groups, RerankProfile, ScoreCache
+    from core.batching import BatchedEmbeddingModel, BatchedCrossEncoder
+    from core.request_context import RequestContext
+    from core.session_store import create_session_store
+    from core.metrics import metrics
+    from core.embedding_cache import EmbeddingCache, CachedEmbeddingModel
+    from core.answer_cache import SemanticAnswerCache
+    from core.enumeration import collect_unique_hits
+    from core.context_packer import TokenCounter, ContextPacker
+    from core.json_loader import JSONCorpusLoader
+    from core.keyword_index import reciprocal_rank_fusion
+    from core.image_index import SourceImageIndex
+    from core.inference_backend import load_embedding_model, load_reranker_model, backend_model_name
     # Fungsi load_config diasumsikan bisa membaca config.json
     from config_loader import load_config 
-    from sentence_transformers import SentenceTransformer, CrossEncoder
 except ImportError as e:
     # Di sini kita tidak bisa pakai messagebox, jadi kita print error dan hentikan
     print(f"Gagal mengimpor modul: {e}\nPastikan library yang dibutuhkan terinstall.")
@@ -24,9 +42,138 @@ except ImportError as e:
 EMBEDDING_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
 RERANKER_MODEL_NAME = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
 BASE_OUTPUT_DIR = "output" 
+# Backend inferensi CPU: "torch" (fp32), "onnx" (ONNX Runtime) atau "int8" (ONNX Runtime terkuantisasi).
+# EMBEDDING_BACKEND / RERANKER_BACKEND menimpa pilihan untuk satu model saja.
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", INFERENCE_BACKEND)
+RERANKER_BACKEND = os.environ.get("RERANKER_BACKEND", INFERENCE_BACKEND)
+MODEL_EXPORT_DIR = os.environ.get("MODEL_EXPORT_DIR", ".model_cache")
+ONNX_THREADS = int(os.environ.get("ONNX_THREADS", 0))  # 0 = default ONNX Runtime
 MAX_HISTORY_TURNS = 5
-ENUMERATION_SEARCH_TOP_K = 50
+# Retrieval lebar untuk ENUMERATION: per halaman, berhenti saat halaman baru tidak menambah entitas unik
+ENUMERATION_PAGE_SIZE = 25
+ENUMERATION_MAX_RESULTS = 200
+ENUMERATION_MIN_NEW_RATIO = 0.2
+ENUMERATION_SOURCES_SHOWN = 10
+LLM_WORKERS = int(os.environ.get("LLM_WORKERS", 4))
+# Lapisan klien Groq (core/llm_client.py): panggilan LLM bersamaan per proses (jawaban didahulukan
+# dari saran), percobaan per panggilan, deadline total per panggilan jawaban dan timeout per
+# percobaan, serta perkiraan token keluaran yang dihitung ke anggaran token per menit Groq
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 8))
+LLM_ATTEMPTS = int(os.environ.get("LLM_ATTEMPTS", 3))
+LLM_DEADLINE_SECONDS = float(os.environ.get("LLM_DEADLINE_SECONDS", 30))
+LLM_ATTEMPT_TIMEOUT = float(os.environ.get("LLM_ATTEMPT_TIMEOUT", 20))
+LLM_COMPLETION_TOKENS = int(os.environ.get("LLM_COMPLETION_TOKENS", 1024))
+# Jendela konteks model Groq (llama-3.3-70b-versatile: 128K token)
+LLM_CONTEXT_TOKENS = int(os.environ.get("LLM_CONTEXT_TOKENS", 131072))
+# Konteks enumerasi yang muat dalam satu panggilan dijawab sekali jalan; hanya yang lebih panjang
+# diagregasi map-reduce. Default-nya jendela konteks dikurangi token jawaban dan cadangan untuk
+# instruksi + riwayat, sehingga tiap panggilan map sebesar mungkin (sesedikit mungkin panggilan)
+ENUMERATION_PROMPT_RESERVE_TOKENS = 2048
+ENUMERATION_CHUNK_TOKENS = int(os.environ.get(
+    "ENUMERATION_CHUNK_TOKENS", LLM_CONTEXT_TOKENS - LLM_COMPLETION_TOKENS - ENUMERATION_PROMPT_RESERVE_TOKENS))
+MAX_COMPARISON_ENTITIES = 5
+# Kedalaman retrieval dan rerank per jenis query (kunci = _classify_query_type / "COMPARISON").
+# Rerank bertingkat: kandidat dinilai per batch dalam urutan retrieval dan berhenti begitu `keep`
+# kandidat lolos threshold dan skor yang masih bisa dicapai kandidat tersisa (skor tertinggi batch
+# terakhir + margin) tidak mengalahkan skor ke-`keep`. RERANK_CASCADE=0
+# menilai semua kandidat (hingga rerank_depth) dalam satu batch seperti sebelumnya.
+# RERANK_CASCADE_MARGIN dalam satuan logit CrossEncoder (ms-marco: kira-kira -11..11).
+RERANK_CASCADE = os.environ.get("RERANK_CASCADE", "1") == "1"
+RERANK_CASCADE_MARGIN = float(os.environ.get("RERANK_CASCADE_MARGIN", 1.0))
+FACT_RETRIEVAL_DEPTH = int(os.environ.get("FACT_RETRIEVAL_DEPTH", 30))
+COMPARISON_RETRIEVAL_DEPTH = int(os.environ.get("COMPARISON_RETRIEVAL_DEPTH", 15))
+RERANK_PROFILES = {
+    "FACT": RerankProfile(
+        "fact", retrieval_depth=FACT_RETRIEVAL_DEPTH,
+        rerank_depth=int(os.environ.get("FACT_RERANK_DEPTH", 30)), keep=5, threshold=0.01,
+        batch_size=8 if RERANK_CASCADE else 0, margin=RERANK_CASCADE_MARGIN),
+    "COMPARISON": RerankProfile(
+        "comparison", retrieval_depth=COMPARISON_RETRIEVAL_DEPTH,
+        rerank_depth=int(os.environ.get("COMPARISON_RERANK_DEPTH", 15)), keep=3,
+        batch_size=5 if RERANK_CASCADE else 0, margin=RERANK_CASCADE_MARGIN),
+    # Enumerasi memakai semua hit sebagai konteks; rerank hanya menentukan urutan dan sumber teratas
+    "ENUMERATION": RerankProfile(
+        "enumeration", retrieval_depth=ENUMERATION_MAX_RESULTS,
+        rerank_depth=int(os.environ.get("ENUMERATION_RERANK_DEPTH", 60)), keep=ENUMERATION_SOURCES_SHOWN,
+        batch_size=20 if RERANK_CASCADE else 0, margin=RERANK_CASCADE_MARGIN),
+}
+# Parameter ANN per jenis query (lihat SearchProfile di core/vector_store.py). VECTOR_METRIC_TYPE
+# harus sama dengan metrik indeks koleksi; <JENIS>_SEARCH_PARAMS (JSON) mengikuti jenis indeks:
+# {"nprobe": n} untuk IVF, {"ef": n} untuk HNSW, {"level": n} untuk AUTOINDEX Zilliz.
+VECTOR_METRIC_TYPE = os.environ.get("VECTOR_METRIC_TYPE", "L2")
+SEARCH_PROFILES = {
+    "FACT": SearchProfile(
+        "fact", top_k=FACT_RETRIEVAL_DEPTH, metric_type=VECTOR_METRIC_TYPE,
+        params=json.loads(os.environ.get("FACT_SEARCH_PARAMS", '{"nprobe": 10}')), output_fields=CONTEXT_FIELDS),
+    "COMPARISON": SearchProfile(
+        "comparison", top_k=COMPARISON_RETRIEVAL_DEPTH, metric_type=VECTOR_METRIC_TYPE,
+        params=json.loads(os.environ.get("COMPARISON_SEARCH_PARAMS", '{"nprobe": 10}')), output_fields=CONTEXT_FIELDS),
+    # Enumerasi mengambil hasil per halaman hingga offset dalam: probe lebih lebar agar halaman akhir tetap relevan
+    "ENUMERATION": SearchProfile(
+        "enumeration", top_k=ENUMERATION_PAGE_SIZE, metric_type=VECTOR_METRIC_TYPE,
+        params=json.loads(os.environ.get("ENUMERATION_SEARCH_PARAMS", '{"nprobe": 16}')), output_fields=CONTEXT_FIELDS),
+    # Pemanasan hanya membuka kanal ke Zilliz: satu hit, satu field
+    "WARMUP": SearchProfile("warmup", top_k=1, metric_type=VECTOR_METRIC_TYPE, output_fields=["chunk_id"]),
+}
+# Query yang menyebut nama dokumen korpus (mis. "SOP_Pengadaan_2023") dicari hanya di dokumen itu
+DOCUMENT_FILTER_AUTO = os.environ.get("DOCUMENT_FILTER_AUTO", "1") == "1"
+# Anggaran token konteks per jenis query, diisi menurut skor rerank (lihat core/context_packer.py).
+# COMPARISON dibagi rata antar entitas; ENUMERATION adalah total semua bagian tahap map.
+CONTEXT_TOKEN_BUDGETS = {
+    "FACT": int(os.environ.get("FACT_CONTEXT_TOKENS", 3000)),
+    "COMPARISON": int(os.environ.get("COMPARISON_CONTEXT_TOKENS", 4000)),
+    "ENUMERATION": int(os.environ.get("ENUMERATION_CONTEXT_TOKENS", 24000)),
+    "SUGGESTION": int(os.environ.get("SUGGESTION_CONTEXT_TOKENS", 500)),
+}
+# Chunk yang >= ambang ini tumpang tindih (shingle kata) dengan chunk terpilih dibuang (0 = nonaktif)
+CONTEXT_DEDUP_THRESHOLD = float(os.environ.get("CONTEXT_DEDUP_THRESHOLD", 0.85))
+# Tokenizer HF lokal untuk menghitung token prompt (nama/direktori); kosong = tiktoken atau perkiraan
+LLM_TOKENIZER = os.environ.get("LLM_TOKENIZER")
+# Backend retrieval vektor: "zilliz", atau "local" (brute-force NumPy atas korpus BASE_OUTPUT_DIR,
+# embedding disimpan di LOCAL_VECTOR_STORE_DIR) untuk uji beban offline tanpa Zilliz
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "zilliz")
+LOCAL_VECTOR_STORE_DIR = os.environ.get("LOCAL_VECTOR_STORE_DIR", ".vector_store")
+# Koneksi Zilliz per proses, deadline total per pencarian (termasuk retry) dan timeout per percobaan
+VECTOR_POOL_SIZE = int(os.environ.get("VECTOR_POOL_SIZE", 4))
+VECTOR_SEARCH_DEADLINE_SECONDS = float(os.environ.get("VECTOR_SEARCH_DEADLINE_SECONDS", 5))
+VECTOR_SEARCH_ATTEMPT_TIMEOUT = float(os.environ.get("VECTOR_SEARCH_ATTEMPT_TIMEOUT", 2))
+VECTOR_SEARCH_ATTEMPTS = int(os.environ.get("VECTOR_SEARCH_ATTEMPTS", 3))
+# Hybrid retrieval: BM25 atas korpus OCR (output/*/*_o_dt.json) difusi dengan hasil vektor (RRF)
+HYBRID_SEARCH = os.environ.get("HYBRID_SEARCH", "1") == "1"
+KEYWORD_SEARCH_TOP_K = 20
 BASE_API_URL = "http://192.168.100.66:5000"
+# Indeks gambar halaman (output/<dok>/images) dipindai ulang berkala (0 = tanpa pemindaian ulang)
+IMAGE_INDEX_REFRESH_SECONDS = float(os.environ.get("IMAGE_INDEX_REFRESH_SECONDS", 300))
+# Micro-batching encode/predict lintas request (0 = nonaktif)
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 32))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", 5))
+# Saran pertanyaan lanjutan dibuat paralel dengan jawaban ("concurrent") atau diambil
+# terpisah lewat /suggestions/<request_id> ("deferred"). Lewat batas waktu -> fallback.
+SUGGESTION_MODE = os.environ.get("SUGGESTION_MODE", "concurrent")
+SUGGESTION_TIMEOUT_SECONDS = float(os.environ.get("SUGGESTION_TIMEOUT_SECONDS", 3))
+SUGGESTION_WORKERS = int(os.environ.get("SUGGESTION_WORKERS", 8))
+MAX_PENDING_SUGGESTIONS = 1000
+# Interval polling saran deferred milik worker lain (session store bersama, mis. SQLite)
+SUGGESTION_POLL_SECONDS = float(os.environ.get("SUGGESTION_POLL_SECONDS", 0.05))
+# Cache embedding query (0 = nonaktif); EMBEDDING_CACHE_DIR mengaktifkan tingkat disk
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", 10000))
+EMBEDDING_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR")
+EMBEDDING_CACHE_DISK_CAPACITY = int(os.environ.get("EMBEDDING_CACHE_DISK_CAPACITY", 100000))
+# Cache skor CrossEncoder per (query, chunk_id) (0 = nonaktif)
+RERANK_CACHE_SIZE = int(os.environ.get("RERANK_CACHE_SIZE", 50000))
+# Cache jawaban semantik untuk query tanpa riwayat (0 = nonaktif)
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", 5000))
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", 0.92))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", 3600))
+# Job batch (/chat/batch, batch_job.py): job bersamaan (saran tidak dibuat, jadi juga batas panggilan
+# LLM jawaban bersamaan), percobaan per job dan jumlah pertanyaan maks. per request /chat/batch
+BATCH_JOB_CONCURRENCY = int(os.environ.get("BATCH_JOB_CONCURRENCY", 8))
+BATCH_JOB_MAX_ATTEMPTS = int(os.environ.get("BATCH_JOB_MAX_ATTEMPTS", 3))
+BATCH_JOB_MAX_REQUESTS = int(os.environ.get("BATCH_JOB_MAX_REQUESTS", 500))
+# gunicorn.conf.py men-set CHATBOT_PRELOAD_ONLY=1: master hanya memuat model, koneksi dibuka per worker
+PRELOAD_ONLY = os.environ.get("CHATBOT_PRELOAD_ONLY", "0") == "1"
+WARMUP_QUERY = "Apa ketentuan kebijakan cuti tahunan?"
 
 # --- DAFTAR KATA KUNCI UNTUK PERCAKAPAN UMUM ---
 CONVERSATIONAL_KEYWORDS = [
@@ -36,44 +183,73 @@ CONVERSATIONAL_KEYWORDS = [
 ]
 
 class ChatbotService:
-    def __init__(self):
+    def __init__(self, milvus=None, llm_generator=None, embedding_model=None, reranker_model=None, keyword_index=None,
+                 image_index=None, preload_only=False):
         """
         Inisialisasi semua komponen yang diperlukan.
         Model-model yang berat akan dimuat sekali di sini.
+        Komponen dapat diinjeksikan (mis. untuk benchmark); jika tidak, semuanya dimuat dari konfigurasi.
         """
         print("Initializing ChatbotService...")
         
         # Inisialisasi komponen utama
-        self.milvus = None
-        self.llm_generator = None
-        self.embedding_model = None
-        self.reranker_model = None
-        self.conversation_history = []
+        self.milvus = milvus
+        self.llm_generator = llm_generator
+        self.embedding_model = embedding_model
+        self.reranker_model = reranker_model
+        self.embedding_backend = self.reranker_backend = "torch"
+        self.rerank_profiles = dict(RERANK_PROFILES)
+        self.search_profiles = dict(SEARCH_PROFILES)
+        self.context_budgets = dict(CONTEXT_TOKEN_BUDGETS)
+        self.context_packer = ContextPacker(TokenCounter(LLM_TOKENIZER), CONTEXT_DEDUP_THRESHOLD)
+        self.keyword_index = keyword_index
+        self.score_cache = ScoreCache(RERANKER_MODEL_NAME, RERANK_CACHE_SIZE) if RERANK_CACHE_SIZE > 0 else None
+        self.answer_cache = None
+        if ANSWER_CACHE_SIZE > 0:
+            self.answer_cache = SemanticAnswerCache(ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SIZE)
+        # Riwayat opsional di sisi server (mode session_id); dibatasi MAX_HISTORY_TURNS
+        self.session_store = create_session_store(max_messages=MAX_HISTORY_TURNS * 2)
+        self.suggestion_executor, self.llm_executor = self._create_executors()
+        self.pending_suggestions = OrderedDict()  # request_id -> (future, deadline), mode deferred
+        self._pending_lock = threading.Lock()
+        # URL gambar sumber di-resolve dari indeks, bukan os.path.exists per halaman per request
+        self.image_index = image_index
+        self._owns_image_index = image_index is None
+        if self.image_index is None:
+            self.image_index = SourceImageIndex(BASE_OUTPUT_DIR, IMAGE_INDEX_REFRESH_SECONDS)
+        # Model mentah (sebelum batching/cache) untuk inferensi pemanasan
+        self._base_models = None
+        self._config = None
+        self._connected = False
+        # True setelah warmup() berhasil; dilaporkan oleh endpoint /ready
+        self.ready = False
 
         # Di sinilah kita akan memindahkan logika dari 'setup_components'
-        self._load_models_and_handlers()
+        if self.milvus is None or self.llm_generator is None:
+            self._load_models_and_handlers()
+        # Nama dokumen diambil dari korpus indeks keyword (tanpa indeks: tidak ada deteksi)
+        self.document_matcher = None
+        if DOCUMENT_FILTER_AUTO and self.keyword_index:
+            self.document_matcher = DocumentMatcher(self.keyword_index.source_files)
+
+        # preload_only=True: hanya bagian yang aman dibagi antar proses (model, indeks) yang dimuat;
+        # connect() dipanggil di tiap worker setelah fork (lihat gunicorn.conf.py)
+        if not preload_only:
+            self.connect()
         
         print("ChatbotService initialization complete.")
 
     def _load_models_and_handlers(self):
         """
-        Memuat model-model dan handler dari Zilliz.
+        Memuat konfigurasi, model dan indeks kata kunci. Handler Zilliz/Groq dibuat di connect().
         """
         try:
             print("Loading configuration from config.json...")
-            config = load_config()
-            milvus_config = config['milvus']
-            
-            print(f"Loading AI Models...")
-            # Model dimuat di sini
-            self.embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-            self.reranker_model = CrossEncoder(RERANKER_MODEL_NAME)
-            print("AI Models loaded.")
-            
-            # --- PERUBAHAN UTAMA: Pass config DAN model yang sudah ada ---
-            self.milvus = ZillizHandler(milvus_config, self.embedding_model, self.reranker_model)
+            self._config = load_config()
             
-            self.llm_generator = LLMAnswerGenerator()
+            self._load_models()
+
+            self._load_keyword_index()
             
             # Tidak perlu pesan welcome atau GUI di sini
             print("All components loaded successfully.")
@@ -83,73 +259,470 @@ class ChatbotService:
             # Hentikan eksekusi jika komponen gagal dimuat
             sys.exit(1)
 
+    def connect(self):
+        """
+        Bagian per-proses yang tidak boleh dibuat sebelum fork: thread micro-batching,
+        cache embedding, koneksi Zilliz dan klien Groq, serta thread refresh indeks gambar.
+        Aman dipanggil lebih dari sekali.
+        """
+        if self._connected:
+            return
+        if self._config is not None:
+            try:
+                self._wrap_models()
+                self._connect_handlers(self._config)
+            except Exception as e:
+                print(f"Error during service initialization: {e}")
+                sys.exit(1)
+        if self._owns_image_index:
+            self.image_index.start_auto_refresh()
+        self._connected = True
+
+    def _connect_handlers(self, config):
+        # --- PERUBAHAN UTAMA: Pass config DAN model yang sudah ada ---
+        self.milvus = self._create_vector_store(config, ZillizVectorStore, LocalVectorStore)
+        self.llm_generator = LLMAnswerGenerator(policy=self._llm_policy())
+
+    def _create_executors(self):
+        """(executor saran, executor LLM paralel) untuk jalur sinkron."""
+        # Pembuatan saran berjalan di luar jalur kritis jawaban; executor LLM menjalankan
+        # panggilan LLM paralel dalam satu request (tahap "map" agregasi enumerasi)
+        return (ThreadPoolExecutor(max_workers=SUGGESTION_WORKERS, thread_name_prefix="suggestions"),
+                ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm"))
+
+    @staticmethod
+    def _llm_policy() -> LLMPolicy:
+        return LLMPolicy(LLM_MAX_CONCURRENCY, LLM_ATTEMPTS, LLM_DEADLINE_SECONDS, LLM_ATTEMPT_TIMEOUT,
+                         completion_tokens=LLM_COMPLETION_TOKENS)
+
+    def _create_vector_store(self, config, remote_cls, local_cls):
+        """Store vektor sesuai VECTOR_STORE (kelas sinkron atau async diberikan pemanggil)."""
+        if VECTOR_STORE == "local":
+            embedding_model = self._base_models[0] if self._base_models else self.embedding_model
+            collection_name = (config.get('milvus') or {}).get('collection_name', 'corpus')
+            # Korpus di-encode dengan model mentah: embedding halaman tidak mengisi cache embedding query
+            return local_cls.from_pages(
+                self._corpus_pages(), self.embedding_model, self.reranker_model, cache_dir=LOCAL_VECTOR_STORE_DIR,
+                model_name=backend_model_name(EMBEDDING_MODEL_NAME, self.embedding_backend),
+                collection_name=f"local:{collection_name}", encoder=embedding_model)
+        retry_policy = RetryPolicy(VECTOR_SEARCH_ATTEMPTS, VECTOR_SEARCH_DEADLINE_SECONDS, VECTOR_SEARCH_ATTEMPT_TIMEOUT)
+        return remote_cls(config['milvus'], self.embedding_model, self.reranker_model,
+                          pool_size=VECTOR_POOL_SIZE, retry_policy=retry_policy)
+
+    def _corpus_pages(self):
+        """((source_file, page), teks) per halaman korpus OCR, dari indeks keyword bila sudah dimuat."""
+        if self.keyword_index is not None:
+            return ((key, self.keyword_index.get_text(*key)) for key in self.keyword_index.keys)
+        corpus_loader = JSONCorpusLoader(BASE_OUTPUT_DIR)
+        return corpus_loader.snapshot.iter_pages() if corpus_loader.snapshot is not None else []
+
+    def warmup(self) -> bool:
+        """
+        Inferensi pemanasan sebelum worker menerima request: satu encode, satu pasangan
+        rerank dan satu pencarian (membuka kanal ke Zilliz). Mengisi self.ready.
+        """
+        start = time.perf_counter()
+        embedding_model, reranker_model = self._base_models or (self.embedding_model, self.reranker_model)
+        try:
+            query_vector = embedding_model.encode(WARMUP_QUERY)
+            reranker_model.predict([(WARMUP_QUERY, WARMUP_QUERY)])
+            profile = self.search_profiles["WARMUP"]
+            self.milvus.search_by_vector(query_vector, top_k=profile.top_k, profile=profile)
+        except Exception as e:
+            print(f"[WARMUP] Gagal: {e}")
+            return False
+        duration = time.perf_counter() - start
+        metrics.record("warmup_seconds", duration)
+        print(f"[WARMUP] Selesai dalam {duration:.2f} detik (pid {os.getpid()}).")
+        self.ready = True
+        return True
+
+    def _load_models(self):
+        """Memuat model embedding dan reranker (bobot model; aman dibagi copy-on-write setelah fork)."""
+        print(f"Loading AI Models...")
+        # Model dimuat di sini (ekspor ONNX/int8 dibuat sekali lalu dipakai ulang dari MODEL_EXPORT_DIR)
+        self.embedding_model, self.embedding_backend = load_embedding_model(
+            EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, MODEL_EXPORT_DIR, ONNX_THREADS)
+        self.reranker_model, self.reranker_backend = load_reranker_model(
+            RERANKER_MODEL_NAME, RERANKER_BACKEND, MODEL_EXPORT_DIR, ONNX_THREADS)
+        self._base_models = (self.embedding_model, self.reranker_model)
+        print(f"AI Models loaded (embedding: {self.embedding_backend}, reranker: {self.reranker_backend}).")
+
+    def _wrap_models(self):
+        """Pembungkus batching/cache di atas model; membuat thread sehingga dijalankan setelah fork."""
+        if self.score_cache is not None:
+            # Skor dari model reranker lain (atau backend lain, mis. int8) tidak boleh dipakai ulang
+            self.score_cache.bind_model(backend_model_name(RERANKER_MODEL_NAME, self.reranker_backend))
+        if BATCH_MAX_SIZE > 0:
+            # Request yang berjalan bersamaan berbagi satu model; pekerjaannya digabung per micro-batch
+            self.embedding_model = BatchedEmbeddingModel(self.embedding_model, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+            self.reranker_model = BatchedCrossEncoder(self.reranker_model, BATCH_MAX_SIZE * 2, BATCH_MAX_WAIT_MS)
+        if EMBEDDING_CACHE_SIZE > 0:
+            # Query berulang / klik saran tidak perlu di-encode ulang
+            cache = EmbeddingCache(backend_model_name(EMBEDDING_MODEL_NAME, self.embedding_backend),
+                                   EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_DISK_CAPACITY)
+            self.embedding_model = CachedEmbeddingModel(self.embedding_model, cache)
+
+    def _load_keyword_index(self):
+        if HYBRID_SEARCH:
+            corpus_loader = JSONCorpusLoader(BASE_OUTPUT_DIR)
+            self.keyword_index = corpus_loader.index if len(corpus_loader.index) else None
+
     # --- METODE UTAMA UNTUK DIPANGGIL OLEH API ---
-    def get_response(self, query: str, history: list):
+    def new_context(self, history: list = None, filters: dict = None) -> RequestContext:
+        """Membuat state per-request; tidak ada riwayat yang disimpan di instance service."""
+        return RequestContext(history, max_history_turns=MAX_HISTORY_TURNS, filters=filters)
+
+    def get_response(self, query: str, history: list, defer_suggestions: bool = None, filters: dict = None,
+                     suggestions: bool = True):
         """
         Metode utama untuk memproses query dari API.
         Menerima query dan riwayat, lalu mengembalikan jawaban, sumber, dan saran.
+        Saran dibuat bersamaan dengan jawaban; dengan defer_suggestions=True
+        respons langsung dikembalikan dan saran diambil lewat get_suggestions(request_id).
+        `filters` (hasil normalize_filters) membatasi pencarian ke dokumen tertentu.
+        suggestions=False (job batch) tidak membuat saran sama sekali; jawabannya juga
+        tidak disimpan ke cache jawaban, karena entri cache selalu berisi saran.
+        Jika Groq gagal (setelah retry/deadline) LLMError dilempar: tidak ada jawaban
+        error yang disimpan ke cache atau riwayat.
         """
-        # Gunakan riwayat dari request, bukan riwayat internal
-        self.conversation_history = history
+        if defer_suggestions is None:
+            defer_suggestions = SUGGESTION_MODE == "deferred"
+        # Riwayat hidup di RequestContext milik request ini, bukan di instance bersama
+        ctx = self.new_context(history, filters)
         
         if not self.milvus:
             return {"error": "Service is not fully initialized yet."}
 
-        is_conversational = self._is_conversational_query(query)
-        if is_conversational:
-            response = self._generate_conversational_response(query)
-            self._add_to_history("user", query)
-            self._add_to_history("bot", response)
-            return {
-                "answer": response,
-                "sources": [],
-                "suggestions": [],
-                "updated_history": self.conversation_history
-            }
-
-        is_comparison = self._is_comparison_query(query)
-        query_type = self._classify_query_type(query)
-
-        result = {}
-        if is_comparison:
-            result = self.process_comparison_query(query)
-        elif query_type == "ENUMERATION":
-            result = self._process_enumeration_query(query)
+        if self._is_conversational_query(query):
+            return self._conversational_response(ctx, query)
+
+        # Parafrase dari pertanyaan sebelumnya (tanpa riwayat) dijawab dari cache
+        cache_vector, cached = self._lookup_answer_cache(query, ctx)
+        if cached is not None:
+            return self._cached_response(ctx, query, cached)
+
+        plan = self._prepare_query(query, ctx)
+        # Saran hanya butuh query + sumber, jadi bisa dimulai sebelum jawaban dibuat
+        suggestion_job = self._start_suggestions(query, plan.get("sources", [])) if suggestions else None
+        try:
+            with metrics.timer("answer_seconds"):
+                result = self._generate_from_plan(plan)
+        except Exception:
+            # Jawaban gagal (mis. LLMError): tidak ada respons yang menunggu saran ini
+            self._cancel_suggestions(suggestion_job)
+            raise
+
+        response = self._build_response(ctx, query, result)
+        if suggestion_job is None:
+            return response
+        if defer_suggestions:
+            self._defer_suggestions(ctx.request_id, suggestion_job)
+            response["suggestions_pending"] = True
         else:
-            result = self.process_standard_query(query)
+            response["suggestions"], complete = self._await_suggestions(suggestion_job)
+            if complete:
+                self._store_answer_cache(cache_vector, ctx, query, response)
+        return response
 
-        # Tambahkan ke riwayat
-        self._add_to_history("user", query)
-        self._add_to_history("bot", result.get("answer", "Maaf, saya tidak bisa menjawab."))
+    def prefetch_embeddings(self, queries: list) -> int:
+        """
+        Meng-encode banyak query dalam satu panggilan (job batch), sehingga encode per request
+        berikutnya (cache jawaban, retrieval) menjadi hit cache embedding. Tanpa cache
+        embedding tidak ada yang dilakukan. Mengembalikan jumlah query yang di-encode.
+        """
+        queries = [query for query in dict.fromkeys(queries) if query]
+        if not queries or not isinstance(self.embedding_model, CachedEmbeddingModel):
+            return 0
+        self.embedding_model.encode(queries)
+        return len(queries)
 
-        # Generate suggestions based on the final context
-        context_for_suggestion = "\n\n".join([hit.get('text', '') for hit in result.get("sources", [])])
-        suggestions = self._generate_proactive_suggestions(query, context_for_suggestion)
+    def _conversational_response(self, ctx: RequestContext, query: str) -> dict:
+        response = self._generate_conversational_response(query)
+        self._add_to_history(ctx, "user", query)
+        self._add_to_history(ctx, "bot", response)
+        return {
+            "answer": response,
+            "sources": [],
+            "suggestions": [],
+            "updated_history": ctx.history,
+            "request_id": ctx.request_id
+        }
+
+    def _cached_response(self, ctx: RequestContext, query: str, cached) -> dict:
+        response, similarity = cached
+        self._add_to_history(ctx, "user", query)
+        self._add_to_history(ctx, "bot", response["answer"])
+        return dict(response, updated_history=ctx.history, request_id=ctx.request_id,
+                    cache_hit=True, cache_similarity=round(similarity, 4), prompt_tokens=0)
+
+    def _build_response(self, ctx: RequestContext, query: str, result: dict) -> dict:
+        """Respons API dari hasil jawaban (saran diisi oleh pemanggil)."""
+        # Tambahkan ke riwayat
+        self._add_to_history(ctx, "user", query)
+        self._add_to_history(ctx, "bot", result.get("answer", "Maaf, saya tidak bisa menjawab."))
 
         return {
             "answer": result.get("answer", "Maaf, terjadi kesalahan internal."),
             "sources": self._format_sources_for_api(result.get("sources", [])), # <--- MEMANGGIL FUNGSI YANG AKAN KITA BUAT
-            "suggestions": suggestions,
-            "updated_history": self.conversation_history
+            "suggestions": [],
+            "updated_history": ctx.history,
+            "request_id": ctx.request_id,
+            "cache_hit": False,
+            "prompt_tokens": result.get("prompt_tokens", 0)
         }
 
-    def clear_history(self):
-        """Membersihkan riwayat percakapan."""
-        self.conversation_history = []
+    # --- CACHE JAWABAN SEMANTIK ---
+    def _lookup_answer_cache(self, query: str, ctx: RequestContext):
+        """
+        Mengembalikan (vektor_query, (respons, similarity) | None). Hanya aktif untuk
+        query tanpa riwayat, karena jawaban dengan riwayat bergantung pada percakapan.
+        """
+        if self.answer_cache is None or ctx.history:
+            return None, None
+        vector = self.embedding_model.encode(query)  # dipakai ulang oleh embedding cache saat retrieval
+        return vector, self.answer_cache.lookup(vector, self._answer_cache_namespace(ctx))
+
+    def _store_answer_cache(self, vector, ctx: RequestContext, query: str, response: dict):
+        # Tanpa sumber (dokumen tidak ditemukan / error) jawaban tidak disimpan
+        if vector is None or not response.get("sources"):
+            return
+        cached = {key: response[key] for key in ("answer", "sources", "suggestions")}
+        self.answer_cache.store(vector, self._answer_cache_namespace(ctx), query, cached)
+
+    def _answer_cache_namespace(self, ctx: RequestContext) -> str:
+        """Jawaban untuk pencarian berfilter dari klien disimpan terpisah per filter."""
+        if not ctx.filters:
+            return self.milvus.collection_name
+        return f"{self.milvus.collection_name}|{filter_expression(ctx.filters)}"
+
+    def invalidate_answer_cache(self, collection: str = None) -> int:
+        """Membuang jawaban tersimpan untuk satu koleksi (mis. setelah re-index), atau semuanya."""
+        if self.answer_cache is None:
+            return 0
+        return self.answer_cache.invalidate(collection)
+
+    def stream_response(self, query: str, history: list = None, session_id: str = None, session_mode: bool = False,
+                        filters: dict = None):
+        """
+        Versi streaming dari get_response. Menghasilkan pasangan (event, data):
+        'sources' lebih dulu (sebelum LLM dipanggil), lalu 'token' berulang kali
+        selama jawaban mengalir dari LLM, kemudian 'suggestions' dan terakhir 'done'
+        (berisi updated_history, atau session_id + new_turns pada mode session).
+        """
+        if session_mode:
+            session_id = session_id or uuid.uuid4().hex
+            history = self.session_store.get(session_id)
+        ctx = self.new_context(history, filters)
+        base_length = len(ctx.history)
+
+        if not self.milvus:
+            yield "error", {"error": "Service is not fully initialized yet."}
+            return
+
+        is_conversational = self._is_conversational_query(query)
+        cache_vector, cached = (None, None) if is_conversational else self._lookup_answer_cache(query, ctx)
+        prompt_tokens = 0  # jawaban percakapan/cache tidak memanggil LLM
+        if is_conversational:
+            answer = self._generate_conversational_response(query)
+            yield "sources", []
+            yield "token", answer
+            suggestions = []
+        elif cached is not None:
+            response, _similarity = cached
+            answer = response["answer"]
+            yield "sources", response["sources"]
+            yield "token", answer
+            suggestions = response["suggestions"]
+        else:
+            plan = self._prepare_query(query, ctx)
+            prompt_tokens = plan.get("prompt_tokens", 0)
+            sources = plan.get("sources", [])
+            suggestion_job = self._start_suggestions(query, sources)
+            formatted_sources = self._format_sources_for_api(sources)
+            yield "sources", formatted_sources
+
+            if "answer" in plan:
+                answer = plan["answer"]
+                yield "token", answer
+            else:
+                parts = []
+                try:
+                    for chunk in self.llm_generator.generate_answer_stream(plan["llm_query"], plan["prompt"]):
+                        parts.append(chunk)
+                        yield "token", chunk
+                except BaseException:
+                    # Termasuk GeneratorExit (klien streaming putus)
+                    self._cancel_suggestions(suggestion_job)
+                    raise
+                answer = "".join(parts).strip()
+
+            suggestions, complete = self._await_suggestions(suggestion_job)
+            if complete:
+                self._store_answer_cache(cache_vector, ctx, query,
+                                         {"answer": answer, "sources": formatted_sources, "suggestions": suggestions})
+
+        self._add_to_history(ctx, "user", query)
+        self._add_to_history(ctx, "bot", answer or "Maaf, saya tidak bisa menjawab.")
+        yield "suggestions", suggestions
+
+        done = {"request_id": ctx.request_id, "cache_hit": cached is not None, "prompt_tokens": prompt_tokens}
+        if session_mode:
+            new_turns = ctx.history[base_length:]
+            self.session_store.append(session_id, new_turns)
+            done.update({"session_id": session_id, "new_turns": new_turns})
+        else:
+            done["updated_history"] = ctx.history
+        yield "done", done
+
+    def get_suggestions(self, request_id: str):
+        """
+        Mengambil saran untuk request yang dijalankan dengan defer_suggestions.
+        Mengembalikan None jika request_id tidak dikenal (atau sudah diambil).
+        Request dari worker lain diambil dari session store bersama.
+        """
+        with self._pending_lock:
+            job = self.pending_suggestions.pop(request_id, None)
+        if job is None:
+            return self._shared_suggestions(request_id)
+        if self.session_store.shared and not self.session_store.discard_suggestions(request_id):
+            self._cancel_suggestions(job)
+            return None  # sudah diambil lewat worker lain
+        return self._await_suggestions(job)[0]
+
+    def _shared_suggestions(self, request_id: str):
+        """Menunggu saran yang ditulis worker lain sampai deadline-nya (lalu saran cadangan)."""
+        if not self.session_store.shared:
+            return None
+        while True:
+            entry = self.session_store.pop_suggestions(request_id)
+            if entry is None:
+                return None
+            suggestions, deadline = entry
+            if suggestions is not None:
+                return suggestions
+            if time.time() >= deadline:
+                metrics.increment("suggestions_timeout")
+                return self._generate_fallback_suggestions("")
+            time.sleep(SUGGESTION_POLL_SECONDS)
+
+    def _start_suggestions(self, query: str, sources: list):
+        """Menjadwalkan _request_suggestions di executor; mengembalikan (future, deadline)."""
+        context = "\n\n".join([hit.get('text') or '' for hit in sources])
+
+        def task():
+            start = time.perf_counter()
+            suggestions = self._request_suggestions(query, context)
+            duration = time.perf_counter() - start
+            metrics.record("suggestions_seconds", duration)
+            return suggestions, duration
+
+        return self.suggestion_executor.submit(task), time.monotonic() + SUGGESTION_TIMEOUT_SECONDS
+
+    @staticmethod
+    def _cancel_suggestions(job):
+        if job is not None:
+            job[0].cancel()
+
+    def _await_suggestions(self, job) -> tuple:
+        """
+        Menunggu saran sampai batas waktunya. Waktu yang tidak perlu ditunggu lagi
+        (karena saran sudah berjalan bersamaan dengan jawaban) dicatat sebagai
+        'suggestions_saved_seconds'. Mengembalikan (saran, lengkap): lewat batas waktu
+        atau LLM gagal (mis. rate limit) -> (_generate_fallback_suggestions, False), dan
+        jawaban dengan saran cadangan seperti itu tidak disimpan ke cache jawaban.
+        """
+        future, deadline = job
+        wait_start = time.perf_counter()
+        try:
+            suggestions, duration = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FuturesTimeoutError:
+            metrics.increment("suggestions_timeout")
+            return self._generate_fallback_suggestions(""), False
+        except Exception as e:
+            metrics.increment("suggestions_failed")
+            print(f"[ERROR] Gagal menghasilkan saran: {e}")
+            return self._generate_fallback_suggestions(""), False
+        finally:
+            waited = time.perf_counter() - wait_start
+            metrics.record("suggestions_wait_seconds", waited)
+        metrics.record("suggestions_saved_seconds", max(0.0, duration - waited))
+        return suggestions, True
+
+    def _defer_suggestions(self, request_id: str, job):
+        with self._pending_lock:
+            self.pending_suggestions[request_id] = job
+            while len(self.pending_suggestions) > MAX_PENDING_SUGGESTIONS:
+                self.pending_suggestions.popitem(last=False)
+        if self.session_store.shared:
+            # Di bawah gunicorn GET /suggestions/<request_id> bisa sampai di worker lain
+            future, deadline = job
+            self.session_store.reserve_suggestions(request_id, time.time() + max(0.0, deadline - time.monotonic()))
+            future.add_done_callback(lambda done: self._publish_suggestions(request_id, done))
+
+    def _publish_suggestions(self, request_id: str, future):
+        """Menulis hasil saran (atau saran cadangan jika gagal) ke session store bersama."""
+        try:
+            suggestions = future.result()[0]
+        except BaseException:
+            suggestions = self._generate_fallback_suggestions("")
+        try:
+            self.session_store.put_suggestions(request_id, suggestions)
+        except Exception as e:
+            print(f"[ERROR] Gagal menyimpan saran {request_id}: {e}")
+
+    def get_session_response(self, query: str, session_id: str = None, defer_suggestions: bool = None,
+                             filters: dict = None):
+        """
+        Mode session: riwayat diambil dari session store, bukan dari klien.
+        Hanya giliran baru (delta) yang dikembalikan sebagai 'new_turns'.
+        """
+        session_id = session_id or uuid.uuid4().hex
+        history = self.session_store.get(session_id)
+        response = self.get_response(query, history, defer_suggestions, filters)
+        new_turns = response.pop("updated_history", [])[len(history):]
+        self.session_store.append(session_id, new_turns)
+        response["session_id"] = session_id
+        response["new_turns"] = new_turns
+        return response
+
+    def clear_history(self, session_id: str = None):
+        """
+        Menghapus riwayat session di server. Tanpa session_id tidak ada state
+        bersama yang perlu dibersihkan (riwayat ada di RequestContext / klien).
+        """
+        if session_id:
+            self.session_store.delete(session_id)
         return {"status": "Conversation history cleared."}
 
+    def batching_stats(self) -> list:
+        """Statistik micro-batch untuk model yang dibungkus (kosong jika batching nonaktif)."""
+        return [model.batcher.stats() for model in (self.embedding_model, self.reranker_model)
+                if hasattr(model, 'batcher')]
+
+    def cache_stats(self) -> dict:
+        """Counter hit/miss untuk cache yang aktif."""
+        stats = {}
+        if isinstance(self.embedding_model, CachedEmbeddingModel):
+            stats["embedding"] = self.embedding_model.cache.stats()
+        if self.score_cache is not None:
+            stats["rerank"] = self.score_cache.stats()
+        if self.answer_cache is not None:
+            stats["answer"] = self.answer_cache.stats()
+        stats["image_index"] = self.image_index.stats()
+        return stats
+
+    def llm_stats(self) -> dict:
+        """Anggaran rate limit Groq terakhir, panggilan berjalan dan antrian (kosong tanpa LLMClient)."""
+        llm = getattr(self.llm_generator, "llm", None)
+        return llm.stats() if llm is not None else {}
+
     # --- METODE PEMBANTU (TIDAK BERUBAH BANYAK) ---
-    def _add_to_history(self, role: str, content: str):
-        self.conversation_history.append({"role": role, "content": content})
-
-    def _format_history_for_prompt(self) -> str:
-        if not self.conversation_history: return ""
-        recent_history = self.conversation_history[-(MAX_HISTORY_TURNS * 2):]
-        formatted_lines = []
-        for item in recent_history:
-            role = "Pengguna" if item['role'] == 'user' else "Asisten"
-            formatted_lines.append(f"{role}: {item['content']}")
-        return "\n".join(formatted_lines)
+    def _add_to_history(self, ctx: RequestContext, role: str, content: str):
+        ctx.add_to_history(role, content)
+
+    def _format_history_for_prompt(self, ctx: RequestContext) -> str:
+        return ctx.format_history_for_prompt()
 
     def _classify_query_type(self, query: str) -> str:
         enumeration_keywords = ["siapa saja", "apa saja", "daftar", "semua", "seluruh", "kumpulan", "berikut", "sebutkan"]
@@ -158,9 +731,10 @@ class ChatbotService:
             return "ENUMERATION"
         return "FACT"
 
-    def _build_aggregation_prompt(self, query: str, context: str) -> str:
+    def _build_aggregation_prompt(self, query: str, context: str, history: str = "") -> str:
+        history_block = f"Riwayat Percakapan (untuk memahami rujukan seperti 'tersebut'):\n{history}\n" if history else ""
         return f"""Tugas Anda adalah menjadi agregator informasi yang teliti. Dari kumpulan teks dokumen di bawah ini, ekstrak SEMUA item yang relevan dengan permintaan pengguna.
-Permintaan Pengguna: '{query}'
+{history_block}Permintaan Pengguna: '{query}'
 Konteks Dokumen:
 {context}
 INSTRUKSI:
@@ -182,7 +756,24 @@ Contoh format jawaban:
         return ["Bisa jelaskan lebih detail tentang topik ini?", "Apa implikasi dari informasi ini?", "Apakah ada contoh kasus yang relevan?"]
 
     def _generate_proactive_suggestions(self, original_query: str, context: str) -> list:
-        prompt = f"""Anda adalah asisten AI. Tugas Anda adalah membuat 3 (tiga) saran pertanyaan lanjutan yang relevan berdasarkan konteks yang diberikan.
+        """Saran pertanyaan lanjutan; jika LLM gagal (LLMError, mis. rate limit) saran cadangan yang dipakai."""
+        try:
+            return self._request_suggestions(original_query, context)
+        except Exception as e:
+            print(f"[ERROR] Gagal menghasilkan saran: {e}")
+            return self._generate_fallback_suggestions("")
+
+    def _request_suggestions(self, original_query: str, context: str) -> list:
+        """Satu panggilan LLM untuk saran; LLMError dilempar ke pemanggil (_await_suggestions)."""
+        # Berikan query asli sebagai parameter pertama, meskipun tidak digunakan dalam prompt, untuk konsistensi
+        # Antri di belakang jawaban; saran yang lewat batas tunggunya tidak dipakai lagi
+        suggestions_text = self.llm_generator.generate_answer(
+            original_query, self._build_suggestion_prompt(original_query, context),
+            priority=PRIORITY_SUGGESTION, timeout=SUGGESTION_TIMEOUT_SECONDS)
+        return self._parse_suggestions(suggestions_text)
+
+    def _build_suggestion_prompt(self, original_query: str, context: str) -> str:
+        return f"""Anda adalah asisten AI. Tugas Anda adalah membuat 3 (tiga) saran pertanyaan lanjutan yang relevan berdasarkan konteks yang diberikan.
         ATURAN PENTING:
         1. Jawaban HARUS berupa sebuah list Python yang valid.
         2. Setiap elemen dalam list adalah sebuah string yang merupakan pertanyaan.
@@ -194,13 +785,14 @@ Contoh format jawaban:
         Pertanyaan Pengguna: {original_query}
         ---
         Konteks Dokumen Relevan:
-        {context[:2000]}
+        {self.context_packer.counter.truncate(context, self.context_budgets["SUGGESTION"])}
         ---
         Saran Pertanyaan Lanjutan (HANYA keluarkan list Python-nya saja, tanpa teks tambahan):
         """
+
+    def _parse_suggestions(self, suggestions_text: str) -> list:
         try:
-            # Berikan query asli sebagai parameter pertama, meskipun tidak digunakan dalam prompt, untuk konsistensi
-            suggestions_text = self.llm_generator.generate_answer(original_query, prompt).strip()
+            suggestions_text = suggestions_text.strip()
             if suggestions_text.startswith("```python"):
                 suggestions_text = suggestions_text.replace("```python", "").replace("```", "").strip()
             suggestions = ast.literal_eval(suggestions_text)
@@ -246,54 +838,95 @@ Contoh format jawaban:
         return any(keyword in query.lower() for keyword in keywords)
 
     def _extract_entities_for_comparison(self, query: str) -> list:
-        query_lower = query.lower()
-        separators = [" dan ", " vs ", " dengan ",", "]
-        entities = []
-        for sep in separators:
-            if sep in query_lower:
-                parts = query_lower.split(sep)
-                if len(parts) >= 2:
-                    part1 = parts[0].replace("bandingkan", "").strip()
-                    part2 = parts[1].strip()
-                    entities.extend([part1, part2])
-                    break
+        """
+        Memecah permintaan perbandingan menjadi entitas (bisa lebih dari dua),
+        mis. 'bandingkan A, B dan C' -> ['a', 'b', 'c']. Urutan kemunculan dipertahankan.
+        """
+        query_lower = query.lower().strip().rstrip("?.!")
+        query_lower = re.sub(r"^(bandingkan|perbedaan|persamaan|bedanya)\s+(antara\s+)?", "", query_lower)
+        parts = re.split(r"\s+(?:dan|vs\.?|versus|dengan)\s+|\s*,\s*", query_lower)
+        entities = [part.strip() for part in parts] if len(parts) >= 2 else []
         if not entities:
             match = re.search(r"dari (.+) ke (.+)", query_lower)
             if match:
                 entities = [match.group(1), match.group(2)]
-        return list(filter(None, list(set(entities))))
+        # Buang duplikat tanpa mengubah urutan
+        return list(dict.fromkeys(filter(None, entities)))[:MAX_COMPARISON_ENTITIES]
 
     # --- METODE PEMROSESAN (SUDAH DIMODIFIKASI UNTUK MENGEMBALIKAN DATA) ---
-    def process_standard_query(self, query: str):
+    # Setiap jalur dipecah menjadi _prepare_* (retrieval + rerank + prompt) dan
+    # pemanggilan LLM, supaya jalur biasa dan jalur streaming berbagi persiapan yang sama.
+    # "Plan" berisi {"prompt", "llm_query", "sources"}, atau {"answer", "sources"}
+    # jika jawaban sudah pasti tanpa LLM (mis. dokumen tidak ditemukan).
+    def _prepare_query(self, query: str, ctx: RequestContext) -> dict:
+        if self._is_comparison_query(query):
+            return self._prepare_comparison_query(query, ctx)
+        if self._classify_query_type(query) == "ENUMERATION":
+            return self._prepare_enumeration_query(query, ctx)
+        return self._prepare_standard_query(query, ctx)
+
+    def _generate_from_plan(self, plan: dict) -> dict:
+        if "answer" in plan:
+            return {"answer": plan["answer"], "sources": plan.get("sources", [])}
+        answer = self.llm_generator.generate_answer(plan["llm_query"], plan["prompt"])
+        return {"answer": answer, "sources": plan["sources"], "prompt_tokens": plan.get("prompt_tokens", 0)}
+
+    def process_standard_query(self, query: str, ctx: RequestContext = None):
+        return self._generate_from_plan(self._prepare_standard_query(query, ctx or self.new_context()))
+
+    def _prepare_standard_query(self, query: str, ctx: RequestContext) -> dict:
         print(f"Searching for: {query}")
         
-        all_hits = self.milvus.search(query, top_k=30)
+        search_profile = self.search_profiles["FACT"]
+        filters = self._search_filters(query, ctx)
+        vector_hits = self.milvus.search(query, top_k=search_profile.top_k, profile=search_profile, filters=filters)
+        return self._standard_plan(query, ctx, vector_hits, filters)
+
+    def _standard_plan(self, query: str, ctx: RequestContext, vector_hits: list, filters: dict = None) -> dict:
+        """Bagian CPU jalur standar (fusi keyword, rerank, prompt) atas kandidat vektor mentah."""
+        profile = self.rerank_profiles["FACT"]
+        # Kandidat mentah (vektor + keyword); rerank dijalankan tepat sekali di bawah
+        all_hits = self._hybrid_search(query, vector_hits, top_k=profile.retrieval_depth, filters=filters)
 
         if not all_hits:
             return {"answer": "Maaf, tidak ada dokumen ditemukan untuk pertanyaan tersebut.", "sources": []}
 
-        reranked_hits = self._ai_rerank_results(query, all_hits)
-        
-        final_hits = []
-        if reranked_hits:
-            final_hits.append(reranked_hits[0])
-            for hit in reranked_hits[1:5]:
-                if hit.get('rerank_score', -99) > 0.01:
-                    final_hits.append(hit)
-
-        context_list = []
-        for hit in final_hits:
-            raw_text = hit.get('text', '')
-            meta = hit.get('metadata', {})
-            source_info = f"[Sumber: {meta.get('source_file')} Halaman {meta.get('page')}]"
-            context_list.append(f"{source_info}\n{raw_text}")
+        reranked_hits = self._ai_rerank_results(query, all_hits, profile)
         
-        full_context = "\n\n".join(context_list)
-        history_string = self._format_history_for_prompt()
+        # Hit teratas selalu ikut; sisanya hanya yang lolos threshold. Duplikat yang dibuang
+        # packer memberi tempat bagi kandidat berikutnya hingga `keep` blok.
+        candidates = reranked_hits[:1] + [hit for hit in reranked_hits[1:]
+                                          if hit.get('rerank_score', -99) > profile.threshold]
+        packed = self._pack_context(candidates, "FACT", max_blocks=profile.keep)
+
+        full_context = "\n\n".join(packed["blocks"])
+        history_string = self._format_history_for_prompt(ctx)
         prompt = self._build_contextual_prompt(query, history_string, full_context)
-        
-        answer = self.llm_generator.generate_answer(query, prompt)
-        return {"answer": answer, "sources": final_hits}
+        return self._prompt_plan(prompt, query, packed["hits"], "FACT")
+
+    @staticmethod
+    def _format_context_block(hit: dict) -> str:
+        meta = hit.get('metadata', {})
+        source_info = f"[Sumber: {meta.get('source_file')} Halaman {meta.get('page')}]"
+        return f"{source_info}\n{hit.get('text', '')}"
+
+    def _pack_context(self, hits: list, query_type: str, budget: int = None, max_blocks: int = None,
+                      format_block=None) -> dict:
+        """Mengisi anggaran token `query_type` dengan hit sesuai urutan skor rerank (lihat ContextPacker.pack)."""
+        packed = self.context_packer.pack(hits, budget or self.context_budgets[query_type],
+                                          format_block or self._format_context_block, max_blocks)
+        if packed["duplicates"]:
+            metrics.increment(f"context_duplicates_dropped_{query_type.lower()}", packed["duplicates"])
+        if packed["over_budget"]:
+            metrics.increment(f"context_hits_over_budget_{query_type.lower()}", packed["over_budget"])
+        return packed
+
+    def _prompt_plan(self, prompt: str, query: str, sources: list, query_type: str, extra_tokens: int = 0) -> dict:
+        """Plan LLM beserta jumlah token prompt akhir (ditambah token panggilan map enumerasi, bila ada)."""
+        prompt_tokens = self.context_packer.counter.count(prompt) + extra_tokens
+        metrics.increment("prompt_tokens_total", prompt_tokens)
+        metrics.increment(f"prompt_tokens_{query_type.lower()}", prompt_tokens)
+        return {"prompt": prompt, "llm_query": query, "sources": sources, "prompt_tokens": prompt_tokens}
 
     def _build_contextual_prompt(self, query: str, history: str, context: str) -> str:
         if history:
@@ -313,87 +946,132 @@ Berdasarkan riwayat dan informasi dokumen di atas, jawablah pertanyaan terbaru p
             prompt = f"Jawab pertanyaan berikut berdasarkan konteks yang diberikan.\n\nPertanyaan: {query}\n\nKonteks:\n{context}\n\nJawaban:"
         return prompt
 
-    def _process_enumeration_query(self, query: str):
+    def _process_enumeration_query(self, query: str, ctx: RequestContext = None):
+        return self._generate_from_plan(self._prepare_enumeration_query(query, ctx or self.new_context()))
+
+    def _prepare_enumeration_query(self, query: str, ctx: RequestContext) -> dict:
         print(f"Processing ENUMERATION query: {query}")
-        
-        all_hits = []
-        seen_ids = set()
 
-        query_vector = self.embedding_model.encode(query).tolist()
-        vector_hits_raw = self.milvus.search(query_vector, top_k=ENUMERATION_SEARCH_TOP_K)
-        
-        if vector_hits_raw:
-            for hit in vector_hits_raw:
-                extracted_hit = {}
-                if isinstance(hit, dict): extracted_hit = hit
-                elif hasattr(hit, 'entity'):
-                    try:
-                        entity = hit.entity
-                        if hasattr(entity, 'to_dict'): entity = entity.to_dict()
-                        extracted_hit = {'id': hit.id, 'distance': hit.distance, 'text': entity.get('text'), 'metadata': entity.get('metadata')}
-                    except: continue
-                
-                if not extracted_hit.get('text'): continue
-                meta = extracted_hit.get('metadata', {})
-                source = meta.get('source_file')
-                if not source: continue
-                uid = f"{source}_{meta.get('page')}"
-                if uid not in seen_ids:
-                    all_hits.append(extracted_hit)
-                    seen_ids.add(uid)
-        
+        # Query di-encode SEKALI; halaman-halaman hasil diambil dengan vektor yang sama
+        query_vector = self.embedding_model.encode(query)
+        search_profile = self.search_profiles["ENUMERATION"]
+        filters = self._search_filters(query, ctx)
+        all_hits, pages = collect_unique_hits(
+            lambda offset, limit: self.milvus.search_by_vector(query_vector, top_k=limit, offset=offset,
+                                                               profile=search_profile, filters=filters),
+            search_profile.top_k, self.rerank_profiles["ENUMERATION"].retrieval_depth, ENUMERATION_MIN_NEW_RATIO)
+        print(f"[ENUMERATION] {len(all_hits)} halaman unik dari {pages} halaman hasil pencarian.")
+        stage = self._enumeration_stage(query, ctx, all_hits, filters)
+        if "answer" in stage or len(stage["prompts"]) == 1:
+            return self._enumeration_plan(query, stage)
+        # Map: setiap bagian konteks diagregasi paralel; Reduce: daftar parsial digabung
+        # oleh panggilan LLM terakhir (yang juga bisa di-stream).
+        partial_lists = list(self.llm_executor.map(
+            lambda prompt: self.llm_generator.generate_answer(query, prompt), stage["prompts"]))
+        return self._enumeration_plan(query, stage, partial_lists)
+
+    def _enumeration_stage(self, query: str, ctx: RequestContext, all_hits: list, filters: dict = None) -> dict:
+        """
+        Bagian CPU jalur enumerasi: fusi keyword, rerank dan pemecahan konteks.
+        Mengembalikan {"answer", "sources"} jika kosong, atau {"hits", "prompts"} dengan
+        satu prompt agregasi per bagian konteks.
+        """
+        # Halaman yang hanya ditemukan lewat keyword ikut ditambahkan (tanpa duplikasi halaman)
+        all_hits = self._hybrid_search(query, all_hits, top_k=len(all_hits) + KEYWORD_SEARCH_TOP_K, filters=filters)
+
         if not all_hits:
             return {"answer": "Maaf, tidak ada dokumen ditemukan untuk pertanyaan tersebut.", "sources": []}
 
-        reranked_hits = self._ai_rerank_results(query, all_hits)
-        context_list = []
-        for hit in reranked_hits:
-            raw_text = hit.get('text', '')
-            meta = hit.get('metadata', {})
-            source_info = f"[Sumber: {meta.get('source_file')} Halaman {meta.get('page')}]"
-            context_list.append(f"{source_info}\n{raw_text}")
-        
-        full_context = "\n\n".join(context_list)
-        prompt = self._build_aggregation_prompt(query, full_context)
-        answer = self.llm_generator.generate_answer(query, prompt)
-        return {"answer": answer, "sources": reranked_hits[:10]}
+        reranked_hits = self._ai_rerank_results(query, all_hits, self.rerank_profiles["ENUMERATION"])
+        packed = self._pack_context(reranked_hits, "ENUMERATION")
+
+        history_string = self._format_history_for_prompt(ctx)
+        if sum(packed["block_tokens"]) <= ENUMERATION_CHUNK_TOKENS:
+            # Muat dalam satu panggilan: tanpa tahap map dan panggilan penggabung
+            context_chunks = ["\n\n".join(packed["blocks"])]
+        else:
+            context_chunks = self.context_packer.chunk(packed["blocks"], ENUMERATION_CHUNK_TOKENS,
+                                                       packed["block_tokens"])
+            metrics.increment("enumeration_map_reduce")
+        prompts = [self._build_aggregation_prompt(query, chunk, history_string) for chunk in context_chunks]
+        return {"hits": packed["hits"], "prompts": prompts}
+
+    def _enumeration_plan(self, query: str, stage: dict, partial_lists: list = None) -> dict:
+        """Plan akhir enumerasi: satu prompt agregasi, atau prompt penggabung daftar parsial (map-reduce)."""
+        if "answer" in stage:
+            return stage
+        if partial_lists is None:
+            prompt, map_tokens = stage["prompts"][0], 0
+        else:
+            prompt = self._build_merge_prompt(query, partial_lists)
+            map_tokens = sum(self.context_packer.counter.count(map_prompt) for map_prompt in stage["prompts"])
+        return self._prompt_plan(prompt, query, stage["hits"][:ENUMERATION_SOURCES_SHOWN], "ENUMERATION", map_tokens)
 
-    def process_comparison_query(self, query: str):
+    def _build_merge_prompt(self, query: str, partial_lists: list) -> str:
+        numbered = "\n\n".join(f"Daftar {i + 1}:\n{items}" for i, items in enumerate(partial_lists))
+        return f"""Beberapa daftar di bawah ini diekstrak dari bagian-bagian dokumen yang berbeda untuk permintaan yang sama.
+Permintaan Pengguna: '{query}'
+{numbered}
+INSTRUKSI:
+1. Gabungkan SEMUA item dari semua daftar menjadi satu daftar lengkap.
+2. Gabungkan item yang sama atau duplikat menjadi satu.
+3. Abaikan daftar yang menyatakan informasi tidak ditemukan.
+4. Keluarkan jawaban HANYA dalam bentuk daftar (bullet points) tanpa teks pembuka atau penutup.
+"""
+
+    def process_comparison_query(self, query: str, ctx: RequestContext = None):
+        return self._generate_from_plan(self._prepare_comparison_query(query, ctx or self.new_context()))
+
+    def _prepare_comparison_query(self, query: str, ctx: RequestContext) -> dict:
         entities = self._extract_entities_for_comparison(query)
         if len(entities) < 2:
             return {"answer": "Maaf, saya tidak yakin apa yang ingin Anda bandingkan. Tolong sebutkan dua dokumen atau topik.", "sources": []}
-        
+
+        # Semua entitas di-encode dalam satu panggilan dan dicari dalam satu pencarian
+        # multi-vektor; semua pasangan rerank dinilai dalam satu batch CrossEncoder.
+        print(f"Searching for context of: {entities}")
+        search_profile = self.search_profiles["COMPARISON"]
+        # Satu filter untuk semua entitas (satu round trip): gabungan dokumen yang disebut di query
+        filters = self._search_filters(query, ctx)
+        hit_lists = self.milvus.search_many(entities, top_k=search_profile.top_k, profile=search_profile, filters=filters)
+        return self._comparison_plan(query, ctx, entities, hit_lists, filters)
+
+    def _comparison_plan(self, query: str, ctx: RequestContext, entities: list, hit_lists: list,
+                         filters: dict = None) -> dict:
+        """Bagian CPU jalur perbandingan: fusi keyword dan rerank per entitas (satu batch), lalu prompt."""
+        profile = self.rerank_profiles["COMPARISON"]
+        hit_lists = [self._hybrid_search(entity, hits, profile.retrieval_depth, filters)
+                     for entity, hits in zip(entities, hit_lists)]
+        reranked_lists = self._ai_rerank_groups(list(zip(entities, hit_lists)), profile)
+
         all_comparison_contexts = {}
         all_comparison_sources = {}
+        entity_budget = self.context_budgets["COMPARISON"] // max(1, len(entities))
+        for entity, reranked_hits in zip(entities, reranked_lists):
+            packed = self._pack_context(reranked_hits, "COMPARISON", budget=entity_budget, max_blocks=profile.keep,
+                                        format_block=lambda hit: hit.get('text', ''))
+            all_comparison_contexts[entity] = "\n\n".join(packed["blocks"])
+            all_comparison_sources[entity] = packed["hits"]
 
-        for entity in entities:
-            print(f"Searching for context of: {entity}")
-            all_hits = self.milvus.search(entity, top_k=15)
-            
-            reranked_hits = self._ai_rerank_results(entity, all_hits)
-            
-            context_list = []
-            for hit in reranked_hits[:3]:
-                context_list.append(hit.get('text', ''))
-            
-            all_comparison_contexts[entity] = "\n\n".join(context_list)
-            all_comparison_sources[entity] = reranked_hits[:3]
-
-        history_string = self._format_history_for_prompt()
+        history_string = self._format_history_for_prompt(ctx)
         prompt = self._build_comparison_prompt(query, history_string, all_comparison_contexts)
-        answer = self.llm_generator.generate_answer("", prompt)
         
         # Gabungkan semua sumber untuk ditampilkan
         combined_sources = []
         for sources in all_comparison_sources.values():
             combined_sources.extend(sources)
         
-        return {"answer": answer, "sources": combined_sources}
+        # llm_query tidak boleh kosong: LLMAnswerGenerator menolak query kosong
+        return self._prompt_plan(prompt, query, combined_sources, "COMPARISON")
 
     def _build_comparison_prompt(self, original_query: str, history: str, contexts: dict) -> str:
-        entity_keys = list(contexts.keys())
-        context1 = contexts.get(entity_keys[0], 'Informasi tidak ditemukan.')
-        context2 = contexts.get(entity_keys[1], 'Informasi tidak ditemukan.')
+        ordinals = ["PERTAMA", "KEDUA", "KETIGA", "KEEMPAT", "KELIMA"]
+        sections = []
+        for i, (entity, context) in enumerate(contexts.items()):
+            ordinal = ordinals[i] if i < len(ordinals) else f"KE-{i + 1}"
+            sections.append(f"INFORMASI DARI SUMBER {ordinal} ({entity}):\n{context or 'Informasi tidak ditemukan.'}")
+        source_sections = "\n---\n".join(sections)
+        all_sources = "kedua sumber" if len(contexts) == 2 else "semua sumber"
         prompt = f"""Kamu adalah asisten AI yang ahli dalam menganalisis dokumen. Gunakan riwayat percakapan untuk memahami konteks dari permintaan perbandingan ini.
 ---
 RIWAYAT PERCAKAPAN SEBELUMNYA:
@@ -402,32 +1080,60 @@ RIWAYAT PERCAKAPAN SEBELUMNYA:
 PERMINTAAN PERBANDINGAN PENGGUNA:
 {original_query}
 ---
-INFORMASI DARI SUMBER PERTAMA ({entity_keys[0]}):
-{context1}
----
-INFORMASI DARI SUMBER KEDUA ({entity_keys[1]}):
-{context2}
+{source_sections}
 ---
 Berdasarkan riwayat dan informasi di atas, buatlah analisis perbandingan yang terstruktur dengan jelas dalam Bahasa Indonesia:
-1.  **Persamaan Utama:** Jelaskan titik-titik yang sama antara kedua sumber.
+1.  **Persamaan Utama:** Jelaskan titik-titik yang sama antara {all_sources}.
 2.  **Perbedaan Kunci:** Jelaskan perbedaan signifikan secara point-by-point.
 3.  **Analisis Perubahan/Tren:** Jelaskan implikasi atau tren dari perbedaan tersebut.
 Jawaban harus ringkas, objektif, dan hanya berdasarkan informasi yang diberikan."""
         return prompt
 
-    def _ai_rerank_results(self, query: str, hits: list):
-        if not hits: return []
-        valid_hits = [h for h in hits if isinstance(h, dict) and 'text' in h]
-        if not valid_hits: return []
-        passage_pairs = [[query, hit.get('text', '')[:1500]] for hit in valid_hits]
-        try:
-            scores = self.reranker_model.predict(passage_pairs)
-            for i, hit in enumerate(valid_hits): hit['rerank_score'] = float(scores[i])
-            valid_hits.sort(key=lambda x: x['rerank_score'], reverse=True)
-        except Exception as e:
-            print(f"[WARNING] Rerank error: {e}")
-            return valid_hits 
-        return valid_hits
+    def _search_filters(self, query: str, ctx: RequestContext):
+        """
+        Filter metadata untuk pencarian request ini: filter dari klien (`filters` /chat), atau
+        source_file dokumen yang namanya disebut di query. None = pencarian ke seluruh koleksi.
+        """
+        if ctx.filters:
+            metrics.increment("search_filtered_client")
+            return ctx.filters
+        if self.document_matcher is not None:
+            source_files = self.document_matcher.match(query)
+            if source_files:
+                metrics.increment("search_filtered_auto")
+                print(f"[FILTER] Pencarian dibatasi ke dokumen: {source_files}")
+                return {"source_file": tuple(source_files)}
+        return None
+
+    def _hybrid_search(self, query: str, vector_hits: list, top_k: int, filters: dict = None) -> list:
+        """
+        Memfusikan hasil vektor dengan hasil BM25 lokal (Reciprocal Rank Fusion), sehingga
+        query istilah persis (nomor peraturan, nama) tetap menemukan halamannya.
+        Tanpa indeks keyword, hasil vektor dikembalikan apa adanya.
+        """
+        if not self.keyword_index:
+            return vector_hits
+        filters = filters or {}
+        if "jenis_dokumen" in filters:
+            # Indeks BM25 tidak menyimpan jenis_dokumen: hanya hasil vektor (sudah difilter) yang dipakai
+            return vector_hits
+        keyword_hits = self.keyword_index.search_hits(query, KEYWORD_SEARCH_TOP_K, filters.get("source_file"))
+        if not keyword_hits:
+            return vector_hits
+        return reciprocal_rank_fusion(vector_hits, keyword_hits, top_k)
+
+    def _ai_rerank_results(self, query: str, hits: list, profile: RerankProfile):
+        """Satu-satunya tahap rerank untuk setiap jalur query."""
+        return self._ai_rerank_groups([(query, hits)], profile)[0]
+
+    def _ai_rerank_groups(self, groups: list, profile: RerankProfile):
+        """Rerank bertingkat beberapa (query, hits); tiap tahap satu batch CrossEncoder untuk semua grup."""
+        with metrics.timer(f"rerank_seconds_{profile.name}"):
+            results, stats = cascade_rerank_groups(self.reranker_model, groups, profile, score_cache=self.score_cache)
+        # Berapa pasangan yang benar-benar dinilai model vs diambil dari cache vs dilewati
+        for key, value in stats.items():
+            metrics.increment(f"rerank_pairs_{key}_{profile.name}", value)
+        return results
 
     # <--- INI ADALAH FUNGSI YANG HILANG. PASTIKAN ADA DI DALAM KELAS --->
 # Di dalam chatbot_service.py
@@ -446,29 +1152,9 @@ Jawaban harus ringkas, objektif, dan hanya berdasarkan informasi yang diberikan.
             processed_pages.add(page_key)
             
             # --- LOGIKA UNTUK MENEMUKAN GAMBAR ---
-            image_url = None
-            folder_name = os.path.splitext(source_file)[0]
-            images_dir = os.path.join(BASE_OUTPUT_DIR, folder_name, "images")
-            
-            try:
-                # Coba nama file yang paling mungkin
-                img_id = f"p{page_num}_full"
-                img_path = os.path.join(images_dir, f"{img_id}.png")
-                if os.path.exists(img_path):
-                    # Jika ditemukan, buat URLnya MENGGUNAKAN BASE_API_URL
-                    image_url = f"{BASE_API_URL}/source_image/{folder_name}/images/{img_id}.png"
-                else:
-                    # Fallback ke nama lain
-                    guesses = [f"page_{page_num}.png", f"{page_num}.png", f"p{page_num}_img_0.png"]
-                    for guess in guesses:
-                        path_check = os.path.join(images_dir, guess)
-                        if os.path.exists(path_check):
-                            image_url = f"{BASE_API_URL}/source_image/{folder_name}/images/{guess}" # <--- JUGA DIUBAH DI SINI
-                            break
-            except Exception as e:
-                print(f"[ERROR IMAGE] {e}")
-                image_url = None
-            
+            # Urutan prioritas nama (p{n}_full, page_{n}, {n}, p{n}_img_0) diterapkan saat indeks dibangun
+            image_path = self.image_index.lookup(source_file, page_num)
+            image_url = f"{BASE_API_URL}/source_image/{image_path}" if image_path else None
             # --- AKHIR LOGIKA GAMBAR ---
 
             formatted_sources.append({
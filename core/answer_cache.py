@@ -0,0 +1,87 @@
+# answer_cache.py
+import threading
+import time
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    Cache jawaban untuk pertanyaan yang hampir sama (parafrase).
+    Embedding query disimpan dalam matriks float32 ternormalisasi; lookup adalah
+    satu perkalian matriks (cosine similarity) terhadap semua entri koleksi yang sama.
+    Entri kedaluwarsa setelah `ttl_seconds`; jika penuh, entri tertua dibuang.
+    """
+    def __init__(self, threshold=0.92, ttl_seconds=3600, max_entries=5000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors = None          # (n, dim) ternormalisasi
+        self._entries = []            # [{"collection", "created", "response", "query"}]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector, collection: str):
+        """Mengembalikan (response, similarity) untuk entri terdekat di atas threshold, atau None."""
+        query = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            self._expire_locked(now)
+            if not self._entries:
+                self.misses += 1
+                return None
+            similarities = self._vectors @ query
+            mask = np.array([entry["collection"] == collection for entry in self._entries])
+            similarities = np.where(mask, similarities, -1.0)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._entries[best]["response"], float(similarities[best])
+
+    def store(self, vector, collection: str, query: str, response: dict):
+        vector = self._normalize(vector)
+        with self._lock:
+            self._expire_locked(time.time())
+            if len(self._entries) >= self.max_entries:
+                self._drop_locked(list(range(len(self._entries) - self.max_entries + 1)))
+            self._entries.append({"collection": collection, "created": time.time(), "response": response, "query": query})
+            row = vector[np.newaxis, :]
+            self._vectors = row if self._vectors is None else np.vstack([self._vectors, row])
+
+    def invalidate(self, collection: str = None) -> int:
+        """
+        Membuang semua entri sebuah koleksi (atau semuanya jika None), termasuk namespace
+        berfilter "<koleksi>|<filter>". Mengembalikan jumlah entri dibuang.
+        """
+        with self._lock:
+            drop = [i for i, entry in enumerate(self._entries)
+                    if collection is None or entry["collection"].split("|", 1)[0] == collection]
+            self._drop_locked(drop)
+            return len(drop)
+
+    def _expire_locked(self, now):
+        expired = [i for i, entry in enumerate(self._entries) if now - entry["created"] > self.ttl_seconds]
+        if expired:
+            self._drop_locked(expired)
+
+    def _drop_locked(self, indices):
+        if not indices: return
+        keep = np.ones(len(self._entries), dtype=bool)
+        keep[indices] = False
+        self._entries = [entry for entry, kept in zip(self._entries, keep) if kept]
+        self._vectors = self._vectors[keep] if self._entries else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "threshold": self.threshold, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
@@ -0,0 +1,386 @@
+# batch_runner.py
+"""
+Menjawab banyak pertanyaan sekaligus (/chat/batch dan batch_job.py) di atas ChatbotService
+atau AsyncChatbotService:
+- query satu jendela di-encode dalam satu panggilan (prefetch_embeddings), dan job yang
+  berjalan bersamaan berbagi micro-batch encode/rerank (core/batching.py);
+- jumlah job bersamaan dibatasi (saran tidak dibuat, sehingga ini juga batas panggilan LLM
+  jawaban), diperkecil saat Groq membatasi laju dan dijeda selama cooldown 429;
+- kegagalan sementara (Zilliz, LLMError yang layak diulang) dicoba ulang dengan backoff;
+- hasil dikeluarkan per job begitu selesai (urutan selesai), sebagai dict satu baris JSON.
+JsonlResultWriter menulis hasil ke JSONL dan mengenali job yang sudah selesai sehingga run
+yang terputus bisa dilanjutkan.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from core.chat_request import parse_chat_request
+from core.llm_client import LLMError
+
+# Job dengan status ini tidak dijalankan ulang saat melanjutkan run
+DONE_STATUSES = ("ok", "invalid")
+
+
+class BatchJob:
+    def __init__(self, job_id, query: str, history: list = None, filters: dict = None):
+        self.id = job_id
+        self.query = query
+        self.history = history or []
+        self.filters = filters or {}
+        self.attempts = 0
+        self.prefetched = False
+
+
+def parse_batch_item(item, index: int, id_field: str = "id", query_field: str = "query"):
+    """
+    Satu item batch -> (BatchJob, None) atau (None, pesan_error). query, history dan filters
+    divalidasi sama seperti /chat; tanpa `id_field` id-nya "item-<index>".
+    """
+    if not isinstance(item, dict):
+        return None, "Item must be a JSON object."
+    job_id = item.get(id_field, f"item-{index}")
+    if isinstance(job_id, bool) or not isinstance(job_id, (str, int)):
+        return None, f"'{id_field}' field must be a string or an integer."
+    params, error = parse_chat_request({"query": item.get(query_field), "history": item.get("history", []),
+                                        "filters": item.get("filters")}, allow_defer=False)
+    if error:
+        return None, error
+    return BatchJob(job_id, params["query"], params["history"], params["filters"]), None
+
+
+def parse_batch_request(data, max_requests: int, max_concurrency: int):
+    """
+    Memvalidasi body /chat/batch: {"requests": [{"id", "query", "history", "filters"}, ...],
+    "concurrency": n (opsional, maks. max_concurrency)}.
+    Mengembalikan ({"jobs", "concurrency"}, None) atau (None, pesan_error) untuk respons 400.
+    """
+    if not isinstance(data, dict):
+        return None, "Invalid request. JSON body is missing."
+    items = data.get('requests')
+    if not isinstance(items, list) or not items:
+        return None, "'requests' field must be a non-empty list."
+    if len(items) > max_requests:
+        return None, f"Too many requests in one batch (max {max_requests})."
+    concurrency = data.get('concurrency', max_concurrency)
+    if isinstance(concurrency, bool) or not isinstance(concurrency, int) or concurrency < 1:
+        return None, "'concurrency' field must be a positive integer."
+
+    jobs, seen = [], set()
+    for index, item in enumerate(items):
+        job, error = parse_batch_item(item, index)
+        if error:
+            return None, f"requests[{index}]: {error}"
+        if str(job.id) in seen:
+            return None, f"requests[{index}]: duplicate id '{job.id}'."
+        seen.add(str(job.id))
+        jobs.append(job)
+    return {"jobs": jobs, "concurrency": min(concurrency, max_concurrency)}, None
+
+
+def read_batch_file(path: str, id_field: str = "id", query_field: str = "query"):
+    """
+    Membaca file JSONL pertanyaan. Mengembalikan (jobs, invalid): `invalid` berisi baris hasil
+    berstatus "invalid" untuk item yang tidak valid. Id yang berulang hanya dijalankan sekali.
+    """
+    jobs, invalid, seen = [], [], set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                invalid.append({"id": f"line-{line_no}", "status": "invalid", "error": f"Invalid JSON: {e}"})
+                continue
+            job, error = parse_batch_item(item, line_no, id_field, query_field)
+            if error:
+                job_id = item.get(id_field, f"line-{line_no}") if isinstance(item, dict) else f"line-{line_no}"
+                invalid.append({"id": job_id, "status": "invalid", "error": error})
+                continue
+            if str(job.id) in seen:
+                print(f"[BATCH] Id '{job.id}' (baris {line_no}) berulang; hanya yang pertama dijalankan.")
+                continue
+            seen.add(str(job.id))
+            jobs.append(job)
+    return jobs, invalid
+
+
+class AdaptiveConcurrency:
+    """
+    Batas job bersamaan gaya AIMD: dibagi dua saat LLM membatasi laju (paling sering sekali
+    per `hold_seconds`, karena job yang berjalan bersamaan gagal bersamaan), naik satu setelah
+    `limit` job berturut-turut berhasil; selalu dalam [minimum, maximum].
+    """
+    def __init__(self, maximum: int, minimum: int = 1, hold_seconds: float = 1.0):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.hold_seconds = hold_seconds
+        self.limit = self.maximum
+        self._successes = 0
+        self._hold_until = 0.0
+
+    def on_success(self):
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.maximum:
+            self.limit += 1
+            self._successes = 0
+
+    def on_rate_limited(self, now: float):
+        self._successes = 0
+        if now < self._hold_until:
+            return
+        self.limit = max(self.minimum, self.limit // 2)
+        self._hold_until = now + self.hold_seconds
+
+
+class BatchScheduler:
+    """
+    Antrian job tanpa I/O, dipakai bersama oleh BatchRunner dan AsyncBatchRunner: urutan
+    job (retry yang sudah jatuh tempo didahulukan), batas konkurensi adaptif, cooldown LLM
+    dan klasifikasi hasil (selesai / dicoba ulang / gagal).
+    """
+    def __init__(self, jobs, concurrency: int, max_attempts: int = 3, llm_generator=None,
+                 prefetch_size: int = 64, base_delay: float = 0.5, max_delay: float = 10.0):
+        self._pending = deque(jobs)
+        self._retries = []  # heap (waktu_mulai, urutan, job)
+        self._sequence = itertools.count()
+        self.limiter = AdaptiveConcurrency(concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.llm_generator = llm_generator
+        self.prefetch_size = prefetch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.counts = {"ok": 0, "error": 0, "retried": 0}
+
+    def done(self) -> bool:
+        return not self._pending and not self._retries and self.in_flight == 0
+
+    def _cooldown(self) -> float:
+        cooldown = getattr(self.llm_generator, "rate_limit_cooldown", None)
+        return cooldown() if cooldown else 0.0
+
+    def prefetch_queries(self) -> list:
+        """Query jendela berikutnya yang belum di-encode (kosong jika job terdepan sudah)."""
+        if not self.prefetch_size or not self._pending or self._pending[0].prefetched:
+            return []
+        queries = []
+        for job in itertools.islice(self._pending, self.prefetch_size):
+            if not job.prefetched:
+                job.prefetched = True
+                queries.append(job.query)
+        return queries
+
+    def next_job(self, now: float):
+        """Job yang boleh dimulai sekarang, atau None (kapasitas penuh, cooldown, atau belum ada)."""
+        if self.in_flight >= self.limiter.limit or self._cooldown() > 0:
+            return None
+        if self._retries and self._retries[0][0] <= now:
+            job = heapq.heappop(self._retries)[2]
+        elif self._pending:
+            job = self._pending.popleft()
+        else:
+            return None
+        job.attempts += 1
+        self.in_flight += 1
+        return job
+
+    def wait_time(self, now: float):
+        """Berapa lama menunggu sebelum mencoba next_job lagi; None = tunggu job yang berjalan selesai."""
+        cooldown = self._cooldown()
+        if cooldown > 0:
+            return cooldown
+        if self.in_flight < self.limiter.limit and self._retries:
+            return max(0.0, self._retries[0][0] - now)
+        return None
+
+    def complete(self, job: BatchJob, response: dict = None, error: Exception = None, elapsed: float = 0.0):
+        """Baris hasil untuk job yang selesai atau gagal permanen; None jika job dijadwalkan ulang."""
+        self.in_flight -= 1
+        now = time.monotonic()
+        if isinstance(error, LLMError):
+            # Permintaan yang ditolak Groq (mis. 400) tidak akan berhasil bila diulang
+            failure, retryable = f"LLM error ({error.kind}): {error}", error.retryable
+            if error.kind == "rate_limit":
+                self.limiter.on_rate_limited(now)
+        elif error is not None:
+            failure, retryable = f"{type(error).__name__}: {error}", True
+        elif response.get("error"):
+            failure, retryable = response["error"], False
+        else:
+            self.limiter.on_success()
+            self.counts["ok"] += 1
+            return self._result(job, "ok", elapsed, response=response)
+
+        if retryable and job.attempts < self.max_attempts:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** job.attempts)))
+            heapq.heappush(self._retries, (now + delay, next(self._sequence), job))
+            self.counts["retried"] += 1
+            print(f"[BATCH] Job '{job.id}' percobaan {job.attempts} gagal ({failure}); ulang dalam {delay:.1f} detik.")
+            return None
+        self.counts["error"] += 1
+        return self._result(job, "error", elapsed, error=failure)
+
+    @staticmethod
+    def _result(job: BatchJob, status: str, elapsed: float, response: dict = None, error: str = None) -> dict:
+        line = {"id": job.id, "query": job.query, "status": status, "attempts": job.attempts,
+                "elapsed_ms": round(elapsed * 1000, 1)}
+        if response is not None:
+            line.update({key: response.get(key) for key in ("answer", "sources", "prompt_tokens", "cache_hit")})
+        if error is not None:
+            line["error"] = error
+        return line
+
+
+class BatchRunner:
+    """Menjalankan job batch di thread pool atas ChatbotService (sinkron); lihat run()."""
+
+    def __init__(self, service, concurrency: int = 8, max_attempts: int = 3, prefetch_size: int = 64):
+        self.service = service
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+        self.prefetch_size = prefetch_size
+        self.scheduler = None
+
+    def _scheduler(self, jobs) -> BatchScheduler:
+        self.scheduler = BatchScheduler(jobs, self.concurrency, self.max_attempts,
+                                        getattr(self.service, "llm_generator", None), self.prefetch_size)
+        return self.scheduler
+
+    def _run_job(self, job: BatchJob):
+        start = time.perf_counter()
+        try:
+            response = self.service.get_response(job.query, job.history, filters=job.filters, suggestions=False)
+            return response, None, time.perf_counter() - start
+        except Exception as e:
+            return None, e, time.perf_counter() - start
+
+    def run(self, jobs):
+        """Menghasilkan satu dict hasil per job (status "ok" atau "error") begitu job selesai."""
+        scheduler = self._scheduler(jobs)
+        futures = {}
+        pool = ThreadPoolExecutor(max_workers=scheduler.limiter.maximum, thread_name_prefix="batch")
+        try:
+            while not scheduler.done():
+                queries = scheduler.prefetch_queries()
+                if queries:
+                    self.service.prefetch_embeddings(queries)
+                job = scheduler.next_job(time.monotonic())
+                while job is not None:
+                    futures[pool.submit(self._run_job, job)] = job
+                    job = scheduler.next_job(time.monotonic())
+
+                timeout = scheduler.wait_time(time.monotonic())
+                if not futures:
+                    time.sleep(timeout or 0.0)
+                    continue
+                done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    line = scheduler.complete(futures.pop(future), *future.result())
+                    if line is not None:
+                        yield line
+        finally:
+            # Konsumen berhenti lebih awal (klien putus): job yang belum mulai dibatalkan
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncBatchRunner(BatchRunner):
+    """Versi asyncio untuk AsyncChatbotService: setiap job adalah task di event loop."""
+
+    async def _run_job(self, job: BatchJob):
+        start = time.perf_counter()
+        try:
+            response = await self.service.get_response(job.query, job.history, filters=job.filters, suggestions=False)
+            return response, None, time.perf_counter() - start
+        except Exception as e:
+            return None, e, time.perf_counter() - start
+
+    async def run(self, jobs):
+        scheduler = self._scheduler(jobs)
+        tasks = {}
+        try:
+            while not scheduler.done():
+                queries = scheduler.prefetch_queries()
+                if queries:
+                    await asyncio.to_thread(self.service.prefetch_embeddings, queries)
+                job = scheduler.next_job(time.monotonic())
+                while job is not None:
+                    tasks[asyncio.ensure_future(self._run_job(job))] = job
+                    job = scheduler.next_job(time.monotonic())
+
+                timeout = scheduler.wait_time(time.monotonic())
+                if not tasks:
+                    await asyncio.sleep(timeout or 0.0)
+                    continue
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    line = scheduler.complete(tasks.pop(task), *task.result())
+                    if line is not None:
+                        yield line
+        finally:
+            # Konsumen berhenti lebih awal (klien putus): task yang berjalan dibatalkan lalu
+            # ditunggu, agar tidak ada task tertunda yang dihancurkan bersama event loop
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class JsonlResultWriter:
+    """
+    Hasil batch sebagai JSONL: satu baris per job, di-flush begitu job selesai. Dengan
+    resume=True baris yang sudah ada dipertahankan dan `completed` berisi id job yang
+    selesai (status di DONE_STATUSES; baris terakhir per id yang berlaku), sehingga
+    menjalankan ulang perintah yang sama hanya mengerjakan sisanya.
+    """
+    def __init__(self, path: str, resume: bool = True):
+        self.path = path
+        self.completed = self._read_completed(path) if resume else set()
+        needs_newline = resume and self._ends_without_newline(path)
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        if needs_newline:
+            self._file.write("\n")  # baris terakhir terpotong (run sebelumnya mati saat menulis)
+
+    @staticmethod
+    def _read_completed(path: str) -> set:
+        statuses = {}
+        if not os.path.exists(path):
+            return set()
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(result, dict) and "id" in result:
+                    statuses[str(result["id"])] = result.get("status")
+        return {job_id for job_id, status in statuses.items() if status in DONE_STATUSES}
+
+    @staticmethod
+    def _ends_without_newline(path: str) -> bool:
+        try:
+            with open(path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return False
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except OSError:
+            return False
+
+    def is_done(self, job_id) -> bool:
+        return str(job_id) in self.completed
+
+    def write(self, result: dict):
+        self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,138 @@
+# batching.py
+import threading
+import time
+import queue
+from concurrent.futures import Future
+
+
+class _PendingRequest:
+    def __init__(self, items):
+        self.items = items
+        self.future = Future()
+
+
+class MicroBatcher:
+    """
+    Menggabungkan pekerjaan dari banyak thread request menjadi micro-batch.
+    Satu worker thread mengambil request dari antrian, menunggu paling lama
+    `max_wait_ms` agar batch terisi (maks. `max_batch_size` item), menjalankan
+    `batch_fn` sekali untuk gabungan item, lalu membagikan hasilnya kembali.
+    Model hanya dipanggil dari worker ini, jadi tidak ada salinan model per thread.
+    Jika batch gabungan gagal, item tiap request dijalankan ulang sendiri-sendiri
+    sehingga hanya request yang memicu galat yang menerima exception.
+    """
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5.0, name="batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.split_retries = 0
+        self._worker = threading.Thread(target=self._run, name=f"{name}-worker", daemon=True)
+        self._worker.start()
+
+    def submit(self, items) -> Future:
+        """Menjadwalkan daftar item; Future berisi hasil untuk item-item tersebut (urutan sama)."""
+        request = _PendingRequest(list(items))
+        self._queue.put(request)
+        return request.future
+
+    def __call__(self, items):
+        return self.submit(items).result()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            avg = (self.items / self.batches) if self.batches else 0.0
+            return {"name": self.name, "batches": self.batches, "items": self.items,
+                    "avg_batch_size": round(avg, 2), "split_retries": self.split_retries,
+                    "queued": self._queue.qsize()}
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        batch = [first]
+        size = len(first.items)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.items)
+        return batch
+
+    def _call(self, items):
+        outputs = self.batch_fn(items)
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(items)
+        return outputs
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            merged = [item for request in batch for item in request.items]
+            try:
+                outputs = self._call(merged)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].future.set_exception(e)
+                    continue
+                # Satu input buruk tidak boleh menggagalkan request lain yang kebetulan satu batch
+                print(f"[WARNING] {self.name}: batch {len(batch)} request gagal ({e}); diulang per request.")
+                with self._stats_lock:
+                    self.split_retries += 1
+                for request in batch:
+                    try:
+                        request.future.set_result(self._call(request.items))
+                    except Exception as request_error:
+                        request.future.set_exception(request_error)
+                continue
+
+            start = 0
+            for request in batch:
+                end = start + len(request.items)
+                request.future.set_result(outputs[start:end])
+                start = end
+
+
+class BatchedEmbeddingModel:
+    """
+    Pembungkus SentenceTransformer: panggilan encode() dari request yang berbeda
+    digabung menjadi satu batch. Atribut lain diteruskan ke model asli.
+    """
+    def __init__(self, model, max_batch_size=32, max_wait_ms=5.0):
+        self.model = model
+        self.batcher = MicroBatcher(lambda texts: model.encode(texts), max_batch_size, max_wait_ms, name="encode")
+
+    def encode(self, sentences, **kwargs):
+        single = isinstance(sentences, str)
+        batch = [sentences] if single else list(sentences)
+        # Argumen khusus (batch_size, normalize, dll.) atau input kosong tidak bisa digabung
+        if kwargs or not batch:
+            return self.model.encode(sentences, **kwargs)
+        vectors = self.batcher(batch)
+        return vectors[0] if single else vectors
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class BatchedCrossEncoder:
+    """Pembungkus CrossEncoder: pasangan (query, passage) dari banyak request di-predict sekaligus."""
+    def __init__(self, model, max_batch_size=64, max_wait_ms=5.0):
+        self.model = model
+        self.batcher = MicroBatcher(lambda pairs: model.predict(pairs), max_batch_size, max_wait_ms, name="rerank")
+
+    def predict(self, pairs, **kwargs):
+        pairs = list(pairs)
+        if kwargs or not pairs:
+            return self.model.predict(pairs, **kwargs)
+        return self.batcher(pairs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
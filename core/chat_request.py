@@ -0,0 +1,63 @@
+# chat_request.py
+"""Validasi body /chat, format SSE dan respons galat LLM, dipakai bersama oleh api_server (Flask) dan asgi_server."""
+import json
+import math
+
+from core.search_filter import normalize_filters
+
+CORS_ORIGINS = ["http://milvus_web.localhost", "http://localhost:5000", "http://127.0.0.1:5000", "http://192.168.100.66:5000"]
+
+
+def parse_chat_request(data, allow_defer: bool = True):
+    """
+    Memvalidasi body JSON /chat dan /chat/stream.
+    Mengembalikan (params, None) atau (None, pesan_error) untuk respons 400.
+    params: query, history, session_mode, session_id, defer_suggestions, filters.
+    """
+    if not data:
+        return None, "Invalid request. JSON body is missing."
+
+    query = data.get('query')
+    if not query or not isinstance(query, str):
+        return None, "Missing 'query' field in request or it's not a string."
+
+    # Mode session: klien cukup mengirim 'session_id' (null/kosong = buat session baru),
+    # riwayat disimpan di server dan hanya delta 'new_turns' yang dikembalikan.
+    session_mode = 'session_id' in data
+    session_id = data.get('session_id')
+    if session_id is not None and not isinstance(session_id, str):
+        return None, "'session_id' field must be a string."
+
+    history = data.get('history', [])
+    if not isinstance(history, list):
+        return None, "'history' field must be a list."
+
+    # Opsional: kembalikan jawaban tanpa menunggu saran; ambil via /suggestions/<request_id>
+    defer_suggestions = data.get('defer_suggestions') if allow_defer else None
+    if defer_suggestions is not None and not isinstance(defer_suggestions, bool):
+        return None, "'defer_suggestions' field must be a boolean."
+
+    # Opsional: {"source_file": "A.pdf" | [...], "jenis_dokumen": ...}; disaring di dalam pencarian Zilliz
+    try:
+        filters = normalize_filters(data.get('filters'))
+    except ValueError as e:
+        return None, str(e)
+
+    return {"query": query, "history": history, "session_mode": session_mode,
+            "session_id": session_id, "defer_suggestions": defer_suggestions, "filters": filters}, None
+
+
+def format_sse(event: str, data) -> str:
+    """Satu pesan server-sent event; data dikirim sebagai JSON satu baris."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def llm_error_response(error):
+    """
+    (status, body, headers) untuk LLMError: 503 bila layak dicoba lagi (rate limit, timeout,
+    Groq bermasalah) dengan Retry-After bila diketahui, 502 bila Groq menolak permintaannya.
+    """
+    status = 503 if error.retryable else 502
+    body = {"error": "The AI service is temporarily unavailable.", "kind": error.kind, "details": str(error)}
+    headers = {"Retry-After": str(math.ceil(error.retry_after))} if error.retry_after else {}
+    return status, body, headers
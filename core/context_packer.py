@@ -0,0 +1,185 @@
+# context_packer.py
+"""
+Penyusunan konteks prompt berbasis anggaran token: hit (sudah urut skor rerank)
+dimasukkan satu per satu sampai anggaran token habis, chunk yang hampir sama
+dengan chunk yang sudah masuk dibuang, dan konteks enumerasi dipecah per jumlah
+token (bukan karakter) untuk tahap map.
+
+Token dihitung dengan tokenizer lokal: tokenizer HF (LLM_TOKENIZER, mis. salinan
+tokenizer Llama 3) jika dikonfigurasi, tiktoken jika terinstall, selain itu
+perkiraan dari jumlah karakter.
+"""
+import math
+import re
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # opsional; tanpa tiktoken dipakai perkiraan karakter
+    tiktoken = None
+
+# Perkiraan konservatif untuk teks Indonesia (cenderung melebihkan jumlah token)
+CHARS_PER_TOKEN = 3.5
+SHINGLE_SIZE = 5
+_WORD_RE = re.compile(r"\w+")
+
+
+class TokenCounter:
+    """Menghitung dan memotong teks per token dengan tokenizer lokal terbaik yang tersedia."""
+
+    def __init__(self, tokenizer_name: str = None, encoding_name: str = "cl100k_base"):
+        self._hf_tokenizer = None
+        self._encoding = None
+        # Tokenizer Rust tidak aman dipakai bersamaan dari banyak thread
+        self._lock = threading.Lock()
+        if tokenizer_name:
+            try:
+                from transformers import AutoTokenizer
+                self._hf_tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+                self._hf_tokenizer.model_max_length = 10 ** 9  # hanya menghitung, tanpa batas model
+            except Exception as e:
+                print(f"[WARNING] Tokenizer '{tokenizer_name}' gagal dimuat ({e}); memakai penghitung lain.")
+        if self._hf_tokenizer is None and tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(encoding_name)
+            except Exception as e:  # mis. file encoding belum ada di cache dan tidak ada akses jaringan
+                print(f"[WARNING] Encoding tiktoken '{encoding_name}' tidak tersedia ({e}); memakai perkiraan karakter.")
+        if self._hf_tokenizer is not None:
+            self.name = f"hf:{tokenizer_name}"
+        elif self._encoding is not None:
+            self.name = f"tiktoken:{encoding_name}"
+        else:
+            self.name = f"approx:{CHARS_PER_TOKEN}_chars_per_token"
+
+    def _encode(self, text: str) -> list:
+        if self._hf_tokenizer is not None:
+            with self._lock:
+                return self._hf_tokenizer.encode(text, add_special_tokens=False)
+        return self._encoding.encode(text, disallowed_special=())
+
+    def _decode(self, ids: list) -> str:
+        if self._hf_tokenizer is not None:
+            with self._lock:
+                return self._hf_tokenizer.decode(ids)
+        return self._encoding.decode(ids)
+
+    @property
+    def exact(self) -> bool:
+        return self._hf_tokenizer is not None or self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if not self.exact:
+            return math.ceil(len(text) / CHARS_PER_TOKEN)
+        return len(self._encode(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Awal `text` sepanjang maks. `max_tokens` token, dipotong di batas kata."""
+        if not text or max_tokens <= 0:
+            return ""
+        if not self.exact:
+            max_chars = int(max_tokens * CHARS_PER_TOKEN)
+            if len(text) <= max_chars:
+                return text
+            cut = text[:max_chars]
+        else:
+            ids = self._encode(text)
+            if len(ids) <= max_tokens:
+                return text
+            cut = self._decode(ids[:max_tokens])
+        # Kata terakhir yang terpotong dibuang
+        space = cut.rfind(" ")
+        return (cut[:space] if space > len(cut) // 2 else cut).rstrip()
+
+
+def _shingles(text: str) -> set:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _is_near_duplicate(shingles: set, accepted: list, threshold: float) -> bool:
+    """
+    Koefisien overlap |A∩B| / min(|A|,|B|): menangkap salinan yang hampir sama
+    maupun chunk yang seluruhnya termuat di chunk lain (chunking yang tumpang tindih).
+    """
+    for other in accepted:
+        smaller = min(len(shingles), len(other))
+        if smaller and len(shingles & other) / smaller >= threshold:
+            return True
+    return False
+
+
+class ContextPacker:
+    """
+    Memilih dan memformat hit untuk konteks prompt dalam anggaran token.
+    `dedup_threshold` <= 0 menonaktifkan pembuangan chunk yang hampir sama.
+    """
+
+    def __init__(self, counter: TokenCounter, dedup_threshold: float = 0.85, min_block_tokens: int = 64):
+        self.counter = counter
+        self.dedup_threshold = dedup_threshold
+        # Sisa anggaran lebih kecil dari ini tidak diisi potongan blok (terlalu sedikit isinya)
+        self.min_block_tokens = min_block_tokens
+
+    def pack(self, hits: list, budget_tokens: int, format_block, max_blocks: int = None) -> dict:
+        """
+        Mengisi anggaran dengan `format_block(hit)` sesuai urutan `hits` (urutan skor rerank).
+        Blok yang melebihi sisa anggaran dilewati agar blok lebih kecil berikutnya masih bisa
+        masuk; blok pertama dipotong alih-alih dibuang sehingga konteks tidak pernah kosong.
+        Mengembalikan {"hits", "blocks", "block_tokens", "tokens", "duplicates", "over_budget", "truncated"}.
+        """
+        result = {"hits": [], "blocks": [], "block_tokens": [], "tokens": 0,
+                  "duplicates": 0, "over_budget": 0, "truncated": 0}
+        accepted_shingles = []
+        separator_tokens = self.counter.count("\n\n")
+        for hit in hits:
+            if max_blocks is not None and len(result["blocks"]) >= max_blocks:
+                break
+            if result["blocks"] and budget_tokens - result["tokens"] < self.min_block_tokens:
+                break  # sisa anggaran tidak cukup untuk blok berarti
+            text = hit.get('text') or ''
+            shingles = _shingles(text) if self.dedup_threshold > 0 else None
+            if shingles and _is_near_duplicate(shingles, accepted_shingles, self.dedup_threshold):
+                result["duplicates"] += 1
+                continue
+
+            block = format_block(hit)
+            tokens = self.counter.count(block)
+            separator = separator_tokens if result["blocks"] else 0
+            remaining = budget_tokens - result["tokens"] - separator
+            if tokens > remaining:
+                if result["blocks"] or remaining < self.min_block_tokens:
+                    result["over_budget"] += 1
+                    continue
+                block = self.counter.truncate(block, remaining)
+                tokens = self.counter.count(block)
+                result["truncated"] += 1
+
+            result["hits"].append(hit)
+            result["blocks"].append(block)
+            result["block_tokens"].append(tokens)
+            result["tokens"] += tokens + separator
+            if shingles:
+                accepted_shingles.append(shingles)
+        return result
+
+    def chunk(self, blocks: list, max_tokens: int, block_tokens: list = None) -> list:
+        """
+        Menggabungkan blok menjadi bagian-bagian berukuran maks. ~`max_tokens` token (tahap map).
+        `block_tokens` (dari pack) menghindari penghitungan ulang.
+        """
+        if block_tokens is None:
+            block_tokens = [self.counter.count(block) for block in blocks]
+        chunks, current, current_tokens = [], [], 0
+        for block, tokens in zip(blocks, block_tokens):
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(block)
+            current_tokens += tokens
+        if current:
+            chunks.append("\n\n".join(current))
+        return chunks
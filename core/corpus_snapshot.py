@@ -0,0 +1,153 @@
+# corpus_snapshot.py
+"""
+Snapshot korpus biner untuk JSONCorpusLoader.
+
+Format satu file:
+    header   : magic (8 byte) | jumlah baris | posisi tabel offset | posisi manifest (uint64)
+    blob     : teks UTF-8 per halaman, berurutan (ditulis streaming saat kompilasi)
+    offsets  : jumlah_baris x (posisi int64, panjang int64), rata 8 byte
+    manifest : JSON {"files": {rel_path: {"mtime_ns", "source_file", "first_row", "pages": [...]}}}
+
+File di-memory-map (read-only) sehingga halaman teks dibagi antar proses lewat page
+cache OS dan baru dibaca saat diakses. Kompilasi ulang bersifat inkremental: hanya
+file JSON yang mtime-nya berubah yang di-parse ulang; teks file lain disalin dari
+snapshot lama.
+"""
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+SNAPSHOT_MAGIC = b"RAGCORP1"
+HEADER_FORMAT = "<8sQQQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+
+class CorpusSnapshot:
+    """Pembaca snapshot ter-memory-map: (source_file, page) -> teks halaman."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, num_rows, offsets_pos, manifest_pos = struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            self._mm.close()
+            raise ValueError(f"Bukan snapshot korpus: {path}")
+
+        self.files = json.loads(self._mm[manifest_pos:].decode('utf-8'))["files"]
+        # Tabel offset kecil (16 byte/halaman) disalin agar mmap tetap bisa ditutup
+        self._offsets = np.frombuffer(self._mm, dtype=np.int64, count=num_rows * 2,
+                                      offset=offsets_pos).reshape(num_rows, 2).copy()
+
+        self._rows = {}  # (source_file, page) -> baris
+        for meta in self.files.values():
+            for i, page in enumerate(meta["pages"]):
+                self._rows[(meta["source_file"], page)] = meta["first_row"] + i
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def _row_bytes(self, row: int) -> bytes:
+        start, length = self._offsets[row]
+        return self._mm[start:start + length]
+
+    def get_text(self, source_file, page) -> str:
+        row = self._rows.get((source_file, page))
+        return self._row_bytes(row).decode('utf-8') if row is not None else ""
+
+    def iter_pages(self):
+        """((source_file, page), teks) untuk setiap halaman (kunci duplikat: yang terakhir menang)."""
+        for key, row in self._rows.items():
+            yield key, self._row_bytes(row).decode('utf-8')
+
+    def file_pages(self, rel_path: str):
+        """(page, bytes UTF-8) milik satu file sumber, tanpa decode (untuk kompilasi inkremental)."""
+        meta = self.files[rel_path]
+        for i, page in enumerate(meta["pages"]):
+            yield page, self._row_bytes(meta["first_row"] + i)
+
+    def close(self):
+        if not self._mm.closed:
+            self._mm.close()
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def open_snapshot(path: str):
+    """Membuka snapshot jika ada dan valid; selain itu None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return CorpusSnapshot(path)
+    except Exception as e:
+        print(f"[CorpusSnapshot] Snapshot {path} tidak valid, dibangun ulang: {e}")
+        return None
+
+
+def compile_snapshot(path: str, sources: dict, read_file):
+    """
+    Membangun (atau memperbarui) snapshot di `path`.
+    `sources`: {rel_path: mtime_ns}; `read_file(rel_path)` -> (source_file, [(page, text)]).
+    Mengembalikan (CorpusSnapshot, {"reused": n, "parsed": n, "removed": n}).
+    Jika tidak ada yang berubah, snapshot lama dibuka apa adanya tanpa menulis ulang.
+    """
+    previous = open_snapshot(path)
+    previous_files = previous.files if previous else {}
+    changed = [rel for rel, mtime_ns in sources.items()
+               if rel not in previous_files or previous_files[rel]["mtime_ns"] != mtime_ns]
+    removed = set(previous_files) - set(sources)
+    if previous is not None and not changed and not removed:
+        return previous, {"reused": len(sources), "parsed": 0, "removed": 0}
+
+    stats = {"reused": 0, "parsed": 0, "removed": len(removed)}
+    manifest = {"files": {}}
+    offsets = []
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(b"\0" * HEADER_SIZE)
+        position = HEADER_SIZE
+        for rel_path in sorted(sources):
+            mtime_ns = sources[rel_path]
+            meta = previous_files.get(rel_path)
+            if meta is not None and meta["mtime_ns"] == mtime_ns:
+                source_file, pages = meta["source_file"], previous.file_pages(rel_path)
+                stats["reused"] += 1
+            else:
+                try:
+                    source_file, pages = read_file(rel_path)
+                except Exception as e:
+                    # Dicatat tanpa halaman agar tidak di-parse ulang sampai file berubah
+                    print(f"[ERROR] Failed to load or parse {rel_path}: {e}")
+                    source_file, pages = None, []
+                pages = [(page, text.encode('utf-8')) for page, text in pages]
+                stats["parsed"] += 1
+
+            entry = {"mtime_ns": mtime_ns, "source_file": source_file, "first_row": len(offsets), "pages": []}
+            for page, data in pages:
+                f.write(data)
+                offsets.append((position, len(data)))
+                entry["pages"].append(page)
+                position += len(data)
+            manifest["files"][rel_path] = entry
+
+        padding = _align8(position) - position
+        f.write(b"\0" * padding)
+        offsets_pos = position + padding
+        f.write(np.asarray(offsets, dtype=np.int64).reshape(-1, 2).tobytes())
+        manifest_pos = offsets_pos + len(offsets) * 16
+        f.write(json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+        f.seek(0)
+        f.write(struct.pack(HEADER_FORMAT, SNAPSHOT_MAGIC, len(offsets), offsets_pos, manifest_pos))
+
+    # Ganti secara atomik; proses lain yang masih memetakan file lama tetap valid
+    os.replace(tmp_path, path)
+    if previous is not None:
+        previous.close()
+    return CorpusSnapshot(path), stats
@@ -0,0 +1,377 @@
+# embedding_cache.py
+import atexit
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: tanpa kunci antarproses, proses ini selalu menjadi penulis
+    fcntl = None
+
+# Versi format tingkat disk (v2: digest kunci per baris di file .keys; v3: log delta indeks)
+DISK_FORMAT_VERSION = 3
+# Seberapa sering proses pembaca memeriksa indeks disk yang ditulis proses penulis
+INDEX_RELOAD_SECONDS = 1.0
+
+
+def normalize_query(text: str) -> str:
+    """Kunci cache: huruf kecil, spasi dirapikan (tombol saran mengirim string yang sama persis)."""
+    return re.sub(r"\s+", " ", text or "").strip().casefold()
+
+
+class EmbeddingCache:
+    """
+    Cache embedding query per model dengan dua tingkat:
+    1. LRU di memori (maks. `max_entries` vektor).
+    2. Opsional di disk (`disk_dir`): array float32 ter-memory-map berkapasitas
+       `disk_capacity` baris + digest kunci per baris + indeks kunci, sehingga tetap
+       ada setelah restart. Jika penuh, slot tertua ditimpa (ring buffer).
+       Indeks = snapshot JSON + log delta append-only ("<kunci> <nomor put>" per baris):
+       flush hanya menambahkan baris baru ke log. Setelah log mencapai `disk_capacity`
+       baris, snapshot ditulis ulang (di luar lock, diganti atomik) dan log baru dimulai.
+       Tingkat disk dibuka per proses pada pemakaian pertama (state warisan fork dibuang).
+       Hanya satu proses per direktori yang menulis (fcntl.flock); proses lain (worker
+       gunicorn lainnya) membaca file yang sama dan memuat ulang indeksnya saat berubah.
+       Digest kunci di tiap baris diperiksa saat membaca, sehingga indeks yang basi
+       (crash, ring buffer berputar) tidak pernah mengembalikan vektor kunci lain.
+    """
+    def __init__(self, model_name: str, max_entries=10000, disk_dir=None, disk_capacity=100000, flush_every=64):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_capacity = disk_capacity
+        self.flush_every = flush_every
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # Tingkat disk (dibuka lazily per proses; dimensi baru diketahui saat vektor pertama)
+        self._disk = None
+        self._disk_keys = None  # row -> digest sha1 kunci (20 byte; nol = kosong)
+        self._disk_index = {}   # key -> row
+        self._row_keys = {}     # row -> key (untuk membuang kunci lama saat slot ditimpa)
+        self._disk_next = 0
+        self._dirty = 0
+        self._disk_pid = None
+        self._disk_writer = False
+        self._lock_file = None
+        self._index_mtime = None
+        self._index_checked = 0.0
+        self._pending = []          # (key, nomor put) yang belum ditulis ke log
+        self._log_generation = None  # log delta milik snapshot saat ini
+        self._log_offset = 0         # byte log yang sudah diterapkan
+        self._log_entries = 0
+        self._compacting = False
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+            self._vectors_path = os.path.join(disk_dir, f"{safe_name}.f32")
+            self._keys_path = os.path.join(disk_dir, f"{safe_name}.keys")
+            self._index_path = os.path.join(disk_dir, f"{safe_name}.index.json")
+            self._log_prefix = os.path.join(disk_dir, f"{safe_name}.index.")
+            self._lock_path = os.path.join(disk_dir, f"{safe_name}.lock")
+            atexit.register(self.flush)
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\x00{normalize_query(text)}".encode('utf-8')).hexdigest()
+
+    # --- Tingkat disk ---
+    def _ensure_disk_locked(self):
+        """Membuka tingkat disk untuk proses ini; setelah fork, state milik induk dibuang tanpa di-flush."""
+        if self._disk_pid == os.getpid():
+            return
+        self._disk_pid = os.getpid()
+        if self._lock_file is not None:
+            # Salinan fd milik induk: menutupnya tidak melepas kunci induk
+            self._lock_file.close()
+            self._lock_file = None
+        self._reset_disk()
+        self._disk_writer = self._claim_writer()
+        self._load_disk_index()
+
+    def _reset_disk(self):
+        self._disk, self._disk_keys, self._disk_index, self._row_keys = None, None, {}, {}
+        self._disk_next, self._dirty, self._index_mtime = 0, 0, None
+        self._pending, self._log_generation, self._log_offset, self._log_entries = [], None, 0, 0
+        self._compacting = False
+
+    def _log_path(self, generation) -> str:
+        return f"{self._log_prefix}{generation}.log"
+
+    def _claim_writer(self) -> bool:
+        """Kunci eksklusif non-blocking pada file .lock; gagal berarti proses lain sudah menjadi penulis."""
+        if fcntl is None:
+            return True
+        lock_file = open(self._lock_path, 'a+')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _load_disk_index(self):
+        paths = (self._index_path, self._vectors_path, self._keys_path)
+        if not all(os.path.exists(path) for path in paths):
+            return
+        first_load = self._disk is None
+        try:
+            mtime = os.stat(self._index_path).st_mtime_ns
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if (meta.get("version") != DISK_FORMAT_VERSION or meta.get("model_name") != self.model_name
+                    or meta.get("capacity") != self.disk_capacity):
+                if first_load:
+                    print("[EmbeddingCache] Indeks disk tidak cocok dengan versi/model/kapasitas, diabaikan.")
+                return
+            self._open_disk(meta["dim"], mode='r+' if self._disk_writer else 'r')
+            self._disk_index = meta["index"]
+            self._row_keys = {row: key for key, row in self._disk_index.items()}
+            self._disk_next = meta["next"]
+            self._index_mtime = mtime
+            self._log_generation, self._log_offset, self._log_entries = meta["log_generation"], 0, 0
+            self._replay_log()
+            if first_load:
+                role = "penulis" if self._disk_writer else "pembaca"
+                print(f"[EmbeddingCache] {len(self._disk_index)} embedding dimuat dari {self.disk_dir} ({role}).")
+        except Exception as e:
+            print(f"[EmbeddingCache] Gagal memuat cache disk: {e}")
+            self._reset_disk()
+
+    def _replay_log(self):
+        """Menerapkan baris log delta yang belum dibaca (hanya baris lengkap; sisa terpotong menunggu)."""
+        try:
+            with open(self._log_path(self._log_generation), 'rb') as f:
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.decode('ascii').splitlines():
+            key, number = line.split()
+            self._apply_put(key, int(number))
+        self._log_offset += len(complete)
+        self._log_entries += complete.count(b"\n")
+        if self._disk_writer and len(complete) < len(data):
+            # Penulis sebelumnya crash di tengah baris: buang sisanya sebelum log ditambah lagi
+            with open(self._log_path(self._log_generation), 'r+b') as f:
+                f.truncate(self._log_offset)
+
+    def _apply_put(self, key, number: int):
+        row = number % self.disk_capacity
+        stale_key = self._row_keys.get(row)
+        if stale_key is not None:
+            self._disk_index.pop(stale_key, None)
+        self._disk_index[key] = row
+        self._row_keys[row] = key
+        self._disk_next = max(self._disk_next, number + 1)
+
+    def _refresh_index_locked(self):
+        """Pembaca: membaca log delta baru (paling sering sekali per INDEX_RELOAD_SECONDS), atau
+        memuat ulang snapshot jika penulis sudah menggantinya."""
+        now = time.monotonic()
+        if now - self._index_checked < INDEX_RELOAD_SECONDS:
+            return
+        self._index_checked = now
+        try:
+            mtime = os.stat(self._index_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._index_mtime:
+            self._load_disk_index()
+        elif self._disk is not None:
+            self._replay_log()
+
+    def _open_disk(self, dim: int, mode='r+'):
+        self._disk = np.memmap(self._vectors_path, dtype=np.float32, mode=mode, shape=(self.disk_capacity, dim))
+        self._disk_keys = np.memmap(self._keys_path, dtype=np.uint8, mode=mode, shape=(self.disk_capacity, 20))
+
+    def _create_disk(self, dim: int):
+        """File baru dibuat di path sementara lalu di-rename: pembaca yang masih me-map file lama tidak terpotong."""
+        for path, shape, dtype in ((self._vectors_path, (self.disk_capacity, dim), np.float32),
+                                   (self._keys_path, (self.disk_capacity, 20), np.uint8)):
+            tmp_path = path + ".tmp"
+            np.memmap(tmp_path, dtype=dtype, mode='w+', shape=shape).flush()
+            os.replace(tmp_path, path)
+        self._reset_disk()
+        self._open_disk(dim)
+
+    def _disk_get(self, key):
+        if not self._disk_writer:
+            self._refresh_index_locked()
+        row = self._disk_index.get(key)
+        if row is None or self._disk is None:
+            return None
+        digest = bytes.fromhex(key)
+        if self._disk_keys[row].tobytes() != digest:
+            return None
+        vector = np.array(self._disk[row])
+        # Penulis bisa menimpa baris ini saat disalin: digest diperiksa lagi sesudahnya
+        if self._disk_keys[row].tobytes() != digest:
+            return None
+        return vector
+
+    def _disk_put(self, key, vector):
+        """Menulis vektor ke slot berikutnya; mengembalikan snapshot yang perlu ditulis (lihat _flush_locked)."""
+        if not self._disk_writer:
+            return None
+        if self._disk is None:
+            self._create_disk(vector.shape[-1])
+        number = self._disk_next
+        row = number % self.disk_capacity
+        self._disk_keys[row] = 0
+        self._disk[row] = vector
+        self._disk_keys[row] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+        # Slot yang ditimpa: _apply_put menghapus kunci lama yang menunjuk ke baris ini
+        self._apply_put(key, number)
+        self._pending.append((key, number))
+        self._dirty += 1
+        if self._dirty >= self.flush_every:
+            return self._flush_locked()
+        return None
+
+    def _flush_locked(self):
+        """
+        Menambahkan put yang tertunda ke log delta. Jika log sudah sepanjang `disk_capacity`
+        baris, log baru dimulai dan snapshot indeks dikembalikan untuk ditulis oleh
+        _write_snapshot di luar lock (None jika tidak perlu).
+        """
+        if not self._disk_writer or self._disk is None or not self._dirty:
+            return None
+        self._disk.flush()
+        self._disk_keys.flush()
+        # Tanpa snapshot (file baru) belum ada log: put tertunda ikut snapshot pertama
+        if self._pending and self._log_generation is not None:
+            lines = "".join(f"{key} {number}\n" for key, number in self._pending)
+            with open(self._log_path(self._log_generation), 'a', encoding='ascii') as f:
+                f.write(lines)
+            self._log_entries += len(self._pending)
+        self._pending = []
+        self._dirty = 0
+        if self._compacting or (self._log_generation is not None and self._log_entries < self.disk_capacity):
+            return None
+        # Semua put sampai di sini ada di snapshot; put berikutnya masuk ke log generasi baru
+        self._compacting = True
+        self._log_generation, self._log_offset, self._log_entries = time.time_ns(), 0, 0
+        return {"version": DISK_FORMAT_VERSION, "model_name": self.model_name, "capacity": self.disk_capacity,
+                "dim": int(self._disk.shape[1]), "next": self._disk_next, "log_generation": self._log_generation,
+                "index": dict(self._disk_index)}
+
+    def _write_snapshot(self, meta):
+        """Menulis snapshot indeks tanpa memegang lock, lalu menggantinya secara atomik dan membuang log lama."""
+        if meta is None:
+            return
+        try:
+            tmp_path = self._index_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, self._index_path)
+            for path in glob.glob(glob.escape(self._log_prefix) + "*.log"):
+                if path != self._log_path(meta["log_generation"]):
+                    os.remove(path)
+        except OSError as e:
+            print(f"[EmbeddingCache] Gagal menulis indeks disk: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def flush(self):
+        """Menulis vektor dan indeks ke disk (dipanggil juga setiap `flush_every` penambahan)."""
+        if not self.disk_dir: return
+        snapshot = None
+        with self._lock:
+            # Proses anak hasil fork tidak boleh mem-flush state milik induknya
+            if self._disk_pid == os.getpid():
+                snapshot = self._flush_locked()
+        self._write_snapshot(snapshot)
+
+    # --- API publik ---
+    def get(self, text: str):
+        key = self._key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+            if self.disk_dir:
+                self._ensure_disk_locked()
+                vector = self._disk_get(key)
+                if vector is not None:
+                    self.disk_hits += 1
+                    self._memory_put(key, vector)
+                    return vector
+            self.misses += 1
+            return None
+
+    def put(self, text: str, vector):
+        key = self._key(text)
+        vector = np.asarray(vector, dtype=np.float32)
+        snapshot = None
+        with self._lock:
+            self._memory_put(key, vector)
+            if self.disk_dir:
+                self._ensure_disk_locked()
+                snapshot = self._disk_put(key, vector)
+        self._write_snapshot(snapshot)
+
+    def _memory_put(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "model_name": self.model_name,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._disk_index),
+                "disk_role": (("writer" if self._disk_writer else "reader")
+                              if self.disk_dir and self._disk_pid == os.getpid() else None),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class CachedEmbeddingModel:
+    """
+    Pembungkus model embedding: teks yang sudah ada di EmbeddingCache tidak di-encode
+    ulang; sisanya di-encode dalam satu panggilan. Atribut lain diteruskan ke model asli.
+    """
+    def __init__(self, model, cache: EmbeddingCache):
+        self.model = model
+        self.cache = cache
+
+    def encode(self, sentences, **kwargs):
+        single = isinstance(sentences, str)
+        batch = [sentences] if single else list(sentences)
+        if kwargs or not batch:
+            return self.model.encode(sentences, **kwargs)
+
+        vectors = [self.cache.get(text) for text in batch]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.model.encode([batch[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                vector = np.asarray(vector, dtype=np.float32)
+                self.cache.put(batch[i], vector)
+                vectors[i] = vector
+        return vectors[0] if single else np.stack(vectors)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
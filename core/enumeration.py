@@ -0,0 +1,84 @@
+# enumeration.py
+"""
+Pembantu jalur ENUMERATION (pertanyaan "sebutkan semua ..."):
+retrieval lebar bertahap per halaman hasil Zilliz. Pemecahan konteks untuk
+agregasi map-reduce ada di core/context_packer.py (per token).
+"""
+
+
+def page_key(hit: dict):
+    """Kunci unik sebuah hit untuk deduplikasi: (source_file, page)."""
+    meta = hit.get('metadata') or {}
+    return meta.get('source_file'), meta.get('page')
+
+
+class UniqueHitCollector:
+    """
+    Status pengambilan bertahap untuk collect_unique_hits: menyimpan hanya hit dengan
+    (source_file, page) yang belum terlihat, dan memutuskan kapan berhenti. Dipisah
+    dari pemanggilan pencarian agar bisa dipakai oleh loop sinkron maupun async.
+    """
+    def __init__(self, page_size: int, max_results: int, min_new_ratio: float = 0.2):
+        self.page_size = page_size
+        self.max_results = max_results
+        self.min_new_ratio = min_new_ratio
+        self.unique_hits = []
+        self.pages = 0
+        self._seen = set()
+        self._offset = 0
+        self._done = False
+
+    def next_request(self):
+        """(offset, limit) untuk halaman berikutnya, atau None jika pengambilan selesai."""
+        if self._done or self._offset >= self.max_results:
+            return None
+        return self._offset, min(self.page_size, self.max_results - self._offset)
+
+    def add_page(self, page: list, limit: int):
+        page = page or []
+        self.pages += 1
+        new_hits = 0
+        for hit in page:
+            source_file, page_num = page_key(hit)
+            if not hit.get('text') or not source_file:
+                continue
+            if (source_file, page_num) in self._seen:
+                continue
+            self._seen.add((source_file, page_num))
+            self.unique_hits.append(hit)
+            new_hits += 1
+
+        self._offset += len(page)
+        if len(page) < limit:
+            self._done = True  # hasil sudah habis
+        elif new_hits < max(1, self.min_new_ratio * limit):
+            self._done = True  # halaman baru tidak lagi menambah entitas unik
+
+
+def collect_unique_hits(search_page, page_size: int, max_results: int, min_new_ratio: float = 0.2):
+    """
+    Mengambil hasil per halaman lewat `search_page(offset, limit)` dan menyimpan
+    hanya hit dengan (source_file, page) yang belum terlihat. Berhenti lebih awal
+    jika sebuah halaman menambah kurang dari `min_new_ratio` hit unik (hasil mulai
+    berulang), jika hasil habis, atau jika `max_results` kandidat sudah diperiksa.
+    Mengembalikan (hit_unik, jumlah_halaman_yang_diambil).
+    """
+    collector = UniqueHitCollector(page_size, max_results, min_new_ratio)
+    request = collector.next_request()
+    while request is not None:
+        offset, limit = request
+        collector.add_page(search_page(offset, limit), limit)
+        request = collector.next_request()
+    return collector.unique_hits, collector.pages
+
+
+async def collect_unique_hits_async(search_page, page_size: int, max_results: int, min_new_ratio: float = 0.2):
+    """Sama dengan collect_unique_hits, untuk `search_page` berupa coroutine function."""
+    collector = UniqueHitCollector(page_size, max_results, min_new_ratio)
+    request = collector.next_request()
+    while request is not None:
+        offset, limit = request
+        collector.add_page(await search_page(offset, limit), limit)
+        request = collector.next_request()
+    return collector.unique_hits, collector.pages
+
@@ -0,0 +1,110 @@
+# image_index.py
+import os
+import re
+import threading
+import time
+
+# Pola nama gambar halaman, urut prioritas (sama dengan urutan tebakan lama di _format_sources_for_api)
+IMAGE_PATTERNS = [
+    re.compile(r"^p(?P<page>[^_/]+)_full\.png$"),
+    re.compile(r"^page_(?P<page>[^/]+)\.png$"),
+    re.compile(r"^(?P<page>[^/_]+)\.png$"),
+    re.compile(r"^p(?P<page>[^_/]+)_img_0\.png$"),
+]
+
+
+class SourceImageIndex:
+    """
+    Indeks (nama_dokumen, halaman) -> path gambar relatif terhadap direktori output,
+    mis. ('Manual_Akuntansi', '13') -> 'Manual_Akuntansi/images/p13_full.png'.
+    Dibangun sekali dari pemindaian direktori, lalu diperbarui oleh pemindaian ulang
+    berkala di thread latar. Pemindaian ulang hanya membaca isi folder images/ yang
+    mtime-nya berubah, sehingga resolusi URL per request cukup satu lookup dict.
+    """
+    def __init__(self, base_output_dir: str, refresh_seconds: float = 300):
+        self.base_output_dir = base_output_dir
+        self.refresh_seconds = refresh_seconds
+        self._images = {}        # (folder, str(page)) -> path relatif
+        self._folders = {}       # folder -> (mtime_ns images/, {str(page): path relatif})
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_scan_seconds = 0.0
+        self.rebuild()
+
+    def rebuild(self) -> int:
+        """Memindai ulang direktori output; mengembalikan jumlah folder images/ yang dibaca ulang."""
+        start = time.perf_counter()
+        folders = {}
+        rescanned = 0
+        try:
+            entries = list(os.scandir(self.base_output_dir))
+        except OSError:
+            entries = []
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            images_dir = os.path.join(entry.path, "images")
+            try:
+                mtime_ns = os.stat(images_dir).st_mtime_ns
+            except OSError:
+                continue
+            previous = self._folders.get(entry.name)
+            if previous is not None and previous[0] == mtime_ns:
+                folders[entry.name] = previous
+                continue
+            folders[entry.name] = (mtime_ns, self._scan_images(entry.name, images_dir))
+            rescanned += 1
+
+        images = {}
+        for folder, (_, pages) in folders.items():
+            for page, path in pages.items():
+                images[(folder, page)] = path
+        with self._lock:
+            self._folders = folders
+            self._images = images
+        self.last_scan_seconds = time.perf_counter() - start
+        return rescanned
+
+    @staticmethod
+    def _scan_images(folder: str, images_dir: str) -> dict:
+        best = {}  # str(page) -> (prioritas, nama file)
+        try:
+            names = [entry.name for entry in os.scandir(images_dir) if entry.is_file()]
+        except OSError:
+            return {}
+        for name in names:
+            for priority, pattern in enumerate(IMAGE_PATTERNS):
+                match = pattern.match(name)
+                if match:
+                    page = match.group("page")
+                    if page not in best or priority < best[page][0]:
+                        best[page] = (priority, name)
+                    break
+        return {page: f"{folder}/images/{name}" for page, (_, name) in best.items()}
+
+    def lookup(self, source_file: str, page) -> str:
+        """Path gambar relatif untuk halaman sebuah dokumen, atau None."""
+        folder = os.path.splitext(source_file)[0]
+        return self._images.get((folder, str(page)))
+
+    def start_auto_refresh(self):
+        """Menjalankan pemindaian ulang berkala (setiap `refresh_seconds`) di thread daemon."""
+        if self.refresh_seconds <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name="image-index-refresh", daemon=True)
+        self._thread.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_seconds):
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"[ImageIndex] Gagal memindai ulang {self.base_output_dir}: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {"documents": len(self._folders), "images": len(self._images),
+                "last_scan_ms": round(self.last_scan_seconds * 1000, 2)}
@@ -0,0 +1,264 @@
+# image_serving.py
+"""
+Pembantu endpoint /source_image: ETag kuat berbasis isi file (di-cache per
+(path, mtime, size)) dan thumbnail yang dibuat sekali lalu disimpan di disk dengan
+batas ukuran total (file yang paling lama tidak dipakai dibuang lebih dulu).
+Pillow bersifat opsional; tanpa Pillow, thumbnail tidak dibuat dan gambar asli dikirim.
+"""
+import hashlib
+import os
+from email.utils import formatdate, parsedate_to_datetime
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: kunci direktori hanya antarthread di proses ini
+    fcntl = None
+
+# Gambar halaman jarang berubah: browser boleh memakai cache, lalu revalidasi via ETag (304)
+IMAGE_MAX_AGE_SECONDS = int(os.environ.get("IMAGE_MAX_AGE_SECONDS", 86400))
+THUMBNAIL_CACHE_DIR = os.environ.get("THUMBNAIL_CACHE_DIR", ".thumbnail_cache")
+THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get("THUMBNAIL_CACHE_MAX_MB", 512)) * 1024 * 1024
+THUMBNAIL_DEFAULT_WIDTH = 320
+
+
+def is_not_modified(if_none_match: str, if_modified_since: str, etag: str, last_modified: float) -> bool:
+    """Evaluasi header kondisional (If-None-Match didahulukan, sesuai RFC 9110)."""
+    if if_none_match:
+        candidates = [tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+class FileETagCache:
+    """ETag kuat = hash SHA-1 isi file; dihitung ulang hanya jika mtime/ukuran berubah."""
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._etags = OrderedDict()  # path -> (mtime_ns, size, etag)
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat: os.stat_result) -> str:
+        with self._lock:
+            cached = self._etags.get(path)
+            if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._etags.move_to_end(path)
+                return cached[2]
+
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        etag = digest.hexdigest()[:32]
+
+        with self._lock:
+            self._etags[path] = (stat.st_mtime_ns, stat.st_size, etag)
+            self._etags.move_to_end(path)
+            while len(self._etags) > self.max_entries:
+                self._etags.popitem(last=False)
+        return etag
+
+
+class ThumbnailCache:
+    """
+    Thumbnail JPEG per (ETag sumber, lebar) di `cache_dir`. Lebar yang diminta dibulatkan
+    ke salah satu `widths` agar jumlah varian terbatas. Sumber kebenarannya adalah isi
+    direktori, sehingga worker gunicorn yang berbagi `cache_dir` memakai thumbnail yang dibuat
+    worker lain dan `max_bytes` berlaku untuk total di disk (bukan per worker): setelah
+    thumbnail baru dibuat, direktori dipindai di bawah kunci fcntl.flock dan file dengan
+    mtime tertua (dipakai paling lama) dihapus. Counter hits/generated/evicted per proses.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int, widths=(160, 320, 640), quality=80):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.widths = sorted(widths)
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._disk_entries = 0
+        self._disk_bytes = 0
+        self.hits = 0
+        self.generated = 0
+        self.evicted = 0
+        if Image is None:
+            print("[ThumbnailCache] Pillow tidak terinstall; thumbnail nonaktif, gambar asli yang dikirim.")
+            return
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock_path = os.path.join(self.cache_dir, ".lock")
+        with self._dir_lock():
+            self._scan()
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None
+
+    @contextmanager
+    def _dir_lock(self):
+        """Kunci antarproses (dan antarthread: tiap pemanggilan membuka fd sendiri) untuk pemindaian + eviction."""
+        with open(self._lock_path, 'a+') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                self._lock.acquire()
+            try:
+                yield
+            finally:
+                if fcntl is None:
+                    self._lock.release()
+
+    def _scan(self) -> list:
+        """[(mtime, nama, ukuran)] thumbnail di disk, terlama dulu; memperbarui total untuk stats()."""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".jpg"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # dihapus proses lain saat dipindai
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        files.sort()
+        self._disk_entries, self._disk_bytes = len(files), sum(size for _, _, size in files)
+        return files
+
+    def snap_width(self, width: int) -> int:
+        """Lebar terkecil yang diizinkan >= permintaan (atau yang terbesar)."""
+        for allowed in self.widths:
+            if width <= allowed:
+                return allowed
+        return self.widths[-1]
+
+    def get(self, source_path: str, source_etag: str, width: int):
+        """
+        Mengembalikan (path_thumbnail, lebar) atau None jika thumbnail tidak tersedia
+        (Pillow tidak ada, gambar sudah lebih kecil dari lebar, atau gagal dibuat).
+        """
+        if not self.enabled:
+            return None
+        width = self.snap_width(width)
+        name = f"{source_etag}_w{width}.jpg"
+        path = os.path.join(self.cache_dir, name)
+
+        if self._touch(path):
+            return path, width
+        with self._lock:
+            key_lock = self._key_locks.setdefault(name, threading.Lock())
+        # Satu pembuat per thumbnail di proses ini; request lain untuk thumbnail yang sama menunggu hasilnya
+        with key_lock:
+            try:
+                if self._touch(path):
+                    return path, width
+                if not self._generate(source_path, path, width):
+                    return None
+                self._evict(keep=name)
+                return path, width
+            finally:
+                with self._lock:
+                    self._key_locks.pop(name, None)
+
+    def _touch(self, path) -> bool:
+        """Thumbnail sudah ada di disk (dibuat proses mana pun): mtime diperbarui sebagai urutan LRU."""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def _generate(self, source_path, path, width) -> bool:
+        try:
+            with Image.open(source_path) as image:
+                if image.width <= width:
+                    return False
+                height = max(1, round(image.height * width / image.width))
+                thumbnail = image.convert("RGB").resize((width, height), Image.LANCZOS)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            thumbnail.save(tmp_path, "JPEG", quality=self.quality, optimize=True)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[ThumbnailCache] Gagal membuat thumbnail {source_path}: {e}")
+            return False
+        with self._lock:
+            self.generated += 1
+        return True
+
+    def _evict(self, keep):
+        """Menghapus thumbnail terlama sampai total di disk (semua proses) <= max_bytes."""
+        with self._dir_lock():
+            files = self._scan()
+            total, evicted = self._disk_bytes, 0
+            for _, name, size in files:
+                if total <= self.max_bytes:
+                    break
+                if name == keep:
+                    continue
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+            self._disk_entries -= evicted
+            self._disk_bytes = total
+        with self._lock:
+            self.evicted += evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "entries": self._disk_entries, "bytes": self._disk_bytes,
+                    "max_bytes": self.max_bytes, "hits": self.hits, "generated": self.generated,
+                    "evicted": self.evicted}
+
+
+class SourceImageResolver:
+    """
+    Logika /source_image yang tidak bergantung pada framework (dipakai Flask dan ASGI):
+    path aman di bawah direktori output, ETag, dan thumbnail opsional.
+    """
+    def __init__(self, base_output_dir: str, etags: FileETagCache = None, thumbnails: ThumbnailCache = None):
+        self.base_output_dir = os.path.abspath(base_output_dir)
+        self.etags = etags or FileETagCache()
+        self.thumbnails = thumbnails or ThumbnailCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES)
+
+    @staticmethod
+    def requested_width(width, thumb) -> int:
+        """Lebar thumbnail dari query string (?w=... atau ?thumb=1); 0 = gambar asli."""
+        try:
+            width = int(width) if width else 0
+        except ValueError:
+            width = 0
+        if not width and thumb:
+            width = THUMBNAIL_DEFAULT_WIDTH
+        return max(0, width)
+
+    def resolve(self, filename: str, width: int = 0):
+        """Mengembalikan (path_absolut, etag, mtime_sumber) atau None jika tidak ada / tidak aman."""
+        path = os.path.realpath(os.path.join(self.base_output_dir, filename))
+        # Tolak '..' / path absolut yang keluar dari direktori output
+        if os.path.commonpath([path, os.path.realpath(self.base_output_dir)]) != os.path.realpath(self.base_output_dir):
+            return None
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        etag = self.etags.get(path, stat)
+        if width:
+            thumbnail = self.thumbnails.get(path, etag, width)
+            if thumbnail:
+                path, snapped_width = thumbnail
+                etag = f"{etag}-w{snapped_width}"
+        return path, etag, stat.st_mtime
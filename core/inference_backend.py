@@ -0,0 +1,269 @@
+# inference_backend.py
+"""
+Backend inferensi CPU untuk model embedding (SentenceTransformer) dan reranker (CrossEncoder):
+- "torch": PyTorch fp32 (perilaku lama).
+- "onnx":  ONNX Runtime atas model yang diekspor sekali ke `export_dir`.
+- "int8":  ONNX Runtime dengan bobot int8 (kuantisasi dinamis dari ekspor yang sama).
+Ekspor di-cache di disk per model; start berikutnya tidak memuat bobot PyTorch sama sekali.
+onnxruntime/onnx bersifat opsional; tanpa itu (atau jika ekspor gagal) dipakai "torch".
+"""
+import inspect
+import json
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+BACKENDS = ("torch", "onnx", "int8")
+MODEL_FILE = "model.onnx"
+INT8_MODEL_FILE = "model_int8.onnx"
+CONFIG_FILE = "export_config.json"
+ONNX_OPSET = 14
+
+
+def backend_model_name(model_name: str, backend: str) -> str:
+    """Nama model untuk kunci cache (skor/embedding berbeda antar backend, terutama int8)."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def resolve_backend(backend: str) -> str:
+    backend = (backend or "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"INFERENCE_BACKEND tidak dikenal: {backend!r} (pilihan: {', '.join(BACKENDS)})")
+    if backend != "torch" and ort is None:
+        print(f"[InferenceBackend] onnxruntime tidak terinstall; backend '{backend}' diganti 'torch'.")
+        return "torch"
+    return backend
+
+
+def load_embedding_model(model_name: str, backend: str, export_dir: str, threads: int = 0):
+    """Mengembalikan (model dengan .encode(), backend yang benar-benar dipakai)."""
+    return _load(model_name, backend, export_dir, threads, "embedding")
+
+
+def load_reranker_model(model_name: str, backend: str, export_dir: str, threads: int = 0):
+    """Mengembalikan (model dengan .predict(), backend yang benar-benar dipakai)."""
+    return _load(model_name, backend, export_dir, threads, "reranker")
+
+
+def _load(model_name, backend, export_dir, threads, kind):
+    backend = resolve_backend(backend)
+    if backend != "torch":
+        try:
+            path = ensure_export(model_name, kind, export_dir, quantized=backend == "int8")
+            model_cls = OnnxEmbeddingModel if kind == "embedding" else OnnxCrossEncoder
+            return model_cls(path, quantized=backend == "int8", threads=threads), backend
+        except Exception as e:
+            print(f"[InferenceBackend] Backend '{backend}' gagal untuk {model_name}: {e}; memakai 'torch'.")
+    from sentence_transformers import SentenceTransformer, CrossEncoder
+    model = SentenceTransformer(model_name) if kind == "embedding" else CrossEncoder(model_name)
+    return model, "torch"
+
+
+# --- Ekspor (sekali per model, di-cache di disk) ---
+def export_path(export_dir: str, model_name: str) -> str:
+    return os.path.join(export_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+
+
+def ensure_export(model_name: str, kind: str, export_dir: str, quantized: bool = False) -> str:
+    """Mengekspor model ke ONNX (dan varian int8) jika belum ada; mengembalikan direktori ekspor."""
+    path = export_path(export_dir, model_name)
+    if not os.path.exists(os.path.join(path, CONFIG_FILE)):
+        print(f"[InferenceBackend] Mengekspor {model_name} ke ONNX ({path})...")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        try:
+            if kind == "embedding":
+                _export_embedding(model_name, tmp_path)
+            else:
+                _export_reranker(model_name, tmp_path)
+            if os.path.exists(os.path.join(path, CONFIG_FILE)):
+                # Proses lain selesai mengekspor lebih dulu
+                shutil.rmtree(tmp_path)
+            else:
+                shutil.rmtree(path, ignore_errors=True)
+                os.replace(tmp_path, path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+    if quantized and not os.path.exists(os.path.join(path, INT8_MODEL_FILE)):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        print(f"[InferenceBackend] Kuantisasi int8 {model_name}...")
+        tmp_file = os.path.join(path, f"{INT8_MODEL_FILE}.{os.getpid()}.tmp")
+        quantize_dynamic(os.path.join(path, MODEL_FILE), tmp_file, weight_type=QuantType.QInt8)
+        os.replace(tmp_file, os.path.join(path, INT8_MODEL_FILE))
+    return path
+
+
+def _export_transformer(model, tokenizer, path, max_length, output_name, sample_texts):
+    import torch
+
+    sample = tokenizer(*sample_texts, padding=True, truncation=True, max_length=max_length, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    class _Wrapper(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *inputs):
+            return self.inner(**dict(zip(input_names, inputs)))[0]
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes[output_name] = {0: "batch"}
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # Exporter TorchScript: tidak butuh onnxscript dan mendukung dynamic_axes
+        export_kwargs["dynamo"] = False
+    model.eval()
+    with torch.no_grad():
+        torch.onnx.export(_Wrapper(model), tuple(sample[name] for name in input_names),
+                          os.path.join(path, MODEL_FILE), input_names=input_names, output_names=[output_name],
+                          dynamic_axes=dynamic_axes, opset_version=ONNX_OPSET, **export_kwargs)
+    tokenizer.save_pretrained(path)
+
+
+def _export_embedding(model_name, path):
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Transformer, Pooling, Normalize
+
+    model = SentenceTransformer(model_name, device="cpu")
+    modules = list(model)
+    if len(modules) < 2 or not isinstance(modules[0], Transformer) or not isinstance(modules[1], Pooling):
+        raise ValueError("hanya pipeline Transformer + Pooling yang didukung")
+    pooling = modules[1]
+    if pooling.pooling_mode_mean_tokens:
+        pooling_mode = "mean"
+    elif pooling.pooling_mode_cls_token:
+        pooling_mode = "cls"
+    else:
+        raise ValueError("mode pooling tidak didukung")
+    if any(not isinstance(module, Normalize) for module in modules[2:]):
+        raise ValueError("modul setelah pooling tidak didukung")
+
+    transformer = modules[0]
+    _export_transformer(transformer.auto_model, transformer.tokenizer, path, transformer.max_seq_length,
+                        "token_embeddings", (["contoh kalimat", "contoh kalimat kedua yang lebih panjang"],))
+    _write_config(path, {"kind": "embedding", "max_length": transformer.max_seq_length, "pooling": pooling_mode,
+                         "normalize": len(modules) > 2, "dimension": model.get_sentence_embedding_dimension()})
+
+
+def _export_reranker(model_name, path):
+    from sentence_transformers import CrossEncoder
+
+    model = CrossEncoder(model_name, device="cpu")
+    # Tokenizer tanpa batas eksplisit melaporkan model_max_length raksasa; batasi ke posisi model
+    max_length = model.max_length or min(model.tokenizer.model_max_length, model.config.max_position_embeddings)
+    _export_transformer(model.model, model.tokenizer, path, max_length, "logits",
+                        (["contoh query", "query kedua"], ["contoh passage", "passage kedua yang lebih panjang"]))
+    # Sama dengan CrossEncoder.predict: sigmoid untuk satu label, tanpa aktivasi untuk lebih
+    activation = "sigmoid" if model.config.num_labels == 1 else "identity"
+    _write_config(path, {"kind": "reranker", "max_length": max_length, "num_labels": model.config.num_labels,
+                         "activation": activation})
+
+
+def _write_config(path, config):
+    with open(os.path.join(path, CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+
+
+# --- Model ONNX Runtime ---
+class _OnnxModel:
+    """
+    Tokenizer + sesi ONNX Runtime. Sesi dibuat saat pertama dipakai (bukan saat dimuat):
+    thread pool ORT tidak selamat melewati fork, jadi di bawah gunicorn preload tiap worker
+    membuat sesinya sendiri dari file yang sudah diekspor master.
+    """
+    def __init__(self, path: str, quantized: bool = False, threads: int = 0):
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(path, CONFIG_FILE), 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+        self.model_file = os.path.join(path, INT8_MODEL_FILE if quantized else MODEL_FILE)
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.max_length = self.config["max_length"]
+        self.threads = threads
+        self._session = None
+        self._input_names = None
+        self._session_lock = threading.Lock()
+        # Tokenizer "fast" HF tidak aman dipanggil bersamaan dari beberapa thread ("Already borrowed")
+        self._tokenizer_lock = threading.Lock()
+
+    def _get_session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    options = ort.SessionOptions()
+                    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                    if self.threads:
+                        options.intra_op_num_threads = self.threads
+                    session = ort.InferenceSession(self.model_file, options, providers=["CPUExecutionProvider"])
+                    self._input_names = [i.name for i in session.get_inputs()]
+                    self._session = session
+        return self._session
+
+    def _tokenize(self, *texts, **kwargs):
+        with self._tokenizer_lock:
+            return self.tokenizer(*texts, padding=True, max_length=self.max_length, return_tensors="np", **kwargs)
+
+    def _run(self, features):
+        session = self._get_session()
+        inputs = {name: features[name].astype(np.int64) for name in self._input_names}
+        return session.run(None, inputs)[0]
+
+    @staticmethod
+    def _length_order(lengths):
+        # Urut panjang (seperti SentenceTransformer.encode) agar padding per batch minimal
+        return np.argsort([-length for length in lengths], kind="stable")
+
+
+class OnnxEmbeddingModel(_OnnxModel):
+    """Pengganti SentenceTransformer.encode (pooling dan normalisasi sama dengan pipeline asli)."""
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dimension"]
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(texts), self.config["dimension"]), dtype=np.float32)
+        order = self._length_order([len(text) for text in texts])
+        for start in range(0, len(texts), batch_size):
+            index = order[start:start + batch_size]
+            features = self._tokenize([texts[i] for i in index], truncation=True)
+            token_embeddings = self._run(features)
+            embeddings[index] = self._pool(token_embeddings, features["attention_mask"])
+        if self.config["normalize"] or normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+    def _pool(self, token_embeddings, attention_mask):
+        if self.config["pooling"] == "cls":
+            return token_embeddings[:, 0]
+        mask = attention_mask[..., None].astype(np.float32)
+        return (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+class OnnxCrossEncoder(_OnnxModel):
+    """Pengganti CrossEncoder.predict untuk pasangan (query, passage)."""
+    def predict(self, pairs, batch_size: int = 32, **kwargs):
+        pairs = list(pairs)
+        num_labels = self.config["num_labels"]
+        scores = np.zeros((len(pairs), num_labels), dtype=np.float32)
+        order = self._length_order([len(query) + len(passage) for query, passage in pairs])
+        for start in range(0, len(pairs), batch_size):
+            index = order[start:start + batch_size]
+            features = self._tokenize([pairs[i][0] for i in index], [pairs[i][1] for i in index],
+                                      truncation="longest_first")
+            scores[index] = self._run(features)
+        if self.config["activation"] == "sigmoid":
+            scores = 1.0 / (1.0 + np.exp(-scores))
+        return scores[:, 0] if num_labels == 1 else scores
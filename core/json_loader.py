@@ -2,14 +2,24 @@ import os
 import json
 import glob
 
+from core.corpus_snapshot import compile_snapshot
+from core.keyword_index import BM25Index
+
+SNAPSHOT_FILENAME = ".corpus_snapshot.bin"
+
 class JSONCorpusLoader:
     """
     Memuat data dari file-file JSON di direktori output.
-    Data ini digunakan terutama untuk keyword search.
+    Data ini digunakan terutama untuk keyword search: teks per halaman dikompilasi ke
+    snapshot biner ter-memory-map (lihat core/corpus_snapshot.py) dan diindeks ke
+    BM25Index (self.index), yang juga melayani get_page_text.
+    Hanya file JSON yang mtime-nya berubah sejak snapshot terakhir yang di-parse ulang.
     """
-    def __init__(self, base_output_dir):
+    def __init__(self, base_output_dir, snapshot_path=None):
         self.base_output_dir = base_output_dir
-        self.corpus = {}  # Akan menyimpan data dengan format: {(filename, page): [data_list]}
+        self.snapshot_path = snapshot_path or os.path.join(base_output_dir, SNAPSHOT_FILENAME)
+        self.snapshot = None
+        self.index = BM25Index()
 
         if not os.path.exists(self.base_output_dir):
             print(f"[WARNING] JSONCorpusLoader: Directory {self.base_output_dir} not found. Keyword search will be disabled.")
@@ -17,58 +27,52 @@ class JSONCorpusLoader:
 
         print(f"[JSONCorpusLoader] Loading corpus from {self.base_output_dir}...")
         self._load_corpus()
-        print(f"[JSONCorpusLoader] Finished loading. Total pages loaded: {len(self.corpus)}")
+        self.index = BM25Index.from_pages(self.snapshot.iter_pages(), text_store=self.snapshot.get_text)
+        print(f"[JSONCorpusLoader] Finished loading. Total pages loaded: {len(self.snapshot)}")
 
     def _load_corpus(self):
         # Cari semua file dengan pola nama 'folder_namafile/namafile_o_dt.json'
         search_pattern = os.path.join(self.base_output_dir, '*', '*_o_dt.json')
-        json_files = glob.glob(search_pattern)
-
-        for json_path in json_files:
+        sources = {}
+        for json_path in glob.glob(search_pattern):
             try:
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                sources[os.path.relpath(json_path, self.base_output_dir)] = os.stat(json_path).st_mtime_ns
+            except OSError as e:
+                print(f"[ERROR] Failed to stat {json_path}: {e}")
+
+        self.snapshot, stats = compile_snapshot(self.snapshot_path, sources, self._read_json_pages)
+        print(f"[JSONCorpusLoader] Snapshot {self.snapshot_path}: {stats['parsed']} file di-parse, "
+              f"{stats['reused']} dipakai ulang, {stats['removed']} dihapus.")
 
-                # Ekstrak nama folder dan nama file dari path
-                full_path_parts = json_path.split(os.sep)
-                folder_name = full_path_parts[-2] # e.g., 'nama_dokumen'
-                file_name = os.path.basename(json_path).replace('_o_dt.json', '') # e.g., 'nama_dokumen'
-                
-                # Asumsikan file JSON memiliki struktur dengan 'ocr_details'
-                ocr_details = data.get('ocr_details', [])
-                if not ocr_details:
-                    continue
+    def _read_json_pages(self, rel_path):
+        """Mem-parse satu file *_o_dt.json menjadi (source_file, [(page, teks_halaman)])."""
+        json_path = os.path.join(self.base_output_dir, rel_path)
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
 
-                # Kelompokkan data berdasarkan nomor halaman
-                pages_data = {}
-                for item in ocr_details:
-                    page_num = item.get('page')
-                    if page_num is not None:
-                        if page_num not in pages_data:
-                            pages_data[page_num] = []
-                        pages_data[page_num].append(item)
-                
-                # Simpan ke dalam self.corpus
-                for page_num, items in pages_data.items():
-                    # Gunakan nama file asli sebagai kunci, bukan nama folder
-                    source_file = f"{file_name}.pdf" # Asumsikan sumbernya adalah PDF
-                    self.corpus[(source_file, page_num)] = items
+        file_name = os.path.basename(json_path).replace('_o_dt.json', '') # e.g., 'nama_dokumen'
+        # Gunakan nama file asli sebagai kunci, bukan nama folder
+        source_file = f"{file_name}.pdf" # Asumsikan sumbernya adalah PDF
 
-            except Exception as e:
-                print(f"[ERROR] Failed to load or parse {json_path}: {e}")
+        # Asumsikan file JSON memiliki struktur dengan 'ocr_details'
+        # Kelompokkan teks berdasarkan nomor halaman
+        pages_data = {}
+        for item in data.get('ocr_details', []):
+            page_num = item.get('page')
+            if page_num is not None:
+                pages_data.setdefault(page_num, []).append(item.get('text', ''))
+        return source_file, [(page_num, "\n".join(texts)) for page_num, texts in pages_data.items()]
 
     def get_page_text(self, source_file, page_num):
-        """Menggabungkan semua teks dari halaman tertentu."""
-        key = (source_file, page_num)
-        if key in self.corpus:
-            return "\n".join([item.get('text', '') for item in self.corpus[key]])
-        return ""
+        """Menggabungkan semua teks dari halaman tertentu (dibaca lazily dari snapshot)."""
+        return self.index.get_text(source_file, page_num)
 
-# Contoh penggunaan (opsional, untuk testing)
+# Langkah kompilasi (opsional): python -m core.json_loader [output_dir]
+# Membangun/memperbarui snapshot sebelum worker dijalankan.
 if __name__ == '__main__':
-    # Ganti dengan path output Anda
-    loader = JSONCorpusLoader("/home/aam-imanullah/milvus/output")
-    if loader.corpus:
-        first_key = list(loader.corpus.keys())[0]
+    import sys
+    loader = JSONCorpusLoader(sys.argv[1] if len(sys.argv) > 1 else "output")
+    if loader.snapshot is not None and len(loader.snapshot):
+        first_key, first_text = next(loader.snapshot.iter_pages())
         print(f"Data for {first_key}:")
-        # print(loader.corpus[first_key])
\ No newline at end of file
+        print(first_text[:200])
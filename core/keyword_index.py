@@ -0,0 +1,180 @@
+# keyword_index.py
+import math
+import re
+from array import array
+
+import numpy as np
+
+# Token: kata/angka, termasuk bentuk majemuk seperti "12/2020", "pmk.05" atau "pasal-3"
+TOKEN_PATTERN = re.compile(r"\w+(?:[./-]\w+)*", re.UNICODE)
+RRF_K = 60
+
+
+def tokenize(text: str) -> list:
+    """Token huruf kecil; token majemuk juga dipecah agar 'No. 12/2020' cocok dengan '12' dan '2020'."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall((text or "").lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[./-]", token) if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    Indeks terbalik BM25 di dalam proses untuk teks per halaman (source_file, page).
+    Posting disimpan ringkas sebagai array bertipe (doc id uint32, tf uint16) per term,
+    dan dibaca tanpa salinan lewat numpy saat skoring. Teks halaman disimpan di sini
+    juga, kecuali `text_store(source_file, page)` diberikan (mis. CorpusSnapshot.get_text),
+    sehingga indeks sekaligus menjadi penyimpan teks halaman.
+    """
+    def __init__(self, k1=1.5, b=0.75, text_store=None):
+        self.k1 = k1
+        self.b = b
+        self.text_store = text_store
+        self.keys = []                 # doc id -> (source_file, page)
+        self.texts = []                # doc id -> teks halaman (kosong jika memakai text_store)
+        self._doc_ids = {}             # (source_file, page) -> doc id
+        self._source_docs = {}         # source_file -> array('I') doc id (filter source_file)
+        self._vocab = {}               # term -> term id
+        self._postings_docs = []       # term id -> array('I')
+        self._postings_tfs = []        # term id -> array('H')
+        self._doc_lengths = array('I')
+        self._avg_doc_length = 0.0
+        self._lengths_np = np.zeros(0, dtype=np.float32)
+
+    @classmethod
+    def from_pages(cls, pages, **kwargs):
+        """Membangun indeks dari iterable ((source_file, page), text)."""
+        index = cls(**kwargs)
+        for key, text in pages:
+            index.add(key, text)
+        index.finalize()
+        return index
+
+    def add(self, key, text: str):
+        if key in self._doc_ids:
+            return
+        doc_id = len(self.keys)
+        self._doc_ids[key] = doc_id
+        self.keys.append(key)
+        self._source_docs.setdefault(key[0], array('I')).append(doc_id)
+        if self.text_store is None:
+            self.texts.append(text)
+
+        term_counts = {}
+        tokens = tokenize(text)
+        for token in tokens:
+            term_counts[token] = term_counts.get(token, 0) + 1
+        self._doc_lengths.append(len(tokens))
+        for term, count in term_counts.items():
+            term_id = self._vocab.get(term)
+            if term_id is None:
+                term_id = self._vocab[term] = len(self._postings_docs)
+                self._postings_docs.append(array('I'))
+                self._postings_tfs.append(array('H'))
+            self._postings_docs[term_id].append(doc_id)
+            self._postings_tfs[term_id].append(min(count, 65535))
+
+    def finalize(self):
+        self._avg_doc_length = (sum(self._doc_lengths) / len(self._doc_lengths)) if self._doc_lengths else 0.0
+        self._lengths_np = np.frombuffer(self._doc_lengths, dtype=np.uint32).astype(np.float32) \
+            if self._doc_lengths else np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get_text(self, source_file, page) -> str:
+        if self.text_store is not None:
+            return self.text_store(source_file, page)
+        doc_id = self._doc_ids.get((source_file, page))
+        return self.texts[doc_id] if doc_id is not None else ""
+
+    @property
+    def source_files(self) -> list:
+        return list(self._source_docs)
+
+    def search(self, query: str, top_k: int = 10, source_files=None) -> list:
+        """
+        Mengembalikan daftar (doc_id, skor) terurut menurun. `source_files` membatasi
+        kandidat ke halaman dokumen-dokumen itu sebelum top-k dipilih.
+        """
+        if not self.keys:
+            return []
+        scores = np.zeros(len(self.keys), dtype=np.float32)
+        num_docs = len(self.keys)
+        norm = self.k1 * (1 - self.b + self.b * self._lengths_np / (self._avg_doc_length or 1.0))
+        for term in set(tokenize(query)):
+            term_id = self._vocab.get(term)
+            if term_id is None:
+                continue
+            doc_ids = np.frombuffer(self._postings_docs[term_id], dtype=np.uint32)
+            tfs = np.frombuffer(self._postings_tfs[term_id], dtype=np.uint16).astype(np.float32)
+            idf = math.log(1 + (num_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + norm[doc_ids])
+
+        if source_files is not None:
+            allowed = [np.frombuffer(self._source_docs[name], dtype=np.uint32)
+                       for name in source_files if name in self._source_docs]
+            if not allowed:
+                return []
+            mask = np.zeros(len(self.keys), dtype=bool)
+            mask[np.concatenate(allowed)] = True
+            scores[~mask] = 0.0
+
+        candidates = np.flatnonzero(scores)
+        if candidates.size == 0:
+            return []
+        if candidates.size > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        ordered = candidates[np.argsort(-scores[candidates])]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in ordered]
+
+    def search_hits(self, query: str, top_k: int = 10, source_files=None) -> list:
+        """Hasil pencarian dalam format hit yang sama dengan VectorStore (core/vector_store.py)."""
+        hits = []
+        for doc_id, score in self.search(query, top_k, source_files):
+            source_file, page = self.keys[doc_id]
+            hits.append({
+                'id': f"kw:{source_file}:{page}",
+                'chunk_id': f"kw:{source_file}:{page}",
+                'bm25_score': score,
+                'text': self.get_text(source_file, page),
+                'metadata': {"source_file": source_file, "page": page}
+            })
+        return hits
+
+
+def reciprocal_rank_fusion(vector_hits: list, keyword_hits: list, top_k: int, k: int = RRF_K) -> list:
+    """
+    Menggabungkan hasil vektor dan keyword dengan Reciprocal Rank Fusion:
+    skor = sum(1 / (k + rank)). Hit keyword untuk halaman yang sudah muncul di hasil
+    vektor menambah skor hit vektor terbaik di halaman itu (tidak menduplikasi teks).
+    """
+    fused = {}
+    order = []
+    page_to_key = {}
+
+    def add(key, hit, rank):
+        if key not in fused:
+            fused[key] = [0.0, hit]
+            order.append(key)
+        fused[key][0] += 1.0 / (k + rank)
+
+    for rank, hit in enumerate(vector_hits, start=1):
+        key = ('vec', hit.get('chunk_id') if hit.get('chunk_id') is not None else hit.get('id'))
+        meta = hit.get('metadata') or {}
+        page_to_key.setdefault((meta.get('source_file'), meta.get('page')), key)
+        add(key, hit, rank)
+    for rank, hit in enumerate(keyword_hits, start=1):
+        meta = hit.get('metadata') or {}
+        page = (meta.get('source_file'), meta.get('page'))
+        add(page_to_key.get(page, ('kw', page)), hit, rank)
+
+    ranked = sorted(order, key=lambda key: fused[key][0], reverse=True)[:top_k]
+    results = []
+    for key in ranked:
+        score, hit = fused[key]
+        hit['rrf_score'] = score
+        results.append(hit)
+    return results
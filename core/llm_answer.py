@@ -1,9 +1,11 @@
 import os
 import logging  # Gunakan logging instead of print
-from groq import Groq
-from typing import Optional
+from groq import Groq, AsyncGroq
+from typing import AsyncIterator, Iterator, Optional
 from dotenv import load_dotenv
 
+from core.llm_client import LLMClient, AsyncLLMClient, LLMError, LLMPolicy, PRIORITY_ANSWER
+
 # --- Konfigurasi Logging ---
 # Siapkan logger sekali di awal file
 logging.basicConfig(
@@ -16,17 +18,30 @@ class LLMAnswerGenerator:
     """
     Menggunakan Groq untuk menghasilkan jawaban berdasarkan 
     query dan konteks yang diberikan (RAG).
+    Panggilan ke Groq lewat LLMClient (core/llm_client.py): antrian berprioritas, anggaran
+    rate limit, retry dan penggabungan prompt identik. Kegagalan dilempar sebagai LLMError.
     """
-    def __init__(self, model_name: Optional[str] = None):
+    def __init__(self, model_name: Optional[str] = None, client=None, policy: Optional[LLMPolicy] = None):
         """
         Inisialisasi generator jawaban menggunakan Groq.
         
         Args:
             model_name (Optional[str]): Nama model Groq yang akan digunakan.
                 Jika None, akan menggunakan model default dari konfigurasi.
+            client: Klien dengan antarmuka `chat.completions.create` yang sudah jadi
+                (mis. LLM palsu lokal untuk pengujian). Jika diberikan, API key tidak diperlukan.
+            policy (Optional[LLMPolicy]): Batas konkurensi, retry dan deadline panggilan LLM.
         """
         load_dotenv()
         self.api_key = os.environ.get("GROQ_API_KEY")
+        self.llm = None
+        default_model = "llama-3.3-70b-versatile" # Contoh model Llama 3 dari Groq
+
+        if client is not None:
+            self.model_name = model_name or default_model
+            self.client = client
+            self.llm = self._create_llm_client(policy)
+            return
 
         if not self.api_key:
             logger.error("API Key Groq tidak ditemukan. Pastikan file .env berisi variabel GROQ_API_KEY=...")
@@ -34,30 +49,82 @@ class LLMAnswerGenerator:
 
         # Tentukan model default jika tidak ada yang dipilih
         # Ini membuatnya lebih mudah untuk mengganti model default di satu tempat
-        default_model = "llama-3.3-70b-versatile" # Contoh model Llama 3 dari Groq
         self.model_name = model_name or default_model
 
         try:
-            self.client = Groq(api_key=self.api_key)
+            self.client = self._create_client()
+            self.llm = self._create_llm_client(policy)
             logger.info(f"LLMAnswerGenerator berhasil diinisialisasi dengan model: {self.model_name}")
         except Exception as e:
             logger.error(f"Gagal menginisialisasi LLMAnswerGenerator: {e}")
             self.client = None
 
-    def generate_answer(self, query: str, context: str) -> str:
+    def generate_answer(self, query: str, context: str, priority: int = PRIORITY_ANSWER,
+                        timeout: Optional[float] = None) -> str:
         """
         Menghasilkan jawaban berdasarkan query dan konteks menggunakan Groq.
 
         Args:
             query (str): Pertanyaan dari pengguna.
             context (str): Konteks atau dokumen yang relevan untuk menjawab query.
+            priority (int): Prioritas antrian (PRIORITY_ANSWER / PRIORITY_SUGGESTION).
+            timeout (Optional[float]): Deadline total panggilan (detik); None = deadline kebijakan.
 
         Returns:
-            str: Jawaban yang dihasilkan oleh model atau pesan error.
+            str: Jawaban yang dihasilkan oleh model, atau pesan untuk input kosong.
+
+        Raises:
+            LLMError: Groq gagal setelah retry, melewati deadline, atau klien tidak tersedia.
         """
+        validation_message = self._validate(query, context)
+        if validation_message:
+            return validation_message
+
+        try:
+            answer = self.llm.complete(self._build_messages(query, context), priority, timeout,
+                                       model=self.model_name, temperature=0.1)
+        except LLMError as e:
+            logger.error(f"Gagal menghasilkan jawaban via Groq ({e.kind}): {e}")
+            raise
+        logger.info(f"Berhasil menghasilkan jawaban untuk query: {query[:50]}...")
+        return answer
+
+    def rate_limit_cooldown(self) -> float:
+        """Sisa detik sebelum panggilan baru sebaiknya dikirim (0 jika tidak sedang dibatasi)."""
+        return self.llm.rate_limit_cooldown() if self.llm else 0.0
+
+    def generate_answer_stream(self, query: str, context: str, priority: int = PRIORITY_ANSWER,
+                               timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Sama seperti generate_answer, tetapi menghasilkan potongan teks (token)
+        begitu diterima dari Groq (stream=True). Galat (sebelum atau di tengah
+        stream) dilempar sebagai LLMError.
+        """
+        validation_message = self._validate(query, context)
+        if validation_message:
+            yield validation_message
+            return
+
+        try:
+            yield from self.llm.stream(self._build_messages(query, context), priority, timeout,
+                                       model=self.model_name, temperature=0.1)
+        except LLMError as e:
+            logger.error(f"Gagal streaming jawaban via Groq ({e.kind}): {e}")
+            raise
+        logger.info(f"Berhasil streaming jawaban untuk query: {query[:50]}...")
+
+    def _create_client(self):
+        # Retry ditangani LLMClient (dengan anggaran dan deadline), bukan retry internal SDK
+        return Groq(api_key=self.api_key, max_retries=0)
+
+    def _create_llm_client(self, policy: Optional[LLMPolicy]):
+        return LLMClient(self.client, policy)
+
+    def _validate(self, query: str, context: str) -> Optional[str]:
+        """Mengembalikan pesan untuk pengguna jika input kosong, atau None jika input valid."""
         if not self.client:
             logger.error("Model LLM Groq tidak tersedia karena klien gagal diinisialisasi.")
-            return "Maaf, layanan AI sedang bermasalah. Silakan coba lagi nanti."
+            raise LLMError("Klien Groq tidak tersedia.", "unavailable")
 
         # Validasi input
         if not query or not query.strip():
@@ -67,7 +134,9 @@ class LLMAnswerGenerator:
         if not context or not context.strip():
             logger.warning("Context kosong atau hanya berisi whitespace.")
             return "Maaf, tidak ada konteks yang tersedia untuk menjawab pertanyaan Anda."
+        return None
 
+    def _build_messages(self, query: str, context: str) -> list:
         # Prompt yang lebih terstruktur
         system_message = "Anda adalah asisten cerdas yang menjawab berdasarkan dokumen yang diberikan."
         user_prompt = f"""
@@ -85,19 +154,51 @@ class LLMAnswerGenerator:
 
         Jawaban:
         """
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_prompt}
+        ]
+
+
+class AsyncLLMAnswerGenerator(LLMAnswerGenerator):
+    """
+    Varian async (AsyncGroq): menunggu Groq tanpa memegang thread, sehingga satu
+    proses bisa melayani banyak percakapan sekaligus. Validasi dan prompt sama
+    dengan LLMAnswerGenerator.
+    """
+    def _create_client(self):
+        return AsyncGroq(api_key=self.api_key, max_retries=0)
+
+    def _create_llm_client(self, policy: Optional[LLMPolicy]):
+        return AsyncLLMClient(self.client, policy)
+
+    async def generate_answer(self, query: str, context: str, priority: int = PRIORITY_ANSWER,
+                              timeout: Optional[float] = None) -> str:
+        validation_message = self._validate(query, context)
+        if validation_message:
+            return validation_message
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.1,
-            )
-            answer = response.choices[0].message.content.strip()
-            logger.info(f"Berhasil menghasilkan jawaban untuk query: {query[:50]}...")
-            return answer
-        except Exception as e:
-            logger.error(f"Terjadi kesalahan saat menghasilkan jawaban via Groq: {e}")
-            return "Maaf, terjadi kesalahan internal saat memproses permintaan Anda. Silakan coba lagi."
\ No newline at end of file
+            answer = await self.llm.complete(self._build_messages(query, context), priority, timeout,
+                                             model=self.model_name, temperature=0.1)
+        except LLMError as e:
+            logger.error(f"Gagal menghasilkan jawaban via Groq ({e.kind}): {e}")
+            raise
+        logger.info(f"Berhasil menghasilkan jawaban untuk query: {query[:50]}...")
+        return answer
+
+    async def generate_answer_stream(self, query: str, context: str, priority: int = PRIORITY_ANSWER,
+                                     timeout: Optional[float] = None) -> AsyncIterator[str]:
+        validation_message = self._validate(query, context)
+        if validation_message:
+            yield validation_message
+            return
+
+        try:
+            async for text in self.llm.stream(self._build_messages(query, context), priority, timeout,
+                                              model=self.model_name, temperature=0.1):
+                yield text
+        except LLMError as e:
+            logger.error(f"Gagal streaming jawaban via Groq ({e.kind}): {e}")
+            raise
+        logger.info(f"Berhasil streaming jawaban untuk query: {query[:50]}...")
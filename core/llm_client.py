@@ -0,0 +1,524 @@
+# llm_client.py
+"""
+Lapisan klien Groq di bawah LLMAnswerGenerator:
+- anggaran rate limit (permintaan dan token per menit) dibaca dari header x-ratelimit-* tiap
+  respons dan dikurangi perkiraan panggilan yang dikirim sesudahnya; panggilan yang tidak muat
+  ditahan sampai anggaran di-reset, bukan dikirim lalu ditolak 429;
+- jumlah panggilan bersamaan per proses dibatasi dan antriannya berprioritas: jawaban
+  didahulukan dari saran pertanyaan; slot dilepas selama menunggu anggaran;
+- 429, 5xx, timeout dan koneksi putus dicoba ulang dengan backoff ber-jitter (minimal selama
+  retry-after) di dalam deadline total per panggilan; retry internal SDK dimatikan;
+- prompt identik yang sedang berjalan (pertanyaan populer yang ditanyakan bersamaan) digabung
+  menjadi satu panggilan.
+Kegagalan akhir dilempar sebagai LLMError, bukan dikembalikan sebagai teks jawaban, sehingga
+tidak pernah tersimpan di cache jawaban atau riwayat.
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+
+from core.metrics import metrics
+
+# Prioritas antrian (angka kecil didahulukan)
+PRIORITY_ANSWER = 0
+PRIORITY_SUGGESTION = 1
+# Jeda bila respons 429 tidak membawa header retry-after
+DEFAULT_RATE_LIMIT_COOLDOWN = 2.0
+# Perkiraan kasar token prompt dari jumlah karakter (hanya untuk anggaran token per menit)
+CHARS_PER_TOKEN = 4
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class LLMError(Exception):
+    """
+    Panggilan LLM gagal setelah retry atau melewati deadline-nya. `kind`: "rate_limit",
+    "timeout", "unavailable" (5xx, koneksi, klien tidak ada) atau "error" (permintaan ditolak,
+    mis. 400); `retry_after` = detik yang disarankan sebelum mencoba lagi, bila diketahui.
+    """
+    def __init__(self, message: str, kind: str = "error", retryable: bool = False, retry_after: float = None):
+        super().__init__(message)
+        self.kind = kind
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def parse_duration(value):
+    """Durasi header Groq ("7.66s", "2m59.56s", "120ms") atau angka detik -> detik; None jika tidak ada."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    parts = _DURATION_RE.findall(str(value))
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _int_header(headers, name: str):
+    try:
+        return int(float(headers.get(name)))
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_headers(error):
+    return getattr(getattr(error, "response", None), "headers", None)
+
+
+def as_llm_error(error: Exception) -> LLMError:
+    """Galat SDK Groq (atau klien palsu dengan status_code yang sama) -> LLMError yang diklasifikasi."""
+    if isinstance(error, LLMError):
+        return error
+    status = getattr(error, "status_code", None) or 0
+    name = type(error).__name__
+    if status == 429 or name == "RateLimitError":
+        retry_after = parse_duration((_error_headers(error) or {}).get("retry-after"))
+        return LLMError(f"Rate limit Groq: {error}", "rate_limit", True, retry_after)
+    if status >= 500 or name == "InternalServerError":
+        return LLMError(f"Groq sedang bermasalah: {error}", "unavailable", True)
+    if name == "APITimeoutError" or isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return LLMError(f"Groq tidak menjawab tepat waktu: {error}", "timeout", True)
+    if name == "APIConnectionError" or isinstance(error, ConnectionError):
+        return LLMError(f"Koneksi ke Groq gagal: {error}", "unavailable", True)
+    return LLMError(f"Groq menolak permintaan: {error}", "error", False)
+
+
+class LLMPolicy:
+    """
+    Batas panggilan LLM per proses. `max_concurrency` panggilan berjalan bersamaan (sisanya antri
+    menurut prioritas); `deadline` membatasi total waktu satu panggilan (antri, menunggu anggaran,
+    semua percobaan dan jeda backoff) dan tiap percobaan memakai timeout min(attempt_timeout, sisa
+    deadline). `completion_tokens` = perkiraan token keluaran yang ikut dihitung ke anggaran token.
+    """
+    def __init__(self, max_concurrency: int = 8, attempts: int = 3, deadline: float = 30.0,
+                 attempt_timeout: float = 20.0, base_delay: float = 0.5, max_delay: float = 8.0,
+                 completion_tokens: int = 1024):
+        self.max_concurrency = max(1, max_concurrency)
+        self.attempts = max(1, attempts)
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.completion_tokens = completion_tokens
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class RateLimitBudget:
+    """
+    Sisa anggaran Groq menurut header respons terakhir (x-ratelimit-remaining-*/reset-*), plus
+    cooldown setelah 429. Header hanya menghitung permintaan yang sudah diterima Groq, sehingga
+    panggilan lain yang masih berjalan (`pending`, dipotong saat reserve) dikurangkan darinya.
+    Setelah waktu reset lewat, sisanya kembali ke batas penuh sampai header berikutnya. Tanpa
+    header (mis. LLM palsu in-process) hanya cooldown 429 yang berlaku.
+    """
+    KINDS = ("requests", "tokens")
+
+    def __init__(self):
+        self.limits = dict.fromkeys(self.KINDS)
+        self.remaining = dict.fromkeys(self.KINDS)
+        self.reset_at = dict.fromkeys(self.KINDS, 0.0)
+        self.pending = dict.fromkeys(self.KINDS, 0)
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def settle(self, tokens: int, headers, now: float):
+        """Panggilan yang di-reserve sudah dijawab (atau gagal); header respons/galatnya, bila ada, dibaca."""
+        with self._lock:
+            self.pending["requests"] -= 1
+            self.pending["tokens"] -= tokens
+            if not headers:
+                return
+            for kind in self.KINDS:
+                remaining = _int_header(headers, f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                self.remaining[kind] = remaining - self.pending[kind]
+                self.limits[kind] = _int_header(headers, f"x-ratelimit-limit-{kind}") or self.limits[kind]
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                self.reset_at[kind] = now + reset if reset is not None else 0.0
+
+    def note_rate_limited(self, retry_after, now: float):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, now + (retry_after or DEFAULT_RATE_LIMIT_COOLDOWN))
+
+    def _wait_locked(self, tokens: int, now: float) -> float:
+        wait = max(0.0, self.blocked_until - now)
+        for kind, needed in (("requests", 1), ("tokens", tokens)):
+            if 0 < self.reset_at[kind] <= now:
+                # Jendela baru: anggaran penuh lagi (dikurangi sendiri sampai header berikutnya)
+                self.remaining[kind], self.reset_at[kind] = self.limits[kind], 0.0
+            remaining, limit = self.remaining[kind], self.limits[kind]
+            # Panggilan yang melebihi batas penuh tidak akan pernah muat: biarkan Groq yang memutuskan
+            if remaining is not None and remaining < needed and (limit is None or needed <= limit):
+                wait = max(wait, self.reset_at[kind] - now)
+        return wait
+
+    def reserve(self, tokens: int, now: float) -> float:
+        """0 = boleh dikirim sekarang (anggaran langsung dipotong); selain itu detik yang harus ditunggu."""
+        with self._lock:
+            wait = self._wait_locked(tokens, now)
+            if wait > 0:
+                return wait
+            for kind, amount in (("requests", 1), ("tokens", tokens)):
+                self.pending[kind] += amount
+                if self.remaining[kind] is not None:
+                    self.remaining[kind] -= amount
+            return 0.0
+
+    def cooldown(self, now: float) -> float:
+        """Detik sampai panggilan baru boleh dikirim lagi (cooldown 429 atau anggaran permintaan habis)."""
+        with self._lock:
+            return self._wait_locked(0, now)
+
+    def snapshot(self, now: float) -> dict:
+        with self._lock:
+            return {"remaining": dict(self.remaining), "limits": dict(self.limits), "pending": dict(self.pending),
+                    "reset_in": {kind: round(max(0.0, at - now), 2) for kind, at in self.reset_at.items()},
+                    "cooldown": round(max(0.0, self.blocked_until - now), 2)}
+
+
+class PrioritySlots:
+    """Semaphore berprioritas: slot yang lepas diberikan ke penunggu berprioritas terkecil, lalu FIFO."""
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self.in_use = 0
+        self._waiters = []  # heap (prioritas, urutan)
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, priority: int, timeout: float) -> bool:
+        entry = (priority, next(self._sequence))
+        end = time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while self.in_use >= self.size or self._waiters[0] != entry:
+                    remaining = end - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                heapq.heappop(self._waiters)
+                self.in_use += 1
+                return True
+            finally:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                # Kepala antrian berubah: penunggu berikutnya mungkin sudah boleh masuk
+                self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.in_use -= 1
+            self._cond.notify_all()
+
+
+class AsyncPrioritySlots:
+    """Versi asyncio dari PrioritySlots; slot yang lepas diserahkan langsung ke penunggu terdepan."""
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self.in_use = 0
+        self._waiters = []  # heap (prioritas, urutan, future)
+        self._sequence = itertools.count()
+
+    async def acquire(self, priority: int, timeout: float) -> bool:
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if self.in_use < self.size and not self._waiters:
+            self.in_use += 1
+            return True
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            await asyncio.wait_for(future, max(0.0, timeout))
+            return True
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                self.release()  # slot diserahkan tepat saat penunggu menyerah
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return False
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(True)  # slot berpindah tangan; in_use tetap
+                return
+        self.in_use -= 1
+
+
+class LLMClient:
+    """
+    Pembungkus klien Groq sinkron (atau klien palsu dengan antarmuka chat.completions.create)
+    dengan anggaran rate limit, antrian prioritas, retry dan penggabungan; lihat complete()/stream().
+    """
+    def __init__(self, client, policy: LLMPolicy = None):
+        self.client = client
+        self.policy = policy or LLMPolicy()
+        self.budget = RateLimitBudget()
+        self.slots = self._create_slots()
+        self._in_flight = {}  # kunci prompt -> Future hasil panggilan yang sedang berjalan
+        self._lock = threading.Lock()
+
+    def _create_slots(self):
+        return PrioritySlots(self.policy.max_concurrency)
+
+    def rate_limit_cooldown(self) -> float:
+        return self.budget.cooldown(time.monotonic())
+
+    def stats(self) -> dict:
+        stats = self.budget.snapshot(time.monotonic())
+        stats.update({"in_flight": self.slots.in_use, "queued": len(self.slots._waiters)})
+        return stats
+
+    def _deadline(self, timeout) -> float:
+        return time.monotonic() + (self.policy.deadline if timeout is None else timeout)
+
+    def _estimate_tokens(self, messages: list) -> int:
+        return sum(len(m.get("content") or "") for m in messages) // CHARS_PER_TOKEN + self.policy.completion_tokens
+
+    @staticmethod
+    def _request_key(messages: list, params: dict) -> str:
+        payload = json.dumps([messages, params], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _send_kwargs(self, messages: list, params: dict, stream: bool, deadline: float) -> dict:
+        timeout = max(0.01, min(self.policy.attempt_timeout, deadline - time.monotonic()))
+        return dict(params, messages=messages, stream=stream, timeout=timeout)
+
+    def _budget_wait(self, tokens: int, deadline: float) -> float:
+        """Detik menunggu anggaran (0 = sudah dipotong, kirim sekarang); LLMError jika melewati deadline."""
+        now = time.monotonic()
+        wait = self.budget.reserve(tokens, now)
+        if wait > 0 and now + wait >= deadline:
+            metrics.increment("llm_budget_exhausted")
+            raise LLMError(f"Anggaran rate limit Groq habis; tersedia lagi dalam {wait:.1f} detik.",
+                           "rate_limit", True, wait)
+        if wait > 0:
+            metrics.record("llm_budget_wait_seconds", wait)
+        return wait
+
+    def _failure(self, error: Exception) -> LLMError:
+        error = as_llm_error(error)
+        if error.kind == "rate_limit":
+            metrics.increment("llm_rate_limited")
+            self.budget.note_rate_limited(error.retry_after, time.monotonic())
+        return error
+
+    def _retry_delay(self, attempt: int, error: LLMError, deadline: float) -> float:
+        """Jeda sebelum percobaan berikutnya, atau LLMError jika tidak layak/sempat diulang."""
+        delay = max(error.retry_after or 0.0, self.policy.backoff(attempt))
+        last_attempt = attempt + 1 >= self.policy.attempts or time.monotonic() + delay >= deadline
+        if not error.retryable or last_attempt:
+            raise error
+        metrics.increment("llm_retries")
+        print(f"[LLM] Percobaan {attempt + 1} gagal ({error}); ulang dalam {delay:.2f} detik.")
+        return delay
+
+    def _send(self, kwargs: dict, tokens: int):
+        """Satu percobaan (anggaran sudah di-reserve); header rate limit dibaca lewat with_raw_response."""
+        completions = self.client.chat.completions
+        raw_api = getattr(completions, "with_raw_response", None)
+        headers = None
+        try:
+            if raw_api is None:
+                return completions.create(**kwargs)
+            raw = raw_api.create(**kwargs)
+            headers = raw.headers
+            return raw.parse()
+        except Exception as e:
+            headers = _error_headers(e)
+            raise
+        finally:
+            self.budget.settle(tokens, headers, time.monotonic())
+
+    def _acquire(self, priority: int, deadline: float):
+        queued = time.perf_counter()
+        if not self.slots.acquire(priority, deadline - time.monotonic()):
+            metrics.increment("llm_queue_timeout")
+            raise LLMError("Antrian panggilan LLM melewati deadline.", "timeout", True)
+        metrics.record("llm_queue_wait_seconds", time.perf_counter() - queued)
+
+    def _send_with_retry(self, messages: list, params: dict, priority: int, deadline: float, stream: bool):
+        """Respons SDK dengan slot antrian masih dipegang; pemanggil wajib memanggil slots.release()."""
+        tokens = self._estimate_tokens(messages)
+        attempt = 0
+        while True:
+            self._acquire(priority, deadline)
+            try:
+                wait = self._budget_wait(tokens, deadline)
+                if wait == 0:
+                    return self._send(self._send_kwargs(messages, params, stream, deadline), tokens)
+            except BaseException as e:
+                self.slots.release()
+                if not isinstance(e, Exception):
+                    raise
+                error = self._failure(e)
+            else:
+                # Anggaran ditunggu tanpa memegang slot: panggilan berprioritas lebih tinggi tetap bisa
+                # masuk lebih dulu, lalu antri ulang menurut prioritasnya
+                self.slots.release()
+                time.sleep(wait)
+                continue
+            time.sleep(self._retry_delay(attempt, error, deadline))
+            attempt += 1
+
+    def complete(self, messages: list, priority: int = PRIORITY_ANSWER, timeout: float = None, **params) -> str:
+        """Teks jawaban satu panggilan chat completion; `params` diteruskan ke Groq (model, temperature, ...)."""
+        deadline = self._deadline(timeout)
+        key = self._request_key(messages, params)
+        with self._lock:
+            shared = self._in_flight.get(key)
+            if shared is None:
+                self._in_flight[key] = future = Future()
+        if shared is not None:
+            metrics.increment("llm_coalesced")
+            try:
+                return shared.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FuturesTimeoutError:
+                raise LLMError("Menunggu panggilan LLM identik melewati deadline.", "timeout", True) from None
+
+        try:
+            response = self._send_with_retry(messages, params, priority, deadline, stream=False)
+            self.slots.release()
+            text = (response.choices[0].message.content or "").strip()
+            future.set_result(text)
+            return text
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stream(self, messages: list, priority: int = PRIORITY_ANSWER, timeout: float = None, **params):
+        """
+        Potongan teks begitu diterima (stream=True). Retry hanya sebelum badan stream (429 selalu
+        datang sebagai status HTTP); galat di tengah stream langsung dilempar sebagai LLMError.
+        Stream tidak digabung, karena setiap pemanggil butuh potongannya sendiri.
+        """
+        deadline = self._deadline(timeout)
+        response = self._send_with_retry(messages, params, priority, deadline, stream=True)
+        try:
+            for chunk in response:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    yield text
+        except Exception as e:
+            raise self._failure(e) from e
+        finally:
+            self.slots.release()
+
+
+class AsyncLLMClient(LLMClient):
+    """Versi asyncio dari LLMClient untuk AsyncGroq; antrian dan penggabungan hidup di event loop."""
+
+    def _create_slots(self):
+        return AsyncPrioritySlots(self.policy.max_concurrency)
+
+    async def _send(self, kwargs: dict, tokens: int):
+        completions = self.client.chat.completions
+        raw_api = getattr(completions, "with_raw_response", None)
+        headers = None
+        try:
+            if raw_api is None:
+                return await completions.create(**kwargs)
+            raw = await raw_api.create(**kwargs)
+            headers = raw.headers
+            return await raw.parse()
+        except BaseException as e:
+            headers = _error_headers(e)
+            raise
+        finally:
+            self.budget.settle(tokens, headers, time.monotonic())
+
+    async def _acquire(self, priority: int, deadline: float):
+        queued = time.perf_counter()
+        if not await self.slots.acquire(priority, deadline - time.monotonic()):
+            metrics.increment("llm_queue_timeout")
+            raise LLMError("Antrian panggilan LLM melewati deadline.", "timeout", True)
+        metrics.record("llm_queue_wait_seconds", time.perf_counter() - queued)
+
+    async def _send_with_retry(self, messages: list, params: dict, priority: int, deadline: float, stream: bool):
+        tokens = self._estimate_tokens(messages)
+        attempt = 0
+        while True:
+            await self._acquire(priority, deadline)
+            try:
+                wait = self._budget_wait(tokens, deadline)
+                if wait == 0:
+                    return await self._send(self._send_kwargs(messages, params, stream, deadline), tokens)
+            except BaseException as e:
+                self.slots.release()
+                if not isinstance(e, Exception):
+                    raise
+                error = self._failure(e)
+            else:
+                self.slots.release()
+                await asyncio.sleep(wait)
+                continue
+            await asyncio.sleep(self._retry_delay(attempt, error, deadline))
+            attempt += 1
+
+    async def complete(self, messages: list, priority: int = PRIORITY_ANSWER, timeout: float = None, **params) -> str:
+        deadline = self._deadline(timeout)
+        key = self._request_key(messages, params)
+        shared = self._in_flight.get(key)
+        if shared is not None:
+            metrics.increment("llm_coalesced")
+            try:
+                return await asyncio.wait_for(asyncio.shield(shared), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise LLMError("Menunggu panggilan LLM identik melewati deadline.", "timeout", True) from None
+
+        future = asyncio.get_running_loop().create_future()
+        # Galat yang tidak ditunggu siapa pun tidak perlu dilaporkan asyncio
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = future
+        try:
+            response = await self._send_with_retry(messages, params, priority, deadline, stream=False)
+            self.slots.release()
+            text = (response.choices[0].message.content or "").strip()
+            future.set_result(text)
+            return text
+        except asyncio.CancelledError:
+            # Pemanggil pertama dibatalkan (klien putus): pemanggil lain tidak ikut dibatalkan
+            future.set_exception(LLMError("Panggilan LLM yang digabung dibatalkan.", "unavailable", True))
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def stream(self, messages: list, priority: int = PRIORITY_ANSWER, timeout: float = None, **params):
+        deadline = self._deadline(timeout)
+        response = await self._send_with_retry(messages, params, priority, deadline, stream=True)
+        try:
+            async for chunk in response:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    yield text
+        except Exception as e:
+            raise self._failure(e) from e
+        finally:
+            self.slots.release()
@@ -0,0 +1,69 @@
+# metrics.py
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class MetricsRegistry:
+    """
+    Pencatat metrik sederhana di dalam proses: counter dan sampel latensi
+    (dibatasi `max_samples` sampel terakhir per nama) dengan ringkasan p50/p95.
+    """
+    def __init__(self, max_samples=2000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._counters = {}
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def counter(self, name: str) -> int:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            counters = dict(self._counters)
+        latencies = {}
+        for name, ordered in samples.items():
+            if not ordered: continue
+            latencies[name] = {
+                "n": len(ordered),
+                "p50_ms": round(_nearest_rank(ordered, 50) * 1000, 2),
+                "p95_ms": round(_nearest_rank(ordered, 95) * 1000, 2),
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+            }
+        return {"counters": counters, "latency": latencies}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counters.clear()
+
+
+def _nearest_rank(ordered, pct):
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+# Registry bersama untuk seluruh proses
+metrics = MetricsRegistry()
@@ -0,0 +1,30 @@
+# request_context.py
+import uuid
+
+
+class RequestContext:
+    """
+    State milik SATU request /chat: riwayat percakapan, filter pencarian dari klien
+    (hasil normalize_filters, lihat core/search_filter.py) dan id request.
+    Objek ini dibuat per request dan dialirkan ke semua jalur pemrosesan,
+    sehingga satu instance ChatbotService (dengan model yang sudah dimuat)
+    aman dipakai bersamaan oleh banyak thread / task asyncio.
+    """
+    def __init__(self, history=None, max_history_turns=5, request_id=None, filters=None):
+        # Salin list dari klien agar request lain / pemanggil tidak ikut termodifikasi
+        self.history = list(history or [])
+        self.max_history_turns = max_history_turns
+        self.request_id = request_id or uuid.uuid4().hex
+        self.filters = filters or {}
+
+    def add_to_history(self, role: str, content: str):
+        self.history.append({"role": role, "content": content})
+
+    def format_history_for_prompt(self) -> str:
+        if not self.history: return ""
+        recent_history = self.history[-(self.max_history_turns * 2):]
+        formatted_lines = []
+        for item in recent_history:
+            role = "Pengguna" if item['role'] == 'user' else "Asisten"
+            formatted_lines.append(f"{role}: {item['content']}")
+        return "\n".join(formatted_lines)
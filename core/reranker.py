@@ -0,0 +1,223 @@
+# reranker.py
+import threading
+from collections import OrderedDict
+
+from core.embedding_cache import normalize_query
+
+RERANK_MAX_CHARS = 1500
+
+
+class ScoreCache:
+    """
+    Cache skor CrossEncoder dengan kunci (query ternormalisasi, chunk_id).
+    Skor hanya berlaku untuk satu model: bind_model() dengan nama lain
+    mengosongkan cache sehingga skor model lama tidak pernah terpakai.
+    """
+    def __init__(self, model_name: str, max_entries=50000):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def bind_model(self, model_name: str):
+        with self._lock:
+            if model_name != self.model_name:
+                self._scores.clear()
+                self.model_name = model_name
+
+    def clear(self):
+        with self._lock:
+            self._scores.clear()
+
+    def get(self, query_key: str, chunk_id):
+        with self._lock:
+            score = self._scores.get((query_key, chunk_id))
+            if score is None:
+                self.misses += 1
+                return None
+            self._scores.move_to_end((query_key, chunk_id))
+            self.hits += 1
+            return score
+
+    def put(self, query_key: str, chunk_id, score: float):
+        with self._lock:
+            self._scores[(query_key, chunk_id)] = score
+            self._scores.move_to_end((query_key, chunk_id))
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"model_name": self.model_name, "entries": len(self._scores), "hits": self.hits,
+                    "misses": self.misses, "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+
+def hit_chunk_id(hit: dict):
+    """Id stabil sebuah hit (chunk_id dari Zilliz, atau primary key 'id')."""
+    chunk_id = hit.get('chunk_id')
+    return chunk_id if chunk_id is not None else hit.get('id')
+
+
+def rerank_hits(reranker_model, query: str, hits: list, max_chars: int = RERANK_MAX_CHARS, score_cache: ScoreCache = None):
+    """
+    Memberi skor setiap hit dengan CrossEncoder dalam SATU batch lalu mengurutkannya.
+    Hit yang bukan dict atau tidak memiliki 'text' dibuang.
+    Dengan `score_cache`, hanya pasangan yang belum pernah dinilai yang masuk ke predict.
+    Jika model gagal, hit dikembalikan dalam urutan aslinya (urutan jarak vektor).
+    """
+    return rerank_groups(reranker_model, [(query, hits)], max_chars, score_cache)[0]
+
+
+def rerank_groups(reranker_model, groups: list, max_chars: int = RERANK_MAX_CHARS, score_cache: ScoreCache = None):
+    """
+    Seperti rerank_hits untuk beberapa pasangan (query, hits) sekaligus: semua pasangan
+    yang belum ada skornya dari semua grup dinilai dalam SATU panggilan predict.
+    Mengembalikan list hasil rerank per grup, dengan urutan yang sama dengan `groups`.
+    """
+    prepared = []
+    pending = []  # (query_key, hit, pasangan)
+    for query, hits in groups:
+        valid_hits = [h for h in (hits or []) if isinstance(h, dict) and 'text' in h]
+        prepared.append(valid_hits)
+        query_key = normalize_query(query)
+        for hit in valid_hits:
+            chunk_id = hit_chunk_id(hit)
+            score = score_cache.get(query_key, chunk_id) if score_cache is not None and chunk_id is not None else None
+            if score is None:
+                pending.append((query_key, hit, [query, (hit.get('text') or '')[:max_chars]]))
+            else:
+                hit['rerank_score'] = score
+
+    try:
+        if pending:
+            scores = reranker_model.predict([pair for _, _, pair in pending])
+            for i, (query_key, hit, _) in enumerate(pending):
+                hit['rerank_score'] = float(scores[i])
+                chunk_id = hit_chunk_id(hit)
+                if score_cache is not None and chunk_id is not None:
+                    score_cache.put(query_key, chunk_id, hit['rerank_score'])
+        for valid_hits in prepared:
+            valid_hits.sort(key=lambda x: x['rerank_score'], reverse=True)
+    except Exception as e:
+        print(f"[WARNING] Rerank error: {e}")
+    return prepared
+
+
+class RerankProfile:
+    """
+    Kedalaman retrieval dan rerank untuk satu jenis query.
+    - retrieval_depth: jumlah kandidat yang diambil dari Zilliz.
+    - rerank_depth: batas atas kandidat yang dinilai CrossEncoder (None = semua).
+    - keep: jumlah hit teratas yang benar-benar dipakai pemanggil.
+    - threshold: skor minimum agar hit dihitung lolos (None = semua skor lolos).
+    - batch_size: kandidat per tahap rerank bertingkat (0 = semua dalam satu tahap).
+    - margin: kelonggaran (satuan skor CrossEncoder) di atas skor tertinggi tahap terakhir
+      yang masih dianggap bisa dicapai kandidat berikutnya (lihat cascade_rerank_groups).
+    """
+    def __init__(self, name: str, retrieval_depth: int, rerank_depth: int = None, keep: int = 5,
+                 threshold: float = None, batch_size: int = 8, margin: float = 1.0):
+        self.name = name
+        self.retrieval_depth = retrieval_depth
+        self.rerank_depth = rerank_depth
+        self.keep = keep
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.margin = margin
+
+
+class _CascadeGroup:
+    def __init__(self, query, hits, profile):
+        self.query = query
+        self.query_key = normalize_query(query)
+        self.hits = [h for h in (hits or []) if isinstance(h, dict) and 'text' in h]
+        limit = len(self.hits) if not profile.rerank_depth else min(len(self.hits), profile.rerank_depth)
+        self.queue = self.hits[:limit]  # kandidat yang boleh dinilai, urutan retrieval
+        self.scored = []
+        self.done = not self.queue
+
+    def update(self, profile, batch: list):
+        """Memperbarui status berhenti setelah satu tahap (`batch` = hit yang baru dinilai)."""
+        if not self.queue:
+            self.done = True
+            return
+        if not batch or len(self.scored) < profile.keep:
+            return
+        kth_score = sorted((hit['rerank_score'] for hit in self.scored), reverse=True)[profile.keep - 1]
+        if profile.threshold is not None and kth_score <= profile.threshold:
+            return  # belum ada `keep` kandidat yang lolos threshold
+        # Kandidat tersisa lebih jauh (jarak vektor) dari semua yang sudah dinilai. Skor yang masih
+        # bisa mereka capai diperkirakan dari tahap terakhir (yang terdekat dengan mereka) + margin;
+        # berhenti hanya jika perkiraan itu pun tidak mengalahkan skor ke-`keep`
+        attainable = max(hit['rerank_score'] for hit in batch) + profile.margin
+        self.done = attainable <= kth_score
+
+    def result(self):
+        # Hit yang dinilai (urut skor), lalu sisanya dalam urutan retrieval tanpa 'rerank_score'
+        scored_ids = {id(hit) for hit in self.scored}
+        ranked = sorted(self.scored, key=lambda h: h['rerank_score'], reverse=True)
+        return ranked + [hit for hit in self.hits if id(hit) not in scored_ids]
+
+
+def cascade_rerank_groups(reranker_model, groups: list, profile: RerankProfile, max_chars: int = RERANK_MAX_CHARS,
+                          score_cache: ScoreCache = None):
+    """
+    Rerank bertingkat untuk beberapa pasangan (query, hits). Kandidat dinilai per tahap
+    (`profile.batch_size` per grup, urutan retrieval; satu panggilan predict untuk semua grup
+    per tahap). Sebuah grup berhenti jika `keep` kandidat sudah lolos threshold dan skor
+    tertinggi yang masih bisa dicapai kandidat tersisa tidak melebihi skor ke-`keep` saat ini,
+    atau jika `rerank_depth` tercapai. Kandidat tersisa selalu lebih jauh (jarak vektor) dari
+    yang sudah dinilai, jadi skor mereka diperkirakan dari tahap terakhir: skor tertingginya
+    + `profile.margin`. Skor dari `score_cache` dipakai lebih dulu tanpa biaya. Mengembalikan (hasil per grup, {"scored", "cached", "skipped"}).
+    Jika model gagal, hit dikembalikan dalam urutan aslinya.
+    """
+    states = [_CascadeGroup(query, hits, profile) for query, hits in groups]
+    stats = {"scored": 0, "cached": 0, "skipped": 0}
+
+    if score_cache is not None:
+        for state in states:
+            remaining = []
+            for hit in state.queue:
+                chunk_id = hit_chunk_id(hit)
+                score = score_cache.get(state.query_key, chunk_id) if chunk_id is not None else None
+                if score is None:
+                    remaining.append(hit)
+                else:
+                    hit['rerank_score'] = score
+                    state.scored.append(hit)
+                    stats["cached"] += 1
+            state.queue = remaining
+
+    try:
+        while True:
+            active = [state for state in states if not state.done]
+            if not active:
+                break
+            pending = []  # (state, hit)
+            batches = {id(state): [] for state in active}
+            for state in active:
+                take = profile.batch_size or len(state.queue)
+                pending.extend((state, hit) for hit in state.queue[:take])
+                state.queue = state.queue[take:]
+            if pending:
+                scores = reranker_model.predict(
+                    [[state.query, (hit.get('text') or '')[:max_chars]] for state, hit in pending])
+                stats["scored"] += len(pending)
+                for (state, hit), score in zip(pending, scores):
+                    hit['rerank_score'] = float(score)
+                    state.scored.append(hit)
+                    batches[id(state)].append(hit)
+                    chunk_id = hit_chunk_id(hit)
+                    if score_cache is not None and chunk_id is not None:
+                        score_cache.put(state.query_key, chunk_id, hit['rerank_score'])
+            for state in active:
+                state.update(profile, batches[id(state)])
+    except Exception as e:
+        print(f"[WARNING] Rerank error: {e}")
+        return [state.hits for state in states], stats
+
+    results = [state.result() for state in states]
+    stats["skipped"] = sum(len(state.hits) - len(state.scored) for state in states)
+    return results, stats
@@ -0,0 +1,90 @@
+# search_filter.py
+"""
+Filter metadata untuk pencarian vektor: validasi filter dari klien (/chat `filters`),
+ekspresi filter Milvus (`filter=` pada MilvusClient.search) sehingga penyaringan terjadi
+di Zilliz dan bukan setelah hasil diambil, evaluasi filter yang sama untuk store lokal,
+dan deteksi nama dokumen di dalam query.
+
+Filter dinormalisasi menjadi {field: (nilai, ...)}: nilai-nilai satu field digabung OR
+(`field in [...]`), antar field digabung AND.
+"""
+import json
+import re
+
+# Hanya field skalar ini yang boleh difilter (sekaligus mencegah injeksi ekspresi lewat nama field)
+FILTERABLE_FIELDS = ("jenis_dokumen", "source_file")
+MAX_FILTER_VALUES = 20
+MAX_FILTER_VALUE_LENGTH = 256
+_NAME_SEPARATOR_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_filters(filters) -> dict:
+    """
+    {field: str | [str, ...]} -> {field: (str, ...)}; None/{} -> {}.
+    ValueError dengan pesan yang bisa dikirim ke klien jika filter tidak valid.
+    """
+    if not filters:
+        return {}
+    if not isinstance(filters, dict):
+        raise ValueError("'filters' field must be an object.")
+    normalized = {}
+    for field, values in filters.items():
+        if field not in FILTERABLE_FIELDS:
+            raise ValueError(f"Unknown filter field '{field}'. Allowed: {', '.join(FILTERABLE_FIELDS)}.")
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, list) or not values or len(values) > MAX_FILTER_VALUES:
+            raise ValueError(f"Filter '{field}' must be a string or a list of 1-{MAX_FILTER_VALUES} strings.")
+        if not all(isinstance(value, str) and 0 < len(value) <= MAX_FILTER_VALUE_LENGTH for value in values):
+            raise ValueError(f"Filter '{field}' values must be non-empty strings "
+                             f"of at most {MAX_FILTER_VALUE_LENGTH} characters.")
+        normalized[field] = tuple(dict.fromkeys(values))
+    return normalized
+
+
+def filter_expression(filters: dict) -> str:
+    """Ekspresi boolean Milvus, mis. 'source_file in ["A.pdf", "B.pdf"] and jenis_dokumen in ["SOP"]'."""
+    # json.dumps menghasilkan literal string berkutip ganda dengan escape yang juga dipahami Milvus
+    return " and ".join(f"{field} in {json.dumps(list(values), ensure_ascii=False)}"
+                        for field, values in sorted(filters.items()))
+
+
+def matches_filters(filters: dict, entity) -> bool:
+    """Evaluasi filter yang sama di dalam proses (LocalVectorStore, hasil BM25)."""
+    return all(entity.get(field) in values for field, values in filters.items())
+
+
+def _normalize_name(text: str) -> str:
+    return " ".join(_NAME_SEPARATOR_RE.sub(" ", (text or "").lower()).split())
+
+
+class DocumentMatcher:
+    """
+    Mendeteksi dokumen korpus yang disebut namanya di query, mis. "isi SOP_Pengadaan_2023.pdf"
+    atau "ringkas sop pengadaan 2023" -> source_file "SOP_Pengadaan_2023.pdf". Nama file
+    dibandingkan tanpa ekstensi, huruf kecil, dengan pemisah (_ - . spasi) disamakan. Hanya
+    nama yang cukup spesifik (minimal dua kata, atau mengandung angka) yang dipakai, agar
+    dokumen bernama umum (mis. "Laporan.pdf") tidak menyempitkan setiap query yang menyebut kata itu.
+    """
+
+    def __init__(self, source_files):
+        self._names = {}  # nama ternormalisasi -> [source_file]
+        for source_file in set(source_files):
+            stem = source_file.rsplit(".", 1)[0] if "." in source_file else source_file
+            name = _normalize_name(stem)
+            if len(name.split()) >= 2 or (any(ch.isdigit() for ch in name) and len(name) >= 4):
+                self._names.setdefault(name, []).append(source_file)
+
+    def __len__(self):
+        return len(self._names)
+
+    def match(self, query: str) -> list:
+        """source_file yang namanya muncul utuh (per kata) di query; nama terpanjang didahulukan."""
+        padded = f" {_normalize_name(query)} "
+        found = []
+        for name in sorted(self._names, key=len, reverse=True):
+            # Nama yang merupakan bagian dari nama lain yang sudah cocok tidak dihitung lagi
+            if f" {name} " in padded:
+                found.extend(self._names[name])
+                padded = padded.replace(f" {name} ", "  ")
+        return sorted(found)
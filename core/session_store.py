@@ -0,0 +1,212 @@
+# session_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class SessionStore(ABC):
+    """
+    Antarmuka penyimpanan riwayat percakapan per session_id di sisi server.
+    Setiap session hanya menyimpan `max_messages` pesan terakhir, dan session
+    yang tidak disentuh lebih dari `ttl_seconds` dianggap kedaluwarsa.
+    `shared` = True jika store dibaca bersama oleh beberapa proses (worker gunicorn);
+    store seperti itu juga menyimpan saran deferred (lihat SQLiteSessionStore).
+    """
+    shared = False
+
+    def __init__(self, max_messages=10, ttl_seconds=3600):
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def get(self, session_id: str) -> list:
+        """Mengembalikan riwayat session (list kosong jika tidak ada / kedaluwarsa)."""
+
+    @abstractmethod
+    def append(self, session_id: str, messages: list) -> list:
+        """Menambahkan pesan baru, memangkas ke `max_messages`, lalu mengembalikan riwayatnya."""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Menghapus riwayat session (tidak apa-apa jika session tidak ada)."""
+
+    def _trim(self, history: list) -> list:
+        return history[-self.max_messages:] if self.max_messages else history
+
+
+class InMemorySessionStore(SessionStore):
+    """Store LRU + TTL di memori proses; jumlah session dibatasi `max_sessions`."""
+    def __init__(self, max_messages=10, ttl_seconds=3600, max_sessions=10000):
+        super().__init__(max_messages, ttl_seconds)
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> (last_access, history)
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> list:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            last_access, history = entry
+            if time.time() - last_access > self.ttl_seconds:
+                del self._sessions[session_id]
+                return []
+            self._sessions.move_to_end(session_id)
+            return list(history)
+
+    def append(self, session_id: str, messages: list) -> list:
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            history = entry[1] if entry and time.time() - entry[0] <= self.ttl_seconds else []
+            history = self._trim(history + list(messages))
+            self._sessions[session_id] = (time.time(), history)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)  # buang session yang paling lama tidak dipakai
+            return list(history)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Store berbasis file SQLite lokal: session bertahan saat restart dan bisa
+    dipakai bersama oleh beberapa worker di mesin yang sama. Setiap baca-ubah-tulis
+    (get memperbarui last_access, append menambah riwayat) berjalan dalam satu
+    transaksi BEGIN IMMEDIATE, sehingga request bersamaan pada session yang sama
+    tidak saling menimpa pesan.
+
+    Tabel `suggestions` menampung saran mode deferred: worker yang menjawab /chat
+    mendaftarkan request_id (reserve_suggestions) lalu menulis sarannya setelah
+    selesai (put_suggestions), sehingga GET /suggestions/<request_id> di worker
+    lain tetap bisa menjawab (pop_suggestions).
+    """
+    shared = True
+    # Baris saran yang tidak pernah diambil dibuang setelah deadline + waktu ini
+    SUGGESTION_RETENTION_SECONDS = 600
+
+    def __init__(self, db_path="sessions.db", max_messages=10, ttl_seconds=3600, max_sessions=100000):
+        super().__init__(max_messages, ttl_seconds)
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                         "session_id TEXT PRIMARY KEY, history TEXT NOT NULL, last_access REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions(last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS suggestions ("
+                         "request_id TEXT PRIMARY KEY, suggestions TEXT, deadline REAL NOT NULL)")
+
+    def _conn(self):
+        # Koneksi sqlite3 tidak boleh dibagi antar thread; satu koneksi per thread.
+        # isolation_level=None: transaksi dibuka sendiri oleh _transaction()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Kunci tulis diambil di awal transaksi (bukan saat UPDATE pertama), lalu COMMIT / ROLLBACK."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _load(self, conn, session_id: str, now: float):
+        """Riwayat session di dalam transaksi; None jika tidak ada atau kedaluwarsa (lalu dihapus)."""
+        row = conn.execute("SELECT history, last_access FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        if now - row[1] > self.ttl_seconds:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            return None
+        return json.loads(row[0])
+
+    def get(self, session_id: str) -> list:
+        now = time.time()
+        with self._transaction() as conn:
+            history = self._load(conn, session_id, now)
+            if history is None:
+                return []
+            conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+        return history
+
+    def append(self, session_id: str, messages: list) -> list:
+        now = time.time()
+        with self._transaction() as conn:
+            history = self._trim((self._load(conn, session_id, now) or []) + list(messages))
+            conn.execute("INSERT OR REPLACE INTO sessions (session_id, history, last_access) VALUES (?, ?, ?)",
+                         (session_id, json.dumps(history, ensure_ascii=False), now))
+            conn.execute("DELETE FROM sessions WHERE last_access < ?", (now - self.ttl_seconds,))
+            conn.execute("DELETE FROM sessions WHERE session_id IN (SELECT session_id FROM sessions "
+                         "ORDER BY last_access DESC LIMIT -1 OFFSET ?)", (self.max_sessions,))
+        return history
+
+    def delete(self, session_id: str):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def reserve_suggestions(self, request_id: str, deadline: float):
+        """Mendaftarkan saran yang masih dibuat; `deadline` dalam waktu time.time()."""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO suggestions (request_id, suggestions, deadline) VALUES (?, NULL, ?)",
+                         (request_id, deadline))
+            conn.execute("DELETE FROM suggestions WHERE deadline < ?",
+                         (time.time() - self.SUGGESTION_RETENTION_SECONDS,))
+
+    def put_suggestions(self, request_id: str, suggestions: list):
+        """Menulis saran yang sudah jadi; tidak ada efek jika request_id sudah diambil/dibuang."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE suggestions SET suggestions = ? WHERE request_id = ?",
+                         (json.dumps(suggestions, ensure_ascii=False), request_id))
+
+    def pop_suggestions(self, request_id: str):
+        """
+        None jika request_id tidak dikenal; selain itu (saran atau None, deadline).
+        Baris dihapus jika sarannya sudah ada atau deadline-nya lewat.
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT suggestions, deadline FROM suggestions WHERE request_id = ?",
+                               (request_id,)).fetchone()
+            if row is None:
+                return None
+            suggestions = json.loads(row[0]) if row[0] is not None else None
+            if suggestions is not None or time.time() >= row[1]:
+                conn.execute("DELETE FROM suggestions WHERE request_id = ?", (request_id,))
+        return suggestions, row[1]
+
+    def discard_suggestions(self, request_id: str) -> bool:
+        """Menghapus baris saran; False jika sudah diambil (atau dibuang) sebelumnya."""
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM suggestions WHERE request_id = ?", (request_id,)).rowcount > 0
+
+
+def create_session_store(kind=None, max_messages=10):
+    """
+    Membuat store dari environment:
+    SESSION_STORE=memory|sqlite, SESSION_TTL_SECONDS, SESSION_MAX_SESSIONS, SESSION_DB_PATH.
+    Store 'memory' hanya berlaku per proses; gunicorn.conf.py memakai 'sqlite'.
+    """
+    kind = (kind or os.environ.get("SESSION_STORE", "memory")).lower()
+    ttl_seconds = float(os.environ.get("SESSION_TTL_SECONDS", 3600))
+    max_sessions = int(os.environ.get("SESSION_MAX_SESSIONS", 10000))
+    if kind == "sqlite":
+        db_path = os.environ.get("SESSION_DB_PATH", "sessions.db")
+        return SQLiteSessionStore(db_path, max_messages, ttl_seconds, max_sessions)
+    return InMemorySessionStore(max_messages, ttl_seconds, max_sessions)
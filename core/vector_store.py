@@ -0,0 +1,597 @@
+# vector_store.py
+"""
+Satu antarmuka retrieval vektor (VectorStore) untuk semua backend:
+- ZillizVectorStore: MilvusClient ter-pool (beberapa kanal gRPC terpisah), deadline per
+  panggilan, retry dengan backoff ber-jitter untuk galat sementara;
+- AsyncZillizVectorStore: sama, di atas AsyncMilvusClient untuk AsyncChatbotService;
+- LocalVectorStore / AsyncLocalVectorStore: brute-force NumPy di dalam proses, agar seluruh
+  pipeline bisa diuji beban tanpa Zilliz.
+Semua backend mengembalikan hit dalam format yang sama (lihat hit_to_dict). Parameter ANN dan
+field yang diminta diatur per jenis query lewat SearchProfile; filter metadata (lihat
+core/search_filter.py) diterapkan di dalam pencarian, bukan setelah hasil diambil.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import UserDict
+
+import numpy as np
+
+from core.reranker import rerank_hits
+from core.search_filter import filter_expression
+
+try:
+    from pymilvus import MilvusClient, AsyncMilvusClient, MilvusException
+    from pymilvus.exceptions import ErrorCode
+    from pymilvus.client.types import Status
+except ImportError:  # hanya LocalVectorStore yang bisa dipakai tanpa pymilvus
+    MilvusClient = AsyncMilvusClient = None
+    MilvusException = ErrorCode = Status = None
+
+try:
+    import grpc
+    TRANSIENT_GRPC_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED,
+                            grpc.StatusCode.RESOURCE_EXHAUSTED, grpc.StatusCode.ABORTED)
+except ImportError:
+    grpc = None
+    TRANSIENT_GRPC_CODES = ()
+
+OUTPUT_FIELDS = ["text", "chunk_id", "document_source", "jenis_dokumen", "judul_bab", "bab", "source_file", "halaman_awal", "halaman_akhir"]
+# Field yang benar-benar dibaca pipeline jawaban (teks konteks, id untuk cache/dedup, sumber + halaman)
+CONTEXT_FIELDS = ["text", "chunk_id", "source_file", "halaman_awal"]
+DEFAULT_VECTOR_FIELD = "vector"
+
+
+class VectorStoreError(Exception):
+    """Pencarian gagal setelah semua percobaan ulang atau melewati deadline-nya."""
+
+
+class RetryPolicy:
+    """
+    Batas waktu dan percobaan ulang satu panggilan pencarian. `deadline` membatasi total
+    waktu (termasuk membuka koneksi dan jeda backoff); tiap percobaan memakai
+    timeout min(attempt_timeout, sisa deadline). Jeda = full jitter: acak(0, min(max_delay,
+    base_delay * 2^percobaan)), sehingga worker yang gagal bersamaan tidak mencoba ulang serentak.
+    """
+    def __init__(self, attempts: int = 3, deadline: float = 5.0, attempt_timeout: float = 2.0,
+                 base_delay: float = 0.05, max_delay: float = 1.0):
+        self.attempts = max(1, attempts)
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def is_transient_error(exc: Exception) -> bool:
+    """Galat yang layak dicoba ulang: koneksi putus, timeout, server sibuk/rate limit."""
+    if isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    if grpc is not None and isinstance(exc, grpc.RpcError):
+        return exc.code() in TRANSIENT_GRPC_CODES
+    if MilvusException is not None and isinstance(exc, MilvusException):
+        # Setelah retry internal pymilvus habis, kode gRPC asli dibawa sebagai `code`
+        return exc.code in (ErrorCode.RATE_LIMIT, Status.CONNECT_FAILED) or exc.code in TRANSIENT_GRPC_CODES
+    return False
+
+
+class SearchProfile:
+    """
+    Parameter pencarian ANN untuk satu jenis query. `metric_type` harus sama dengan metrik
+    indeks koleksi (L2, IP atau COSINE); `params` sesuai jenis indeks: {"nprobe": n} untuk
+    IVF, {"ef": n} untuk HNSW, {"level": n} untuk AUTOINDEX Zilliz. `top_k` adalah jumlah
+    kandidat per pencarian (per halaman untuk enumerasi) dan `output_fields` field minimal
+    yang dikirim balik oleh Zilliz.
+    """
+    def __init__(self, name: str, top_k: int = 10, metric_type: str = "L2", params: dict = None,
+                 output_fields: list = None):
+        self.name = name
+        self.top_k = top_k
+        self.metric_type = metric_type
+        self.params = dict(params if params is not None else {"nprobe": 10})
+        self.output_fields = list(output_fields or OUTPUT_FIELDS)
+
+    def search_params(self, offset: int = 0) -> dict:
+        search_params = {"metric_type": self.metric_type, "params": dict(self.params)}
+        if offset:
+            search_params["offset"] = offset
+        return search_params
+
+
+# Dipakai bila pemanggil tidak memberi profil (pemakaian mandiri store): semua field
+DEFAULT_SEARCH_PROFILE = SearchProfile("default")
+
+
+def as_query_vectors(vectors) -> list:
+    """
+    Daftar vektor query untuk `data=`: baris ndarray float32 dikirim apa adanya (pymilvus
+    mengubahnya langsung ke bytes), tanpa .tolist() yang membuat ratusan objek float per vektor.
+    """
+    array = np.asarray(vectors, dtype=np.float32)
+    if array.ndim == 1:
+        array = array[None, :]
+    return list(array)
+
+
+def format_hit(hit_id, distance, entity) -> dict:
+    """Format hit yang konsisten untuk semua backend (entity: dict / objek dengan .get)."""
+    metadata = {
+        "source_file": entity.get("source_file"),
+        "page": entity.get("halaman_awal"),
+        "judul_bab": entity.get("judul_bab"),
+        "bab": entity.get("bab"),
+        "jenis_dokumen": entity.get("jenis_dokumen")
+    }
+    return {
+        'id': hit_id,
+        'chunk_id': entity.get("chunk_id"),
+        'distance': distance,
+        'text': entity.get("text"),
+        'metadata': metadata
+    }
+
+
+def hit_to_dict(hit) -> dict:
+    """
+    Mengubah satu hit MilvusClient ke format hit. `Hit` pymilvus (UserDict) dibaca lewat
+    dict dasarnya: tanpa __getitem__ berlapis per field dan tanpa wrapper/salinan entity.
+    """
+    if isinstance(hit, UserDict):
+        raw = hit.data
+        return format_hit(hit.id, raw.get("distance"), raw.get("entity") or {})
+    return format_hit(hit.get("id"), hit.get("distance"), hit.get("entity") or {})
+
+
+class VectorStore(ABC):
+    """
+    Antarmuka bersama. Subkelas wajib mengimplementasikan search_by_vectors; encode query (CPU)
+    dan rerank opsional ada di sini. `collection_name` menjadi namespace cache jawaban.
+    Semua metode pencarian menerima `profile` (SearchProfile; default semua field) dan
+    `filters` (hasil normalize_filters; None/{} = tanpa filter).
+    """
+    collection_name = None
+
+    def __init__(self, embedding_model, reranker_model):
+        self.embedding_model = embedding_model
+        self.reranker_model = reranker_model
+
+    def search(self, query: str, top_k: int = 10, rerank: bool = False, profile: SearchProfile = None,
+               filters: dict = None):
+        """
+        Melakukan pencarian vektor dan mengembalikan kandidat mentah (urut jarak).
+        Reranking sengaja dipisah: pemanggil (ChatbotService) menjalankan tahap
+        rerank tepat satu kali per query. Set rerank=True hanya untuk pemakaian
+        mandiri store ini.
+        """
+        hits = self.search_by_vector(self.embedding_model.encode(query), top_k, profile=profile, filters=filters)
+        if rerank:
+            return self.rerank(query, hits)
+        return hits
+
+    def search_by_vector(self, query_vector, top_k: int = 10, offset: int = 0, profile: SearchProfile = None,
+                         filters: dict = None):
+        """
+        Pencarian dengan vektor yang sudah di-encode (mis. hasil satu encode batch).
+        `offset` melewati hasil teratas sehingga hasil bisa diambil per halaman.
+        """
+        return self.search_by_vectors([query_vector], top_k, offset, profile, filters)[0]
+
+    def search_many(self, queries: list, top_k: int = 10, offset: int = 0, profile: SearchProfile = None,
+                    filters: dict = None) -> list:
+        """
+        Beberapa query sekaligus (entitas perbandingan, varian query, request batch): semua
+        query di-encode dalam satu panggilan encode dan dicari dalam satu pencarian
+        multi-vektor (satu round trip). Mengembalikan satu daftar hit per query, urutan sama.
+        Filter berlaku untuk semua query.
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        return self.search_by_vectors(self.embedding_model.encode(queries), top_k, offset, profile, filters)
+
+    @abstractmethod
+    def search_by_vectors(self, query_vectors, top_k: int = 10, offset: int = 0, profile: SearchProfile = None,
+                          filters: dict = None) -> list:
+        """Satu daftar hit per vektor query, dari satu panggilan ke backend."""
+
+    def rerank(self, query: str, hits: list):
+        """Tahap rerank terpisah: satu batch CrossEncoder untuk semua hit."""
+        return rerank_hits(self.reranker_model, query, hits)
+
+    def close(self):
+        pass
+
+
+class ClientPool:
+    """
+    Beberapa klien (kanal gRPC) yang dipakai bergiliran. Satu kanal melayani banyak RPC
+    bersamaan, jadi klien tidak dipinjam eksklusif; pool membagi beban antar kanal dan
+    mengganti kanal yang rusak. Klien dibuat saat pertama dibutuhkan (setelah fork, di
+    proses yang memakainya).
+    """
+    def __init__(self, factory, size: int):
+        self._factory = factory
+        self._slots = [None] * max(1, size)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """(slot, klien) berikutnya secara round-robin; slot kosong diisi klien baru."""
+        with self._lock:
+            slot = self._next
+            self._next = (self._next + 1) % len(self._slots)
+            client = self._slots[slot]
+        if client is None:
+            client = self._factory()
+            with self._lock:
+                if self._slots[slot] is None:
+                    self._slots[slot] = client
+                else:  # thread lain sudah mengisi slot ini lebih dulu
+                    self._close(client)
+                    client = self._slots[slot]
+        return slot, client
+
+    def discard(self, slot: int, client):
+        """Kanal yang gagal dengan galat koneksi dibuang; permintaan berikutnya membuat yang baru."""
+        with self._lock:
+            if self._slots[slot] is not client:
+                return
+            self._slots[slot] = None
+        self._close(client)
+
+    @staticmethod
+    def _close(client):
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    def close(self):
+        with self._lock:
+            clients, self._slots = self._slots, [None] * len(self._slots)
+        for client in clients:
+            if client is not None:
+                self._close(client)
+
+
+class ZillizVectorStore(VectorStore):
+    """Zilliz Cloud / Milvus lewat MilvusClient ter-pool, dengan deadline dan retry."""
+
+    def __init__(self, config, embedding_model, reranker_model, pool_size: int = 4,
+                 retry_policy: RetryPolicy = None, client_factory=None):
+        """
+        `config`: collection_name, uri, token, dan opsional vector_field_name.
+        `client_factory` dapat diinjeksikan (mis. klien palsu untuk benchmark offline).
+        """
+        super().__init__(embedding_model, reranker_model)
+        self.collection_name = config['collection_name']
+        self.uri = config['uri']
+        self.token = config['token']
+        self.vector_field = config.get('vector_field_name') or DEFAULT_VECTOR_FIELD
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._pool = self._create_pool(client_factory, pool_size)
+
+    def _create_pool(self, client_factory, pool_size: int):
+        return ClientPool(client_factory or self._create_client, pool_size)
+
+    def _create_client(self):
+        # Alias berbeda per slot: setiap klien punya kanal gRPC sendiri
+        alias = f"{self.collection_name}-{os.getpid()}-{id(self)}-{random.getrandbits(32):08x}"
+        # Membuka koneksi juga dibatasi waktu, bukan hanya pencarian
+        client = MilvusClient(uri=self.uri, token=self.token, alias=alias, timeout=self.retry_policy.attempt_timeout)
+        print(f"✅ Berhasil terhubung ke Zilliz Cloud (koneksi {alias}).")
+        return client
+
+    def _search_kwargs(self, data: list, top_k: int, offset: int, deadline: float,
+                       profile: SearchProfile = None, filters: dict = None) -> dict:
+        profile = profile or DEFAULT_SEARCH_PROFILE
+        kwargs = {
+            "collection_name": self.collection_name,
+            "data": data,
+            "anns_field": self.vector_field,
+            "search_params": profile.search_params(offset),
+            "limit": top_k,
+            "output_fields": profile.output_fields,
+            "timeout": max(0.01, min(self.retry_policy.attempt_timeout, deadline - time.monotonic())),
+            # Rate limit diteruskan ke sini agar dijeda dengan jitter, bukan retry internal pymilvus
+            "retry_on_rate_limit": False,
+        }
+        if filters:
+            # Disaring di Zilliz sebelum top-k, bukan mengambil lebar lalu membuang hasil
+            kwargs["filter"] = filter_expression(filters)
+        return kwargs
+
+    def _retry_delay(self, attempt: int, error: Exception, deadline: float) -> float:
+        """Jeda sebelum percobaan berikutnya, atau VectorStoreError jika tidak layak/sempat diulang."""
+        delay = self.retry_policy.backoff(attempt)
+        last_attempt = attempt + 1 >= self.retry_policy.attempts or time.monotonic() + delay >= deadline
+        if not is_transient_error(error) or last_attempt:
+            raise VectorStoreError(f"Pencarian '{self.collection_name}' gagal setelah "
+                                   f"{attempt + 1} percobaan: {error}") from error
+        print(f"[VectorStore] Percobaan {attempt + 1} gagal ({error}); ulang dalam {delay:.2f} detik.")
+        return delay
+
+    @staticmethod
+    def _to_hit_lists(results, data: list) -> list:
+        return [[hit_to_dict(hit) for hit in hits] for hits in (results or [[] for _ in data])]
+
+    def search_by_vectors(self, query_vectors, top_k: int = 10, offset: int = 0, profile: SearchProfile = None,
+                          filters: dict = None) -> list:
+        data = as_query_vectors(query_vectors)
+        deadline = time.monotonic() + self.retry_policy.deadline
+        attempt = 0
+        while True:
+            slot = client = None
+            try:
+                slot, client = self._pool.acquire()
+                results = client.search(**self._search_kwargs(data, top_k, offset, deadline, profile, filters))
+                return self._to_hit_lists(results, data)
+            except Exception as e:
+                if client is not None and is_transient_error(e):
+                    self._pool.discard(slot, client)
+                time.sleep(self._retry_delay(attempt, e, deadline))
+                attempt += 1
+
+    def close(self):
+        self._pool.close()
+
+
+async def _search_many_async(store, queries: list, top_k: int, offset: int, profile: SearchProfile,
+                             filters: dict) -> list:
+    """Versi async dari VectorStore.search_many; encode berjalan di thread terpisah."""
+    queries = list(queries)
+    if not queries:
+        return []
+    vectors = await asyncio.to_thread(store.embedding_model.encode, queries)
+    return await store.search_by_vectors(vectors, top_k, offset, profile, filters)
+
+
+class AsyncClientPool:
+    """Versi asyncio dari ClientPool; klien dibuat dan dipakai di dalam satu event loop."""
+    def __init__(self, factory, size: int):
+        self._factory = factory
+        self._slots = [None] * max(1, size)
+        self._next = 0
+        self._creating = {}  # slot -> Task pembuatan klien, agar satu slot tidak dibuat dua kali
+
+    async def acquire(self):
+        slot = self._next
+        self._next = (self._next + 1) % len(self._slots)
+        client = self._slots[slot]
+        if client is None:
+            task = self._creating.get(slot)
+            if task is None:
+                task = self._creating[slot] = asyncio.ensure_future(self._factory())
+            try:
+                client = await task
+            finally:
+                self._creating.pop(slot, None)
+            self._slots[slot] = client
+        return slot, client
+
+    async def discard(self, slot: int, client):
+        if self._slots[slot] is not client:
+            return
+        self._slots[slot] = None
+        try:
+            await client.close()
+        except Exception:
+            pass
+
+    async def close(self):
+        clients, self._slots = self._slots, [None] * len(self._slots)
+        for client in clients:
+            if client is not None:
+                try:
+                    await client.close()
+                except Exception:
+                    pass
+
+
+class AsyncZillizVectorStore(ZillizVectorStore):
+    """
+    Varian async di atas AsyncMilvusClient: pencarian tidak memegang thread selama menunggu
+    Zilliz. Encode query (CPU) tidak dilakukan di sini; pemanggil menjalankannya di executor
+    dan mengirim vektornya ke search_by_vector. Klien dibuat di event loop yang memakainya.
+    """
+    def _create_pool(self, client_factory, pool_size: int):
+        # `client_factory` di sini adalah coroutine function
+        return AsyncClientPool(client_factory or self._create_async_client, pool_size)
+
+    async def _create_async_client(self):
+        alias = f"{self.collection_name}-async-{os.getpid()}-{id(self)}-{random.getrandbits(32):08x}"
+        client = AsyncMilvusClient(uri=self.uri, token=self.token, alias=alias,
+                                   timeout=self.retry_policy.attempt_timeout)
+        print(f"✅ Berhasil terhubung ke Zilliz Cloud (async, koneksi {alias}).")
+        return client
+
+    async def search_by_vector(self, query_vector, top_k: int = 10, offset: int = 0, profile: SearchProfile = None,
+                               filters: dict = None):
+        return (await self.search_by_vectors([query_vector], top_k, offset, profile, filters))[0]
+
+    async def search_many(self, queries: list, top_k: int = 10, offset: int = 0, profile: SearchProfile = None,
+                          filters: dict = None) -> list:
+        return await _search_many_async(self, queries, top_k, offset, profile, filters)
+
+    async def search_by_vectors(self, query_vectors, top_k: int = 10, offset: int = 0,
+                                profile: SearchProfile = None, filters: dict = None) -> list:
+        data = as_query_vectors(query_vectors)
+        deadline = time.monotonic() + self.retry_policy.deadline
+        attempt = 0
+        while True:
+            slot = client = None
+            try:
+                slot, client = await self._pool.acquire()
+                results = await client.search(**self._search_kwargs(data, top_k, offset, deadline, profile, filters))
+                return self._to_hit_lists(results, data)
+            except Exception as e:
+                if client is not None and is_transient_error(e):
+                    await self._pool.discard(slot, client)
+                await asyncio.sleep(self._retry_delay(attempt, e, deadline))
+                attempt += 1
+
+    async def close(self):
+        await self._pool.close()
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Brute-force NumPy atas matriks embedding di memori, dengan metrik profil (L2, IP, COSINE)
+    dan filter metadata yang sama dengan Zilliz. `rows` adalah entity dengan field yang sama
+    dengan OUTPUT_FIELDS.
+    """
+    def __init__(self, vectors, rows: list, embedding_model, reranker_model, collection_name: str = "local"):
+        super().__init__(embedding_model, reranker_model)
+        self.collection_name = collection_name
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.rows = rows
+        # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2; norma korpus dihitung sekali
+        self._norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        self._field_values = {}  # field -> {nilai: indeks baris}, dibangun saat field pertama kali difilter
+        self._lock = threading.Lock()
+
+    def _filtered_rows(self, filters: dict):
+        """Indeks baris yang lolos filter (AND antar field, OR antar nilai), atau None tanpa filter."""
+        if not filters:
+            return None
+        selected = None
+        for field, values in filters.items():
+            with self._lock:
+                by_value = self._field_values.get(field)
+                if by_value is None:
+                    groups = {}
+                    for i, row in enumerate(self.rows):
+                        groups.setdefault(row.get(field), []).append(i)
+                    by_value = self._field_values[field] = {value: np.asarray(ids, dtype=np.int64)
+                                                            for value, ids in groups.items()}
+            ids = [by_value[value] for value in values if value in by_value]
+            field_ids = np.unique(np.concatenate(ids)) if ids else np.zeros(0, dtype=np.int64)
+            selected = field_ids if selected is None else np.intersect1d(selected, field_ids, assume_unique=True)
+        return selected
+
+    def search_by_vectors(self, query_vectors, top_k: int = 10, offset: int = 0, profile: SearchProfile = None,
+                          filters: dict = None) -> list:
+        queries = np.stack(as_query_vectors(query_vectors))
+        row_ids = self._filtered_rows(filters)
+        if not self.rows or (row_ids is not None and row_ids.size == 0):
+            return [[] for _ in queries]
+        vectors = self.vectors if row_ids is None else self.vectors[row_ids]
+        norms = self._norms if row_ids is None else self._norms[row_ids]
+        metric = (profile or DEFAULT_SEARCH_PROFILE).metric_type.upper()
+        products = queries @ vectors.T
+        if metric == "L2":
+            distances = norms[None, :] - 2.0 * products + np.einsum('ij,ij->i', queries, queries)[:, None]
+            order_keys = distances
+        else:
+            # IP / COSINE: skor kemiripan (makin besar makin dekat), seperti "distance" dari Milvus
+            distances = products
+            if metric == "COSINE":
+                query_norms = np.sqrt(np.einsum('ij,ij->i', queries, queries))[:, None]
+                distances = products / np.maximum(query_norms * np.sqrt(norms)[None, :], 1e-12)
+            order_keys = -distances
+        limit = min(offset + top_k, len(vectors))
+        results = []
+        for row_keys, row_distances in zip(order_keys, distances):
+            if limit <= 0:
+                results.append([])
+                continue
+            candidates = np.argpartition(row_keys, limit - 1)[:limit]
+            ordered = candidates[np.argsort(row_keys[candidates])][offset:]
+            row_index = ordered if row_ids is None else row_ids[ordered]
+            results.append([format_hit(int(i), float(row_distances[j]), self.rows[i])
+                            for i, j in zip(row_index, ordered)])
+        return results
+
+    @classmethod
+    def from_pages(cls, pages, embedding_model, reranker_model, cache_dir: str = None, model_name: str = "",
+                   batch_size: int = 64, collection_name: str = "local", encoder=None):
+        """
+        Membangun store dari ((source_file, page), teks) per halaman (mis. snapshot korpus OCR),
+        satu baris per halaman. Dengan `cache_dir`, embedding disimpan (vectors-<sha1>.npy,
+        dibuka ter-memory-map sehingga dibagi antar worker) dan dipakai ulang selama model dan
+        daftar halamannya sama. `encoder` (default embedding_model) meng-encode korpus.
+        """
+        encoder = encoder or embedding_model
+        pages = [(key, text) for key, text in pages if text]
+        rows = [{"chunk_id": f"{source_file}:{page}", "text": text, "source_file": source_file,
+                 "document_source": source_file, "halaman_awal": page}
+                for (source_file, page), text in pages]
+        signature = {"model": model_name, "pages": [row["chunk_id"] for row in rows]}
+
+        vectors = None
+        if cache_dir:
+            vectors = cls._load_cached_vectors(cache_dir, signature)
+        if vectors is None:
+            texts = [row["text"] for row in rows]
+            vectors = np.concatenate(
+                [np.asarray(encoder.encode(texts[i:i + batch_size]), dtype=np.float32)
+                 for i in range(0, len(texts), batch_size)]) if texts else np.zeros((0, 1), np.float32)
+            if cache_dir:
+                cls._save_cached_vectors(cache_dir, signature, vectors)
+                vectors = cls._load_cached_vectors(cache_dir, signature)
+        print(f"[LocalVectorStore] {len(rows)} halaman siap dicari.")
+        return cls(vectors, rows, embedding_model, reranker_model, collection_name)
+
+    @staticmethod
+    def _cached_vectors_path(cache_dir: str, signature: dict) -> str:
+        # Tanda tangan (model + daftar halaman) adalah bagian dari nama file: vektor tidak
+        # pernah bisa dipasangkan dengan signature lain, meski worker lain sedang menulis
+        payload = json.dumps(signature, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return os.path.join(cache_dir, f"vectors-{hashlib.sha1(payload).hexdigest()}.npy")
+
+    @classmethod
+    def _load_cached_vectors(cls, cache_dir: str, signature: dict):
+        try:
+            vectors = np.load(cls._cached_vectors_path(cache_dir, signature), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        if vectors.ndim != 2 or vectors.shape[0] != len(signature["pages"]):
+            return None
+        return vectors
+
+    @classmethod
+    def _save_cached_vectors(cls, cache_dir: str, signature: dict, vectors):
+        """vectors-<sha1 signature>.npy dan meta.json ditulis ke file sementara lalu os.replace."""
+        os.makedirs(cache_dir, exist_ok=True)
+        path = cls._cached_vectors_path(cache_dir, signature)
+        tmp_path = os.path.join(cache_dir, f"vectors.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, vectors)
+        os.replace(tmp_path, path)
+        # meta.json hanya keterangan (file vektor aktif + signature-nya), tidak dibaca saat memuat
+        tmp_meta = os.path.join(cache_dir, f"meta.{os.getpid()}.tmp.json")
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(dict(signature, file=os.path.basename(path)), f)
+        os.replace(tmp_meta, os.path.join(cache_dir, "meta.json"))
+        # Vektor signature lama yang masih ter-memory-map di worker lain tetap terbaca setelah unlink
+        for name in os.listdir(cache_dir):
+            if name.startswith("vectors-") and name.endswith(".npy") and name != os.path.basename(path):
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    pass
+
+
+class AsyncLocalVectorStore(LocalVectorStore):
+    """LocalVectorStore untuk AsyncChatbotService: perkalian matriks dijalankan di thread."""
+
+    async def search_by_vector(self, query_vector, top_k: int = 10, offset: int = 0, profile: SearchProfile = None,
+                               filters: dict = None):
+        return (await self.search_by_vectors([query_vector], top_k, offset, profile, filters))[0]
+
+    async def search_many(self, queries: list, top_k: int = 10, offset: int = 0, profile: SearchProfile = None,
+                          filters: dict = None) -> list:
+        return await _search_many_async(self, queries, top_k, offset, profile, filters)
+
+    async def search_by_vectors(self, query_vectors, top_k: int = 10, offset: int = 0,
+                                profile: SearchProfile = None, filters: dict = None) -> list:
+        return await asyncio.to_thread(super().search_by_vectors, query_vectors, top_k, offset, profile, filters)
+
+    async def close(self):
+        pass
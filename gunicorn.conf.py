@@ -0,0 +1,62 @@
+# gunicorn.conf.py
+"""
+Konfigurasi gunicorn untuk api_server (dibaca otomatis dari direktori kerja):
+    gunicorn api_server:app
+
+Model embedding/reranker dan indeks BM25 dimuat SEKALI di master (preload_app), lalu
+dibagi copy-on-write ke semua worker. Koneksi Zilliz, klien Groq dan thread (micro-batching,
+refresh indeks gambar) baru dibuat di tiap worker setelah fork, diikuti inferensi
+pemanasan; /ready baru mengembalikan 200 setelah itu.
+
+Dengan beberapa worker, request berurutan dari satu klien bisa sampai di worker berbeda:
+- Riwayat session dan saran deferred (GET /suggestions/<request_id>) harus berada di store
+  bersama: SESSION_STORE default-nya 'sqlite' di sini, dan SESSION_STORE=memory ditolak
+  jika GUNICORN_WORKERS > 1.
+- Cache jawaban/embedding di memori, /metrics, /stats dan /cache/invalidate tetap per worker:
+  /cache/invalidate hanya membersihkan worker yang menerimanya (entri di worker lain habis
+  oleh ANSWER_CACHE_TTL_SECONDS), dan /metrics hanya melaporkan worker tersebut (lihat "pid").
+"""
+import gc
+import os
+
+# Harus di-set sebelum api_server diimpor oleh master
+os.environ.setdefault("CHATBOT_PRELOAD_ONLY", "1")
+# Tokenizer HF tidak boleh memakai thread pool yang dibuat sebelum fork
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+# Session dan saran deferred dibagi antar worker lewat file SQLite
+os.environ.setdefault("SESSION_STORE", "sqlite")
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+if workers > 1 and os.environ["SESSION_STORE"].lower() == "memory":
+    raise RuntimeError("SESSION_STORE=memory keeps sessions and deferred suggestions per worker; "
+                       "use SESSION_STORE=sqlite or GUNICORN_WORKERS=1.")
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+preload_app = True
+# Pemanasan + jawaban LLM bisa lama; worker yang macet tetap dibunuh
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+
+
+def when_ready(server):
+    # Objek hasil preload dipindah ke generasi permanen GC: siklus GC di worker tidak
+    # menyentuh (dan menyalin) halaman memorinya
+    gc.freeze()
+    server.log.info("Models preloaded in master (pid %s); forking workers.", os.getpid())
+    if server.cfg.workers > 1:
+        server.log.warning("%s workers: answer/embedding caches, /metrics, /stats and /cache/invalidate "
+                           "are per worker; sessions and deferred suggestions use SESSION_STORE=%s.",
+                           server.cfg.workers, os.environ["SESSION_STORE"])
+
+
+def post_worker_init(worker):
+    # Dipanggil setelah aplikasi tersedia di worker dan sebelum worker menerima koneksi
+    import api_server
+
+    service = api_server.chatbot_service
+    if service is None:
+        return
+    service.connect()
+    if not service.warmup():
+        worker.log.warning("Warmup failed in worker %s; /ready will report 503.", os.getpid())
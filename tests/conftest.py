@@ -0,0 +1,68 @@
+# tests/conftest.py
+"""
+Fixture bersama: ChatbotService asli di atas komponen palsu dari benchmarks/support.py
+(model, Zilliz dan Groq disimulasikan tanpa jeda), serta klien uji Flask untuk api_server.
+"""
+import importlib
+import json
+
+import pytest
+
+from benchmarks.support import (FakeAsyncGroqClient, FakeCrossEncoder, FakeEmbeddingModel, FakeGroqClient,
+                                build_fake_async_service, build_fake_service)
+from core.llm_answer import AsyncLLMAnswerGenerator, LLMAnswerGenerator
+
+QUERY = "Apa ketentuan kebijakan cuti tahunan?"
+
+
+def fake_llm(client=None, policy=None) -> LLMAnswerGenerator:
+    return LLMAnswerGenerator(client=client or FakeGroqClient(latency=0.0, token_delay=0.0, answer_tokens=8),
+                              policy=policy)
+
+
+def fake_service(llm_generator=None, **kwargs):
+    return build_fake_service(num_chunks=200, zilliz_latency=0.0,
+                              embedding_model=FakeEmbeddingModel(cost_per_call=0.0, cost_per_text=0.0),
+                              reranker_model=FakeCrossEncoder(cost_per_call=0.0, cost_per_pair=0.0),
+                              llm_generator=llm_generator or fake_llm(), **kwargs)
+
+
+def fake_async_service():
+    return build_fake_async_service(
+        num_chunks=200, zilliz_latency=0.0,
+        embedding_model=FakeEmbeddingModel(cost_per_call=0.0, cost_per_text=0.0),
+        reranker_model=FakeCrossEncoder(cost_per_call=0.0, cost_per_pair=0.0),
+        llm_generator=AsyncLLMAnswerGenerator(client=FakeAsyncGroqClient(latency=0.0, token_delay=0.0)))
+
+
+def parse_sse(body: str) -> list:
+    """[(event, data)] dari badan text/event-stream hasil format_sse."""
+    events = []
+    for message in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def close_service(service):
+    """Menunggu tugas latar (saran, map-reduce) selesai agar tidak ada log setelah sesi pytest ditutup."""
+    service.suggestion_executor.shutdown(wait=True)
+    service.llm_executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def service():
+    service = fake_service()
+    yield service
+    close_service(service)
+
+
+@pytest.fixture
+def api_client(monkeypatch, service):
+    """Klien uji Flask; api_server diimpor dengan ChatbotService palsu (tanpa model/koneksi asli)."""
+    import chatbot_service
+
+    monkeypatch.setattr(chatbot_service, "ChatbotService", lambda preload_only=False: service)
+    api_server = importlib.import_module("api_server")
+    monkeypatch.setattr(api_server, "chatbot_service", service)
+    return api_server.app.test_client()
@@ -0,0 +1,108 @@
+# tests/test_async_service.py
+"""
+AsyncChatbotService di atas komponen palsu async: saran sebagai task, tanpa thread pool sinkron,
+serta putaran penuh /chat, /chat/stream dan /source_image lewat asgi_server.
+"""
+import asyncio
+import importlib
+import threading
+
+import pytest
+from starlette.testclient import TestClient
+
+from core.image_serving import SourceImageResolver, ThumbnailCache
+from tests.conftest import QUERY, fake_async_service, parse_sse
+
+
+def test_async_service_has_no_sync_executors():
+    service = fake_async_service()
+    assert service.suggestion_executor is None
+    assert service.llm_executor is None
+
+
+def test_async_response_runs_suggestions_without_suggestion_threads():
+    service = fake_async_service()
+    response = asyncio.run(service.get_response(QUERY, []))
+
+    assert response["answer"].startswith("- Jawaban")
+    assert response["suggestions"] == ['Apa dasar hukumnya?', 'Siapa yang berwenang?', 'Kapan mulai berlaku?']
+    assert not [thread for thread in threading.enumerate()
+                if thread.name.startswith(("suggestions", "llm_"))]
+    service.cpu_executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def asgi_client(monkeypatch, tmp_path):
+    """
+    TestClient Starlette untuk asgi_server di atas AsyncChatbotService palsu. Semua request
+    (dan lifespan: warmup, penutupan pool) berjalan di satu event loop milik klien uji.
+    """
+    import async_chatbot_service
+
+    service = fake_async_service()
+    monkeypatch.setattr(async_chatbot_service, "AsyncChatbotService", lambda: service)
+    asgi_server = importlib.import_module("asgi_server")
+    monkeypatch.setattr(asgi_server, "chatbot_service", service)
+    images = tmp_path / "output" / "Manual_Akuntansi" / "images"
+    images.mkdir(parents=True)
+    (images / "p13_full.png").write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(range(256)))
+    monkeypatch.setattr(asgi_server, "source_images", SourceImageResolver(
+        str(tmp_path / "output"), thumbnails=ThumbnailCache(str(tmp_path / "thumbs"), 1 << 20)))
+    with TestClient(asgi_server.app) as client:
+        yield client
+    service.cpu_executor.shutdown(wait=True)
+
+
+def test_asgi_chat_round_trip(asgi_client):
+    assert asgi_client.get("/ready").json()["status"] == "ready"
+    response = asgi_client.post("/chat", json={"query": QUERY, "history": []})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["answer"].startswith("- Jawaban")
+    assert body["sources"]
+    assert body["suggestions"] == ['Apa dasar hukumnya?', 'Siapa yang berwenang?', 'Kapan mulai berlaku?']
+
+    deferred = asgi_client.post("/chat", json={"query": "Bagaimana prosedur lembur?", "history": [],
+                                               "defer_suggestions": True}).json()
+    assert deferred["suggestions"] == []  # diambil lewat /suggestions/<request_id>
+    fetched = asgi_client.get(f"/suggestions/{deferred['request_id']}")
+    assert fetched.status_code == 200 and len(fetched.json()["suggestions"]) == 3
+    assert asgi_client.get(f"/suggestions/{deferred['request_id']}").status_code == 404
+
+    assert asgi_client.post("/chat", json={"history": []}).status_code == 400
+
+
+def test_asgi_chat_stream_round_trip(asgi_client):
+    response = asgi_client.post("/chat/stream", json={"query": QUERY, "history": []})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "sources" and names[-2:] == ["suggestions", "done"]
+    assert set(names[1:-2]) == {"token"}
+    answer = "".join(data for name, data in events if name == "token")
+    assert answer.startswith("- Jawaban")
+    assert events[-1][1]["updated_history"][-1] == {"role": "bot", "content": answer.strip()}
+
+    # Query yang sama dijawab dari cache jawaban: satu event token
+    cached = parse_sse(asgi_client.post("/chat/stream", json={"query": QUERY, "history": []}).text)
+    assert [name for name, _ in cached] == ["sources", "token", "suggestions", "done"]
+    assert cached[-1][1]["cache_hit"] is True
+
+
+def test_asgi_source_image_conditional_requests(asgi_client):
+    url = "/source_image/Manual_Akuntansi/images/p13_full.png"
+    response = asgi_client.get(url)
+    assert response.status_code == 200
+    assert response.content.startswith(b"\x89PNG")
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+    assert response.headers["cache-control"].startswith("public, max-age=")
+
+    for headers in ({"If-None-Match": etag}, {"If-Modified-Since": last_modified}):
+        not_modified = asgi_client.get(url, headers=headers)
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == etag
+
+    assert asgi_client.get(url, headers={"If-None-Match": '"lain"'}).status_code == 200
+    assert asgi_client.get("/source_image/../rahasia.txt").status_code == 404
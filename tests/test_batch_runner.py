@@ -0,0 +1,167 @@
+# tests/test_batch_runner.py
+"""Penjadwalan dan resume batch (core/batch_runner.py): heap retry, AIMD, LLMError, JSONL terpotong."""
+import asyncio
+import json
+import time
+
+import pytest
+
+from core import batch_runner
+from core.batch_runner import (AdaptiveConcurrency, AsyncBatchRunner, BatchJob, BatchRunner, BatchScheduler,
+                               JsonlResultWriter)
+from core.llm_client import LLMError
+from tests.conftest import QUERY
+
+
+def jobs(*ids):
+    return [BatchJob(job_id, f"Apa ketentuan {job_id}?") for job_id in ids]
+
+
+@pytest.fixture
+def fixed_delays(monkeypatch):
+    """Jeda retry berurutan dari daftar, menggantikan jitter acak."""
+    def install(*delays):
+        remaining = iter(delays)
+        monkeypatch.setattr(batch_runner.random, "uniform", lambda low, high: next(remaining))
+    return install
+
+
+def test_due_retries_run_before_pending_in_due_order(fixed_delays):
+    fixed_delays(2.0, 1.0)
+    scheduler = BatchScheduler(jobs("a", "b", "c", "d"), concurrency=2, max_attempts=3)
+    start = time.monotonic()
+    a, b = scheduler.next_job(start), scheduler.next_job(start)
+    assert scheduler.next_job(start) is None  # kapasitas penuh
+
+    assert scheduler.complete(a, error=RuntimeError("Zilliz timeout")) is None  # jatuh tempo +2 detik
+    assert scheduler.complete(b, error=RuntimeError("Zilliz timeout")) is None  # jatuh tempo +1 detik
+    assert scheduler.counts["retried"] == 2
+
+    # Retry belum jatuh tempo: job baru jalan dulu, dan waktu tunggu = retry terdekat
+    c = scheduler.next_job(start)
+    assert c.id == "c"
+    assert scheduler.wait_time(start) == pytest.approx(1.0, abs=0.1)
+
+    later = start + 5.0
+    retried_b = scheduler.next_job(later)
+    assert (retried_b.id, retried_b.attempts) == ("b", 2)
+    scheduler.complete(c, response={"answer": "ok", "sources": []})
+    assert scheduler.next_job(later).id == "a"
+    assert scheduler.next_job(later) is None
+
+
+def test_adaptive_concurrency_halves_once_per_hold_window():
+    limiter = AdaptiveConcurrency(8, hold_seconds=1.0)
+    limiter.on_rate_limited(100.0)
+    assert limiter.limit == 4
+    limiter.on_rate_limited(100.5)  # job lain dari gelombang yang sama
+    assert limiter.limit == 4
+    limiter.on_rate_limited(101.0)
+    assert limiter.limit == 2
+    limiter.on_rate_limited(102.0)
+    limiter.on_rate_limited(103.0)
+    assert limiter.limit == 1  # tidak di bawah minimum
+
+
+def test_adaptive_concurrency_grows_by_one_after_limit_successes():
+    limiter = AdaptiveConcurrency(3, hold_seconds=0.0)
+    limiter.on_rate_limited(0.0)
+    assert limiter.limit == 1
+    limiter.on_success()
+    assert limiter.limit == 2
+    limiter.on_success()
+    limiter.on_rate_limited(1.0)  # 429 mengulang hitungan keberhasilan
+    assert limiter.limit == 1
+    for _ in range(1 + 2 + 10):
+        limiter.on_success()
+    assert limiter.limit == 3  # tidak melebihi maksimum
+
+
+def test_non_retryable_llm_error_fails_without_retry():
+    scheduler = BatchScheduler(jobs("a"), concurrency=4, max_attempts=5)
+    job = scheduler.next_job(time.monotonic())
+    line = scheduler.complete(job, error=LLMError("context too long", "error", retryable=False))
+
+    assert line["status"] == "error"
+    assert line["attempts"] == 1
+    assert line["error"].startswith("LLM error (error)")
+    assert scheduler.counts == {"ok": 0, "error": 1, "retried": 0}
+    assert scheduler.done()
+
+
+def test_rate_limited_llm_error_is_retried_and_halves_concurrency(fixed_delays):
+    fixed_delays(0.0)
+    scheduler = BatchScheduler(jobs("a"), concurrency=4, max_attempts=2)
+    job = scheduler.next_job(time.monotonic())
+    assert scheduler.complete(job, error=LLMError("429", "rate_limit", retryable=True, retry_after=1.0)) is None
+    assert scheduler.limiter.limit == 2
+    assert scheduler.counts["retried"] == 1
+
+    job = scheduler.next_job(time.monotonic() + 1.0)
+    line = scheduler.complete(job, error=LLMError("429", "rate_limit", retryable=True))
+    assert (line["status"], line["attempts"]) == ("error", 2)  # max_attempts tercapai
+
+
+def test_writer_resumes_after_truncated_last_line(tmp_path):
+    path = tmp_path / "hasil.jsonl"
+    lines = [{"id": "a", "status": "ok"}, {"id": "b", "status": "error"},
+             {"id": "c", "status": "error"}, {"id": "c", "status": "ok"}, {"id": 7, "status": "invalid"}]
+    path.write_text("".join(json.dumps(line) + "\n" for line in lines) + '{"id": "d", "sta', encoding="utf-8")
+    assert JsonlResultWriter._ends_without_newline(str(path))
+
+    writer = JsonlResultWriter(str(path))
+    assert writer.completed == {"a", "c", "7"}
+    assert not writer.is_done("b") and not writer.is_done("d")
+    writer.write({"id": "d", "status": "ok"})
+    writer.write({"id": "b", "status": "ok"})
+    writer.close()
+
+    assert not JsonlResultWriter._ends_without_newline(str(path))
+    assert path.read_text(encoding="utf-8").splitlines()[-3:] == [
+        '{"id": "d", "sta', '{"id": "d", "status": "ok"}', '{"id": "b", "status": "ok"}']
+    assert JsonlResultWriter(str(path)).completed == {"a", "b", "c", "d", "7"}
+
+
+def test_writer_restart_discards_previous_results(tmp_path):
+    path = tmp_path / "hasil.jsonl"
+    path.write_text('{"id": "a", "status": "ok"}\n', encoding="utf-8")
+    writer = JsonlResultWriter(str(path), resume=False)
+    assert writer.completed == set()
+    writer.close()
+    assert path.read_text(encoding="utf-8") == ""
+
+
+def test_batch_runner_answers_every_job(service):
+    runner = BatchRunner(service, concurrency=2)
+    results = list(runner.run([BatchJob(i, f"{QUERY} ({i})") for i in range(4)]))
+
+    assert sorted(result["id"] for result in results) == [0, 1, 2, 3]
+    assert {result["status"] for result in results} == {"ok"}
+    assert all(result["answer"].startswith("- Jawaban") for result in results)
+    assert runner.scheduler.counts == {"ok": 4, "error": 0, "retried": 0}
+
+
+class SlowAsyncService:
+    """Service async palsu: query "cepat" langsung dijawab, sisanya menggantung."""
+    llm_generator = None
+
+    def prefetch_embeddings(self, queries):
+        return 0
+
+    async def get_response(self, query, history, filters=None, suggestions=True):
+        if query != "cepat":
+            await asyncio.sleep(30)
+        return {"answer": "ok", "sources": []}
+
+
+def test_async_runner_awaits_cancelled_jobs_when_consumer_stops():
+    async def consume_one():
+        runner = AsyncBatchRunner(SlowAsyncService(), concurrency=4, prefetch_size=0)
+        results = runner.run([BatchJob("fast", "cepat")] + [BatchJob(i, "lambat") for i in range(3)])
+        first = await results.__anext__()
+        await results.aclose()
+        return first, [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    first, leftover = asyncio.run(consume_one())
+    assert first["id"] == "fast"
+    assert leftover == []
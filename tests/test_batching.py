@@ -0,0 +1,64 @@
+# tests/test_batching.py
+"""Micro-batching (core/batching.py): pembagian hasil per request dan isolasi galat batch."""
+import pytest
+
+from core.batching import BatchedEmbeddingModel, MicroBatcher
+
+
+class RecordingModel:
+    """batch_fn palsu: panjang tiap teks, gagal jika ada teks 'buruk' di dalam batch."""
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, items):
+        self.calls.append(list(items))
+        if "buruk" in items:
+            raise ValueError("input tidak valid")
+        return [len(item) for item in items]
+
+
+def test_requests_are_merged_and_results_split_in_order():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=200)
+    futures = [batcher.submit(["a", "bb"]), batcher.submit(["ccc"]), batcher.submit(["dddd", "e"])]
+
+    assert [future.result(timeout=2) for future in futures] == [[1, 2], [3], [4, 1]]
+    assert model.calls == [["a", "bb", "ccc", "dddd", "e"]]
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["split_retries"] == 0
+
+
+def test_failed_batch_is_retried_per_request_so_only_the_bad_request_fails():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=200)
+    good, bad, other = batcher.submit(["a"]), batcher.submit(["buruk", "bb"]), batcher.submit(["ccc"])
+
+    assert good.result(timeout=2) == [1]
+    assert other.result(timeout=2) == [3]
+    with pytest.raises(ValueError, match="tidak valid"):
+        bad.result(timeout=2)
+    assert model.calls == [["a", "buruk", "bb", "ccc"], ["a"], ["buruk", "bb"], ["ccc"]]
+    stats = batcher.stats()
+    assert stats["split_retries"] == 1 and stats["batches"] == 2 and stats["items"] == 2
+
+
+def test_single_request_failure_is_not_retried():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_wait_ms=0)
+    with pytest.raises(ValueError):
+        batcher(["buruk"])
+    assert model.calls == [["buruk"]]
+    assert batcher(["ok"]) == [2]  # worker tetap hidup setelah galat
+
+
+def test_batched_embedding_model_unwraps_single_sentence():
+    class Encoder:
+        dimension = 3
+
+        def encode(self, sentences, **kwargs):
+            return [[len(sentence)] * 3 for sentence in sentences] if not kwargs else "langsung"
+
+    model = BatchedEmbeddingModel(Encoder(), max_wait_ms=0)
+    assert model.encode("abcd") == [4, 4, 4]
+    assert model.encode(["a", "bb"]) == [[1, 1, 1], [2, 2, 2]]
+    assert model.encode(["a"], normalize_embeddings=True) == "langsung"
+    assert model.dimension == 3
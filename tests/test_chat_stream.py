@@ -0,0 +1,116 @@
+# tests/test_chat_stream.py
+"""/chat/stream (api_server): urutan event SSE, payload 'done', delta riwayat session, LLMError di tengah stream."""
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.support import FakeGroqClient
+from core.llm_client import LLMError, LLMPolicy
+from tests.conftest import QUERY, close_service, fake_llm, fake_service, parse_sse
+
+
+class BrokenStreamGroqClient(FakeGroqClient):
+    """Stream jawaban yang putus dengan 503 setelah `tokens_before_error` token."""
+    def __init__(self, tokens_before_error=3):
+        super().__init__(latency=0.0, token_delay=0.0, answer_tokens=8)
+        self.tokens_before_error = tokens_before_error
+
+    def _stream(self, tokens):
+        yield from super()._stream(tokens[:self.tokens_before_error])
+        error = Exception("Error code: 503 - Service Unavailable")
+        error.status_code = 503
+        error.response = SimpleNamespace(headers={})
+        raise error
+
+
+def stream(client, body):
+    response = client.post("/chat/stream", json=body)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    return parse_sse(response.get_data(as_text=True))
+
+
+def test_stream_event_order_and_done_payload(api_client):
+    events = stream(api_client, {"query": QUERY, "history": []})
+    names = [name for name, _ in events]
+
+    assert names[0] == "sources"
+    assert names[-2:] == ["suggestions", "done"]
+    assert set(names[1:-2]) == {"token"} and len(names) > 4
+    assert events[0][1], "sumber dikirim sebelum token pertama"
+
+    answer = "".join(data for name, data in events if name == "token")
+    assert answer.startswith("- Jawaban")
+    assert events[-2][1] == ['Apa dasar hukumnya?', 'Siapa yang berwenang?', 'Kapan mulai berlaku?']
+
+    done = events[-1][1]
+    assert done["request_id"]
+    assert done["cache_hit"] is False
+    assert done["prompt_tokens"] > 0
+    assert done["updated_history"] == [{"role": "user", "content": QUERY},
+                                       {"role": "bot", "content": answer.strip()}]
+    assert "session_id" not in done
+
+
+def test_stream_repeated_query_is_answered_from_cache(api_client):
+    first = stream(api_client, {"query": QUERY, "history": []})
+    second = stream(api_client, {"query": QUERY, "history": []})
+
+    assert [name for name, _ in second] == ["sources", "token", "suggestions", "done"]
+    assert second[-1][1]["cache_hit"] is True
+    assert second[1][1] == "".join(data for name, data in first if name == "token").strip()
+
+
+def test_stream_session_returns_only_new_turns(api_client, service):
+    first = stream(api_client, {"query": QUERY, "session_id": None})[-1][1]
+    session_id = first["session_id"]
+    assert [turn["role"] for turn in first["new_turns"]] == ["user", "bot"]
+    assert "updated_history" not in first
+
+    follow_up = "Siapa yang berwenang menyetujuinya?"
+    second = stream(api_client, {"query": follow_up, "session_id": session_id})[-1][1]
+    assert second["session_id"] == session_id
+    assert [turn["content"] for turn in second["new_turns"]][0] == follow_up
+    assert len(second["new_turns"]) == 2
+
+    # Riwayat lengkap hanya ada di server: dua giliran pertama + delta kedua
+    assert service.session_store.get(session_id) == first["new_turns"] + second["new_turns"]
+
+
+def test_llm_error_mid_stream_becomes_error_event(monkeypatch, api_client, service):
+    monkeypatch.setattr(service, "llm_generator", fake_llm(BrokenStreamGroqClient(tokens_before_error=3)))
+
+    events = stream(api_client, {"query": QUERY, "session_id": "s-1"})
+    names = [name for name, _ in events]
+
+    assert names == ["sources", "token", "token", "token", "error"]
+    error = events[-1][1]
+    assert error["kind"] == "unavailable"
+    assert error["error"] == "The AI service is temporarily unavailable."
+    # Jawaban yang putus tidak masuk riwayat session maupun cache jawaban
+    assert service.session_store.get("s-1") == []
+    assert service.answer_cache.stats()["entries"] == 0
+
+
+@pytest.mark.parametrize("body", [{}, {"query": ""}, {"query": QUERY, "history": "x"}])
+def test_stream_rejects_invalid_body(api_client, body):
+    assert api_client.post("/chat/stream", json=body).status_code == 400
+
+
+def test_get_response_raises_llm_error_without_caching():
+    failing = FakeGroqClient(latency=0.0, token_delay=0.0)
+    def create(*args, **kwargs):
+        error = Exception("Error code: 429 - rate limit reached")
+        error.status_code = 429
+        error.response = SimpleNamespace(headers={"retry-after": "0"})
+        raise error
+    failing.chat.completions.create = create
+    service = fake_service(fake_llm(failing, LLMPolicy(attempts=1)))
+
+    try:
+        with pytest.raises(LLMError) as raised:
+            service.get_response(QUERY, [])
+        assert raised.value.kind == "rate_limit"
+        assert service.answer_cache.stats()["entries"] == 0
+    finally:
+        close_service(service)
@@ -0,0 +1,151 @@
+# tests/test_context_packer.py
+"""
+Penyusun konteks (core/context_packer.py): anggaran token pack, potongan blok pertama,
+pembuangan chunk hampir sama (shingle), pemecahan chunk map, dan urutan fallback tokenizer
+HF -> tiktoken -> perkiraan karakter.
+"""
+import sys
+import types
+
+import pytest
+
+from core import context_packer
+from core.context_packer import CHARS_PER_TOKEN, ContextPacker, TokenCounter
+
+
+class WordEncoding:
+    """Encoding palsu: satu token per kata (spasi dipertahankan pada token berikutnya)."""
+    def __init__(self):
+        self.vocab = []
+
+    def encode(self, text, **kwargs):
+        ids = []
+        for i, word in enumerate(text.split(" ")):
+            piece = word if i == 0 else " " + word
+            if piece not in self.vocab:
+                self.vocab.append(piece)
+            ids.append(self.vocab.index(piece))
+        return ids
+
+    def decode(self, ids):
+        return "".join(self.vocab[i] for i in ids)
+
+
+@pytest.fixture
+def word_counter(monkeypatch):
+    monkeypatch.setattr(context_packer, "tiktoken", types.SimpleNamespace(get_encoding=lambda name: WordEncoding()))
+    counter = TokenCounter()
+    assert counter.exact and counter.name == "tiktoken:cl100k_base"
+    return counter
+
+
+def words(n, start=0):
+    return " ".join(f"w{i}" for i in range(start, start + n))
+
+
+def hit(text, **extra):
+    return dict(text=text, **extra)
+
+
+def test_fallback_to_character_estimate(monkeypatch):
+    monkeypatch.setattr(context_packer, "tiktoken", None)
+    counter = TokenCounter()
+    assert not counter.exact and counter.name == f"approx:{CHARS_PER_TOKEN}_chars_per_token"
+    assert counter.count("") == 0
+    assert counter.count("a" * 8) == 3  # 8 / 3.5 dibulatkan ke atas
+    assert counter.truncate("satu dua tiga empat", 3) == "satu dua"  # 10 karakter, kata terpotong dibuang
+    assert counter.truncate("pendek", 100) == "pendek" and counter.truncate("teks", 0) == ""
+
+
+def test_fallback_from_failed_hf_tokenizer_to_tiktoken_then_estimate(monkeypatch):
+    class AutoTokenizer:
+        @staticmethod
+        def from_pretrained(name):
+            raise OSError(f"{name} tidak ditemukan")
+
+    monkeypatch.setitem(sys.modules, "transformers", types.SimpleNamespace(AutoTokenizer=AutoTokenizer))
+    monkeypatch.setattr(context_packer, "tiktoken", types.SimpleNamespace(get_encoding=lambda name: WordEncoding()))
+    assert TokenCounter("meta-llama/tidak-ada").name == "tiktoken:cl100k_base"
+
+    def missing_encoding(name):
+        raise ValueError("encoding belum di-cache")
+
+    monkeypatch.setattr(context_packer, "tiktoken", types.SimpleNamespace(get_encoding=missing_encoding))
+    assert TokenCounter("meta-llama/tidak-ada").name.startswith("approx:")
+
+
+def test_hf_tokenizer_is_preferred(monkeypatch):
+    encoding = WordEncoding()
+
+    class FakeTokenizer:
+        model_max_length = 512
+
+        def encode(self, text, add_special_tokens=True):
+            assert add_special_tokens is False
+            return encoding.encode(text)
+
+        def decode(self, ids):
+            return encoding.decode(ids)
+
+    class AutoTokenizer:
+        @staticmethod
+        def from_pretrained(name):
+            return FakeTokenizer()
+
+    monkeypatch.setitem(sys.modules, "transformers", types.SimpleNamespace(AutoTokenizer=AutoTokenizer))
+    counter = TokenCounter("llama-3")
+    assert counter.name == "hf:llama-3"
+    assert counter._hf_tokenizer.model_max_length == 10 ** 9
+    assert counter.count(words(7)) == 7
+    assert counter.truncate(words(7), 4) == words(3)
+
+
+def test_pack_fills_budget_in_order_and_skips_blocks_that_do_not_fit(word_counter):
+    packer = ContextPacker(word_counter, dedup_threshold=0, min_block_tokens=2)
+    hits = [hit(words(10, 0)), hit(words(30, 100)), hit(words(5, 200)), hit(words(5, 300))]
+    packed = packer.pack(hits, budget_tokens=22, format_block=lambda h: h["text"])
+
+    # Blok kedua (30 token) dilewati; blok kecil sesudahnya masih masuk. "\n\n" = 1 token pemisah
+    assert packed["hits"] == [hits[0], hits[2], hits[3]]
+    assert packed["block_tokens"] == [10, 5, 5]
+    assert packed["tokens"] == 22
+    assert (packed["over_budget"], packed["truncated"], packed["duplicates"]) == (1, 0, 0)
+
+    limited = packer.pack(hits, budget_tokens=1000, format_block=lambda h: h["text"], max_blocks=2)
+    assert limited["hits"] == hits[:2]
+
+
+def test_pack_truncates_only_the_first_block_and_stops_below_min_block(word_counter):
+    packer = ContextPacker(word_counter, dedup_threshold=0, min_block_tokens=4)
+    hits = [hit(words(50)), hit(words(3, 100))]
+    packed = packer.pack(hits, budget_tokens=20, format_block=lambda h: "[S] " + h["text"])
+    # 20 token pertama, lalu kata terakhir (yang mungkin terpotong) dibuang
+    assert packed["blocks"] == ["[S] " + words(18)]
+    assert packed["truncated"] == 1 and packed["tokens"] == 19
+    # Sisa anggaran 1 < min_block_tokens: berhenti tanpa menghitung blok berikutnya
+    assert packed["over_budget"] == 0 and len(packed["hits"]) == 1
+
+
+def test_pack_drops_near_duplicates_and_contained_chunks(word_counter):
+    packer = ContextPacker(word_counter, dedup_threshold=0.85, min_block_tokens=1)
+    base = words(40)
+    hits = [hit(base, id="asli"),
+            hit(base.replace("w39", "x39"), id="hampir-sama"),   # 35 dari 36 shingle sama
+            hit(words(12, 10), id="termuat"),                    # seluruhnya bagian dari chunk asli
+            hit(words(40, 20), id="tumpang-tindih-separuh"),     # overlap 16/36 shingle
+            hit("Cuti tahunan 12 hari", id="pendek")]
+    packed = packer.pack(hits, budget_tokens=10000, format_block=lambda h: h["text"])
+    assert [h["id"] for h in packed["hits"]] == ["asli", "tumpang-tindih-separuh", "pendek"]
+    assert packed["duplicates"] == 2
+
+    off = ContextPacker(word_counter, dedup_threshold=0).pack(hits, 10000, lambda h: h["text"])
+    assert len(off["hits"]) == 5 and off["duplicates"] == 0
+
+
+def test_chunk_groups_blocks_up_to_max_tokens(word_counter):
+    packer = ContextPacker(word_counter)
+    blocks = [words(4, 0), words(4, 10), words(4, 20), words(9, 30)]
+    assert packer.chunk(blocks, 8) == ["\n\n".join(blocks[:2]), blocks[2], blocks[3]]
+    # block_tokens dari pack dipakai apa adanya; blok tunggal yang melebihi batas tetap satu chunk
+    assert packer.chunk(blocks, 8, block_tokens=[1, 1, 1, 1]) == ["\n\n".join(blocks)]
+    assert packer.chunk([], 8) == []
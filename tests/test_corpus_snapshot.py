@@ -0,0 +1,105 @@
+# tests/test_corpus_snapshot.py
+"""
+Snapshot korpus (core/corpus_snapshot.py) lewat JSONCorpusLoader: kompilasi awal, kompilasi
+ulang inkremental setelah mtime berubah, pembaca lama vs baru, dan header rusak/terpotong.
+"""
+import json
+import os
+import struct
+
+import pytest
+
+from core.corpus_snapshot import HEADER_FORMAT, HEADER_SIZE, SNAPSHOT_MAGIC, CorpusSnapshot, compile_snapshot, open_snapshot
+from core.json_loader import SNAPSHOT_FILENAME, JSONCorpusLoader
+
+
+def write_document(output_dir, name, pages, mtime_ns):
+    folder = output_dir / name
+    folder.mkdir(exist_ok=True)
+    path = folder / f"{name}_o_dt.json"
+    details = [{"page": page, "text": line} for page, lines in pages.items() for line in lines]
+    path.write_text(json.dumps({"ocr_details": details}), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    write_document(tmp_path, "SOP_Cuti", {1: ["Cuti tahunan", "12 hari kerja"], 2: ["Cuti sakit"]}, 1_000_000_000)
+    write_document(tmp_path, "Manual", {4: ["Jurnal penyesuaian"]}, 1_000_000_000)
+    return tmp_path
+
+
+def test_build_then_partial_recompile_after_mtime_change(corpus):
+    loader = JSONCorpusLoader(str(corpus))
+    assert len(loader.snapshot) == 3
+    assert loader.get_page_text("SOP_Cuti.pdf", 1) == "Cuti tahunan\n12 hari kerja"
+    assert loader.index.search_hits("penyesuaian")[0]["metadata"] == {"source_file": "Manual.pdf", "page": 4}
+    old_reader = loader.snapshot
+
+    # Tanpa perubahan: snapshot lama dibuka apa adanya, tidak ditulis ulang
+    written = os.stat(corpus / SNAPSHOT_FILENAME).st_ino
+    unchanged = JSONCorpusLoader(str(corpus))
+    assert os.stat(corpus / SNAPSHOT_FILENAME).st_ino == written
+    unchanged.snapshot.close()
+
+    write_document(corpus, "SOP_Cuti", {1: ["Cuti tahunan 14 hari kerja"], 3: ["Cuti besar"]}, 2_000_000_000)
+    parsed = []
+    sources = {rel: os.stat(corpus / rel).st_mtime_ns for rel in ("SOP_Cuti/SOP_Cuti_o_dt.json", "Manual/Manual_o_dt.json")}
+    snapshot, stats = compile_snapshot(str(corpus / SNAPSHOT_FILENAME), sources,
+                                       lambda rel: parsed.append(rel) or loader._read_json_pages(rel))
+    assert stats == {"reused": 1, "parsed": 1, "removed": 0}
+    assert parsed == ["SOP_Cuti/SOP_Cuti_o_dt.json"]
+
+    # Pembaca baru melihat teks baru; halaman yang hilang kosong, file yang tidak berubah disalin
+    assert snapshot.get_text("SOP_Cuti.pdf", 1) == "Cuti tahunan 14 hari kerja"
+    assert snapshot.get_text("SOP_Cuti.pdf", 3) == "Cuti besar"
+    assert ("SOP_Cuti.pdf", 2) not in snapshot and snapshot.get_text("SOP_Cuti.pdf", 2) == ""
+    assert snapshot.get_text("Manual.pdf", 4) == "Jurnal penyesuaian"
+    # Pembaca lama tetap memetakan file lama (diganti atomik, bukan ditimpa di tempat)
+    assert old_reader.get_text("SOP_Cuti.pdf", 1) == "Cuti tahunan\n12 hari kerja"
+    old_reader.close()
+
+    reloaded = JSONCorpusLoader(str(corpus))
+    assert reloaded.get_page_text("SOP_Cuti.pdf", 1) == "Cuti tahunan 14 hari kerja"
+    assert reloaded.index.search("besar")
+    snapshot.close()
+    reloaded.snapshot.close()
+
+
+def test_removed_and_unparseable_files(corpus):
+    JSONCorpusLoader(str(corpus)).snapshot.close()
+    (corpus / "Manual" / "Manual_o_dt.json").unlink()
+    (corpus / "SOP_Cuti" / "SOP_Cuti_o_dt.json").write_text("{bukan json", encoding="utf-8")
+
+    loader = JSONCorpusLoader(str(corpus))
+    assert len(loader.snapshot) == 0 and len(loader.index) == 0
+    # File rusak tercatat tanpa halaman sehingga tidak di-parse ulang sampai mtime berubah
+    assert loader.snapshot.files["SOP_Cuti/SOP_Cuti_o_dt.json"]["pages"] == []
+    assert "Manual/Manual_o_dt.json" not in loader.snapshot.files
+    loader.snapshot.close()
+
+
+@pytest.mark.parametrize("damage", ["bad_magic", "truncated_header", "truncated_body", "empty"])
+def test_corrupt_snapshot_is_rejected_and_rebuilt(corpus, damage):
+    JSONCorpusLoader(str(corpus)).snapshot.close()
+    path = corpus / SNAPSHOT_FILENAME
+    data = path.read_bytes()
+    if damage == "bad_magic":
+        data = b"XXXXXXXX" + data[8:]
+    elif damage == "truncated_header":
+        data = data[:HEADER_SIZE - 4]
+    elif damage == "truncated_body":
+        _, _, offsets_pos, _ = struct.unpack_from(HEADER_FORMAT, data)
+        data = data[:offsets_pos + 8]
+    else:
+        data = b""
+    path.write_bytes(data)
+
+    assert open_snapshot(str(path)) is None
+    with pytest.raises(Exception):
+        CorpusSnapshot(str(path))
+
+    loader = JSONCorpusLoader(str(corpus))
+    assert loader.get_page_text("SOP_Cuti.pdf", 2) == "Cuti sakit"
+    assert path.read_bytes()[:8] == SNAPSHOT_MAGIC
+    loader.snapshot.close()
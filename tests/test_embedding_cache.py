@@ -0,0 +1,143 @@
+# tests/test_embedding_cache.py
+"""Tingkat disk EmbeddingCache (core/embedding_cache.py) yang dibagi beberapa proses worker."""
+import hashlib
+import json
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from core import embedding_cache
+from core.embedding_cache import EmbeddingCache
+
+
+def vector(text):
+    return np.frombuffer(hashlib.sha256(text.encode()).digest(), dtype=np.uint8).astype(np.float32)
+
+
+def _fill(cache, worker, count):
+    for i in range(count):
+        text = f"worker {worker} pertanyaan {i}"
+        cache.put(text, vector(text))
+    cache.flush()
+
+
+def test_disk_entries_survive_restart(tmp_path):
+    cache = EmbeddingCache("m", max_entries=4, disk_dir=str(tmp_path), disk_capacity=16, flush_every=100)
+    _fill(cache, 0, 10)
+    reloaded = EmbeddingCache("m", max_entries=4, disk_dir=str(tmp_path), disk_capacity=16)
+    reloaded.get("worker 0 pertanyaan 0")
+    assert reloaded.stats()["disk_hits"] == 1
+    assert all(np.array_equal(reloaded.get(f"worker 0 pertanyaan {i}"), vector(f"worker 0 pertanyaan {i}"))
+               for i in range(10))
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="butuh fork")
+def test_forked_workers_never_map_a_key_to_another_keys_vector(tmp_path):
+    # Cache dibuat di master (seperti preload gunicorn), lalu dipakai oleh worker hasil fork
+    cache = EmbeddingCache("m", max_entries=8, disk_dir=str(tmp_path), disk_capacity=32, flush_every=5)
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_fill, args=(cache, worker, 60)) for worker in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    reloaded = EmbeddingCache("m", max_entries=8, disk_dir=str(tmp_path), disk_capacity=32)
+    found = 0
+    for worker in range(2):
+        for i in range(60):
+            text = f"worker {worker} pertanyaan {i}"
+            cached = reloaded.get(text)
+            if cached is not None:
+                found += 1
+                assert np.array_equal(cached, vector(text))
+    assert found > 0
+
+
+def test_reader_process_sees_writer_flushes(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "INDEX_RELOAD_SECONDS", 0.0)
+    writer = EmbeddingCache("m", disk_dir=str(tmp_path), disk_capacity=16, flush_every=1)
+    writer.put("a", vector("a"))
+    # Kunci penulis dipegang `writer`, jadi cache kedua menjadi pembaca
+    reader = EmbeddingCache("m", disk_dir=str(tmp_path), disk_capacity=16)
+    assert np.array_equal(reader.get("a"), vector("a"))
+    assert reader.stats()["disk_role"] == "reader"
+
+    writer.put("b", vector("b"))
+    reader.put("c", vector("c"))  # pembaca tidak menulis ke disk
+    assert np.array_equal(reader.get("b"), vector("b"))
+    assert writer.stats()["disk_entries"] == 2
+
+
+def test_stale_index_misses_instead_of_returning_another_vector(tmp_path):
+    cache = EmbeddingCache("m", disk_dir=str(tmp_path), disk_capacity=16, flush_every=100)
+    _fill(cache, 0, 6)
+    del cache
+
+    index_path = os.path.join(str(tmp_path), "m.index.json")
+    with open(index_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    keys, rows = list(meta["index"]), list(meta["index"].values())
+    meta["index"] = dict(zip(keys, rows[1:] + rows[:1]))  # setiap kunci menunjuk baris kunci lain
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    reloaded = EmbeddingCache("m", disk_dir=str(tmp_path), disk_capacity=16)
+    assert all(reloaded.get(f"worker 0 pertanyaan {i}") is None for i in range(6))
+
+
+def test_flush_appends_index_deltas_and_compacts_after_capacity(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "INDEX_RELOAD_SECONDS", 0.0)
+    index_path = os.path.join(str(tmp_path), "m.index.json")
+    writer = EmbeddingCache("m", disk_dir=str(tmp_path), disk_capacity=8, flush_every=2)
+    _fill(writer, 0, 2)
+    snapshot_mtime = os.stat(index_path).st_mtime_ns
+    reader = EmbeddingCache("m", disk_dir=str(tmp_path), disk_capacity=8)
+    assert reader.get("worker 0 pertanyaan 0") is not None
+
+    # Flush berikutnya hanya menambah baris log; snapshot JSON tidak ditulis ulang
+    _fill(writer, 1, 6)
+    assert os.stat(index_path).st_mtime_ns == snapshot_mtime
+    (log_path,) = [path for path in os.listdir(tmp_path) if path.endswith(".log")]
+    with open(os.path.join(str(tmp_path), log_path), encoding="ascii") as f:
+        assert len(f.read().splitlines()) == 6
+    assert np.array_equal(reader.get("worker 1 pertanyaan 5"), vector("worker 1 pertanyaan 5"))
+
+    # Log mencapai kapasitas: snapshot baru, log lama dibuang; ring buffer sudah berputar
+    _fill(writer, 2, 2)
+    assert os.stat(index_path).st_mtime_ns != snapshot_mtime
+    assert log_path not in os.listdir(tmp_path)
+    with open(index_path, encoding="utf-8") as f:
+        assert json.load(f)["next"] == 10
+    assert reader.get("worker 0 pertanyaan 1") is None  # baris 1 sudah ditimpa
+    assert np.array_equal(reader.get("worker 2 pertanyaan 1"), vector("worker 2 pertanyaan 1"))
+
+    _fill(writer, 3, 1)
+    del writer
+    reloaded = EmbeddingCache("m", disk_dir=str(tmp_path), disk_capacity=8)
+    assert np.array_equal(reloaded.get("worker 3 pertanyaan 0"), vector("worker 3 pertanyaan 0"))
+    assert reloaded.stats()["disk_entries"] == 8
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="butuh fork")
+def test_torn_log_line_is_ignored_and_truncated_by_the_writer(tmp_path):
+    # Penulis pertama berjalan di proses lain agar kunci penulisnya lepas saat proses selesai
+    cache = EmbeddingCache("m", disk_dir=str(tmp_path), disk_capacity=16, flush_every=1)
+    writer = multiprocessing.get_context("fork").Process(target=_fill, args=(cache, 0, 3))
+    writer.start()
+    writer.join()
+    assert writer.exitcode == 0
+    (log_path,) = [os.path.join(str(tmp_path), path) for path in os.listdir(tmp_path) if path.endswith(".log")]
+    with open(log_path, "a", encoding="ascii") as f:
+        f.write("abc")  # crash di tengah penulisan baris
+
+    reloaded = EmbeddingCache("m", disk_dir=str(tmp_path), disk_capacity=16, flush_every=1)
+    assert reloaded.get("worker 0 pertanyaan 2") is not None
+    assert reloaded.stats()["disk_role"] == "writer"
+    reloaded.put("baru", vector("baru"))
+    with open(log_path, encoding="ascii") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 3 and all(len(line.split()) == 2 for line in lines)
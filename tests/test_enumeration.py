@@ -0,0 +1,38 @@
+# tests/test_enumeration.py
+"""Jalur ENUMERATION: konteks yang muat dalam satu panggilan dijawab sekali jalan, sisanya map-reduce."""
+import chatbot_service
+from benchmarks.support import FakeGroqClient
+from tests.conftest import close_service, fake_llm, fake_service
+
+QUERY = "sebutkan semua dokumen tentang kebijakan cuti"
+
+
+def answer_calls(monkeypatch, chunk_tokens):
+    monkeypatch.setattr(chatbot_service, "ENUMERATION_CHUNK_TOKENS", chunk_tokens)
+    client = FakeGroqClient(latency=0.0, token_delay=0.0, answer_tokens=8)
+    service = fake_service(fake_llm(client))
+    try:
+        response = service.get_response(QUERY, [], suggestions=False)
+    finally:
+        close_service(service)
+    return client.calls, response
+
+
+def test_context_that_fits_one_call_is_answered_in_one_pass(monkeypatch):
+    calls, response = answer_calls(monkeypatch, chatbot_service.ENUMERATION_CHUNK_TOKENS)
+    assert calls == 1
+    assert response["answer"].startswith("- Jawaban")
+    assert 0 < response["prompt_tokens"] <= chatbot_service.CONTEXT_TOKEN_BUDGETS["ENUMERATION"] + 1000
+
+
+def test_context_larger_than_one_call_is_map_reduced(monkeypatch):
+    calls, response = answer_calls(monkeypatch, 300)
+    # Beberapa panggilan map + satu panggilan penggabung
+    assert calls >= 3
+    assert response["answer"].startswith("- Jawaban")
+
+
+def test_default_chunk_size_follows_the_model_context_window():
+    assert chatbot_service.ENUMERATION_CHUNK_TOKENS >= chatbot_service.CONTEXT_TOKEN_BUDGETS["ENUMERATION"]
+    assert (chatbot_service.ENUMERATION_CHUNK_TOKENS + chatbot_service.LLM_COMPLETION_TOKENS
+            < chatbot_service.LLM_CONTEXT_TOKENS)
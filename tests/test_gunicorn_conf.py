@@ -0,0 +1,34 @@
+# tests/test_gunicorn_conf.py
+"""gunicorn.conf.py: session dan saran deferred harus memakai store bersama jika worker > 1."""
+import os
+import runpy
+
+import pytest
+
+CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    # setenv dulu agar nilai yang di-setdefault oleh gunicorn.conf.py dipulihkan setelah tes
+    for name in ("SESSION_STORE", "GUNICORN_WORKERS", "CHATBOT_PRELOAD_ONLY", "TOKENIZERS_PARALLELISM"):
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+
+
+def test_defaults_to_sqlite_sessions():
+    conf = runpy.run_path(CONF)
+    assert conf["workers"] == 2
+    assert os.environ["SESSION_STORE"] == "sqlite"
+
+
+def test_refuses_memory_sessions_with_several_workers(monkeypatch):
+    monkeypatch.setenv("SESSION_STORE", "memory")
+    with pytest.raises(RuntimeError, match="SESSION_STORE=memory"):
+        runpy.run_path(CONF)
+
+
+def test_memory_sessions_allowed_with_one_worker(monkeypatch):
+    monkeypatch.setenv("SESSION_STORE", "memory")
+    monkeypatch.setenv("GUNICORN_WORKERS", "1")
+    assert runpy.run_path(CONF)["workers"] == 1
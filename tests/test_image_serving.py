@@ -0,0 +1,58 @@
+# tests/test_image_serving.py
+"""ThumbnailCache (core/image_serving.py) yang dibagi beberapa worker lewat satu direktori cache."""
+import os
+
+import numpy as np
+import pytest
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image
+
+from core.image_serving import ThumbnailCache
+
+
+@pytest.fixture
+def sources(tmp_path):
+    """Enam gambar sumber 800x600 berisi noise (thumbnail JPEG-nya tidak kecil)."""
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"p{i}.png"
+        Image.fromarray(rng.integers(0, 255, (600, 800, 3), dtype=np.uint8)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def disk_bytes(cache_dir):
+    return sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.name.endswith(".jpg"))
+
+
+def test_thumbnail_made_by_one_worker_is_reused_by_another(tmp_path, sources):
+    cache_dir = str(tmp_path / "thumbs")
+    worker_a = ThumbnailCache(cache_dir, max_bytes=10 * 1024 * 1024)
+    worker_b = ThumbnailCache(cache_dir, max_bytes=10 * 1024 * 1024)
+
+    path_a, width = worker_a.get(sources[0], "etag0", 300)
+    path_b, _ = worker_b.get(sources[0], "etag0", 300)
+
+    assert path_a == path_b and width == 320
+    assert (worker_a.stats()["generated"], worker_b.stats()["generated"]) == (1, 0)
+    assert worker_b.stats()["hits"] == 1
+
+
+def test_size_cap_applies_to_total_on_disk_across_workers(tmp_path, sources):
+    cache_dir = str(tmp_path / "thumbs")
+    probe = ThumbnailCache(str(tmp_path / "probe"), max_bytes=10 * 1024 * 1024)
+    probe.get(sources[0], "probe", 640)
+    one_thumbnail = probe.stats()["bytes"]
+
+    max_bytes = int(one_thumbnail * 2.5)
+    workers = [ThumbnailCache(cache_dir, max_bytes) for _ in range(3)]
+    for i, source in enumerate(sources):
+        workers[i % len(workers)].get(source, f"etag{i}", 640)
+        assert disk_bytes(cache_dir) <= max_bytes
+
+    # Yang tersisa adalah thumbnail terbaru; total eviction dari semua worker = sisanya
+    remaining = sorted(name for name in os.listdir(cache_dir) if name.endswith(".jpg"))
+    assert remaining == ["etag4_w640.jpg", "etag5_w640.jpg"]
+    assert sum(worker.stats()["evicted"] for worker in workers) == len(sources) - len(remaining)
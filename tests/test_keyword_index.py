@@ -0,0 +1,91 @@
+# tests/test_keyword_index.py
+"""
+Indeks keyword (core/keyword_index.py): tokenisasi nomor peraturan, urutan BM25 pada korpus
+kecil, filter source_file, dan penggabungan Reciprocal Rank Fusion dengan hit vektor.
+"""
+import pytest
+
+from core.keyword_index import RRF_K, BM25Index, reciprocal_rank_fusion, tokenize
+
+PAGES = [
+    (("SOP_Cuti.pdf", 1), "Cuti tahunan diberikan 12 hari kerja. Cuti tahunan diajukan lewat atasan."),
+    (("SOP_Cuti.pdf", 2), "Cuti sakit memerlukan surat dokter."),
+    (("Manual_Akuntansi.pdf", 4), "Jurnal penyesuaian dicatat setiap akhir periode sesuai PMK No. 12/2020."),
+    (("Manual_Akuntansi.pdf", 5), "Laporan keuangan tahunan disusun oleh bagian akuntansi."),
+    (("SOP_Lembur.pdf", 1), ""),
+]
+
+
+@pytest.fixture
+def index():
+    return BM25Index.from_pages(PAGES)
+
+
+def keys(index, results):
+    return [index.keys[doc_id] for doc_id, _ in results]
+
+
+def test_tokenize_splits_compound_tokens():
+    assert tokenize("PMK No. 12/2020 pasal-3") == ["pmk", "no", "12/2020", "12", "2020", "pasal-3", "pasal", "3"]
+    assert tokenize(None) == []
+
+
+def test_bm25_ranks_by_term_frequency_and_rarity(index):
+    results = index.search("cuti tahunan")
+    # Halaman 1 memuat kedua term (masing-masing dua kali); "tahunan" juga muncul di laporan keuangan
+    assert keys(index, results) == [("SOP_Cuti.pdf", 1), ("SOP_Cuti.pdf", 2), ("Manual_Akuntansi.pdf", 5)]
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True) and scores[-1] > 0
+
+
+def test_bm25_matches_regulation_numbers_and_skips_unknown_terms(index):
+    # Token utuh "12/2020" hanya cocok di halaman PMK; bagian "12" juga cocok dengan "12 hari kerja"
+    assert keys(index, index.search("peraturan 12/2020")) == [("Manual_Akuntansi.pdf", 4), ("SOP_Cuti.pdf", 1)]
+    assert keys(index, index.search("2020")) == [("Manual_Akuntansi.pdf", 4)]
+    assert index.search("lembur") == [] and BM25Index().search("cuti") == []
+
+
+def test_bm25_top_k_and_source_file_filter(index):
+    assert keys(index, index.search("cuti tahunan", top_k=1)) == [("SOP_Cuti.pdf", 1)]
+    assert keys(index, index.search("tahunan", source_files=["Manual_Akuntansi.pdf"])) == [("Manual_Akuntansi.pdf", 5)]
+    assert index.search("tahunan", source_files=["Tidak_Ada.pdf"]) == []
+
+
+def test_search_hits_use_kw_ids_and_text_store():
+    index = BM25Index.from_pages(PAGES, text_store=lambda source_file, page: f"{source_file}#{page}")
+    assert index.texts == [] and len(index) == 5
+    hit = index.search_hits("surat dokter")[0]
+    assert hit["id"] == hit["chunk_id"] == "kw:SOP_Cuti.pdf:2"
+    assert hit["text"] == "SOP_Cuti.pdf#2"
+    assert hit["metadata"] == {"source_file": "SOP_Cuti.pdf", "page": 2}
+
+
+def vector_hit(chunk_id, source_file, page):
+    return {"chunk_id": chunk_id, "text": chunk_id, "metadata": {"source_file": source_file, "page": page}}
+
+
+def keyword_hit(source_file, page):
+    return {"id": f"kw:{source_file}:{page}", "chunk_id": f"kw:{source_file}:{page}", "text": "halaman",
+            "metadata": {"source_file": source_file, "page": page}}
+
+
+def test_rrf_merges_keyword_hits_into_vector_hits_of_the_same_page():
+    vector_hits = [vector_hit("v1", "A.pdf", 1), vector_hit("v2", "A.pdf", 1), vector_hit("v3", "B.pdf", 2)]
+    keyword_hits = [keyword_hit("B.pdf", 2), keyword_hit("C.pdf", 7), keyword_hit("A.pdf", 1)]
+    fused = reciprocal_rank_fusion(vector_hits, keyword_hits, top_k=10)
+
+    # Tidak ada hit kw: untuk halaman yang sudah ada di hasil vektor; skornya masuk ke hit vektor
+    # terbaik di halaman itu (v1, bukan v2). Skor sama tetap dalam urutan kemunculan
+    assert [hit["chunk_id"] for hit in fused] == ["v1", "v3", "v2", "kw:C.pdf:7"]
+    rrf = {hit["chunk_id"]: hit["rrf_score"] for hit in fused}
+    assert rrf["v3"] == pytest.approx(1 / (RRF_K + 3) + 1 / (RRF_K + 1))
+    assert rrf["v1"] == pytest.approx(1 / (RRF_K + 1) + 1 / (RRF_K + 3))
+    assert rrf["v2"] == pytest.approx(1 / (RRF_K + 2))
+    assert rrf["kw:C.pdf:7"] == pytest.approx(1 / (RRF_K + 2))
+
+
+def test_rrf_deduplicates_repeated_keyword_pages_and_respects_top_k():
+    keyword_hits = [keyword_hit("C.pdf", 7), keyword_hit("D.pdf", 1), keyword_hit("C.pdf", 7)]
+    fused = reciprocal_rank_fusion([vector_hit("v1", "A.pdf", 1)], keyword_hits, top_k=2)
+    assert [hit["chunk_id"] for hit in fused] == ["kw:C.pdf:7", "v1"]
+    assert fused[0]["rrf_score"] == pytest.approx(1 / (RRF_K + 1) + 1 / (RRF_K + 3))
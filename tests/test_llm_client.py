@@ -0,0 +1,272 @@
+# tests/test_llm_client.py
+"""
+Klien Groq (core/llm_client.py): anggaran rate limit, antrian prioritas, retry 429 dengan
+retry-after, deadline, penggabungan prompt identik, dan satu putaran lewat fake_groq_server.
+"""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fake_groq_server import SUGGESTION_ANSWER, FakeGroqServer
+from benchmarks.support import FakeAsyncGroqClient, FakeGroqClient
+from core.llm_client import (PRIORITY_ANSWER, PRIORITY_SUGGESTION, AsyncLLMClient, LLMClient, LLMError, LLMPolicy,
+                             PrioritySlots, RateLimitBudget, parse_duration)
+
+ANSWER = [{"role": "user", "content": "Apa ketentuan kebijakan cuti tahunan?"}]
+SUGGESTION = [{"role": "user", "content": "Saran Pertanyaan untuk kebijakan cuti"}]
+
+
+def http_error(status, headers=None):
+    error = Exception(f"Error code: {status}")
+    error.status_code = status
+    error.response = SimpleNamespace(headers=headers or {})
+    return error
+
+
+class ScriptedGroqClient(FakeGroqClient):
+    """FakeGroqClient yang melempar galat dari `failures` (berurutan) sebelum menjawab normal."""
+    def __init__(self, failures=(), latency=0.0):
+        super().__init__(latency=latency, token_delay=0.0, answer_tokens=4)
+        self.failures = list(failures)
+        self.prompts = []
+        self._calls_lock = threading.Lock()
+
+    def _create(self, model=None, messages=None, temperature=None, stream=False, **kwargs):
+        with self._calls_lock:
+            self.prompts.append(messages[-1]["content"])
+            failure = self.failures.pop(0) if self.failures else None
+        if failure is not None:
+            raise failure
+        return super()._create(model, messages, temperature, stream, **kwargs)
+
+
+def wait_until(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "kondisi tidak tercapai"
+        time.sleep(0.005)
+
+
+def test_parse_duration():
+    assert parse_duration("7.66s") == pytest.approx(7.66)
+    assert parse_duration("2m59.56s") == pytest.approx(179.56)
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("3") == 3.0
+    assert parse_duration(None) is None and parse_duration("nanti") is None
+
+
+def test_budget_settle_subtracts_pending_calls_and_reserve_waits_for_reset():
+    budget = RateLimitBudget()
+    assert budget.reserve(100, 0.0) == 0.0 and budget.reserve(100, 0.0) == 0.0
+    # Respons pertama: Groq baru menghitung dirinya sendiri; panggilan kedua masih berjalan
+    budget.settle(100, {"x-ratelimit-remaining-requests": "2", "x-ratelimit-limit-requests": "30",
+                        "x-ratelimit-remaining-tokens": "5000", "x-ratelimit-limit-tokens": "6000",
+                        "x-ratelimit-reset-requests": "10s", "x-ratelimit-reset-tokens": "1.5s"}, 0.0)
+    assert budget.remaining == {"requests": 1, "tokens": 4900}
+    assert budget.pending == {"requests": 1, "tokens": 100}
+
+    assert budget.reserve(4000, 0.1) == 0.0
+    assert budget.remaining["tokens"] == 900
+    # Token tidak cukup: tunggu sampai reset token; permintaan juga habis (reset 10 detik)
+    assert budget.reserve(1000, 0.5) == pytest.approx(10.0 - 0.5)
+    # Setelah kedua jendela lewat anggaran penuh lagi
+    assert budget.reserve(1000, 11.0) == 0.0
+    assert budget.remaining == {"requests": 29, "tokens": 5000}
+
+
+def test_budget_lets_oversized_calls_through_and_honours_429_cooldown():
+    budget = RateLimitBudget()
+    budget.reserve(1, 0.0)
+    budget.settle(1, {"x-ratelimit-remaining-tokens": "10", "x-ratelimit-limit-tokens": "100",
+                      "x-ratelimit-reset-tokens": "5s"}, 0.0)
+    assert budget.reserve(500, 0.0) == 0.0  # tidak akan pernah muat: Groq yang memutuskan
+
+    budget = RateLimitBudget()
+    budget.note_rate_limited(3.0, 1.0)
+    assert budget.cooldown(1.5) == pytest.approx(2.5)
+    budget.note_rate_limited(None, 1.0)
+    assert budget.cooldown(1.5) == pytest.approx(2.5)  # cooldown tidak pernah dipersingkat
+
+
+def test_priority_slots_hand_freed_slot_to_lowest_priority_then_fifo():
+    slots = PrioritySlots(1)
+    assert slots.acquire(PRIORITY_ANSWER, 1.0)
+    order = []
+
+    def waiter(name, priority):
+        assert slots.acquire(priority, 2.0)
+        order.append(name)
+        slots.release()
+
+    threads = []
+    for name, priority in [("saran-1", PRIORITY_SUGGESTION), ("saran-2", PRIORITY_SUGGESTION),
+                           ("jawaban", PRIORITY_ANSWER)]:
+        threads.append(threading.Thread(target=waiter, args=(name, priority)))
+        threads[-1].start()
+        wait_until(lambda: len(slots._waiters) == len(threads))
+    slots.release()
+    for thread in threads:
+        thread.join()
+
+    assert order == ["jawaban", "saran-1", "saran-2"]
+    assert slots.in_use == 0
+
+
+def test_priority_slots_acquire_times_out():
+    slots = PrioritySlots(1)
+    assert slots.acquire(PRIORITY_ANSWER, 1.0)
+    assert not slots.acquire(PRIORITY_ANSWER, 0.05)
+    assert slots._waiters == []
+
+
+def test_rate_limited_call_is_retried_after_retry_after():
+    client = ScriptedGroqClient([http_error(429, {"retry-after": "0.2"})])
+    llm = LLMClient(client, LLMPolicy(attempts=3, base_delay=0.0))
+
+    start = time.monotonic()
+    assert llm.complete(ANSWER).startswith("- Jawaban")
+    assert time.monotonic() - start >= 0.2
+    assert len(client.prompts) == 2
+    assert llm.slots.in_use == 0
+
+
+def test_non_retryable_error_is_raised_immediately():
+    client = ScriptedGroqClient([http_error(400)])
+    with pytest.raises(LLMError) as raised:
+        LLMClient(client, LLMPolicy(attempts=3, base_delay=0.0)).complete(ANSWER)
+    assert (raised.value.kind, raised.value.retryable) == ("error", False)
+    assert len(client.prompts) == 1
+
+
+def test_deadline_stops_retries_before_it_is_exceeded():
+    client = ScriptedGroqClient([http_error(429, {"retry-after": "5"})] * 5)
+    llm = LLMClient(client, LLMPolicy(attempts=5, deadline=1.0))
+
+    start = time.monotonic()
+    with pytest.raises(LLMError) as raised:
+        llm.complete(ANSWER)
+    # Retry-after 5 detik tidak muat dalam deadline 1 detik: gagal sekarang, tanpa tidur sia-sia
+    assert time.monotonic() - start < 0.5
+    assert (raised.value.kind, raised.value.retry_after) == ("rate_limit", 5.0)
+    assert len(client.prompts) == 1
+
+
+def test_queue_wait_past_deadline_raises_timeout():
+    llm = LLMClient(ScriptedGroqClient(), LLMPolicy(max_concurrency=1))
+    assert llm.slots.acquire(PRIORITY_ANSWER, 1.0)
+    with pytest.raises(LLMError) as raised:
+        llm.complete(ANSWER, timeout=0.05)
+    assert raised.value.kind == "timeout"
+
+
+def test_identical_prompts_in_flight_make_one_call():
+    client = ScriptedGroqClient(latency=0.2)
+    llm = LLMClient(client)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(llm.complete(ANSWER, model="m")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(client.prompts) == 1
+    assert len(results) == 4 and len(set(results)) == 1
+    assert llm._in_flight == {}
+    # Parameter berbeda = panggilan berbeda
+    llm.complete(ANSWER, model="lain")
+    assert len(client.prompts) == 2
+
+
+def test_answers_run_ahead_of_queued_suggestions():
+    client = ScriptedGroqClient(latency=0.05)
+    llm = LLMClient(client, LLMPolicy(max_concurrency=1))
+    assert llm.slots.acquire(PRIORITY_ANSWER, 1.0)  # slot satu-satunya sedang dipakai
+
+    threads = [threading.Thread(target=llm.complete, args=(SUGGESTION,), kwargs={"priority": PRIORITY_SUGGESTION}),
+               threading.Thread(target=llm.complete, args=(ANSWER,), kwargs={"priority": PRIORITY_ANSWER})]
+    for i, thread in enumerate(threads):
+        thread.start()
+        wait_until(lambda: len(llm.slots._waiters) == i + 1)
+    llm.slots.release()
+    for thread in threads:
+        thread.join()
+
+    assert client.prompts == [ANSWER[0]["content"], SUGGESTION[0]["content"]]
+
+
+def test_budget_wait_does_not_hold_a_slot():
+    client = ScriptedGroqClient()
+    llm = LLMClient(client, LLMPolicy(max_concurrency=1))
+    llm.budget.note_rate_limited(0.3, time.monotonic())
+
+    waiting = threading.Thread(target=llm.complete, args=(SUGGESTION,), kwargs={"priority": PRIORITY_SUGGESTION})
+    waiting.start()
+    time.sleep(0.1)
+    # Saran menunggu anggaran tanpa memegang slot satu-satunya
+    assert llm.slots.in_use == 0
+    assert llm.slots.acquire(PRIORITY_ANSWER, 0.05)
+    llm.slots.release()
+    waiting.join()
+    assert client.prompts == [SUGGESTION[0]["content"]]
+
+
+@pytest.fixture
+def groq_server():
+    server = FakeGroqServer(latency=0.0, token_delay=0.0, answer_tokens=4, requests=2, tokens=100000,
+                            window=1.0).start()
+    yield server
+    server.stop()
+
+
+def groq_llm(server):
+    groq = pytest.importorskip("groq")
+    return LLMClient(groq.Groq(api_key="fake", base_url=server.url, max_retries=0),
+                     LLMPolicy(attempts=3, deadline=5.0, base_delay=0.0, completion_tokens=0))
+
+
+def test_fake_groq_server_budget_holds_calls_instead_of_429(groq_server):
+    llm = groq_llm(groq_server)
+    answers = [llm.complete(ANSWER, model="fake") for _ in range(2)]
+    # Anggaran 2 permintaan per jendela: header menunjukkan habis, panggilan ketiga ditahan
+    # sampai reset alih-alih dikirim lalu ditolak 429
+    assert llm.budget.remaining["requests"] == 0
+    assert llm.complete(SUGGESTION, model="fake") == SUGGESTION_ANSWER
+    assert answers == ["- Jawaban simulasi0 simulasi1 simulasi2"] * 2
+    assert groq_server.stats["completed"] == 3
+    assert groq_server.stats["rate_limited"] == 0
+
+
+def test_fake_groq_server_429_then_success(groq_server):
+    other = groq_llm(groq_server)
+    for _ in range(2):
+        other.complete(ANSWER, model="fake")
+    # Klien ini belum melihat header apa pun: Groq menolak dengan 429, retry setelah retry-after berhasil
+    llm = groq_llm(groq_server)
+    start = time.monotonic()
+    assert llm.complete(SUGGESTION, model="fake") == SUGGESTION_ANSWER
+    assert time.monotonic() - start >= 0.5
+    assert groq_server.stats["rate_limited"] == 1
+    assert groq_server.stats["completed"] == 3
+
+
+def test_async_client_coalesces_and_waits_for_budget_without_a_slot():
+    client = FakeAsyncGroqClient(latency=0.05, token_delay=0.0, answer_tokens=4)
+    llm = AsyncLLMClient(client, LLMPolicy(max_concurrency=1))
+
+    async def scenario():
+        texts = await asyncio.gather(*(llm.complete(ANSWER) for _ in range(3)))
+        llm.budget.note_rate_limited(0.2, time.monotonic())
+        waiting = asyncio.create_task(llm.complete(SUGGESTION, priority=PRIORITY_SUGGESTION))
+        await asyncio.sleep(0.05)
+        in_use = llm.slots.in_use
+        return texts, in_use, await waiting
+
+    texts, in_use, suggestion = asyncio.run(scenario())
+    assert client.calls == 2
+    assert len(set(texts)) == 1
+    assert in_use == 0
+    assert suggestion == SUGGESTION_ANSWER
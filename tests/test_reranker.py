@@ -0,0 +1,74 @@
+# tests/test_reranker.py
+"""
+Rerank bertingkat (core/reranker.py): grup hanya berhenti jika skor yang masih bisa dicapai
+kandidat tersisa tidak mengalahkan skor ke-`keep`, sehingga hit terbaik di tahap berikutnya
+tetap ditemukan.
+"""
+from core.reranker import RerankProfile, ScoreCache, cascade_rerank_groups
+
+
+class ScriptedCrossEncoder:
+    """CrossEncoder palsu: skor per teks dari `scores`, mencatat ukuran tiap panggilan predict."""
+    def __init__(self, scores):
+        self.scores = scores
+        self.calls = []
+
+    def predict(self, pairs, **kwargs):
+        pairs = list(pairs)
+        self.calls.append(len(pairs))
+        return [self.scores[passage] for _, passage in pairs]
+
+
+def hits(scores):
+    return [{"chunk_id": f"c{i}", "text": f"t{i}", "distance": float(i)} for i in range(len(scores))]
+
+
+def rerank(scores, profile, score_cache=None):
+    model = ScriptedCrossEncoder({f"t{i}": score for i, score in enumerate(scores)})
+    (result,), stats = cascade_rerank_groups(model, [("kebijakan cuti", hits(scores))], profile,
+                                             score_cache=score_cache)
+    return result, stats, model
+
+
+def test_best_hit_in_second_batch_reaches_top_k():
+    scores = [2.0, 1.5, 1.0, 0.5, 9.0, 0.0, -1.0, -2.0]
+    result, stats, model = rerank(scores, RerankProfile("uji", 8, keep=2, batch_size=4))
+    assert [hit["chunk_id"] for hit in result[:2]] == ["c4", "c0"]
+    assert model.calls == [4, 4]
+
+
+def test_tail_within_margin_of_kth_score_is_still_scored():
+    # Top-2 tidak berubah di tahap kedua, tetapi skor tahap itu masih dekat skor ke-2: aturan
+    # lama ("top-k tidak berubah") berhenti di sini dan kehilangan c8
+    scores = [5.0, 4.0, 1.0, 0.0, 3.5, 3.0, 0.0, 0.0, 6.0, 0.0, 0.0, 0.0]
+    result, stats, model = rerank(scores, RerankProfile("uji", 12, keep=2, batch_size=4, margin=1.0))
+    assert [hit["chunk_id"] for hit in result[:2]] == ["c8", "c0"]
+    assert model.calls == [4, 4, 4]
+
+
+def test_stops_once_tail_cannot_beat_kth_score():
+    scores = [5.0, 4.0, 1.0, 0.0, 1.0, 0.5, 0.0, -1.0, 9.0, 0.0]
+    result, stats, model = rerank(scores, RerankProfile("uji", 10, keep=2, batch_size=4, margin=1.0))
+    # Skor tertinggi tahap kedua (1.0) + margin = 2.0 <= skor ke-2 (4.0): sisanya tidak dinilai
+    assert model.calls == [4, 4]
+    assert stats == {"scored": 8, "cached": 0, "skipped": 2}
+    assert [hit["chunk_id"] for hit in result[:2]] == ["c0", "c1"]
+    assert "rerank_score" not in result[-1]
+
+
+def test_keeps_scoring_until_keep_hits_pass_threshold():
+    scores = [5.0, -3.0, -3.0, -3.0, -3.0, -3.0, 2.0, -3.0]
+    result, stats, model = rerank(scores, RerankProfile("uji", 8, keep=2, threshold=0.0, batch_size=2, margin=0.5))
+    assert [hit["chunk_id"] for hit in result[:2]] == ["c0", "c6"]
+    assert model.calls == [2, 2, 2, 2]
+
+
+def test_rerank_depth_and_cached_scores():
+    cache = ScoreCache("m")
+    cache.put("kebijakan cuti", "c1", 7.0)
+    scores = [1.0, 0.0, 0.5, 0.2, 3.0]
+    result, stats, model = rerank(scores, RerankProfile("uji", 5, rerank_depth=4, keep=1, batch_size=0),
+                                  score_cache=cache)
+    assert [hit["chunk_id"] for hit in result] == ["c1", "c0", "c2", "c3", "c4"]
+    assert model.calls == [3]
+    assert stats == {"scored": 3, "cached": 1, "skipped": 1}
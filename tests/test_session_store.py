@@ -0,0 +1,105 @@
+# tests/test_session_store.py
+"""Session store (core/session_store.py): TTL, pemangkasan, dan append bersamaan tanpa pesan hilang."""
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from core.session_store import InMemorySessionStore, SessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"), max_messages=4, ttl_seconds=60)
+    return InMemorySessionStore(max_messages=4, ttl_seconds=60)
+
+
+def turn(text):
+    return [{"role": "user", "content": text}, {"role": "bot", "content": f"jawaban {text}"}]
+
+
+def test_append_trims_to_max_messages(store):
+    store.append("s", turn("a"))
+    store.append("s", turn("b"))
+    assert store.append("s", turn("c")) == turn("b") + turn("c")
+    assert store.get("s") == turn("b") + turn("c")
+    assert store.get("lain") == []
+
+
+def test_expired_session_is_dropped(store, monkeypatch):
+    store.append("s", turn("a"))
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert store.get("s") == []
+    assert store.append("s", turn("b")) == turn("b")
+
+
+def test_delete(store):
+    store.append("s", turn("a"))
+    store.delete("s")
+    assert store.get("s") == []
+    store.delete("tidak-ada")
+
+
+def test_session_store_requires_get_append_delete():
+    class ReadOnly(SessionStore):
+        def get(self, session_id):
+            return []
+
+    with pytest.raises(TypeError, match="append"):
+        ReadOnly()
+
+
+def _append_many(db_path, worker, count, barrier=None):
+    store = SQLiteSessionStore(db_path, max_messages=0)
+    if barrier is not None:
+        barrier.wait()
+    for i in range(count):
+        store.append("bersama", [{"role": "user", "content": f"{worker}-{i}"}])
+        store.get("bersama")
+
+
+def test_sqlite_concurrent_appends_from_threads_keep_every_message(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    SQLiteSessionStore(db_path)
+    barrier = threading.Barrier(8)
+    threads = [threading.Thread(target=_append_many, args=(db_path, worker, 25, barrier)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    contents = [message["content"] for message in SQLiteSessionStore(db_path, max_messages=0).get("bersama")]
+    assert sorted(contents) == sorted(f"{worker}-{i}" for worker in range(8) for i in range(25))
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="butuh fork")
+def test_sqlite_concurrent_appends_from_processes_keep_every_message(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    SQLiteSessionStore(db_path)
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_append_many, args=(db_path, worker, 25)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    contents = [message["content"] for message in SQLiteSessionStore(db_path, max_messages=0).get("bersama")]
+    assert len(contents) == 100
+
+
+def test_shared_suggestions_reserve_put_pop(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    deadline = time.time() + 60
+    store.reserve_suggestions("r", deadline)
+    assert store.pop_suggestions("r") == (None, deadline)  # masih dibuat: baris tetap ada
+
+    store.put_suggestions("r", ["Apa dasar hukumnya?"])
+    assert store.pop_suggestions("r") == (["Apa dasar hukumnya?"], deadline)
+    assert store.pop_suggestions("r") is None
+    store.put_suggestions("r", ["terlambat"])  # sudah diambil: tidak dibuat ulang
+    assert store.pop_suggestions("r") is None
+    assert not store.discard_suggestions("r")
@@ -0,0 +1,134 @@
+# tests/test_suggestions.py
+"""
+Saran pertanyaan lanjutan: LLMError -> saran cadangan (jawaban seperti itu tidak masuk cache jawaban),
+dan saran deferred yang diambil lewat worker lain dari session store bersama.
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.support import FakeAsyncGroqClient, FakeGroqClient
+from core.llm_answer import AsyncLLMAnswerGenerator
+from core.llm_client import LLMPolicy
+from core.session_store import SQLiteSessionStore
+from tests.conftest import QUERY, close_service, fake_async_service, fake_llm, fake_service, parse_sse
+
+SUGGESTIONS = ['Apa dasar hukumnya?', 'Siapa yang berwenang?', 'Kapan mulai berlaku?']
+
+
+def rate_limit_error():
+    error = Exception("Error code: 429 - rate limit reached")
+    error.status_code = 429
+    error.response = SimpleNamespace(headers={"retry-after": "0.01"})
+    return error
+
+
+class SuggestionRateLimitedGroqClient(FakeGroqClient):
+    """Jawaban normal, tetapi setiap permintaan saran ditolak dengan 429."""
+    def _create(self, model=None, messages=None, temperature=None, stream=False, **kwargs):
+        if "Saran Pertanyaan" in messages[-1]["content"]:
+            raise rate_limit_error()
+        return super()._create(model, messages, temperature, stream, **kwargs)
+
+
+class AsyncSuggestionRateLimitedGroqClient(FakeAsyncGroqClient):
+    async def _create(self, model=None, messages=None, temperature=None, stream=False, **kwargs):
+        if "Saran Pertanyaan" in messages[-1]["content"]:
+            raise rate_limit_error()
+        return await super()._create(model, messages, temperature, stream, **kwargs)
+
+
+@pytest.fixture
+def service():
+    client = SuggestionRateLimitedGroqClient(latency=0.0, token_delay=0.0, answer_tokens=8)
+    service = fake_service(fake_llm(client, LLMPolicy(attempts=1)))
+    yield service
+    close_service(service)
+
+
+def test_rate_limited_suggestions_fall_back_and_answer_is_not_cached(service):
+    fallback = service._generate_fallback_suggestions("")
+    response = service.get_response(QUERY, [])
+
+    assert response["answer"].startswith("- Jawaban")
+    assert response["suggestions"] == fallback
+    assert service.answer_cache.stats()["entries"] == 0
+    # Pertanyaan yang sama dijawab ulang (bukan dari cache berisi saran cadangan)
+    assert service.get_response(QUERY, []).get("cache_hit") is False
+
+
+def test_rate_limited_suggestions_in_stream_fall_back_and_are_not_cached(api_client, service):
+    events = parse_sse(api_client.post("/chat/stream", json={"query": QUERY}).get_data(as_text=True))
+
+    assert dict(events)["suggestions"] == service._generate_fallback_suggestions("")
+    assert events[-1][0] == "done"
+    assert service.answer_cache.stats()["entries"] == 0
+
+
+def test_generate_proactive_suggestions_returns_fallback_on_llm_error(service):
+    assert service._generate_proactive_suggestions(QUERY, "konteks") == service._generate_fallback_suggestions("")
+
+
+def test_successful_suggestions_are_cached():
+    service = fake_service()
+    try:
+        assert service.get_response(QUERY, [])["suggestions"] == SUGGESTIONS
+        assert service.answer_cache.stats()["entries"] == 1
+        assert service.get_response(QUERY, [])["cache_hit"] is True
+    finally:
+        close_service(service)
+
+
+def test_async_rate_limited_suggestions_fall_back_and_answer_is_not_cached():
+    service = fake_async_service()
+    client = AsyncSuggestionRateLimitedGroqClient(latency=0.0, token_delay=0.0)
+    service.llm_generator = AsyncLLMAnswerGenerator(client=client, policy=LLMPolicy(attempts=1))
+
+    response = asyncio.run(service.get_response(QUERY, []))
+    assert response["suggestions"] == service._generate_fallback_suggestions("")
+    assert service.answer_cache.stats()["entries"] == 0
+    service.cpu_executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Dua service ('worker' gunicorn) dengan session store SQLite yang sama."""
+    services = [fake_service() for _ in range(2)]
+    for service in services:
+        service.session_store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    yield services
+    for service in services:
+        close_service(service)
+
+
+def test_deferred_suggestions_are_served_by_another_worker(workers):
+    first, second = workers
+    response = first.get_response(QUERY, [], defer_suggestions=True)
+    assert response["suggestions_pending"] is True
+
+    assert second.get_suggestions(response["request_id"]) == SUGGESTIONS
+    # Sudah diambil: tidak ada worker yang mengembalikannya lagi
+    assert first.get_suggestions(response["request_id"]) is None
+    assert second.get_suggestions(response["request_id"]) is None
+
+
+def test_deferred_suggestions_on_the_same_worker_are_fetched_once(workers):
+    first, second = workers
+    request_id = first.get_response(QUERY, [], defer_suggestions=True)["request_id"]
+
+    assert first.get_suggestions(request_id) == SUGGESTIONS
+    assert second.get_suggestions(request_id) is None
+
+
+def test_unknown_request_id_on_shared_store(workers):
+    assert workers[1].get_suggestions("tidak-ada") is None
+
+
+def test_pending_suggestions_from_another_worker_fall_back_after_deadline(workers):
+    store = workers[1].session_store
+    store.reserve_suggestions("r-1", time.time() + 0.1)
+
+    assert workers[1].get_suggestions("r-1") == workers[1]._generate_fallback_suggestions("")
+    assert store.pop_suggestions("r-1") is None
@@ -0,0 +1,198 @@
+# tests/test_vector_store.py
+"""
+Store vektor (core/vector_store.py): urutan L2/IP/COSINE dan filter LocalVectorStore, cache
+vektor di disk, serta retry/deadline/pool ZillizVectorStore di atas klien palsu.
+"""
+import asyncio
+import json
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.support import FakeCollection, FakeEmbeddingModel, FakeMilvusClient
+from core import vector_store
+from core.vector_store import (AsyncZillizVectorStore, LocalVectorStore, RetryPolicy, SearchProfile, VectorStore,
+                               VectorStoreError, ZillizVectorStore)
+
+VECTORS = np.array([[1.0, 0.0], [0.0, 2.0], [3.0, 3.0], [-1.0, 0.0]], dtype=np.float32)
+ROWS = [{"chunk_id": f"c{i}", "text": f"teks {i}", "source_file": source, "halaman_awal": i + 1,
+         "jenis_dokumen": kind}
+        for i, (source, kind) in enumerate([("A.pdf", "SOP"), ("B.pdf", "SOP"), ("A.pdf", "Manual"),
+                                            ("C.pdf", "Manual")])]
+CONFIG = {"collection_name": "uji", "uri": "local://fake", "token": ""}
+
+
+@pytest.fixture
+def local():
+    return LocalVectorStore(VECTORS, ROWS, embedding_model=None, reranker_model=None)
+
+
+def ids(hits):
+    return [hit["chunk_id"] for hit in hits]
+
+
+@pytest.mark.parametrize("metric, expected", [
+    ("L2", ["c0", "c3", "c1", "c2"]),      # jarak terkecil dulu
+    ("IP", ["c2", "c0", "c1", "c3"]),      # hasil kali terbesar dulu
+    ("COSINE", ["c0", "c2", "c1", "c3"]),  # sudut terkecil dulu, tanpa pengaruh panjang vektor
+])
+def test_local_store_orders_by_metric(local, metric, expected):
+    hits = local.search_by_vector([1.0, 0.1], top_k=4, profile=SearchProfile("uji", metric_type=metric))
+    assert ids(hits) == expected
+    distances = [hit["distance"] for hit in hits]
+    assert distances == sorted(distances, reverse=metric != "L2")
+
+
+def test_local_store_l2_distance_and_offset(local):
+    hits = local.search_by_vector([1.0, 0.0], top_k=2, offset=1)
+    assert ids(hits) == ["c3", "c1"]
+    assert [hit["distance"] for hit in hits] == pytest.approx([4.0, 5.0])
+    assert hits[1]["metadata"]["source_file"] == "B.pdf"
+
+
+def test_local_store_filters_before_top_k(local):
+    filters = {"source_file": ("A.pdf", "C.pdf"), "jenis_dokumen": ("Manual",)}
+    assert ids(local.search_by_vector([1.0, 0.0], top_k=5, filters=filters)) == ["c3", "c2"]
+    assert local.search_by_vector([1.0, 0.0], filters={"source_file": ("Z.pdf",)}) == []
+
+
+def test_local_store_search_by_vectors_keeps_query_order(local):
+    first, second = local.search_by_vectors([[1.0, 0.0], [0.0, 1.0]], top_k=1)
+    assert (ids(first), ids(second)) == (["c0"], ["c1"])
+
+
+def pages():
+    return [(("A.pdf", 1), "cuti tahunan"), (("A.pdf", 2), "cuti sakit"), (("B.pdf", 1), "")]
+
+
+def test_from_pages_reuses_cached_vectors_only_for_the_same_signature(tmp_path):
+    model = FakeEmbeddingModel(cost_per_call=0.0, cost_per_text=0.0)
+    cache_dir = str(tmp_path)
+    store = LocalVectorStore.from_pages(pages(), model, None, cache_dir=cache_dir, model_name="m")
+    assert ids(store.rows) == ["A.pdf:1", "A.pdf:2"]  # halaman kosong dilewati
+    assert not store.vectors.flags.owndata  # view atas file ter-memory-map, bukan salinan
+    meta = json.loads((tmp_path / "meta.json").read_text(encoding="utf-8"))
+    assert meta["pages"] == ["A.pdf:1", "A.pdf:2"] and os.path.exists(tmp_path / meta["file"])
+
+    class NoEncode:
+        def encode(self, texts):
+            raise AssertionError("vektor seharusnya dari cache")
+
+    cached = LocalVectorStore.from_pages(pages(), model, None, cache_dir=cache_dir, model_name="m", encoder=NoEncode())
+    np.testing.assert_array_equal(cached.vectors, store.vectors)
+
+    # Signature lain (halaman bertambah) tidak pernah memakai vektor lama; file lama dibuang
+    rebuilt = LocalVectorStore.from_pages(pages() + [(("B.pdf", 2), "lembur")], model, None,
+                                          cache_dir=cache_dir, model_name="m")
+    assert rebuilt.vectors.shape[0] == 3
+    assert len([name for name in os.listdir(cache_dir) if name.startswith("vectors-")]) == 1
+
+
+def test_cached_vectors_with_wrong_row_count_are_rejected(tmp_path):
+    signature = {"model": "m", "pages": ["A.pdf:1", "A.pdf:2"]}
+    np.save(LocalVectorStore._cached_vectors_path(str(tmp_path), signature), np.zeros((3, 4), np.float32))
+    assert LocalVectorStore._load_cached_vectors(str(tmp_path), signature) is None
+    LocalVectorStore._save_cached_vectors(str(tmp_path), signature, np.ones((2, 4), np.float32))
+    assert LocalVectorStore._load_cached_vectors(str(tmp_path), signature).shape == (2, 4)
+
+
+class FlakyClient(FakeMilvusClient):
+    """Klien Milvus palsu yang melempar galat dari `failures` (dibagi antar klien pool) dulu."""
+    def __init__(self, collection, failures, created):
+        super().__init__(collection)
+        self.failures = failures
+        self.closed = False
+        self.timeouts = []
+        created.append(self)
+
+    def search(self, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        if self.failures:
+            raise self.failures.pop(0)
+        return super().search(**kwargs)
+
+    def close(self):
+        self.closed = True
+
+
+def zilliz(failures, policy=None, pool_size=2):
+    collection = FakeCollection(num_chunks=50, latency=0.0)
+    created = []
+    store = ZillizVectorStore(CONFIG, FakeEmbeddingModel(cost_per_call=0.0, cost_per_text=0.0), None,
+                              pool_size=pool_size, retry_policy=policy or RetryPolicy(base_delay=0.0),
+                              client_factory=lambda: FlakyClient(collection, failures, created))
+    return store, created
+
+
+def test_zilliz_retries_transient_error_on_a_new_channel():
+    store, created = zilliz([ConnectionError("kanal putus")], pool_size=1)
+    hits = store.search("kebijakan cuti", top_k=3)
+
+    assert len(hits) == 3
+    assert len(created) == 2 and created[0].closed  # kanal rusak dibuang, slot diisi klien baru
+    assert not created[1].closed
+
+
+def test_zilliz_non_transient_error_is_not_retried():
+    store, created = zilliz([ValueError("collection tidak ada")])
+    with pytest.raises(VectorStoreError, match="1 percobaan"):
+        store.search("kebijakan cuti")
+    assert not created[0].closed
+
+
+def test_zilliz_gives_up_after_attempts_and_keeps_attempt_timeout_within_deadline():
+    failures = [TimeoutError("lambat")] * 5
+    store, created = zilliz(failures, RetryPolicy(attempts=3, deadline=0.5, attempt_timeout=2.0, base_delay=0.0))
+    with pytest.raises(VectorStoreError, match="3 percobaan"):
+        store.search("kebijakan cuti")
+    timeouts = [timeout for client in created for timeout in client.timeouts]
+    assert len(timeouts) == 3 and all(0 < timeout <= 0.5 for timeout in timeouts)
+
+
+def test_zilliz_pool_round_robins_and_sends_filters():
+    store, created = zilliz([], pool_size=2)
+    for _ in range(4):
+        hits = store.search("kebijakan cuti", top_k=5, filters={"jenis_dokumen": ("SOP",)})
+        assert hits and {hit["metadata"]["jenis_dokumen"] for hit in hits} == {"SOP"}
+    assert len(created) == 2
+    assert [len(client.timeouts) for client in created] == [2, 2]
+    store.close()
+    assert all(client.closed for client in created)
+
+
+def test_async_zilliz_retries_transient_error():
+    collection = FakeCollection(num_chunks=50, latency=0.0)
+    failures = [ConnectionError("kanal putus")]
+
+    class AsyncFlakyClient:
+        async def search(self, **kwargs):
+            if failures:
+                raise failures.pop(0)
+            return collection.search_results(kwargs["data"], kwargs["search_params"], kwargs["limit"],
+                                             kwargs["output_fields"], kwargs.get("filter"))
+
+        async def close(self):
+            pass
+
+    async def factory():
+        return AsyncFlakyClient()
+
+    store = AsyncZillizVectorStore(CONFIG, None, None, retry_policy=RetryPolicy(base_delay=0.0), client_factory=factory)
+    vector = FakeEmbeddingModel(cost_per_call=0.0, cost_per_text=0.0).encode("kebijakan cuti")
+    hits = asyncio.run(store.search_by_vector(vector, top_k=4))
+    assert len(hits) == 4 and failures == []
+
+
+def test_transient_error_classification():
+    assert vector_store.is_transient_error(ConnectionError())
+    assert vector_store.is_transient_error(asyncio.TimeoutError())
+    assert not vector_store.is_transient_error(ValueError())
+
+
+def test_vector_store_requires_search_by_vectors():
+    class Incomplete(VectorStore):
+        pass
+
+    with pytest.raises(TypeError, match="search_by_vectors"):
+        Incomplete(None, None)